@@ -0,0 +1,67 @@
+"""
+Date Range
+==========
+Predikat tanggal yang sargable. Filter harian / rentang / bulanan ditulis sebagai
+rentang setengah terbuka `kolom >= awal AND kolom < akhir` pada kolom mentah — bukan
+func.date(kolom) atau extract('month', kolom), yang membuat MySQL tidak bisa memakai
+index seperti patrol_sessions_nik_tanggal_index.
+
+Berlaku sama untuk kolom DATE maupun DATETIME/TIMESTAMP:
+    on_date(Tamu.jam_masuk, tgl)                     # satu hari
+    date_between(Chat.created_at, mulai, sampai)     # mulai..sampai inklusif (per hari)
+    in_month(PatrolSessions.tanggal, 2026, 9)        # satu bulan kalender
+
+today_wib() memberi tanggal hari ini di WIB walau TZ proses bukan Asia/Jakarta (CLI, job).
+
+app.core.query_lint menolak pola lama saat SQL_LINT aktif.
+"""
+
+from datetime import date, datetime, timedelta, timezone
+
+from sqlalchemy import and_, true
+
+ONE_DAY = timedelta(days=1)
+TZ_WIB = timezone(timedelta(hours=7))
+
+
+def today_wib() -> date:
+    return datetime.now(TZ_WIB).date()
+
+
+def _as_date(value) -> date:
+    return value.date() if isinstance(value, datetime) else value
+
+
+def day_bounds(tanggal) -> tuple:
+    """(awal, akhir) setengah terbuka untuk satu hari."""
+    tanggal = _as_date(tanggal)
+    return tanggal, tanggal + ONE_DAY
+
+
+def month_bounds(tahun: int, bulan: int) -> tuple:
+    """(tanggal 1 bulan ini, tanggal 1 bulan berikutnya)."""
+    awal = date(int(tahun), int(bulan), 1)
+    akhir = date(awal.year + 1, 1, 1) if awal.month == 12 else date(awal.year, awal.month + 1, 1)
+    return awal, akhir
+
+
+def on_date(column, tanggal):
+    """column jatuh pada tanggal tsb."""
+    awal, akhir = day_bounds(tanggal)
+    return and_(column >= awal, column < akhir)
+
+
+def date_between(column, mulai=None, sampai=None):
+    """column di antara hari mulai..sampai (inklusif); batas None diabaikan."""
+    kondisi = []
+    if mulai is not None:
+        kondisi.append(column >= _as_date(mulai))
+    if sampai is not None:
+        kondisi.append(column < _as_date(sampai) + ONE_DAY)
+    return and_(*kondisi) if kondisi else true()
+
+
+def in_month(column, tahun: int, bulan: int):
+    """column jatuh pada bulan kalender tsb."""
+    awal, akhir = month_bounds(tahun, bulan)
+    return and_(column >= awal, column < akhir)
@@ -3,15 +3,35 @@ FCM V1 Push Notification Service
 ==================================
 Mengirim push notification ke device Android melalui Firebase Cloud Messaging (FCM) v1 API.
 Menggunakan Service Account credentials (serviceAccountKey.json).
-Menggunakan JWT manual + requests dengan IPv4 force (seperti PHP Laravel FcmV1Service).
+Menggunakan JWT manual (seperti PHP Laravel FcmV1Service) dengan IPv4 force.
+
+Dispatcher:
+- Satu httpx.AsyncClient (HTTP/2, koneksi di-pool) yang hidup di event loop khusus
+  (thread "fcm-dispatcher"), sehingga bisa dipanggil dari thread mana pun:
+  APScheduler, handler sinkron, maupun coroutine.
+- Pengiriman per token berjalan paralel, dibatasi FCM_CONCURRENCY.
+- 429 / 5xx / error jaringan di-retry dengan exponential backoff (menghormati Retry-After),
+  maksimal FCM_MAX_RETRIES kali. 401 → access token di-refresh sekali.
+- Token yang dibalas UNREGISTERED / INVALID_ARGUMENT (token tidak valid) dihapus dari
+  karyawan_devices secara otomatis.
+- Service account & access token di-cache di memori.
+
+API:
+    send_multicast(tokens, data=None, notification=None, ttl_seconds=None) -> FcmResult   (blocking)
+    await send_multicast_async(...)                                                     (coroutine)
+    submit_multicast(...) -> concurrent.futures.Future                                  (fire & forget)
 """
 
 import os
 import json
 import time
+import random
+import asyncio
 import logging
 import socket
-import requests
+import threading
+
+import httpx
 
 logger = logging.getLogger(__name__)
 
@@ -27,81 +47,296 @@ socket.getaddrinfo = _ipv4_getaddrinfo
 # Path ke service account key
 SERVICE_ACCOUNT_PATH = "/var/www/appPatrol-python/serviceAccountKey.json"
 
-# Cache token
+FCM_CONCURRENCY = int(os.getenv("FCM_CONCURRENCY", 50))
+FCM_MAX_RETRIES = int(os.getenv("FCM_MAX_RETRIES", 3))
+FCM_TIMEOUT = float(os.getenv("FCM_TIMEOUT", 10))
+
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+# Cache service account & token
+_service_account: dict = {}
 _cached_token: str = ""
 _token_expiry: float = 0.0
 
+# Dispatcher (event loop khusus FCM)
+_loop: asyncio.AbstractEventLoop = None
+_loop_lock = threading.Lock()
+_client: httpx.AsyncClient = None
+_semaphore: asyncio.Semaphore = None
+_token_lock: asyncio.Lock = None
 
-def _load_service_account() -> dict:
-    with open(SERVICE_ACCOUNT_PATH) as f:
-        return json.load(f)
 
+class FcmResult:
+    """Ringkasan pengiriman multicast (mirip BatchResponse firebase_admin)."""
 
-def _get_access_token() -> str:
-    """Ambil OAuth2 access token menggunakan JWT + Google Token endpoint (cached 55 menit)."""
-    global _cached_token, _token_expiry
+    def __init__(self, responses: list, pruned: int = 0):
+        self.responses = responses
+        self.success_count = sum(1 for r in responses if r["status"] == 200)
+        self.failure_count = len(responses) - self.success_count
+        self.pruned = pruned
 
-    now = time.time()
-    if _cached_token and now < _token_expiry:
-        return _cached_token
+    def __repr__(self):
+        return f"FcmResult(success={self.success_count}, failure={self.failure_count}, pruned={self.pruned})"
 
-    import base64
-    import json
-    import hmac
-    import hashlib
 
-    try:
-        sa = _load_service_account()
-
-        # Build JWT
-        header = {"alg": "RS256", "typ": "JWT"}
-        now_ts = int(time.time())
-        payload = {
-            "iss": sa["client_email"],
-            "scope": "https://www.googleapis.com/auth/firebase.messaging",
-            "aud": "https://oauth2.googleapis.com/token",
-            "iat": now_ts,
-            "exp": now_ts + 3600,
-        }
+def _load_service_account() -> dict:
+    global _service_account
+    if not _service_account:
+        with open(SERVICE_ACCOUNT_PATH) as f:
+            _service_account = json.load(f)
+    return _service_account
 
-        def b64(data: dict) -> str:
-            return base64.urlsafe_b64encode(json.dumps(data).encode()).rstrip(b'=').decode()
 
-        signing_input = f"{b64(header)}.{b64(payload)}"
+def _build_assertion(sa: dict) -> str:
+    """JWT RS256 untuk ditukar menjadi OAuth2 access token."""
+    import base64
+    from cryptography.hazmat.primitives import hashes, serialization
+    from cryptography.hazmat.primitives.asymmetric import padding
 
-        # Sign dengan private key menggunakan cryptography
-        from cryptography.hazmat.primitives import hashes, serialization
-        from cryptography.hazmat.primitives.asymmetric import padding
+    header = {"alg": "RS256", "typ": "JWT"}
+    now_ts = int(time.time())
+    payload = {
+        "iss": sa["client_email"],
+        "scope": "https://www.googleapis.com/auth/firebase.messaging",
+        "aud": "https://oauth2.googleapis.com/token",
+        "iat": now_ts,
+        "exp": now_ts + 3600,
+    }
 
-        private_key = serialization.load_pem_private_key(
-            sa["private_key"].encode(), password=None
-        )
-        signature = private_key.sign(signing_input.encode(), padding.PKCS1v15(), hashes.SHA256())
-        jwt_token = f"{signing_input}.{base64.urlsafe_b64encode(signature).rstrip(b'=').decode()}"
+    def b64(data: dict) -> str:
+        return base64.urlsafe_b64encode(json.dumps(data).encode()).rstrip(b'=').decode()
 
-        # Exchange JWT untuk access token
-        resp = requests.post(
-            "https://oauth2.googleapis.com/token",
-            data={
-                "grant_type": "urn:ietf:params:oauth:grant-type:jwt-bearer",
-                "assertion": jwt_token,
-            },
-            timeout=10,
-        )
+    signing_input = f"{b64(header)}.{b64(payload)}"
 
-        if resp.status_code != 200:
-            raise Exception(f"Token exchange failed: {resp.status_code} {resp.text[:200]}")
+    # Sign dengan private key menggunakan cryptography
+    private_key = serialization.load_pem_private_key(
+        sa["private_key"].encode(), password=None
+    )
+    signature = private_key.sign(signing_input.encode(), padding.PKCS1v15(), hashes.SHA256())
+    return f"{signing_input}.{base64.urlsafe_b64encode(signature).rstrip(b'=').decode()}"
 
-        token_data = resp.json()
-        _cached_token = token_data["access_token"]
-        _token_expiry = now + 3300  # Cache 55 menit
 
-        logger.info("[FCM] ✅ Access token berhasil di-refresh via JWT")
-        return _cached_token
+async def _get_access_token(force: bool = False) -> str:
+    """Ambil OAuth2 access token menggunakan JWT + Google Token endpoint (cached 55 menit)."""
+    global _cached_token, _token_expiry
 
+    async with _token_lock:
+        now = time.time()
+        if _cached_token and now < _token_expiry and not force:
+            return _cached_token
+
+        try:
+            # Exchange JWT untuk access token
+            resp = await _client.post(
+                "https://oauth2.googleapis.com/token",
+                data={
+                    "grant_type": "urn:ietf:params:oauth:grant-type:jwt-bearer",
+                    "assertion": _build_assertion(_load_service_account()),
+                },
+            )
+
+            if resp.status_code != 200:
+                raise Exception(f"Token exchange failed: {resp.status_code} {resp.text[:200]}")
+
+            _cached_token = resp.json()["access_token"]
+            _token_expiry = now + 3300  # Cache 55 menit
+
+            logger.info("[FCM] ✅ Access token berhasil di-refresh via JWT")
+            return _cached_token
+
+        except Exception as e:
+            logger.error(f"[FCM] ❌ Gagal ambil access token: {e}")
+            raise
+
+
+# ─── Dispatcher loop ───────────────────────────────────────────────────────
+def _ensure_loop() -> asyncio.AbstractEventLoop:
+    global _loop
+    with _loop_lock:
+        if _loop is not None and _loop.is_running():
+            return _loop
+
+        loop = asyncio.new_event_loop()
+        started = threading.Event()
+
+        def _run():
+            asyncio.set_event_loop(loop)
+            loop.call_soon(started.set)
+            loop.run_forever()
+
+        threading.Thread(target=_run, name="fcm-dispatcher", daemon=True).start()
+        started.wait()
+
+        async def _init():
+            global _client, _semaphore, _token_lock
+            _client = httpx.AsyncClient(
+                http2=True,
+                timeout=FCM_TIMEOUT,
+                limits=httpx.Limits(max_connections=FCM_CONCURRENCY, max_keepalive_connections=FCM_CONCURRENCY),
+            )
+            _semaphore = asyncio.Semaphore(FCM_CONCURRENCY)
+            _token_lock = asyncio.Lock()
+
+        asyncio.run_coroutine_threadsafe(_init(), loop).result()
+        _loop = loop
+        logger.info(f"[FCM] Dispatcher aktif (concurrency={FCM_CONCURRENCY}, retry={FCM_MAX_RETRIES})")
+        return _loop
+
+
+def _error_info(resp: httpx.Response):
+    """(error_code, message) dari body error FCM v1."""
+    try:
+        err = resp.json().get("error", {})
+    except Exception:
+        return None, resp.text[:200]
+    code = err.get("status")
+    for detail in err.get("details", []):
+        if detail.get("errorCode"):
+            code = detail["errorCode"]
+            break
+    return code, err.get("message", "")
+
+
+def _is_stale_token(status, error_code, message: str) -> bool:
+    if error_code == "UNREGISTERED" or status == 404:
+        return True
+    # INVALID_ARGUMENT juga dipakai untuk payload salah → hanya jika memang soal token
+    return error_code == "INVALID_ARGUMENT" and "registration token" in (message or "").lower()
+
+
+def _backoff(attempt: int, resp: httpx.Response = None) -> float:
+    if resp is not None:
+        retry_after = resp.headers.get("retry-after")
+        if retry_after and retry_after.isdigit():
+            return min(float(retry_after), 60.0)
+    return min(0.5 * (2 ** attempt), 8.0) + random.uniform(0, 0.25)
+
+
+async def _send_one(url: str, token: str, message: dict) -> dict:
+    result = {"token": token[:30], "status": "error"}
+    refreshed = False
+    attempt = 0
+    while True:
+        resp = None
+        async with _semaphore:
+            try:
+                access_token = await _get_access_token()
+                resp = await _client.post(
+                    url,
+                    headers={"Authorization": f"Bearer {access_token}"},
+                    json={"message": {**message, "token": token}},
+                )
+            except Exception as e:
+                result = {"token": token[:30], "status": "error", "error": str(e)}
+
+        if resp is not None:
+            if resp.status_code == 200:
+                return {"token": token[:30], "status": 200}
+
+            error_code, error_msg = _error_info(resp)
+            result = {"token": token[:30], "status": resp.status_code, "error": error_code}
+
+            if resp.status_code == 401 and not refreshed:
+                refreshed = True
+                try:
+                    await _get_access_token(force=True)
+                except Exception as e:
+                    logger.warning(f"[FCM] ⚠️ Refresh access token gagal: {e}")
+                    return {"token": token[:30], "status": 401, "error": f"token refresh: {e}"}
+                continue
+            if _is_stale_token(resp.status_code, error_code, error_msg):
+                result["stale"] = True
+                return result
+            if resp.status_code not in RETRY_STATUS:
+                logger.warning(f"[FCM] ⚠️ Gagal ke token {token[:30]}... | status={resp.status_code} | {error_code}: {error_msg[:200]}")
+                return result
+
+        if attempt >= FCM_MAX_RETRIES:
+            logger.warning(f"[FCM] ⚠️ Menyerah setelah {attempt + 1}x ke token {token[:30]}... | {result.get('error')}")
+            return result
+        await asyncio.sleep(_backoff(attempt, resp))
+        attempt += 1
+
+
+def _build_message(data: dict = None, notification: dict = None, ttl_seconds: int = None) -> dict:
+    message = {"android": {"priority": "high"}}
+    if data:
+        message["data"] = {k: str(v) for k, v in data.items()}
+    if notification:
+        message["notification"] = notification
+    if ttl_seconds:
+        message["android"]["ttl"] = f"{int(ttl_seconds)}s"
+    return message
+
+
+def _prune_tokens(tokens: list) -> int:
+    """Hapus karyawan_devices yang token-nya sudah tidak terdaftar di FCM."""
+    from app.database import SessionLocal
+    from app.models.models import KaryawanDevices
+
+    db = SessionLocal()
+    try:
+        deleted = db.query(KaryawanDevices).filter(
+            KaryawanDevices.fcm_token.in_(tokens)
+        ).delete(synchronize_session=False)
+        db.commit()
+        logger.info(f"[FCM] 🗑️ {deleted} token tidak valid dihapus dari karyawan_devices")
+        return deleted
     except Exception as e:
-        logger.error(f"[FCM] ❌ Gagal ambil access token: {e}")
-        raise
+        db.rollback()
+        logger.error(f"[FCM] Gagal prune token: {e}")
+        return 0
+    finally:
+        db.close()
+
+
+async def _send_multicast(tokens: list, message: dict) -> FcmResult:
+    tokens = list(dict.fromkeys(t for t in tokens if t))
+    if not tokens:
+        return FcmResult([])
+
+    project_id = _load_service_account()["project_id"]
+    url = f"https://fcm.googleapis.com/v1/projects/{project_id}/messages:send"
+    responses = await asyncio.gather(*(_send_one(url, t, message) for t in tokens), return_exceptions=True)
+    # Satu token yang error tak terduga tidak boleh membuang hasil token lain
+    responses = [
+        {"token": t[:30], "status": "error", "error": str(r)} if isinstance(r, BaseException) else r
+        for t, r in zip(tokens, responses)
+    ]
+
+    stale = [t for t, r in zip(tokens, responses) if r.get("stale")]
+    pruned = 0
+    if stale:
+        pruned = await asyncio.get_running_loop().run_in_executor(None, _prune_tokens, stale)
+
+    result = FcmResult(responses, pruned)
+    logger.info(f"[FCM] Multicast {len(tokens)} token → {result}")
+    return result
+
+
+# ─── Public API ────────────────────────────────────────────────────────────
+def submit_multicast(tokens: list, data: dict = None, notification: dict = None, ttl_seconds: int = None):
+    """Jadwalkan pengiriman tanpa menunggu hasil. Return concurrent.futures.Future."""
+    message = _build_message(data, notification, ttl_seconds)
+    return asyncio.run_coroutine_threadsafe(_send_multicast(tokens, message), _ensure_loop())
+
+
+def send_multicast(tokens: list, data: dict = None, notification: dict = None, ttl_seconds: int = None) -> FcmResult:
+    """Kirim ke banyak token dan tunggu hasilnya (blocking — jangan dipanggil dari event loop)."""
+    try:
+        return submit_multicast(tokens, data, notification, ttl_seconds).result()
+    except Exception as e:
+        logger.error(f"[FCM] send_multicast error: {e}")
+        return FcmResult([{"token": t[:30], "status": "error", "error": str(e)} for t in tokens if t])
+
+
+async def send_multicast_async(tokens: list, data: dict = None, notification: dict = None, ttl_seconds: int = None) -> FcmResult:
+    """Versi coroutine dari send_multicast (untuk handler async / Socket.IO)."""
+    try:
+        return await asyncio.wrap_future(submit_multicast(tokens, data, notification, ttl_seconds))
+    except Exception as e:
+        logger.error(f"[FCM] send_multicast_async error: {e}")
+        return FcmResult([{"token": t[:30], "status": "error", "error": str(e)} for t in tokens if t])
 
 
 def send_chat_notification(
@@ -109,10 +344,12 @@ def send_chat_notification(
     sender_nama: str,
     message_text: str,
     room: str,
-    db_session=None
+    db_session=None,
+    wait: bool = True
 ) -> list:
     """
     Kirim push notification chat ke semua device dari daftar NIK.
+    wait=False → token diambil sekarang, pengiriman berjalan di dispatcher (return []).
     """
     if not target_niks or not db_session:
         return []
@@ -142,12 +379,16 @@ def send_chat_notification(
         print(f"[FCM CHAT] Mengirim ke {len(tokens)} token | room={room}")
         logger.info(f"[FCM CHAT] Mengirim ke {len(tokens)} token | room={room} | pengirim={sender_nama}")
 
-        return _send_to_tokens(tokens, {
+        data = {
             "type": "chat",
             "title": sender_nama,
             "body": message_text,
             "room": room,
-        })
+        }
+        if not wait:
+            submit_multicast(tokens, data=data)
+            return []
+        return _send_to_tokens(tokens, data)
 
     except Exception as e:
         logger.error(f"[FCM CHAT] Error saat kirim notifikasi: {e}")
@@ -157,45 +398,4 @@ def send_chat_notification(
 
 def _send_to_tokens(tokens: list, data: dict) -> list:
     """Kirim data-only push notification ke list token via FCM v1 API."""
-    try:
-        access_token = _get_access_token()
-        sa = _load_service_account()
-        project_id = sa["project_id"]
-        url = f"https://fcm.googleapis.com/v1/projects/{project_id}/messages:send"
-        headers = {
-            "Authorization": f"Bearer {access_token}",
-            "Content-Type": "application/json",
-        }
-
-        responses = []
-        for token in tokens:
-            payload = {
-                "message": {
-                    "token": token,
-                    "data": {k: str(v) for k, v in data.items()},
-                    "android": {
-                        "priority": "high"
-                    }
-                }
-            }
-
-            try:
-                resp = requests.post(url, headers=headers, json=payload, timeout=10)
-                if resp.status_code == 200:
-                    logger.info(f"[FCM] ✅ Terkirim ke token: {token[:30]}...")
-                    print(f"[FCM] ✅ Terkirim ke token: {token[:30]}...")
-                else:
-                    logger.warning(f"[FCM] ⚠️ Gagal ke token {token[:30]}... | status={resp.status_code} | {resp.text[:200]}")
-                    print(f"[FCM] ⚠️ Gagal | status={resp.status_code} | {resp.text[:300]}")
-                responses.append({"token": token[:30], "status": resp.status_code})
-            except Exception as e:
-                logger.error(f"[FCM] ❌ Error kirim ke token {token[:30]}: {e}")
-                print(f"[FCM] ❌ Error: {e}")
-                responses.append({"token": token[:30], "status": "error", "error": str(e)})
-
-        return responses
-
-    except Exception as e:
-        logger.error(f"[FCM] _send_to_tokens error: {e}")
-        print(f"[FCM] _send_to_tokens error: {e}")
-        return []
+    return send_multicast(tokens, data=data).responses
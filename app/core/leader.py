@@ -0,0 +1,223 @@
+"""
+Scheduler Leader
+================
+Pemilihan satu worker "leader" untuk job APScheduler yang hanya boleh berjalan sekali
+per deployment (reminder, auto-close presensi, deteksi pelanggaran, retensi lokasi).
+Dengan N worker uvicorn/gunicorn tanpa ini setiap job berjalan N kali: reminder & push
+FCM terkirim berulang dan scan penuh ke DB dikerjakan N kali.
+
+Backend (SCHEDULER_LEADER_BACKEND):
+- auto  (default) → redis bila SCHEDULER_LEADER_URL / SIO_STATE_URL diset, selain itu mysql
+- redis → lease `SET key node NX PX ttl`; leader memperpanjang lease setiap
+          SCHEDULER_LEADER_RENEW detik (WATCH/MULTI, hanya bila key masih miliknya)
+- mysql → GET_LOCK(name, 0) pada satu koneksi khusus yang dipegang selama proses hidup;
+          lock lepas sendiri bila koneksi / proses mati
+- none  → setiap worker dianggap leader (perilaku lama, untuk dev satu proses)
+
+renew() dijalankan sekali sebelum scheduler start lalu sebagai job di SEMUA worker:
+leader memperpanjang, worker lain mencoba mengambil alih bila lease kosong (leader mati
+→ diganti dalam ≤ SCHEDULER_LEADER_TTL detik). Job leader-only dibungkus only_leader().
+"""
+
+import os
+import time
+import uuid
+import socket
+import logging
+import threading
+from functools import wraps
+
+from sqlalchemy import text
+
+logger = logging.getLogger("leader")
+
+BACKEND = os.getenv("SCHEDULER_LEADER_BACKEND", "auto")
+LEADER_URL = os.getenv("SCHEDULER_LEADER_URL", os.getenv("SIO_STATE_URL", os.getenv("SIO_MESSAGE_QUEUE", "")))
+LEADER_KEY = os.getenv("SCHEDULER_LEADER_KEY", "patrol:scheduler:leader")
+TTL_SECONDS = int(os.getenv("SCHEDULER_LEADER_TTL", 30))
+RENEW_SECONDS = int(os.getenv("SCHEDULER_LEADER_RENEW", 10))
+
+NODE_ID = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+
+
+class RedisLease:
+    backend = "redis"
+
+    def __init__(self, url: str, key: str = LEADER_KEY, node_id: str = NODE_ID, ttl: int = TTL_SECONDS):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("SCHEDULER_LEADER_URL diset tetapi paket 'redis' belum terpasang (pip install redis)")
+        self.redis = redis.Redis.from_url(url, decode_responses=True)
+        self.key = key
+        self.node = node_id
+        self.ttl_ms = ttl * 1000
+
+    def acquire(self) -> bool:
+        from redis.exceptions import WatchError
+        if self.redis.set(self.key, self.node, nx=True, px=self.ttl_ms):
+            return True
+        with self.redis.pipeline(transaction=True) as p:
+            try:
+                p.watch(self.key)
+                if p.get(self.key) != self.node:
+                    return False
+                p.multi()
+                p.pexpire(self.key, self.ttl_ms)
+                p.execute()
+                return True
+            except WatchError:      # lease berganti pemilik di tengah jalan
+                return False
+
+    def release(self):
+        from redis.exceptions import WatchError
+        with self.redis.pipeline(transaction=True) as p:
+            try:
+                p.watch(self.key)
+                if p.get(self.key) == self.node:
+                    p.multi()
+                    p.delete(self.key)
+                    p.execute()
+            except WatchError:
+                pass
+        self.redis.close()
+
+
+class MysqlLock:
+    backend = "mysql"
+
+    def __init__(self, name: str = LEADER_KEY):
+        self.name = name
+        self._conn = None
+
+    def acquire(self) -> bool:
+        from app.database import engine
+        try:
+            if self._conn is not None:
+                # Masih memegang lock di koneksi ini?
+                if self._scalar("SELECT IS_USED_LOCK(:n) = CONNECTION_ID()"):
+                    return True
+                self._close()
+            self._conn = engine.connect()
+            if self._scalar("SELECT GET_LOCK(:n, 0)") == 1:
+                return True
+        except Exception as e:
+            logger.warning(f"GET_LOCK gagal: {e}")
+        self._close()
+        return False
+
+    def _scalar(self, sql: str):
+        try:
+            return self._conn.execute(text(sql), {"n": self.name}).scalar()
+        finally:
+            # GET_LOCK tidak transaksional; jangan biarkan transaksi baca terbuka lama
+            self._conn.rollback()
+
+    def _close(self):
+        if self._conn is not None:
+            try:
+                self._conn.close()      # lock MySQL ikut lepas bersama koneksi
+            except Exception:
+                pass
+            self._conn = None
+
+    def release(self):
+        if self._conn is not None:
+            try:
+                self._scalar("SELECT RELEASE_LOCK(:n)")
+            except Exception:
+                pass
+        self._close()
+
+
+class _Always:
+    backend = "none"
+
+    def acquire(self) -> bool:
+        return True
+
+    def release(self):
+        pass
+
+
+_lock = threading.Lock()
+_backend = None
+_is_leader = False
+_valid_until = 0.0  # monotonic; renew terlambat > TTL → lease mungkin sudah diambil worker lain
+_stats = {"acquired": 0, "lost": 0, "skipped_runs": 0, "since": None}
+
+
+def _create():
+    backend = BACKEND
+    if backend == "auto":
+        backend = "redis" if LEADER_URL else "mysql"
+    if backend == "redis":
+        return RedisLease(LEADER_URL)
+    if backend == "mysql":
+        return MysqlLock()
+    return _Always()
+
+
+def renew() -> bool:
+    """Ambil / perpanjang kepemimpinan; dipanggil periodik oleh scheduler di semua worker."""
+    global _backend, _is_leader, _valid_until
+    with _lock:
+        started = time.monotonic()
+        if _backend is None:
+            _backend = _create()
+        try:
+            ok = _backend.acquire()
+        except Exception as e:
+            logger.warning(f"renew leader gagal: {e}")
+            ok = False
+        if ok and not _is_leader:
+            _stats["acquired"] += 1
+            _stats["since"] = time.time()
+            logger.info(f"[Leader] {NODE_ID} menjadi leader scheduler ({_backend.backend})")
+        elif not ok and _is_leader:
+            _stats["lost"] += 1
+            _stats["since"] = None
+            logger.warning(f"[Leader] {NODE_ID} kehilangan kepemimpinan scheduler")
+        _is_leader = ok
+        _valid_until = started + TTL_SECONDS if ok else 0.0
+        return ok
+
+
+def is_leader() -> bool:
+    return _is_leader and time.monotonic() < _valid_until
+
+
+def only_leader(func):
+    """Bungkus job scheduler agar hanya dijalankan worker leader."""
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        if not is_leader():
+            with _lock:
+                _stats["skipped_runs"] += 1
+            return None
+        return func(*args, **kwargs)
+    return wrapper
+
+
+def release():
+    """Lepas kepemimpinan saat shutdown agar worker lain bisa langsung mengambil alih."""
+    global _backend, _is_leader
+    with _lock:
+        if _backend is not None:
+            try:
+                _backend.release()
+            except Exception as e:
+                logger.warning(f"release leader gagal: {e}")
+        _backend = None
+        _is_leader = False
+
+
+def stats() -> dict:
+    with _lock:
+        return {
+            **_stats,
+            "node": NODE_ID,
+            "leader": is_leader(),
+            "backend": _backend.backend if _backend else None,
+            "ttl_seconds": TTL_SECONDS,
+        }
@@ -0,0 +1,188 @@
+"""
+Master Data Cache
+=================
+Read-through cache in-process untuk tabel master yang jarang berubah
+(beberapa kali per bulan) tetapi dibaca di hampir setiap request Android:
+
+- presensi_jamkerja        → get_jam_kerja / get_all_jam_kerja / get_first_jam_kerja
+- pengaturan_umum          → get_pengaturan
+- cabang                   → get_cabang / get_all_cabang
+- departemen               → get_departemen
+- presensi_jamkerja_bydept → get_jam_kerja_dept (header + detail jadwal departemen)
+
+Setiap namespace punya nomor versi. Endpoint tulis (master.py, general_setting.py,
+jam_kerja_dept.py) memanggil invalidate() setelah commit sehingga versi naik dan
+pembacaan berikutnya memuat ulang tabel. TTL tetap dipakai sebagai jaring pengaman
+untuk worker lain yang tidak menerima invalidasi.
+
+Nilai yang dikembalikan adalah snapshot read-only (SimpleNamespace) — bukan objek ORM —
+agar aman dipakai lintas session/thread. Jangan di-db.add() atau dimodifikasi.
+"""
+
+import os
+import time
+import logging
+import threading
+from types import SimpleNamespace
+
+from sqlalchemy import inspect
+from sqlalchemy.orm import Session
+
+from app.models.models import (
+    PresensiJamkerja, PengaturanUmum, Cabang, Departemen,
+    PresensiJamkerjaBydept, PresensiJamkerjaByDeptDetail
+)
+
+logger = logging.getLogger(__name__)
+
+CACHE_TTL_SECONDS = int(os.getenv("MASTER_CACHE_TTL", 300))
+
+JAM_KERJA = "presensi_jamkerja"
+PENGATURAN = "pengaturan_umum"
+CABANG = "cabang"
+DEPARTEMEN = "departemen"
+JAM_KERJA_DEPT = "presensi_jamkerja_bydept"
+
+NAMESPACES = (JAM_KERJA, PENGATURAN, CABANG, DEPARTEMEN, JAM_KERJA_DEPT)
+
+_lock = threading.Lock()
+_versions = {ns: 0 for ns in NAMESPACES}
+_entries = {}  # ns -> (version, loaded_at, data)
+_stats = {ns: {"hits": 0, "misses": 0, "invalidations": 0} for ns in NAMESPACES}
+
+
+def _snapshot(obj):
+    if obj is None:
+        return None
+    return SimpleNamespace(**{attr.key: getattr(obj, attr.key) for attr in inspect(obj).mapper.column_attrs})
+
+
+def _read_through(ns: str, db: Session, loader):
+    now = time.monotonic()
+    with _lock:
+        version = _versions[ns]
+        entry = _entries.get(ns)
+        if entry and entry[0] == version and now - entry[1] < CACHE_TTL_SECONDS:
+            _stats[ns]["hits"] += 1
+            return entry[2]
+        _stats[ns]["misses"] += 1
+
+    data = loader(db)
+
+    with _lock:
+        # Jangan simpan hasil jika ada invalidasi selama loading (data mungkin sudah basi)
+        if _versions[ns] == version:
+            _entries[ns] = (version, now, data)
+    return data
+
+
+# ─── Loaders ───────────────────────────────────────────────────────────────
+def _load_jam_kerja(db: Session) -> dict:
+    rows = db.query(PresensiJamkerja).order_by(PresensiJamkerja.kode_jam_kerja).all()
+    return {r.kode_jam_kerja: _snapshot(r) for r in rows}
+
+
+def _load_pengaturan(db: Session):
+    return _snapshot(db.query(PengaturanUmum).order_by(PengaturanUmum.id).first())
+
+
+def _load_cabang(db: Session) -> dict:
+    return {r.kode_cabang: _snapshot(r) for r in db.query(Cabang).all()}
+
+
+def _load_departemen(db: Session) -> dict:
+    return {r.kode_dept: _snapshot(r) for r in db.query(Departemen).all()}
+
+
+def _load_jam_kerja_dept(db: Session) -> dict:
+    headers = {}
+    for h in db.query(PresensiJamkerjaBydept).all():
+        headers.setdefault((h.kode_dept, h.kode_cabang), h.kode_jk_dept)
+    details = {}
+    for d in db.query(PresensiJamkerjaByDeptDetail).all():
+        details.setdefault(d.kode_jk_dept, []).append((d.hari, d.kode_jam_kerja))
+    return {"headers": headers, "details": details}
+
+
+# ─── Public API ────────────────────────────────────────────────────────────
+def get_all_jam_kerja(db: Session) -> dict:
+    """{kode_jam_kerja: snapshot} untuk seluruh master jam kerja, urut kode."""
+    return _read_through(JAM_KERJA, db, _load_jam_kerja)
+
+
+def get_jam_kerja(db: Session, kode_jam_kerja: str):
+    if not kode_jam_kerja:
+        return None
+    return get_all_jam_kerja(db).get(kode_jam_kerja)
+
+
+def get_first_jam_kerja(db: Session):
+    """Pengganti db.query(PresensiJamkerja).first() (urut primary key)."""
+    return next(iter(get_all_jam_kerja(db).values()), None)
+
+
+def get_pengaturan(db: Session):
+    return _read_through(PENGATURAN, db, _load_pengaturan)
+
+
+def get_all_cabang(db: Session) -> dict:
+    """{kode_cabang: snapshot}; dict yang sama dikembalikan selama cache belum dimuat ulang."""
+    return _read_through(CABANG, db, _load_cabang)
+
+
+def get_cabang(db: Session, kode_cabang: str):
+    if not kode_cabang:
+        return None
+    return get_all_cabang(db).get(kode_cabang)
+
+
+def get_departemen(db: Session, kode_dept: str):
+    if not kode_dept:
+        return None
+    return _read_through(DEPARTEMEN, db, _load_departemen).get(kode_dept)
+
+
+def get_jam_kerja_dept(db: Session) -> dict:
+    """
+    {'headers': {(kode_dept, kode_cabang): kode_jk_dept},
+     'details': {kode_jk_dept: [(hari, kode_jam_kerja), ...]}}
+    """
+    return _read_through(JAM_KERJA_DEPT, db, _load_jam_kerja_dept)
+
+
+def get_dept_kode_jam_kerja(db: Session, kode_cabang: str, kode_dept: str, hari: str):
+    """kode_jam_kerja jadwal departemen (cabang + dept) untuk nama hari tertentu, atau None."""
+    data = get_jam_kerja_dept(db)
+    kode_jk_dept = data["headers"].get((kode_dept, kode_cabang))
+    if not kode_jk_dept:
+        return None
+    hari_key = (hari or '').strip().lower()
+    for d_hari, kode in data["details"].get(kode_jk_dept, []):
+        if (d_hari or '').strip().lower() == hari_key:
+            return kode
+    return None
+
+
+def invalidate(*namespaces: str):
+    """Naikkan versi namespace (tanpa argumen = semua) agar dibaca ulang dari DB."""
+    targets = namespaces or NAMESPACES
+    with _lock:
+        for ns in targets:
+            _versions[ns] += 1
+            _entries.pop(ns, None)
+            _stats[ns]["invalidations"] += 1
+    logger.info(f"[MasterCache] Invalidate: {', '.join(targets)}")
+
+
+def versions(*namespaces: str) -> dict:
+    """Nomor versi saat ini per namespace — untuk cache turunan (mis. reminder timeline)."""
+    with _lock:
+        return {ns: _versions[ns] for ns in (namespaces or NAMESPACES)}
+
+
+def cache_stats() -> dict:
+    with _lock:
+        return {
+            ns: {**_stats[ns], "version": _versions[ns], "loaded": ns in _entries}
+            for ns in NAMESPACES
+        }
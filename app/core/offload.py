@@ -0,0 +1,129 @@
+"""
+Blocking Work Offload & Event Loop Lag Monitor
+==============================================
+Model eksekusi untuk kode sinkron (SQLAlchemy Session, tulis file, firebase_admin)
+di server async yang juga melayani Socket.IO (walkie, tracking) pada loop yang sama.
+
+Aturan di router:
+- Handler yang seluruh isinya sinkron ditulis sebagai `def` (bukan `async def`) →
+  FastAPI/Starlette menjalankannya di thread pool, loop tetap bebas.
+- Handler yang wajib `async` (await request.form(), sio.emit, dll.) membungkus bagian
+  blocking dengan `await run_blocking(func, *args)`.
+
+Thread pool dibatasi (THREADPOOL_SIZE, default 40) dan dipakai bersama oleh handler
+`def`, dependency sinkron (get_db) dan run_blocking(), sehingga jumlah query paralel
+tetap sebanding dengan pool koneksi DB.
+
+LoopLagMonitor mengukur keterlambatan asyncio.sleep() periodik. Jika loop tertahan
+lebih dari LOOP_LAG_THRESHOLD_MS, request yang sedang berjalan saat itu di-log sebagai
+tersangka (dicatat oleh track_request di middleware app.main).
+"""
+
+import os
+import time
+import asyncio
+import logging
+import itertools
+from contextlib import contextmanager
+
+import anyio.to_thread
+from starlette.concurrency import run_in_threadpool
+
+logger = logging.getLogger("loop_lag")
+
+THREADPOOL_SIZE = int(os.getenv("THREADPOOL_SIZE", 40))
+LOOP_LAG_INTERVAL_MS = int(os.getenv("LOOP_LAG_INTERVAL_MS", 100))
+LOOP_LAG_THRESHOLD_MS = int(os.getenv("LOOP_LAG_THRESHOLD_MS", 200))
+
+_inflight = {}  # request_id -> (label, started_monotonic)
+_request_ids = itertools.count(1)
+
+
+def configure_threadpool(size: int = THREADPOOL_SIZE):
+    """Set batas thread pool default anyio (dipanggil sekali saat startup, di dalam loop)."""
+    global THREADPOOL_SIZE
+    limiter = anyio.to_thread.current_default_thread_limiter()
+    limiter.total_tokens = size
+    THREADPOOL_SIZE = size
+    logger.info(f"Thread pool offload: {size} worker")
+
+
+async def run_blocking(func, *args, **kwargs):
+    """Jalankan fungsi sinkron di thread pool bersama dan tunggu hasilnya."""
+    return await run_in_threadpool(func, *args, **kwargs)
+
+
+@contextmanager
+def track_request(label: str):
+    """Catat request yang sedang diproses agar bisa disebut saat loop lag terdeteksi."""
+    request_id = next(_request_ids)
+    _inflight[request_id] = (label, time.monotonic())
+    try:
+        yield
+    finally:
+        _inflight.pop(request_id, None)
+
+
+class LoopLagMonitor:
+    """
+    Task asyncio ringan yang tidur LOOP_LAG_INTERVAL_MS lalu mengukur keterlambatan bangun.
+
+    Pemakaian (lifespan):
+        monitor = LoopLagMonitor()
+        monitor.start()
+        ...
+        await monitor.stop()
+    """
+
+    def __init__(self, interval_ms: int = LOOP_LAG_INTERVAL_MS, threshold_ms: int = LOOP_LAG_THRESHOLD_MS):
+        self.interval = interval_ms / 1000
+        self.threshold = threshold_ms / 1000
+        self.max_lag_ms = 0.0
+        self.lag_events = 0
+        self._task = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+            logger.info(
+                f"Loop lag monitor aktif (interval {self.interval * 1000:.0f} ms, "
+                f"ambang {self.threshold * 1000:.0f} ms)"
+            )
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            started = time.monotonic()
+            await asyncio.sleep(self.interval)
+            lag = time.monotonic() - started - self.interval
+            if lag > self.threshold:
+                self._report(lag)
+
+    def _report(self, lag: float):
+        lag_ms = lag * 1000
+        self.lag_events += 1
+        self.max_lag_ms = max(self.max_lag_ms, lag_ms)
+        now = time.monotonic()
+        suspects = sorted(_inflight.values(), key=lambda x: x[1])
+        detail = ", ".join(f"{label} ({(now - t0) * 1000:.0f} ms)" for label, t0 in suspects[:5]) or "-"
+        logger.warning(f"⚠️ Event loop tertahan {lag_ms:.0f} ms | request aktif: {detail}")
+
+    def stats(self) -> dict:
+        return {
+            "lag_events": self.lag_events,
+            "max_lag_ms": round(self.max_lag_ms, 1),
+            "threshold_ms": self.threshold * 1000,
+            "inflight": len(_inflight),
+            "threadpool_size": THREADPOOL_SIZE,
+        }
+
+
+loop_lag_monitor = LoopLagMonitor()
@@ -10,6 +10,7 @@ from functools import wraps
 from jose import jwt, JWTError
 from app.core.security import SECRET_KEY, ALGORITHM
 from app.models.models import Users
+from app.core import principal_cache
 from datetime import datetime, timedelta
 
 SUPER_ADMIN_ROLE = "super admin"
@@ -292,7 +293,7 @@ class CurrentUser:
         return all(perm in self.permissions for perm in permissions)
 
 
-async def get_current_user(
+def get_current_user(
     db: Session = Depends(get_db),
     authorization: Optional[str] = Header(None)
 ) -> CurrentUser:
@@ -328,6 +329,18 @@ async def get_current_user(
             headers={"WWW-Authenticate": "Bearer"},
         )
     
+    # Principal cache: request hangat tidak menyentuh DB sama sekali
+    cached = principal_cache.get(token, principal_cache.SCOPE_WEB)
+    if cached is not None:
+        return CurrentUser(
+            id=cached["id"],
+            username=cached["username"],
+            roles=list(cached["roles"]),
+            permissions=list(cached["permissions"]),
+            is_super_admin=cached["is_super_admin"]
+        )
+    cache_epoch = principal_cache.current_epoch()
+
     try:
         # Decode JWT token
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
@@ -388,6 +401,19 @@ async def get_current_user(
     # Get user's permissions
     permissions = get_user_permissions(db, user.id)
     
+    principal_cache.put(
+        token, principal_cache.SCOPE_WEB, user.id,
+        {
+            "id": user.id,
+            "username": user.username,
+            "roles": roles,
+            "permissions": permissions,
+            "is_super_admin": is_super_admin_user,
+        },
+        epoch=cache_epoch,
+        exp=payload.get("exp")
+    )
+    
     return CurrentUser(
         id=user.id,
         username=user.username,
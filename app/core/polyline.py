@@ -0,0 +1,117 @@
+"""
+Polyline
+========
+Penyederhanaan & kompresi jejak GPS.
+
+- simplify(lat, lon, epsilon_m) → indeks titik yang dipertahankan (Douglas-Peucker
+  pada proyeksi equirectangular lokal, jarak titik ke SEGMEN sehingga rute bolak-balik
+  patroli tidak terpotong)
+- encode(lat, lon) / decode(s)  → Google Encoded Polyline (presisi 1e-5 ≈ 1.1 m);
+  bisa langsung dibaca library peta di frontend (mis. @mapbox/polyline)
+- encode_ints(values) / decode_ints(s) → deret bilangan bulat dengan skema yang sama
+  (delta + zigzag + 5-bit chunk), dipakai untuk offset waktu (detik) tiap titik
+"""
+
+import math
+
+import numpy as np
+
+EARTH_RADIUS_M = 6371000
+PRECISION = 5
+
+
+def _project(lat: np.ndarray, lon: np.ndarray) -> tuple:
+    lat0 = math.radians(float(np.mean(lat)))
+    x = np.radians(lon - lon[0]) * EARTH_RADIUS_M * math.cos(lat0)
+    y = np.radians(lat - lat[0]) * EARTH_RADIUS_M
+    return x, y
+
+
+def simplify(lat, lon, epsilon_m: float) -> np.ndarray:
+    """Indeks (urut) titik hasil Douglas-Peucker dengan toleransi epsilon_m meter."""
+    lat = np.asarray(lat, dtype=float)
+    lon = np.asarray(lon, dtype=float)
+    n = len(lat)
+    if n < 3 or epsilon_m <= 0:
+        return np.arange(n)
+    x, y = _project(lat, lon)
+    keep = np.zeros(n, dtype=bool)
+    keep[0] = keep[-1] = True
+    stack = [(0, n - 1)]
+    while stack:
+        a, b = stack.pop()
+        if b - a < 2:
+            continue
+        px, py = x[a + 1:b], y[a + 1:b]
+        dx, dy = x[b] - x[a], y[b] - y[a]
+        seg2 = dx * dx + dy * dy
+        if seg2 == 0:
+            d = np.hypot(px - x[a], py - y[a])
+        else:
+            t = np.clip(((px - x[a]) * dx + (py - y[a]) * dy) / seg2, 0.0, 1.0)
+            d = np.hypot(px - (x[a] + t * dx), py - (y[a] + t * dy))
+        i = int(np.argmax(d))
+        if d[i] > epsilon_m:
+            m = a + 1 + i
+            keep[m] = True
+            stack.append((a, m))
+            stack.append((m, b))
+    return np.flatnonzero(keep)
+
+
+def _encode_value(v: int, out: list):
+    v = ~(v << 1) if v < 0 else (v << 1)
+    while v >= 0x20:
+        out.append(chr((0x20 | (v & 0x1f)) + 63))
+        v >>= 5
+    out.append(chr(v + 63))
+
+
+def _decode_values(s: str) -> list:
+    values, shift, acc = [], 0, 0
+    for ch in s:
+        b = ord(ch) - 63
+        acc |= (b & 0x1f) << shift
+        shift += 5
+        if b < 0x20:
+            values.append(~(acc >> 1) if acc & 1 else acc >> 1)
+            shift, acc = 0, 0
+    return values
+
+
+def encode_ints(values) -> str:
+    """Deret bilangan bulat → string (delta terhadap nilai sebelumnya)."""
+    out, prev = [], 0
+    for v in values:
+        v = int(v)
+        _encode_value(v - prev, out)
+        prev = v
+    return "".join(out)
+
+
+def decode_ints(s: str) -> list:
+    hasil, prev = [], 0
+    for d in _decode_values(s or ""):
+        prev += d
+        hasil.append(prev)
+    return hasil
+
+
+def encode(lat, lon, precision: int = PRECISION) -> str:
+    """Koordinat → Google Encoded Polyline."""
+    factor = 10 ** precision
+    lat_i = np.round(np.asarray(lat, dtype=float) * factor).astype(np.int64)
+    lon_i = np.round(np.asarray(lon, dtype=float) * factor).astype(np.int64)
+    out, plat, plon = [], 0, 0
+    for a, b in zip(lat_i.tolist(), lon_i.tolist()):
+        _encode_value(a - plat, out)
+        _encode_value(b - plon, out)
+        plat, plon = a, b
+    return "".join(out)
+
+
+def decode(s: str, precision: int = PRECISION) -> tuple:
+    """Google Encoded Polyline → (lat array, lon array)."""
+    v = np.asarray(_decode_values(s or ""), dtype=np.int64)
+    factor = 10 ** precision
+    return np.cumsum(v[0::2]) / factor, np.cumsum(v[1::2]) / factor
@@ -0,0 +1,177 @@
+"""
+Principal Cache
+===============
+Cache in-process (TTL + LRU) untuk hasil autentikasi per token, agar request yang
+sudah "hangat" tidak perlu bolak-balik ke DB hanya untuk mengenali user:
+
+- get_current_user (web, app.core.permissions)  → id, username, roles, permissions, is_super_admin
+- get_current_user_sanctum (Android, auth_legacy) → id, username, nik
+- get_current_user_data / get_current_user_nik (Android JWT, auth_legacy) → id, username, nik
+- handshake Socket.IO (app.core.sio_auth)        → user_id
+
+Key = sha256(token) + scope, sehingga token mentah tidak pernah disimpan di memori cache.
+Entry hanya dibuat setelah validasi lengkap (termasuk cek iat vs users.updated_at),
+dan umurnya dibatasi TTL serta klaim `exp` JWT. Perubahan users yang tidak lewat hook
+invalidasi di bawah (mis. UPDATE langsung di DB) baru terlihat setelah TTL habis.
+
+Invalidasi:
+- invalidate_user(user_id) → reset sesi (master.py), edit/hapus user & assign role
+- invalidate_all()         → perubahan role/permission (role_permission.py, utilities.py)
+- invalidate_token(token)  → logout
+
+Invalidasi hanya berlaku untuk worker ini; worker lain mengikuti TTL
+(PRINCIPAL_CACHE_TTL, default 60 detik) sebagai batas maksimum data basi.
+"""
+
+import os
+import time
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+CACHE_TTL_SECONDS = int(os.getenv("PRINCIPAL_CACHE_TTL", 60))
+CACHE_MAX_ENTRIES = int(os.getenv("PRINCIPAL_CACHE_MAX", 5000))
+
+SCOPE_WEB = "web"
+SCOPE_ANDROID = "android"
+SCOPE_ANDROID_JWT = "android_jwt"
+SCOPE_SOCKET = "socket"
+
+_lock = threading.Lock()
+_entries = OrderedDict()  # key -> (user_id, expires_at, epoch, data)
+_user_keys = {}  # user_id -> set(key)
+_epoch = 0  # naik setiap invalidate_user() / invalidate_all(); diambil lewat current_epoch()
+_all_gen = 0  # nilai _epoch saat invalidate_all() terakhir; entry yang lebih lama dianggap basi
+_user_gen = OrderedDict()  # user_id -> (nilai _epoch saat invalidate_user() terakhir, monotonic)
+_gen_floor = 0  # generasi terbesar yang sudah dibuang dari _user_gen; put() dengan epoch lebih lama ditolak
+_stats = {"hits": 0, "misses": 0, "evictions": 0, "invalidations": 0}
+
+
+def token_key(token: str, scope: str) -> str:
+    return f"{scope}:{hashlib.sha256(token.encode()).hexdigest()}"
+
+
+def _unindex(key: str, user_id):
+    keys = _user_keys.get(user_id)
+    if keys:
+        keys.discard(key)
+        if not keys:
+            _user_keys.pop(user_id, None)
+
+
+def _drop(key: str):
+    entry = _entries.pop(key, None)
+    if entry:
+        _unindex(key, entry[0])
+
+
+def get(token: str, scope: str):
+    """Return data principal (dict) untuk token, atau None jika belum ada / kedaluwarsa."""
+    key = token_key(token, scope)
+    now = time.monotonic()
+    with _lock:
+        entry = _entries.get(key)
+        if entry and entry[2] >= _all_gen and now < entry[1]:
+            _entries.move_to_end(key)
+            _stats["hits"] += 1
+            return entry[3]
+        if entry:
+            _drop(key)
+        _stats["misses"] += 1
+    return None
+
+
+def current_epoch() -> int:
+    """
+    Ambil sebelum query DB; diteruskan ke put() agar hasil yang basi tidak disimpan:
+    put() menolak bila sejak itu ada invalidate_all() atau invalidate_user() untuk user tsb.
+    """
+    return _epoch
+
+
+def put(token: str, scope: str, user_id: int, data: dict, epoch: int, exp: float = None):
+    """
+    Simpan principal yang sudah tervalidasi. `exp` = klaim exp JWT (epoch detik), jika ada,
+    supaya entry tidak hidup lebih lama dari tokennya.
+    """
+    ttl = CACHE_TTL_SECONDS
+    if exp:
+        ttl = min(ttl, exp - time.time())
+    if ttl <= 0:
+        return
+
+    key = token_key(token, scope)
+    with _lock:
+        # Ada invalidate_all() / invalidate_user(user_id) selama validasi berjalan → jangan simpan
+        if epoch < _all_gen or epoch < _gen_floor or epoch < _user_gen.get(user_id, (0, 0))[0]:
+            return
+        _drop(key)
+        _entries[key] = (user_id, time.monotonic() + ttl, epoch, data)
+        _user_keys.setdefault(user_id, set()).add(key)
+        while len(_entries) > CACHE_MAX_ENTRIES:
+            oldest, old_entry = _entries.popitem(last=False)
+            _unindex(oldest, old_entry[0])
+            _stats["evictions"] += 1
+
+
+def invalidate_user(user_id):
+    """Hapus semua token milik user (reset sesi, edit user, perubahan role user)."""
+    if user_id is None:
+        return
+    global _epoch
+    user_id = int(user_id)
+    with _lock:
+        _epoch += 1
+        _user_gen.pop(user_id, None)
+        _user_gen[user_id] = (_epoch, time.monotonic())
+        _prune_gen()
+        keys = _user_keys.pop(user_id, set())
+        for key in keys:
+            _entries.pop(key, None)
+        _stats["invalidations"] += 1
+    logger.info(f"[PrincipalCache] Invalidate user {user_id} ({len(keys)} token)")
+
+
+def _prune_gen():
+    """
+    Batasi _user_gen: generasi yang lebih tua dari TTL (atau melebihi CACHE_MAX_ENTRIES)
+    dipindah ke _gen_floor. put() dengan epoch di bawah floor berarti validasinya dimulai
+    sebelum invalidasi itu — hanya tidak disimpan, jadi aman walau user-nya lain.
+    """
+    global _gen_floor
+    batas = time.monotonic() - CACHE_TTL_SECONDS
+    while _user_gen:
+        user_id, (gen, at) = next(iter(_user_gen.items()))
+        if at > batas and len(_user_gen) <= CACHE_MAX_ENTRIES:
+            break
+        _user_gen.popitem(last=False)
+        _gen_floor = max(_gen_floor, gen)
+
+
+def invalidate_token(token: str):
+    with _lock:
+        for scope in (SCOPE_WEB, SCOPE_ANDROID, SCOPE_ANDROID_JWT, SCOPE_SOCKET):
+            _drop(token_key(token, scope))
+        _stats["invalidations"] += 1
+
+
+def invalidate_all():
+    """Kosongkan cache (perubahan role / permission yang bisa mengenai banyak user)."""
+    global _epoch, _all_gen
+    with _lock:
+        _epoch += 1
+        _all_gen = _epoch
+        _user_gen.clear()   # sudah tercakup _all_gen
+        _entries.clear()
+        _user_keys.clear()
+        _stats["invalidations"] += 1
+    logger.info("[PrincipalCache] Invalidate all")
+
+
+def cache_stats() -> dict:
+    with _lock:
+        return {**_stats, "entries": len(_entries), "epoch": _epoch, "user_generations": len(_user_gen),
+                "ttl_seconds": CACHE_TTL_SECONDS}
@@ -0,0 +1,221 @@
+"""
+PTT Relay
+=========
+Jalur cepat audio walkie-talkie (event `voice_stream`) untuk channel besar.
+
+sio.emit(room=channel) membuat satu asyncio task per penerima per frame dan tidak
+membatasi antrian kirim; klien lambat menumpuk audio basi di antrian Engine.IO dan
+beberapa pembicara sekaligus melipatgandakan bandwidth. Relay ini:
+
+- Giliran bicara (floor) per channel: frame hanya diteruskan dari pemegang giliran.
+  Giliran diambil otomatis oleh frame pertama (klien lama) atau eksplisit lewat
+  `ptt_start` / `ptt_end`, dan lepas sendiri bila pemegang diam PTT_FLOOR_TTL_MS.
+  Pengirim yang ditolak menerima `ptt_busy` sekali per pemegang; perubahan pemegang
+  diumumkan ke channel dengan `ptt_floor`.
+- Paket dibangun sekali per frame: header Socket.IO biner untuk `voice_stream`
+  (konstan) dibuat sekali per proses, per frame hanya satu paket biner berisi audio
+  apa adanya — payload yang diterima klien tetap sama (bytes).
+- Fan-out langsung ke antrian Engine.IO socket lokal tanpa task per penerima. Bila
+  antrian penerima sudah ≥ PTT_HIGH_WATER_FRAMES, frame masuk outbox terbatas
+  (PTT_QUEUE_FRAMES); saat penuh frame TERLAMA dibuang (audio basi tidak berguna).
+- Anggota channel di worker lain menerima frame lewat publish_frame() state Redis
+  (app.core.sio_state); tanpa Redis semua anggota ada di proses ini.
+
+Benchmark: scripts/bench_ptt_relay.py
+"""
+
+import os
+import time
+import asyncio
+import logging
+from collections import deque
+
+from engineio import packet as eio_packet
+from socketio import packet as sio_packet
+
+logger = logging.getLogger("ptt_relay")
+
+EVENT = 'voice_stream'
+QUEUE_FRAMES = int(os.getenv("PTT_QUEUE_FRAMES", 10))           # ≈200 ms audio @20 ms
+HIGH_WATER_FRAMES = int(os.getenv("PTT_HIGH_WATER_FRAMES", 3))
+FLOOR_TTL_MS = int(os.getenv("PTT_FLOOR_TTL_MS", 1000))
+BUSY_RECHECK_SECONDS = 0.25     # cache lokal "channel sedang dipakai orang lain"
+
+
+class _Outbox:
+    __slots__ = ('sock', 'frames', 'task')
+
+    def __init__(self, sock):
+        self.sock = sock
+        self.frames = deque(maxlen=QUEUE_FRAMES)
+        self.task = None
+
+
+class PttRelay:
+    def __init__(self, server, state, namespace: str = '/'):
+        self.server = server
+        self.state = state
+        self.namespace = namespace
+        self.channel_of = {}        # sid -> channel
+        self.members = {}           # channel -> {sid: _Outbox} (socket di worker ini)
+        self._floor = {}            # channel -> (sid pemegang, cache berlaku sampai)
+        self._busy = {}             # sid -> pemegang terakhir yang sudah diberitahukan
+        self._header = None
+        self._high_water = HIGH_WATER_FRAMES * 2    # header + biner per frame
+        self._stats = {"frames": 0, "deliveries": 0, "queued": 0, "dropped": 0,
+                       "floor_rejected": 0, "remote_frames": 0}
+        state.frame_handler = self._deliver_remote
+
+    # ─── Keanggotaan ──────────────────────────────────────────────────────
+    def join(self, sid, channel):
+        self._remove(sid)
+        eio_sid = self.server.manager.eio_sid_from_sid(sid, self.namespace)
+        sock = self.server.eio.sockets.get(eio_sid)
+        if sock is None:
+            return
+        self.channel_of[sid] = channel
+        self.members.setdefault(channel, {})[sid] = _Outbox(sock)
+
+    async def leave(self, sid):
+        channel = self.channel_of.get(sid)
+        self._remove(sid)
+        self._busy.pop(sid, None)
+        if channel:
+            await self.release(sid, channel)
+
+    def _remove(self, sid):
+        channel = self.channel_of.pop(sid, None)
+        members = self.members.get(channel)
+        if members is None:
+            return
+        ob = members.pop(sid, None)
+        if ob and ob.task:
+            ob.task.cancel()
+        if not members:
+            del self.members[channel]
+
+    # ─── Giliran bicara ───────────────────────────────────────────────────
+    async def _holder(self, sid, channel):
+        """Pemegang giliran channel setelah sid mencoba mengambilnya (== sid berarti dapat)."""
+        now = time.monotonic()
+        cached = self._floor.get(channel)
+        if cached and now < cached[1]:
+            return cached[0]
+        holder = await self.state.acquire_floor(channel, sid, FLOOR_TTL_MS)
+        if holder == sid:
+            # perpanjang ke store setiap setengah TTL, bukan setiap frame
+            self._floor[channel] = (sid, now + FLOOR_TTL_MS / 2000)
+            if not cached or cached[0] != sid:
+                self._busy.pop(sid, None)
+                await self._announce(channel, sid)
+        else:
+            self._floor[channel] = (holder, now + BUSY_RECHECK_SECONDS)
+        return holder
+
+    async def _announce(self, channel, sid):
+        user_id = await self.state.user_of(sid) if sid else None
+        await self.server.emit('ptt_floor', {'channel': channel, 'sid': sid, 'userId': user_id},
+                               room=channel, namespace=self.namespace)
+
+    async def request_floor(self, sid) -> dict:
+        channel = self.channel_of.get(sid)
+        if channel is None:
+            return {'granted': False, 'channel': None, 'userId': None}
+        holder = await self._holder(sid, channel)
+        return {'granted': holder == sid, 'channel': channel, 'userId': await self.state.user_of(holder)}
+
+    async def release(self, sid, channel=None):
+        channel = channel or self.channel_of.get(sid)
+        if channel is None:
+            return
+        cached = self._floor.get(channel)
+        if cached and cached[0] == sid:
+            del self._floor[channel]
+        if await self.state.release_floor(channel, sid):
+            await self._announce(channel, None)
+
+    # ─── Frame ────────────────────────────────────────────────────────────
+    async def frame(self, sid, data) -> bool:
+        """Teruskan satu frame audio dari sid ke channel-nya; False bila ditolak."""
+        channel = self.channel_of.get(sid)
+        if channel is None:
+            return False
+        holder = await self._holder(sid, channel)
+        if holder != sid:
+            self._stats["floor_rejected"] += 1
+            if self._busy.get(sid) != holder:
+                self._busy[sid] = holder
+                await self.server.emit('ptt_busy', {'channel': channel, 'userId': await self.state.user_of(holder)},
+                                       to=sid, namespace=self.namespace)
+            return False
+        self._stats["frames"] += 1
+        if not isinstance(data, (bytes, bytearray)):
+            # payload non-biner (klien lama): jalur emit biasa
+            await self.server.emit(EVENT, data, room=channel, skip_sid=sid, namespace=self.namespace)
+            return True
+        self._fanout(channel, data, sid)
+        await self.state.publish_frame(channel, sid, data)
+        return True
+
+    def _deliver_remote(self, channel, sid, data):
+        if channel in self.members:
+            self._stats["remote_frames"] += 1
+            self._fanout(channel, data, sid)
+
+    def _header_packet(self):
+        if self._header is None:
+            pkt = self.server.packet_class(sio_packet.EVENT, namespace=self.namespace, data=[EVENT, b''])
+            self._header = eio_packet.Packet(eio_packet.MESSAGE, pkt.encode()[0])
+        return self._header
+
+    def _fanout(self, channel, data, skip_sid):
+        members = self.members.get(channel)
+        if not members:
+            return
+        frame = (self._header_packet(), eio_packet.Packet(eio_packet.MESSAGE, bytes(data)))
+        closed = []
+        delivered = 0
+        for sid, ob in members.items():
+            if sid == skip_sid:
+                continue
+            sock = ob.sock
+            if sock.closed:
+                closed.append(sid)
+                continue
+            delivered += 1
+            # langsung ke antrian Engine.IO (sama seperti socket.send, tanpa log per paket);
+            # timeout ping tetap ditangani loop ping Engine.IO
+            if not ob.frames and sock.queue.qsize() < self._high_water:
+                sock.queue.put_nowait(frame[0])
+                sock.queue.put_nowait(frame[1])
+                continue
+            if len(ob.frames) == QUEUE_FRAMES:
+                self._stats["dropped"] += 1
+            ob.frames.append(frame)
+            self._stats["queued"] += 1
+            if ob.task is None:
+                ob.task = asyncio.ensure_future(self._drain(ob))
+        self._stats["deliveries"] += delivered
+        for sid in closed:
+            self._remove(sid)
+
+    async def _drain(self, ob):
+        """Kirim outbox penerima lambat setiap kali writer Engine.IO mengambil antriannya."""
+        sock = ob.sock
+        try:
+            while ob.frames and not sock.closed:
+                await sock.queue.join()
+                while ob.frames and sock.queue.qsize() < self._high_water:
+                    header, body = ob.frames.popleft()
+                    sock.queue.put_nowait(header)
+                    sock.queue.put_nowait(body)
+        finally:
+            ob.task = None
+
+    def stats(self) -> dict:
+        return {
+            **self._stats,
+            "channels": len(self.members),
+            "members": sum(len(m) for m in self.members.values()),
+            "backlog": sum(len(ob.frames) for m in self.members.values() for ob in m.values()),
+        }
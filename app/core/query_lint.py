@@ -0,0 +1,108 @@
+"""
+Query Lint
+==========
+Inspector SQL untuk test/dev: menandai statement yang membungkus kolom tanggal ber-index
+dengan fungsi di WHERE / ON / HAVING — DATE(col), YEAR(col), MONTH(col), DAY(col),
+DATE_FORMAT(col, ...), EXTRACT(... FROM col). MySQL tidak bisa memakai index untuk
+predikat seperti itu; tulis ulang dengan app.core.date_range.
+
+Fungsi pada daftar SELECT / GROUP BY / ORDER BY tidak dipermasalahkan.
+
+Aktifkan lewat env (dibaca app.database):
+    SQL_LINT=1       → log warning sekali per pola
+    SQL_LINT=strict  → raise WrappedDateColumnError (untuk test)
+atau dari harness test: query_lint.install(engine, strict=True).
+"""
+
+import re
+import logging
+import threading
+
+from sqlalchemy import event, Date, DateTime
+
+logger = logging.getLogger("query_lint")
+
+# Klausa predikat dan batas akhirnya
+_PREDICATE_START = re.compile(r"\b(WHERE|ON|HAVING)\b", re.I)
+_PREDICATE_END = re.compile(
+    r"\b(SELECT|WHERE|HAVING|GROUP\s+BY|ORDER\s+BY|LIMIT|UNION|(?:LEFT|RIGHT|INNER|CROSS|OUTER)?\s*JOIN|ON\s+DUPLICATE)\b",
+    re.I
+)
+_IDENT = r"`?(?:(?P<tbl>\w+)`?\.`?)?(?P<col>\w+)`?"
+_WRAPPED = (
+    re.compile(r"\b(?P<fn>DATE|YEAR|MONTH|DAY|DAYOFMONTH|DATE_FORMAT)\s*\(\s*" + _IDENT + r"\s*[,)]", re.I),
+    re.compile(r"\b(?P<fn>EXTRACT)\s*\(\s*\w+\s+FROM\s+" + _IDENT + r"\s*\)", re.I),
+)
+
+
+class WrappedDateColumnError(AssertionError):
+    """Kolom tanggal ber-index dibungkus fungsi pada predikat."""
+
+
+_index_lock = threading.Lock()
+_indexed = None        # {tabel: {kolom tanggal ber-index}}
+_seen = set()
+
+
+def indexed_date_columns(metadata=None) -> dict:
+    """{nama_tabel: {kolom}} — kolom DATE/DATETIME yang menjadi bagian index atau PK."""
+    global _indexed
+    if metadata is not None:
+        return _scan(metadata)
+    with _index_lock:
+        if _indexed is None:
+            from app.models.models import Base
+            _indexed = _scan(Base.metadata)
+        return _indexed
+
+
+def _scan(metadata) -> dict:
+    hasil = {}
+    for table in metadata.tables.values():
+        kolom = set()
+        for idx in list(table.indexes) + [table.primary_key]:
+            kolom.update(c.name for c in idx.columns if isinstance(c.type, (Date, DateTime)))
+        if kolom:
+            hasil[table.name] = kolom
+    return hasil
+
+
+def _predicates(sql: str):
+    for m in _PREDICATE_START.finditer(sql):
+        start = m.end()
+        end = _PREDICATE_END.search(sql, start)
+        yield sql[start:end.start() if end else len(sql)]
+
+
+def check(sql: str, indexed: dict = None) -> list:
+    """List (fungsi, tabel, kolom) kolom tanggal ber-index yang dibungkus fungsi pada predikat."""
+    indexed = indexed if indexed is not None else indexed_date_columns()
+    semua = set().union(*indexed.values()) if indexed else set()
+    temuan = []
+    for segmen in _predicates(sql):
+        for pola in _WRAPPED:
+            for m in pola.finditer(segmen):
+                tbl, col = m.group("tbl"), m.group("col")
+                # Alias (presensi_1, p) tidak dikenal → cocokkan nama kolom saja
+                if (col in indexed[tbl]) if tbl in indexed else (col in semua):
+                    temuan.append((m.group("fn").upper(), tbl, col))
+    return temuan
+
+
+def install(engine, strict: bool = False):
+    """Pasang listener before_cursor_execute pada engine."""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _lint(conn, cursor, statement, parameters, context, executemany):
+        temuan = check(statement)
+        if not temuan:
+            return
+        pesan = ", ".join(f"{fn}({tbl + '.' if tbl else ''}{col})" for fn, tbl, col in temuan)
+        if strict:
+            raise WrappedDateColumnError(f"Predikat tanggal tidak sargable: {pesan}\n{statement}")
+        key = tuple(temuan)
+        if key not in _seen:
+            _seen.add(key)
+            logger.warning(f"[QueryLint] Predikat tanggal tidak sargable: {pesan}")
+
+    return _lint
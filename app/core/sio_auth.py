@@ -0,0 +1,189 @@
+"""
+Socket.IO Handshake Auth
+========================
+Verifikasi token pada event `connect` Socket.IO tanpa menahan event loop.
+
+Sebelumnya connect men-decode JWT lalu, bila gagal, membuka SessionLocal() dan
+menjalankan validate_sanctum_token (query personal_access_tokens + SHA-256) langsung
+di loop. Saat reconnect massal (deploy, Wi-Fi site besar putus) setiap handshake
+menahan loop dan semua socket lain ikut tersendat.
+
+- Token yang sudah tervalidasi disimpan di app.core.principal_cache (scope `socket`,
+  key = sha256(token)), umur dibatasi PRINCIPAL_CACHE_TTL dan klaim `exp` JWT;
+  invalidate_user / invalidate_token / invalidate_all ikut berlaku.
+- Fallback Sanctum dijalankan di thread pool (run_blocking) dengan batas paralel
+  SIO_CONNECT_DB_CONCURRENCY agar storm tidak menghabiskan pool koneksi DB.
+- AdmissionLimiter (GCRA per worker): handshake di atas SIO_CONNECT_RATE/detik
+  (burst SIO_CONNECT_BURST) ditunda merata; yang harus menunggu lebih dari
+  SIO_CONNECT_MAX_WAIT detik ditolak dan klien Socket.IO mencoba lagi dengan backoff.
+- Histogram latensi connect per hasil (cache / jwt / sanctum / invalid / no_token /
+  throttled) — lihat /api/socket-stats di app.main.
+"""
+
+import os
+import time
+import asyncio
+import logging
+
+from jose import jwt, JWTError
+
+from app.core import principal_cache
+from app.core.offload import run_blocking
+from app.database import SessionLocal
+from app.routers.auth_legacy import SECRET_KEY, ALGORITHM, validate_sanctum_token
+
+logger = logging.getLogger("sio_auth")
+
+CONNECT_RATE = float(os.getenv("SIO_CONNECT_RATE", 50))            # handshake / detik / worker
+CONNECT_BURST = int(os.getenv("SIO_CONNECT_BURST", 100))
+CONNECT_MAX_WAIT = float(os.getenv("SIO_CONNECT_MAX_WAIT", 5))      # detik
+DB_CONCURRENCY = int(os.getenv("SIO_CONNECT_DB_CONCURRENCY", 8))
+
+BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+OUTCOMES = ("cache", "jwt", "sanctum", "invalid", "no_token", "throttled")
+
+_db_slots = asyncio.Semaphore(DB_CONCURRENCY)
+
+
+class AdmissionLimiter:
+    """
+    Generic Cell Rate Algorithm: satu handshake diizinkan tiap 1/rate detik dengan
+    toleransi `burst`. admit() mengembalikan lama tunggu (detik) yang harus dijalani
+    pemanggil, atau None bila tunggu melebihi max_wait (tolak).
+    """
+
+    def __init__(self, rate: float, burst: int, max_wait: float):
+        self.rate = rate
+        self.burst = burst
+        self.interval = 1 / rate if rate > 0 else 0
+        self.tolerance = self.interval * max(burst - 1, 0)
+        self.max_wait = max_wait
+        self._tat = 0.0     # theoretical arrival time
+        self._stats = {"admitted": 0, "delayed": 0, "rejected": 0, "max_wait_ms": 0.0}
+
+    def admit(self, now: float = None):
+        if not self.interval:
+            self._stats["admitted"] += 1
+            return 0.0
+        now = time.monotonic() if now is None else now
+        tat = max(self._tat, now)
+        wait = tat - self.tolerance - now
+        if wait > self.max_wait:
+            self._stats["rejected"] += 1
+            return None
+        self._tat = tat + self.interval
+        self._stats["admitted"] += 1
+        if wait > 0:
+            self._stats["delayed"] += 1
+            self._stats["max_wait_ms"] = max(self._stats["max_wait_ms"], round(wait * 1000, 1))
+            return wait
+        return 0.0
+
+    def stats(self) -> dict:
+        return {**self._stats, "rate": self.rate, "burst": self.burst, "max_wait": self.max_wait}
+
+
+class LatencyHistogram:
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS_MS) + 1)   # + "+Inf"
+        self.count = 0
+        self.sum_ms = 0.0
+        self.max_ms = 0.0
+
+    def observe(self, ms: float):
+        i = 0
+        while i < len(BUCKETS_MS) and ms > BUCKETS_MS[i]:
+            i += 1
+        self.counts[i] += 1
+        self.count += 1
+        self.sum_ms += ms
+        self.max_ms = max(self.max_ms, ms)
+
+    def to_dict(self) -> dict:
+        # kumulatif seperti bucket Prometheus (le)
+        buckets, total = {}, 0
+        for le, n in zip([str(b) for b in BUCKETS_MS] + ["+Inf"], self.counts):
+            total += n
+            buckets[le] = total
+        return {
+            "count": self.count,
+            "sum_ms": round(self.sum_ms, 1),
+            "avg_ms": round(self.sum_ms / self.count, 2) if self.count else None,
+            "max_ms": round(self.max_ms, 1),
+            "buckets_ms": buckets,
+        }
+
+
+limiter = AdmissionLimiter(CONNECT_RATE, CONNECT_BURST, CONNECT_MAX_WAIT)
+_histograms = {outcome: LatencyHistogram() for outcome in OUTCOMES}
+_stats = {"db_lookups": 0, "db_errors": 0}
+
+
+def observe(outcome: str, started: float):
+    """Catat latensi connect (started = time.perf_counter() di awal handler)."""
+    _histograms[outcome].observe((time.perf_counter() - started) * 1000)
+
+
+def _sanctum_lookup(token: str):
+    db = SessionLocal()
+    try:
+        return validate_sanctum_token(db, token)
+    finally:
+        db.close()
+
+
+async def verify_token(token: str):
+    """
+    Return (user_id, sumber) dengan sumber 'cache' / 'jwt' / 'sanctum', atau (None, None)
+    jika token tidak valid. user_id sama dengan yang dulu disimpan di session socket
+    (klaim `sub` JWT, atau str(tokenable_id) Sanctum).
+    """
+    cached = principal_cache.get(token, principal_cache.SCOPE_SOCKET)
+    if cached is not None:
+        return cached["user_id"], "cache"
+
+    epoch = principal_cache.current_epoch()
+    try:
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    except JWTError:
+        payload = None
+
+    if payload is not None:
+        user_id = payload.get("sub")
+        _remember(token, user_id, epoch, payload.get("exp"))
+        return user_id, "jwt"
+
+    # Fallback: Sanctum Token (Legacy Android) — query DB di thread pool
+    if "|" not in token:
+        return None, None
+    async with _db_slots:
+        _stats["db_lookups"] += 1
+        try:
+            sanctum_user_id = await run_blocking(_sanctum_lookup, token)
+        except Exception as e:
+            _stats["db_errors"] += 1
+            logger.warning(f"Socket Sanctum Error: {e}")
+            return None, None
+    if not sanctum_user_id:
+        return None, None
+    user_id = str(sanctum_user_id)
+    _remember(token, user_id, epoch)
+    return user_id, "sanctum"
+
+
+def _remember(token: str, user_id, epoch: int, exp: float = None):
+    if user_id is None:
+        return
+    try:
+        key_user = int(user_id)     # invalidate_user() memakai id numerik
+    except (TypeError, ValueError):
+        key_user = user_id
+    principal_cache.put(token, principal_cache.SCOPE_SOCKET, key_user, {"user_id": user_id}, epoch, exp=exp)
+
+
+def stats() -> dict:
+    return {
+        "latency": {outcome: h.to_dict() for outcome, h in _histograms.items()},
+        "admission": limiter.stats(),
+        "db": {**_stats, "concurrency": DB_CONCURRENCY},
+    }
@@ -0,0 +1,379 @@
+"""
+Socket.IO Shared State
+======================
+State realtime (presence WebRTC, anggota channel walkie, SID per user) yang bisa dibagi
+antar worker uvicorn / node.
+
+Konfigurasi (env):
+- SIO_MESSAGE_QUEUE  URL Redis-compatible (redis://, rediss://, valkey://) untuk client
+                     manager pub/sub Socket.IO. Kosong = mode single worker (in-memory),
+                     sama seperti sebelumnya.
+- SIO_STATE_URL      URL store state; default sama dengan SIO_MESSAGE_QUEUE.
+- SIO_STATE_PREFIX   prefix key Redis (default "patrol:sio:").
+
+Dengan client manager pub/sub, setiap sio.emit() (room, to=sid, broadcast — termasuk
+emergency_broadcast dari emergency_legacy) dipublish ke semua worker dan masing-masing
+worker mengirim ke socket yang tersambung padanya. Presence dibaca dari store bersama
+sehingga room_status / daftar peer memuat anggota dari semua worker.
+
+Layout key RedisState (P = prefix):
+    P c:<sid>       hash {userId, role, webrtc_room, walkie_channel, node}
+    P r:<room>      set sid anggota room WebRTC
+    P ch:<channel>  set sid anggota channel walkie
+    P u:<userId>    set sid milik user
+    P n:<node>      set sid yang tersambung ke node tsb
+    P nodes         zset node → heartbeat terakhir (epoch detik)
+    P floor:<ch>    sid pemegang giliran bicara PTT (TTL, lihat app.core.ptt_relay)
+    P ptt           channel pub/sub frame audio PTT antar node (biner)
+
+Node yang mati tanpa shutdown bersih (kill -9, OOM) dibersihkan oleh node lain setelah
+heartbeat-nya lewat NODE_TIMEOUT_SECONDS.
+"""
+
+import os
+import time
+import uuid
+import socket
+import asyncio
+import logging
+
+import socketio
+
+logger = logging.getLogger("sio_state")
+
+MESSAGE_QUEUE = os.getenv("SIO_MESSAGE_QUEUE", "")
+STATE_URL = os.getenv("SIO_STATE_URL", MESSAGE_QUEUE)
+KEY_PREFIX = os.getenv("SIO_STATE_PREFIX", "patrol:sio:")
+HEARTBEAT_SECONDS = int(os.getenv("SIO_NODE_HEARTBEAT", 10))
+NODE_TIMEOUT_SECONDS = int(os.getenv("SIO_NODE_TIMEOUT", 30))
+
+NODE_ID = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+
+
+def _key(value):
+    # userId dari token (str) dan dari payload join_room (bisa int) disamakan
+    return str(value) if value is not None else None
+
+
+def client_manager():
+    """Client manager pub/sub untuk AsyncServer; None = AsyncManager bawaan (satu proses)."""
+    if not MESSAGE_QUEUE:
+        return None
+    return socketio.AsyncRedisManager(MESSAGE_QUEUE, channel=KEY_PREFIX + "emit")
+
+
+class MemoryState:
+    """Index in-process (satu worker)."""
+
+    backend = "memory"
+
+    def __init__(self):
+        self.sessions = {}      # sid -> {userId, role, webrtc_room, walkie_channel}
+        self.rooms = {}         # room -> {sid}
+        self.channels = {}      # channel -> {sid}
+        self.users = {}         # userId -> {sid}
+        self.floors = {}        # channel -> (sid, berlaku_sampai monotonic)
+        self.frame_handler = None
+
+    @staticmethod
+    def _add(index: dict, key, sid):
+        if key is not None:
+            index.setdefault(key, set()).add(sid)
+
+    @staticmethod
+    def _remove(index: dict, key, sid):
+        members = index.get(key)
+        if members is not None:
+            members.discard(sid)
+            if not members:
+                del index[key]
+
+    async def start(self):
+        pass
+
+    async def stop(self):
+        pass
+
+    async def register(self, sid, user_id):
+        self.sessions[sid] = {'userId': user_id, 'role': None, 'webrtc_room': None, 'walkie_channel': None}
+        self._add(self.users, _key(user_id), sid)
+
+    async def join_room(self, sid, room, role, user_id):
+        """Pindahkan sid ke room WebRTC; return room sebelumnya (atau None)."""
+        s = self.sessions.get(sid)
+        if s is None:
+            return None
+        prev_room = s['webrtc_room']
+        self._remove(self.rooms, prev_room, sid)
+        self._remove(self.users, _key(s['userId']), sid)
+        s.update(webrtc_room=room, role=role, userId=user_id)
+        self._add(self.rooms, room, sid)
+        self._add(self.users, _key(user_id), sid)
+        return prev_room
+
+    async def set_channel(self, sid, channel):
+        s = self.sessions.get(sid)
+        if s is None:
+            return
+        self._remove(self.channels, s['walkie_channel'], sid)
+        s['walkie_channel'] = channel
+        self._add(self.channels, channel, sid)
+
+    async def members(self, room) -> list:
+        """[{sid, userId, role}] anggota room WebRTC."""
+        out = []
+        for sid in self.rooms.get(room, ()):
+            s = self.sessions[sid]
+            out.append({'sid': sid, 'userId': s['userId'], 'role': s['role']})
+        return out
+
+    async def channel_members(self, channel) -> set:
+        return set(self.channels.get(channel, ()))
+
+    async def user_sids(self, user_id) -> set:
+        return set(self.users.get(_key(user_id), ()))
+
+    async def unregister(self, sid):
+        """Hapus sid dari semua index; return state terakhirnya (atau None)."""
+        s = self.sessions.pop(sid, None)
+        if s is None:
+            return None
+        self._remove(self.rooms, s['webrtc_room'], sid)
+        self._remove(self.channels, s['walkie_channel'], sid)
+        self._remove(self.users, _key(s['userId']), sid)
+        return s
+
+    async def user_of(self, sid):
+        s = self.sessions.get(sid)
+        return s['userId'] if s else None
+
+    async def acquire_floor(self, channel, sid, ttl_ms: int):
+        """Ambil / perpanjang giliran bicara; return sid pemegang (== sid berarti berhasil)."""
+        now = time.monotonic()
+        cur = self.floors.get(channel)
+        if cur is None or cur[0] == sid or cur[1] <= now:
+            self.floors[channel] = (sid, now + ttl_ms / 1000)
+            return sid
+        return cur[0]
+
+    async def release_floor(self, channel, sid) -> bool:
+        cur = self.floors.get(channel)
+        if cur is None or cur[0] != sid:
+            return False
+        del self.floors[channel]
+        return True
+
+    async def publish_frame(self, channel, sid, data: bytes):
+        pass    # satu proses: semua anggota channel ada di relay lokal
+
+    def stats(self) -> dict:
+        return {"backend": self.backend, "sessions": len(self.sessions), "rooms": len(self.rooms),
+                "channels": len(self.channels), "users": len(self.users)}
+
+
+class RedisState:
+    """State bersama di Redis (lihat layout key di docstring modul)."""
+
+    backend = "redis"
+    _FIELDS = ('userId', 'role', 'webrtc_room', 'walkie_channel', 'node')
+
+    def __init__(self, url: str, prefix: str = KEY_PREFIX, node_id: str = NODE_ID):
+        try:
+            import redis.asyncio as aioredis
+        except ImportError:
+            raise RuntimeError("SIO_STATE_URL diset tetapi paket 'redis' belum terpasang (pip install redis)")
+        self.redis = aioredis.Redis.from_url(url, decode_responses=True)
+        self.raw = aioredis.Redis.from_url(url)     # frame audio (bytes)
+        self.prefix = prefix
+        self.node = node_id
+        self.frame_handler = None                   # callable(channel, sid, data) dari PttRelay
+        self._node_b = node_id.encode()
+        self._task = None
+        self._frame_task = None
+
+    def k(self, kind: str, name) -> str:
+        return f"{self.prefix}{kind}:{name}"
+
+    async def start(self):
+        await self._heartbeat()
+        self._task = asyncio.create_task(self._heartbeat_loop())
+        if self.frame_handler:
+            self._frame_task = asyncio.create_task(self._frame_loop())
+
+    async def stop(self):
+        for task in (self._task, self._frame_task):
+            if task:
+                task.cancel()
+        self._task = self._frame_task = None
+        try:
+            await self._drop_node(self.node)
+        finally:
+            await self.redis.aclose()
+            await self.raw.aclose()
+
+    async def _heartbeat_loop(self):
+        while True:
+            await asyncio.sleep(HEARTBEAT_SECONDS)
+            try:
+                await self._heartbeat()
+            except Exception as e:
+                logger.warning(f"heartbeat gagal: {e}")
+
+    async def _heartbeat(self):
+        now = time.time()
+        await self.redis.zadd(self.prefix + "nodes", {self.node: now})
+        dead = await self.redis.zrangebyscore(self.prefix + "nodes", "-inf", now - NODE_TIMEOUT_SECONDS)
+        for node in dead:
+            logger.info(f"membersihkan sesi node mati {node}")
+            await self._drop_node(node)
+
+    async def _drop_node(self, node):
+        for sid in await self.redis.smembers(self.k("n", node)):
+            await self.unregister(sid)
+        await self.redis.delete(self.k("n", node))
+        await self.redis.zrem(self.prefix + "nodes", node)
+
+    async def _get(self, sid) -> dict:
+        values = await self.redis.hmget(self.k("c", sid), *self._FIELDS)
+        if values[-1] is None:      # tanpa node = sesi tidak ada
+            return None
+        return {f: (v or None) for f, v in zip(self._FIELDS, values)}
+
+    async def register(self, sid, user_id):
+        async with self.redis.pipeline(transaction=True) as p:
+            p.hset(self.k("c", sid), mapping={'userId': _key(user_id) or '', 'node': self.node})
+            if user_id is not None:
+                p.sadd(self.k("u", _key(user_id)), sid)
+            p.sadd(self.k("n", self.node), sid)
+            await p.execute()
+
+    async def join_room(self, sid, room, role, user_id):
+        s = await self._get(sid)
+        if s is None:
+            return None
+        async with self.redis.pipeline(transaction=True) as p:
+            if s['webrtc_room']:
+                p.srem(self.k("r", s['webrtc_room']), sid)
+            if s['userId']:
+                p.srem(self.k("u", s['userId']), sid)
+            p.hset(self.k("c", sid), mapping={
+                'webrtc_room': room or '', 'role': role or '', 'userId': _key(user_id) or ''
+            })
+            if room:
+                p.sadd(self.k("r", room), sid)
+            if user_id is not None:
+                p.sadd(self.k("u", _key(user_id)), sid)
+            await p.execute()
+        return s['webrtc_room']
+
+    async def set_channel(self, sid, channel):
+        s = await self._get(sid)
+        if s is None:
+            return
+        async with self.redis.pipeline(transaction=True) as p:
+            if s['walkie_channel']:
+                p.srem(self.k("ch", s['walkie_channel']), sid)
+            p.hset(self.k("c", sid), 'walkie_channel', channel or '')
+            if channel:
+                p.sadd(self.k("ch", channel), sid)
+            await p.execute()
+
+    async def members(self, room) -> list:
+        sids = list(await self.redis.smembers(self.k("r", room)))
+        if not sids:
+            return []
+        async with self.redis.pipeline(transaction=False) as p:
+            for sid in sids:
+                p.hmget(self.k("c", sid), 'userId', 'role', 'webrtc_room')
+            rows = await p.execute()
+        out = []
+        for sid, (user_id, role, current) in zip(sids, rows):
+            if current != room:     # sisa sesi yang sudah hilang / pindah
+                continue
+            out.append({'sid': sid, 'userId': user_id or None, 'role': role or None})
+        return out
+
+    async def channel_members(self, channel) -> set:
+        return set(await self.redis.smembers(self.k("ch", channel)))
+
+    async def user_sids(self, user_id) -> set:
+        return set(await self.redis.smembers(self.k("u", _key(user_id))))
+
+    async def unregister(self, sid):
+        s = await self._get(sid)
+        if s is None:
+            return None
+        async with self.redis.pipeline(transaction=True) as p:
+            if s['webrtc_room']:
+                p.srem(self.k("r", s['webrtc_room']), sid)
+            if s['walkie_channel']:
+                p.srem(self.k("ch", s['walkie_channel']), sid)
+            if s['userId']:
+                p.srem(self.k("u", s['userId']), sid)
+            p.srem(self.k("n", s['node']), sid)
+            p.delete(self.k("c", sid))
+            await p.execute()
+        return s
+
+    async def user_of(self, sid):
+        return await self.redis.hget(self.k("c", sid), 'userId') or None
+
+    async def acquire_floor(self, channel, sid, ttl_ms: int):
+        key = self.k("floor", channel)
+        if await self.redis.set(key, sid, nx=True, px=ttl_ms):
+            return sid
+        holder = await self.redis.get(key)
+        if holder == sid:
+            await self.redis.pexpire(key, ttl_ms)
+            return sid
+        if holder is None:      # kedaluwarsa di antara SET dan GET
+            return await self.acquire_floor(channel, sid, ttl_ms)
+        return holder
+
+    async def release_floor(self, channel, sid) -> bool:
+        from redis.exceptions import WatchError
+        key = self.k("floor", channel)
+        async with self.redis.pipeline(transaction=True) as p:
+            try:
+                await p.watch(key)
+                if await p.get(key) != sid:
+                    return False
+                p.multi()
+                p.delete(key)
+                await p.execute()
+                return True
+            except WatchError:      # pemegang berganti di tengah jalan
+                return False
+
+    async def publish_frame(self, channel, sid, data: bytes):
+        await self.raw.publish(
+            self.prefix + "ptt",
+            b"\0".join((self._node_b, channel.encode(), sid.encode(), bytes(data)))
+        )
+
+    async def _frame_loop(self):
+        while True:
+            try:
+                pubsub = self.raw.pubsub()
+                await pubsub.subscribe(self.prefix + "ptt")
+                async for msg in pubsub.listen():
+                    if msg['type'] != 'message':
+                        continue
+                    node, channel, sid, data = msg['data'].split(b"\0", 3)
+                    if node == self._node_b:
+                        continue
+                    self.frame_handler(channel.decode(), sid.decode(), data)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"subscriber frame PTT terputus: {e}")
+                await asyncio.sleep(1)
+
+    def stats(self) -> dict:
+        return {"backend": self.backend, "node": self.node}
+
+
+def create_state():
+    if STATE_URL:
+        return RedisState(STATE_URL)
+    return MemoryState()
@@ -0,0 +1,143 @@
+"""
+Walkie Channel ACL
+==================
+Index hak akses channel walkie-talkie: (kode_cabang, kode_dept) → daftar channel aktif
+yang boleh diikuti, urut priority desc lalu nama.
+
+Aturan (sama dengan helper lama di walkie_legacy / auth_legacy):
+- dept_members terisi  → kode_dept karyawan harus ada di daftar (dipisah koma)
+- walkie_channel_cabangs terisi → kode_cabang karyawan harus ada di daftar
+- kosong = terbuka untuk semua
+
+Sebelumnya setiap login, /channels dan /room/validate memuat semua channel lalu satu
+query walkie_channel_cabangs per channel. Di sini seluruh channel + cabang dimuat
+dengan SATU query join, dikompilasi menjadi snapshot read-only, dan hasil per
+(kode_cabang, kode_dept) disimpan di index (dihitung saat pertama diminta).
+
+walkie_channel.py (CRUD) memanggil invalidate() setelah commit; TTL WALKIE_ACL_TTL
+menjadi jaring pengaman untuk worker lain.
+"""
+
+import os
+import time
+import logging
+import threading
+from types import SimpleNamespace
+
+from sqlalchemy.orm import Session
+
+from app.models.models import WalkieChannels, WalkieChannelCabangs, Karyawan
+
+logger = logging.getLogger(__name__)
+
+CACHE_TTL_SECONDS = int(os.getenv("WALKIE_ACL_TTL", 300))
+
+
+class ChannelAcl:
+    """Snapshot channel walkie + index akses per (kode_cabang, kode_dept)."""
+
+    def __init__(self, channels: list):
+        # channels: snapshot semua channel (aktif & nonaktif)
+        self.by_code = {c.code: c for c in channels}
+        self.active = sorted((c for c in channels if c.active == 1), key=lambda c: (-c.priority, c.name))
+        self._index = {}
+        self._lock = threading.Lock()
+
+    def allowed(self, kode_cabang, kode_dept) -> tuple:
+        key = (kode_cabang, kode_dept)
+        hasil = self._index.get(key)
+        if hasil is None:
+            hasil = tuple(
+                c for c in self.active
+                if (c.depts is None or kode_dept in c.depts)
+                and (not c.cabangs or kode_cabang in c.cabangs)
+            )
+            with self._lock:
+                self._index[key] = hasil
+        return hasil
+
+    def is_allowed(self, kode_cabang, kode_dept, code: str) -> bool:
+        return any(c.code == code for c in self.allowed(kode_cabang, kode_dept))
+
+
+_lock = threading.Lock()
+_version = 0
+_entry = None   # (version, loaded_at, ChannelAcl)
+_stats = {"hits": 0, "misses": 0, "invalidations": 0}
+
+
+def _load(db: Session) -> ChannelAcl:
+    rows = db.query(
+        WalkieChannels.id, WalkieChannels.code, WalkieChannels.name, WalkieChannels.active,
+        WalkieChannels.auto_join, WalkieChannels.priority, WalkieChannels.dept_members,
+        WalkieChannelCabangs.kode_cabang
+    ).outerjoin(
+        WalkieChannelCabangs, WalkieChannelCabangs.walkie_channel_id == WalkieChannels.id
+    ).all()
+
+    channels = {}
+    for r in rows:
+        c = channels.get(r.id)
+        if c is None:
+            c = channels[r.id] = SimpleNamespace(
+                id=r.id, code=r.code, name=r.name, active=r.active, auto_join=r.auto_join,
+                priority=r.priority, dept_members=r.dept_members,
+                depts=frozenset(d.strip() for d in r.dept_members.split(',')) if r.dept_members else None,
+                cabangs=set()
+            )
+        if r.kode_cabang is not None:
+            c.cabangs.add(r.kode_cabang)
+    for c in channels.values():
+        c.cabangs = frozenset(c.cabangs)
+    return ChannelAcl(list(channels.values()))
+
+
+def get_acl(db: Session) -> ChannelAcl:
+    global _entry
+    now = time.monotonic()
+    with _lock:
+        version = _version
+        if _entry and _entry[0] == version and now - _entry[1] < CACHE_TTL_SECONDS:
+            _stats["hits"] += 1
+            return _entry[2]
+        _stats["misses"] += 1
+
+    acl = _load(db)
+
+    with _lock:
+        # Jangan simpan hasil jika ada invalidasi selama loading
+        if _version == version:
+            _entry = (version, now, acl)
+    return acl
+
+
+def allowed_channels(db: Session, nik: str) -> tuple:
+    """Channel aktif yang boleh diikuti karyawan (urut priority desc, nama)."""
+    karyawan = db.query(Karyawan.kode_cabang, Karyawan.kode_dept).filter(Karyawan.nik == nik).first()
+    if not karyawan:
+        return ()
+    return get_acl(db).allowed(karyawan.kode_cabang, karyawan.kode_dept)
+
+
+def get_channel(db: Session, code: str):
+    """Snapshot channel berdasarkan code (aktif maupun nonaktif), atau None."""
+    return get_acl(db).by_code.get(code)
+
+
+def invalidate():
+    global _version, _entry
+    with _lock:
+        _version += 1
+        _entry = None
+        _stats["invalidations"] += 1
+    logger.info("[WalkieAcl] Invalidate")
+
+
+def stats() -> dict:
+    with _lock:
+        return {
+            **_stats,
+            "version": _version,
+            "channels": len(_entry[2].by_code) if _entry else None,
+            "index_keys": len(_entry[2]._index) if _entry else None,
+        }
@@ -15,6 +15,11 @@ engine = create_engine(
     }
 )
 
+# Dev/test: tandai predikat func.date()/extract() pada kolom tanggal ber-index
+if os.getenv("SQL_LINT"):
+    from app.core import query_lint
+    query_lint.install(engine, strict=os.getenv("SQL_LINT") == "strict")
+
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 def get_db():
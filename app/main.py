@@ -8,26 +8,62 @@ import logging
 
 logging.basicConfig(level=logging.INFO)
 from app.database import get_db
+from app.core.offload import configure_threadpool, loop_lag_monitor, track_request, run_blocking
+from app.core import leader
+from app.core.permissions import CurrentUser, require_permission_dependency
 from app.models.models import Users
 from app.routers import auth, auth_legacy, beranda_legacy, absensi_legacy, patroli_legacy, emergency_legacy, izin_legacy, logistik_legacy, task_legacy, berita_legacy, tracking_legacy, ops_legacy, tamu_legacy, barang_legacy, dashboard, monitoring, master, berita, security, utilities, payroll, chat_management, walkie_channel, general_setting, jam_kerja_dept, hari_libur, lembur, izin_absen, izin_sakit, izin_cuti, izin_dinas, employee_tracking, role_permission, statistik_legacy, surat_legacy, notifications, reminder, denda
 
 from fastapi.staticfiles import StaticFiles
 
 import socketio
-from app.sio import sio as sio_server
+from app.sio import sio as sio_server, state as sio_state, ptt as sio_ptt, clients as sio_clients
+from app.core import sio_auth
 
 # ─── Reminder Scheduler ───────────────────────────────────────────────────
 _scheduler = BackgroundScheduler(timezone="Asia/Jakarta")
 
 @asynccontextmanager
 async def lifespan(app):
-    """Start APScheduler on startup, stop on shutdown."""
+    """
+    Start APScheduler on startup, stop on shutdown.
+
+    Multi-worker: setiap worker menjalankan lifespan ini. Job yang dibungkus
+    leader.only_leader() hanya dijalankan worker leader (app.core.leader); sisanya
+    sengaja berjalan per worker:
+    - leader_renew         → pemilihan / perpanjangan leader
+    - daily_stats_flush    → tabel tanda rollup (idempoten) + cadangan tanda di memori worker ini
+    - dashboard_snapshot   → snapshot disimpan di memori worker ini
+    - tracking_ingest      → thread write-behind antrian ping worker ini
+    - notification_outbox  → dispatcher klaim baris via UPDATE … LIMIT (aman paralel)
+    """
     from app.services.reminder_scheduler import run_reminder_check
     from app.services.auto_close_presensi import run_auto_close_presensi
+    from app.services import tracking_ingest, notification_outbox, daily_stats, dashboard_snapshot, violation_detector, location_retention
+    from datetime import datetime, timedelta
+
+    # Thread pool untuk handler/dependency sinkron + monitor event loop
+    configure_threadpool()
+    loop_lag_monitor.start()
+
+    # State Socket.IO bersama (heartbeat node bila SIO_STATE_URL diset)
+    await sio_state.start()
+    logging.getLogger("sio_state").info(f"Socket.IO state backend: {sio_state.backend}")
+
+    # Pilih leader sebelum scheduler start; diperpanjang / diambil alih oleh job di bawah
+    await run_blocking(leader.renew)
+    _scheduler.add_job(
+        leader.renew,
+        trigger='interval',
+        seconds=leader.RENEW_SECONDS,
+        id='leader_renew',
+        replace_existing=True,
+        max_instances=1
+    )
 
     # Reminder: setiap 1 menit
     _scheduler.add_job(
-        run_reminder_check,
+        leader.only_leader(run_reminder_check),
         trigger='interval',
         minutes=1,
         id='reminder_check',
@@ -37,7 +73,7 @@ async def lifespan(app):
 
     # Auto-close lupa absen pulang: setiap 5 menit
     _scheduler.add_job(
-        run_auto_close_presensi,
+        leader.only_leader(run_auto_close_presensi),
         trigger='interval',
         minutes=5,
         id='auto_close_presensi',
@@ -45,11 +81,80 @@ async def lifespan(app):
         max_instances=1
     )
 
+    # Rollup daily_employee_stats: proses (nik, tanggal) yang ditandai titik tulis
+    _scheduler.add_job(
+        daily_stats.flush,
+        trigger='interval',
+        seconds=daily_stats.FLUSH_SECONDS,
+        id='daily_stats_flush',
+        replace_existing=True,
+        max_instances=1
+    )
+
+    # Rollup daily_employee_stats: perbaiki tanda yang hilang saat worker crash (juga saat start)
+    _scheduler.add_job(
+        leader.only_leader(daily_stats.rekonsiliasi),
+        trigger='interval',
+        minutes=daily_stats.RECONCILE_MINUTES,
+        id='daily_stats_reconcile',
+        replace_existing=True,
+        max_instances=1,
+        next_run_time=datetime.now() + timedelta(minutes=1)
+    )
+
+    # Snapshot dashboard admin: hitung ulang key yang masih dibuka
+    _scheduler.add_job(
+        dashboard_snapshot.refresh_all,
+        trigger='interval',
+        seconds=dashboard_snapshot.REFRESH_SECONDS,
+        id='dashboard_snapshot',
+        replace_existing=True,
+        max_instances=1
+    )
+
+    # Deteksi pelanggaran inkremental (high-water mark per sumber + tutup hari)
+    _scheduler.add_job(
+        leader.only_leader(violation_detector.run),
+        trigger='interval',
+        seconds=violation_detector.SCAN_SECONDS,
+        id='violation_detector',
+        replace_existing=True,
+        max_instances=1
+    )
+
+    # Retensi riwayat lokasi: arsip + kompaksi + hapus bertahap ping lama
+    _scheduler.add_job(
+        leader.only_leader(location_retention.run),
+        trigger='interval',
+        minutes=location_retention.INTERVAL_MINUTES,
+        id='location_retention',
+        replace_existing=True,
+        max_instances=1
+    )
+
+    # Retensi notification_outbox: hapus baris sent / failed yang sudah lama
+    _scheduler.add_job(
+        leader.only_leader(notification_outbox.purge),
+        trigger='interval',
+        minutes=notification_outbox.PURGE_MINUTES,
+        id='notification_outbox_purge',
+        replace_existing=True,
+        max_instances=1
+    )
+
     _scheduler.start()
+    tracking_ingest.start()
+    notification_outbox.start()
     logging.getLogger("reminder_scheduler").info("✅ Reminder Scheduler started (every 1 minute)")
     logging.getLogger("auto_close_presensi").info("✅ Auto-Close Presensi started (every 5 minutes)")
     yield
+    await loop_lag_monitor.stop()
+    await sio_state.stop()
+    tracking_ingest.stop()
+    notification_outbox.stop()
     _scheduler.shutdown(wait=False)
+    leader.release()
+    daily_stats.flush()
     logging.getLogger("reminder_scheduler").info("🛑 Scheduler stopped")
 
 
@@ -67,7 +172,8 @@ app_fastapi = FastAPI(
 @app_fastapi.middleware("http")
 async def log_requests(request: Request, call_next):
     print(f"DEBUG PATH: {request.method} {request.url.path}")
-    response = await call_next(request)
+    with track_request(f"{request.method} {request.url.path}"):
+        response = await call_next(request)
     return response
 
 # Mount Laravel Storage Public
@@ -194,6 +300,21 @@ def check_db(db: Session = Depends(get_db)):
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app_fastapi.get("/api/loop-lag")
+def loop_lag_stats(current_user: CurrentUser = Depends(require_permission_dependency("logs.index"))):
+    """Statistik event loop lag & thread pool offload (lihat app.core.offload)."""
+    return loop_lag_monitor.stats()
+
+@app_fastapi.get("/api/scheduler-leader")
+def scheduler_leader_stats(current_user: CurrentUser = Depends(require_permission_dependency("logs.index"))):
+    """Status leader scheduler worker ini (lihat app.core.leader)."""
+    return leader.stats()
+
+@app_fastapi.get("/api/socket-stats")
+def socket_stats(current_user: CurrentUser = Depends(require_permission_dependency("logs.index"))):
+    """Histogram latensi handshake Socket.IO, admission limiter & relay PTT (lihat app.core.sio_auth)."""
+    return {**sio_auth.stats(), "ptt": sio_ptt.stats(), "state": sio_state.stats(), "local_clients": len(sio_clients)}
+
 # --- Socket.IO Integration ---
 # Wrap FastAPI with Socket.IO ASGI App
 # socketio_path='/api/socket.io' matches Nginx rewrite: /api-py/socket.io -> /api/socket.io
@@ -0,0 +1,46 @@
+from sqlalchemy import Column, Date, DateTime, Index, Integer
+from sqlalchemy.dialects.mysql import CHAR, SMALLINT
+from sqlalchemy.sql import func
+from app.database import Base
+
+class DailyEmployeeStats(Base):
+    """Rollup harian per karyawan — diisi oleh app.services.daily_stats."""
+    __tablename__ = 'daily_employee_stats'
+    __table_args__ = (
+        Index('idx_daily_employee_stats_tanggal', 'tanggal'),
+        {'extend_existing': True}
+    )
+
+    nik = Column(CHAR(18), primary_key=True)
+    tanggal = Column(Date, primary_key=True)
+    # Presensi
+    presensi = Column(SMALLINT, nullable=False, default=0)          # jumlah baris presensi
+    hadir = Column(SMALLINT, nullable=False, default=0)
+    terlambat = Column(SMALLINT, nullable=False, default=0)
+    izin = Column(SMALLINT, nullable=False, default=0)
+    sakit = Column(SMALLINT, nullable=False, default=0)
+    cuti = Column(SMALLINT, nullable=False, default=0)
+    alfa = Column(SMALLINT, nullable=False, default=0)
+    ta = Column(SMALLINT, nullable=False, default=0)
+    total_jam = Column(Integer, nullable=False, default=0)          # SUM(presensi_jamkerja.total_jam)
+    # Aktivitas
+    patroli = Column(SMALLINT, nullable=False, default=0)
+    patroli_selesai = Column(SMALLINT, nullable=False, default=0)
+    safety_briefing = Column(SMALLINT, nullable=False, default=0)
+    tamu = Column(SMALLINT, nullable=False, default=0)
+    barang = Column(SMALLINT, nullable=False, default=0)
+    turlalin = Column(SMALLINT, nullable=False, default=0)
+    surat = Column(SMALLINT, nullable=False, default=0)
+    pelanggaran = Column(SMALLINT, nullable=False, default=0)
+    updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
+
+
+class DailyEmployeeStatsDirty(Base):
+    """Tanda (nik, tanggal) yang menunggu dihitung ulang — dibagi semua worker (app.services.daily_stats)."""
+    __tablename__ = 'daily_employee_stats_dirty'
+    __table_args__ = {'extend_existing': True}
+
+    nik = Column(CHAR(18), primary_key=True)    # '*' = seluruh NIK pada tanggal tsb (mark_day)
+    tanggal = Column(Date, primary_key=True)
+    versi = Column(Integer, nullable=False, default=1)   # naik setiap mark; flush hanya menghapus versi yang dihitungnya
+    updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
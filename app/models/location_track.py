@@ -0,0 +1,29 @@
+from sqlalchemy import Column, Date, DateTime, Index, Integer
+from sqlalchemy.dialects.mysql import BIGINT, CHAR, MEDIUMTEXT, SMALLINT
+from sqlalchemy.sql import func
+from app.database import Base
+
+class LocationTrack(Base):
+    """Jejak lokasi terkompresi per NIK per shift — diisi oleh app.services.location_retention."""
+    __tablename__ = 'location_tracks'
+    __table_args__ = (
+        Index('idx_location_tracks_nik_mulai', 'nik', 'mulai'),
+        Index('idx_location_tracks_tanggal', 'tanggal'),
+        {'extend_existing': True}
+    )
+
+    id = Column(BIGINT(unsigned=True), primary_key=True, autoincrement=True)
+    nik = Column(CHAR(18), nullable=False)
+    tanggal = Column(Date, nullable=False)                   # tanggal ping (hari yang dikompaksi)
+    presensi_id = Column(BIGINT, nullable=True)              # NULL = di luar shift
+    kode_jam_kerja = Column(CHAR(4), nullable=True)
+    mulai = Column(DateTime, nullable=False)
+    selesai = Column(DateTime, nullable=False)
+    jumlah_titik = Column(Integer, nullable=False)           # ping mentah
+    jumlah_simpan = Column(Integer, nullable=False)          # titik setelah Douglas-Peucker
+    mocked = Column(Integer, nullable=False, default=0)      # ping is_mocked=1
+    epsilon_m = Column(SMALLINT, nullable=False)
+    polyline = Column(MEDIUMTEXT, nullable=False)            # Google Encoded Polyline (1e-5)
+    waktu = Column(MEDIUMTEXT, nullable=False)               # detik sejak `mulai`, delta-encoded
+    id_akhir = Column(BIGINT, nullable=True)                 # id ping mentah terbesar di segmen ini
+    created_at = Column(DateTime, server_default=func.now())
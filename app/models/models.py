@@ -2,7 +2,7 @@ from typing import Optional, List
 import datetime
 import decimal
 
-from sqlalchemy import CHAR, Column, DECIMAL, Date, DateTime, Enum, Float, ForeignKey, ForeignKeyConstraint, Index, String, TIMESTAMP, Table, Text, Time, text
+from sqlalchemy import CHAR, Column, Computed, DECIMAL, Date, DateTime, Enum, Float, ForeignKey, ForeignKeyConstraint, Index, String, TIMESTAMP, Table, Text, Time, text
 from sqlalchemy.dialects.mysql import BIGINT, CHAR, DOUBLE, INTEGER, LONGTEXT, SMALLINT, TINYINT, VARCHAR
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship
 
@@ -991,7 +991,8 @@ class EmployeeLocationHistories(Base):
     __table_args__ = (
         ForeignKeyConstraint(['nik'], ['users_karyawan.nik'], ondelete='CASCADE', name='fk_history_karyawan'),
         Index('fk_history_karyawan', 'nik'),
-        Index('idx_user_time', 'user_id', 'recorded_at')
+        Index('idx_user_time', 'user_id', 'recorded_at'),
+        Index('idx_history_recorded_at', 'recorded_at')
     )
 
     id: Mapped[int] = mapped_column(BIGINT(20), primary_key=True)
@@ -1862,6 +1863,11 @@ class PresensiJamkerjaByDeptDetail(Base):
 
 class Violation(Base):
     __tablename__ = 'violations'
+    __table_args__ = (
+        # Satu pelanggaran otomatis per (nik, tanggal, jenis) — target INSERT IGNORE
+        # app.services.violation_detector; pelanggaran MANUAL (system_type NULL) tidak dibatasi
+        Index('uk_violations_system', 'nik', 'tanggal_pelanggaran', 'system_type', unique=True),
+    )
 
     id: Mapped[int] = mapped_column(BIGINT(20), primary_key=True, autoincrement=True)
     nik: Mapped[str] = mapped_column(String(20), ForeignKey('karyawan.nik'), nullable=False)
@@ -1873,6 +1879,7 @@ class Violation(Base):
     bukti_foto: Mapped[Optional[str]] = mapped_column(String(255))
     source: Mapped[str] = mapped_column(Enum('MANUAL', 'SYSTEM'), server_default=text("'MANUAL'"), nullable=False)
     violation_type: Mapped[Optional[str]] = mapped_column(String(50)) 
+    system_type: Mapped[Optional[str]] = mapped_column(String(50), Computed("(case when `source` = 'SYSTEM' then `violation_type` end)", persisted=True))
     is_read: Mapped[int] = mapped_column(TINYINT(1), nullable=False, server_default=text('0'), default=0)
     created_at: Mapped[Optional[datetime.datetime]] = mapped_column(TIMESTAMP, server_default=text('current_timestamp()'))
     updated_at: Mapped[Optional[datetime.datetime]] = mapped_column(TIMESTAMP, server_default=text('current_timestamp() ON UPDATE current_timestamp()'))
@@ -0,0 +1,36 @@
+from sqlalchemy import Column, Integer, String, Text, DateTime, Index
+from sqlalchemy.dialects.mysql import BIGINT
+from sqlalchemy.sql import func
+from app.database import Base
+
+class NotificationOutbox(Base):
+    __tablename__ = 'notification_outbox'
+    __table_args__ = (
+        Index('uniq_outbox_dedup', 'dedup_key', unique=True),
+        Index('idx_outbox_status', 'status', 'available_at'),
+        Index('idx_outbox_claim', 'claim_token'),
+        {'extend_existing': True}
+    )
+
+    id = Column(BIGINT(unsigned=True), primary_key=True, autoincrement=True)
+    # NULL = tanpa dedup (mis. chat); selain itu "TYPE:nik:window" → INSERT IGNORE
+    dedup_key = Column(String(191), nullable=True)
+    type = Column(String(50), nullable=False)
+    nik = Column(String(18), nullable=True)              # subjek (pelanggar / pengirim)
+    kode_cabang = Column(String(3), nullable=True)       # NULL → diambil dari karyawan subjek
+    recipient_scope = Column(String(20), nullable=False, default='cabang')  # cabang | cabang_active | niks
+    recipient_niks = Column(Text, nullable=True)         # JSON list untuk scope 'niks'
+    title = Column(String(255), nullable=True)
+    body = Column(Text, nullable=True)
+    data = Column(Text, nullable=True)                   # JSON dict payload FCM data
+    ttl_seconds = Column(Integer, nullable=True)
+    status = Column(String(20), nullable=False, default='pending')  # pending | sending | sent | failed
+    attempts = Column(Integer, nullable=False, default=0)
+    claim_token = Column(String(36), nullable=True)
+    last_error = Column(Text, nullable=True)
+    sent_count = Column(Integer, nullable=True)
+    failure_count = Column(Integer, nullable=True)
+    available_at = Column(DateTime, server_default=func.now())
+    locked_at = Column(DateTime, nullable=True)
+    sent_at = Column(DateTime, nullable=True)
+    created_at = Column(DateTime, server_default=func.now())
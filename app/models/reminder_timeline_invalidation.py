@@ -0,0 +1,16 @@
+from sqlalchemy import Column, DateTime, String, Index
+from sqlalchemy.dialects.mysql import BIGINT
+from sqlalchemy.sql import func
+from app.database import Base
+
+class ReminderTimelineInvalidation(Base):
+    """Log invalidasi reminder timeline lintas worker — dibaca leader setiap tick (app.services.reminder_timeline)."""
+    __tablename__ = 'reminder_timeline_invalidations'
+    __table_args__ = (
+        Index('idx_rti_created', 'created_at'),
+        {'extend_existing': True}
+    )
+
+    id = Column(BIGINT(unsigned=True), primary_key=True, autoincrement=True)
+    nik = Column(String(18), nullable=True)   # NULL = rebuild penuh
+    created_at = Column(DateTime, server_default=func.now())
@@ -0,0 +1,29 @@
+from sqlalchemy import Column, String, Text, DateTime, Index
+from sqlalchemy.dialects.mysql import BIGINT, CHAR
+from sqlalchemy.sql import func
+from app.database import Base
+
+class SlipGajiDetail(Base):
+    """Snapshot hasil hitung gaji per karyawan untuk satu periode slip_gaji."""
+    __tablename__ = 'slip_gaji_detail'
+    __table_args__ = (
+        Index('idx_slip_gaji_detail_nik', 'nik'),
+        {'extend_existing': True}
+    )
+
+    kode_slip_gaji = Column(CHAR(8), primary_key=True)
+    nik = Column(CHAR(18), primary_key=True)
+    # Nama dibekukan saat snapshot agar slip periode lama tidak berubah
+    nama_karyawan = Column(String(100), nullable=False)
+    nama_jabatan = Column(String(100), nullable=True)
+    nama_dept = Column(String(100), nullable=True)
+    nama_cabang = Column(String(100), nullable=True)
+    gaji_pokok = Column(BIGINT, nullable=False, default=0)
+    total_tunjangan = Column(BIGINT, nullable=False, default=0)
+    tunjangan_detail = Column(Text, nullable=True)      # JSON {kode_jenis_tunjangan: jumlah}
+    bpjs_kesehatan = Column(BIGINT, nullable=False, default=0)
+    bpjs_tenagakerja = Column(BIGINT, nullable=False, default=0)
+    penambah = Column(BIGINT, nullable=False, default=0)
+    pengurang = Column(BIGINT, nullable=False, default=0)
+    gaji_bersih = Column(BIGINT, nullable=False, default=0)
+    created_at = Column(DateTime, server_default=func.now())
@@ -0,0 +1,14 @@
+from sqlalchemy import Column, Date, DateTime, String
+from sqlalchemy.dialects.mysql import BIGINT
+from sqlalchemy.sql import func
+from app.database import Base
+
+class ViolationScanState(Base):
+    """High-water mark per sumber — diisi oleh app.services.violation_detector."""
+    __tablename__ = 'violation_scan_state'
+    __table_args__ = {'extend_existing': True}
+
+    source = Column(String(50), primary_key=True)   # presensi | app_frauds | security_reports | location_histories | tutup_hari
+    last_id = Column(BIGINT(unsigned=True), nullable=True)   # id terakhir yang sudah diproses (sumber stream)
+    last_date = Column(Date, nullable=True)                  # tanggal terakhir yang sudah ditutup (tutup_hari)
+    updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
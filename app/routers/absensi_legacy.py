@@ -5,6 +5,9 @@ from sqlalchemy import text, func
 from app.database import get_db
 from app.routers.auth_legacy import get_current_user_nik, get_current_user_data, CurrentUser
 from app.models.models import Presensi, PresensiJamkerja, Karyawan, PengaturanUmum
+from app.services.schedule_resolver import ScheduleResolver
+from app.core import master_cache
+from app.services import notification_outbox, reminder_timeline, daily_stats
 from datetime import datetime, date, timedelta
 import shutil
 import os
@@ -25,135 +28,25 @@ os.makedirs(STORAGE_PATH, exist_ok=True)
 WIB = pytz.timezone('Asia/Jakarta')
 
 def determine_jam_kerja_hari_ini(db: Session, nik: str, today: date, now_wib: datetime):
-    # Dynamic import to avoid circular dependency
-    from app.models.models import PresensiJamkerjaByDeptDetail, SetJamKerjaByDate, SetJamKerjaByDay, PresensiJamkerjaBydept, PresensiJamkerjaBydateExtra
-    from sqlalchemy import desc, extract
-    
-    jam_kerja_obj = None
-    presensi = None
-    
-    # Check if there is an active ongoing shift
-    presensi_aktif = db.query(Presensi).filter(Presensi.nik == nik, Presensi.tanggal == today, Presensi.jam_out == None).first()
-    
-    # Logic Lintas Hari: Check if yesterday's shift is still ongoing
-    if not presensi_aktif:
-        yesterday = today - timedelta(days=1)
-        presensi_yesterday = db.query(Presensi).filter(
-            Presensi.nik == nik, 
-            Presensi.tanggal == yesterday,
-            Presensi.lintashari == 1,
-            Presensi.jam_out == None
-        ).first()
-        if presensi_yesterday:
-            presensi_aktif = presensi_yesterday
-
-    # If there is an active shift, lock onto it
-    if presensi_aktif:
-        return db.query(PresensiJamkerja).filter(PresensiJamkerja.kode_jam_kerja == presensi_aktif.kode_jam_kerja).first(), presensi_aktif
-
-    # We don't have an active shift. Let's find the best schedule.
-    # Contexts to prevent falling back incorrectly:
-    has_roster_this_month = db.query(SetJamKerjaByDate).filter(
-        SetJamKerjaByDate.nik == nik,
-        extract('month', SetJamKerjaByDate.tanggal) == today.month,
-        extract('year', SetJamKerjaByDate.tanggal) == today.year
-    ).count() > 0
-
-    has_regular_day = db.query(SetJamKerjaByDay).filter(SetJamKerjaByDay.nik == nik).count() > 0
-
-    karyawan = db.query(Karyawan).filter(Karyawan.nik == nik).first()
-    has_dept_day = False
-    dept_header = None
-    if karyawan and karyawan.kode_dept:
-        dept_header = db.query(PresensiJamkerjaBydept).filter(
-            PresensiJamkerjaBydept.kode_dept == karyawan.kode_dept,
-            PresensiJamkerjaBydept.kode_cabang == karyawan.kode_cabang
-        ).first()
-        if dept_header:
-            has_dept_day = db.query(PresensiJamkerjaByDeptDetail).filter(
-                PresensiJamkerjaByDeptDetail.kode_jk_dept == dept_header.kode_jk_dept
-            ).count() > 0
-
-    days_map = ["Senin", "Selasa", "Rabu", "Kamis", "Jumat", "Sabtu", "Minggu"]
-    day_name = days_map[now_wib.weekday()]
-
-    possible_shifts = []
-    
-    # Priority 0: Extra Date
-    extra_dates = db.query(PresensiJamkerjaBydateExtra).filter(PresensiJamkerjaBydateExtra.nik == nik, PresensiJamkerjaBydateExtra.tanggal == today).order_by(desc(PresensiJamkerjaBydateExtra.id)).all()
-    for ex in extra_dates:
-        possible_shifts.append({'kode': ex.kode_jam_kerja, 'source': 'extra'})
-
-    # Priority 1: Roster
-    if not has_roster_this_month:
-        # Fallback to Priority 2: Regular Day
-        if not has_regular_day:
-            # Fallback to Priority 3: Dept Day
-            if not has_dept_day:
-                # Priority 4: Karyawan Default
-                if karyawan and karyawan.kode_jadwal:
-                    possible_shifts.append({'kode': karyawan.kode_jadwal, 'source': 'default'})
-            else:
-                # Get Dept today
-                dept_detail = db.query(PresensiJamkerjaByDeptDetail).filter(
-                    PresensiJamkerjaByDeptDetail.kode_jk_dept == dept_header.kode_jk_dept,
-                    PresensiJamkerjaByDeptDetail.hari == day_name
-                ).first()
-                if dept_detail and dept_detail.kode_jam_kerja:
-                    possible_shifts.append({'kode': dept_detail.kode_jam_kerja, 'source': 'dept'})
-        else:
-            # Get Regular today
-            by_day = db.query(SetJamKerjaByDay).filter(SetJamKerjaByDay.nik == nik, SetJamKerjaByDay.hari == day_name).first()
-            if by_day:
-                 possible_shifts.append({'kode': by_day.kode_jam_kerja, 'source': 'byday'})
-    else:
-        # User is on roster this month.
-        by_date = db.query(SetJamKerjaByDate).filter(SetJamKerjaByDate.nik == nik, SetJamKerjaByDate.tanggal == today).first()
-        if by_date:
-            possible_shifts.append({'kode': by_date.kode_jam_kerja, 'source': 'roster'})
-
-    # Fetch JamKerja objects and sort possible shifts chronologically by jam_masuk
-    shifts_with_jk = []
-    for s in possible_shifts:
-        jk = db.query(PresensiJamkerja).filter(PresensiJamkerja.kode_jam_kerja == s['kode']).first()
-        if jk:
-            shifts_with_jk.append((s, jk))
-            
-    shifts_with_jk.sort(key=lambda x: x[1].jam_masuk)
-
-    # Now, find the first schedule they HAVE NOT FINISHED
-    finished_presensis = []
-    
-    for s, jk in shifts_with_jk:
-        kode = s['kode']
-        
-        # Check if they finished this one
-        finished_p = db.query(Presensi).filter(Presensi.nik == nik, Presensi.tanggal == today, Presensi.kode_jam_kerja == kode, Presensi.jam_out != None).first()
-        if not finished_p:
-            # Found one!
-            return jk, None
-        else:
-            finished_presensis.append((kode, finished_p))
-            
-    if finished_presensis:
-        last_kode, last_p = finished_presensis[-1]
-        jk = db.query(PresensiJamkerja).filter(PresensiJamkerja.kode_jam_kerja == last_kode).first()
-        return jk, last_p
-        
-    return None, None
+    """
+    Tentukan jadwal kerja aktif satu karyawan → (jam_kerja_obj, presensi).
+    Hierarki lengkap ada di ScheduleResolver (dipakai juga oleh scheduler secara batch).
+    """
+    return ScheduleResolver(db).resolve_one(nik, today, now_wib)
 
 @router.get("/hariini")
-async def get_presensi_hari_ini(
+def get_presensi_hari_ini(
     nik: str = Depends(get_current_user_nik),
     db: Session = Depends(get_db)
 ):
     # Use WIB Timezone
     now_wib = datetime.now(WIB)
     today = now_wib.date()
+    resolver = ScheduleResolver(db)
     
     # Get general settings early
-    from app.models.models import Karyawan, Cabang, KaryawanWajah, PengaturanUmum
-    setting = db.query(PengaturanUmum).first()
+    from app.models.models import Karyawan, KaryawanWajah
+    setting = master_cache.get_pengaturan(db)
     
     # Logic Toleransi Awal (Early Check-In / Shift Malam Next Day)
     from datetime import time
@@ -165,7 +58,7 @@ async def get_presensi_hari_ini(
         active_today = db.query(Presensi).filter(Presensi.nik == nik, Presensi.tanggal == today, Presensi.jam_out == None).first()
         if not active_today:
             tomorrow = today + timedelta(days=1)
-            jam_kerja_tmrw, _ = determine_jam_kerja_hari_ini(db, nik, tomorrow, now_wib)
+            jam_kerja_tmrw, _ = resolver.resolve_one(nik, tomorrow, now_wib)
             # Jika besok ada shift yang dimulai dini hari,
             # maka anggap "hari ini" adalah shift besok tersebut agar bisa absen.
             if jam_kerja_tmrw and jam_kerja_tmrw.jam_masuk <= toleransi_batas:
@@ -174,12 +67,12 @@ async def get_presensi_hari_ini(
     if not karyawan:
         raise HTTPException(404, "Data Karyawan tidak ditemukan")
         
-    jam_kerja_obj, presensi = determine_jam_kerja_hari_ini(db, nik, today, now_wib)
+    jam_kerja_obj, presensi = resolver.resolve_one(nik, today, now_wib)
 
     # Get Cabang Info
     cabang = None
     if karyawan.kode_cabang:
-        cabang = db.query(Cabang).filter(Cabang.kode_cabang == karyawan.kode_cabang).first()
+        cabang = master_cache.get_cabang(db, karyawan.kode_cabang)
         
     # Check Face Registered
     wajah_count = db.query(KaryawanWajah).filter(KaryawanWajah.nik == nik).count()
@@ -229,7 +122,7 @@ async def get_presensi_hari_ini(
 
 
 @router.post("/absen")
-async def absen(
+def absen(
     image: UploadFile = File(...),
     status: str = Form(...), # 'masuk' or 'pulang' per logic API Android
     lokasi: str = Form(...),
@@ -248,8 +141,7 @@ async def absen(
     if not is_masuk and not is_pulang:
          raise HTTPException(status_code=400, detail=f"Status absen tidak valid: {status}")
 
-    from app.models.models import PengaturanUmum
-    setting = db.query(PengaturanUmum).first()
+    setting = master_cache.get_pengaturan(db)
     
     # Logic Toleransi Awal (Early Check-In / Shift Malam Next Day)
     from datetime import time
@@ -276,9 +168,9 @@ async def absen(
     file_path = os.path.join(STORAGE_PATH, filename)
     
     try:
-        # Reset pointer just in case and read async
-        await image.seek(0)
-        content = await image.read()
+        # Handler sinkron (thread pool) → baca langsung dari file upload
+        image.file.seek(0)
+        content = image.file.read()
         with open(file_path, "wb") as buffer:
             buffer.write(content)
             
@@ -295,7 +187,7 @@ async def absen(
         jk = None
         used_kode_jam_kerja = kode_jam_kerja if kode_jam_kerja else 'NS'
         if used_kode_jam_kerja != 'NS' and used_kode_jam_kerja != '':
-            jk = db.query(PresensiJamkerja).filter(PresensiJamkerja.kode_jam_kerja == used_kode_jam_kerja).first()
+            jk = master_cache.get_jam_kerja(db, used_kode_jam_kerja)
 
         if not jk:
              # FALLBACK: HITUNG SENDIRI JADWAL HARI INI SECARA PINTAR
@@ -309,13 +201,13 @@ async def absen(
                      raise HTTPException(400, "Anda tidak memiliki jadwal kerja hari ini dan status jadwal Anda Terkunci. Silakan hubungi Admin.")
                      
                  # Jika tidak di-lock, fallback ke entry shift pertama sebagai default
-                 jk = db.query(PresensiJamkerja).first()
+                 jk = master_cache.get_first_jam_kerja(db)
                  if not jk:
                       raise HTTPException(500, "Master Jam Kerja kosong.")
                  used_kode_jam_kerja = jk.kode_jam_kerja
         
         if not jk:
-            jk = db.query(PresensiJamkerja).filter(PresensiJamkerja.kode_jam_kerja == used_kode_jam_kerja).first()
+            jk = master_cache.get_jam_kerja(db, used_kode_jam_kerja)
 
         # Check existing
         existing = db.query(Presensi).filter(Presensi.nik == nik, Presensi.tanggal == today, Presensi.kode_jam_kerja == used_kode_jam_kerja).first()
@@ -358,6 +250,7 @@ async def absen(
         db.add(new_presensi)
         db.commit()
         db.refresh(new_presensi)
+        daily_stats.mark(nik, today)
         message = "Berhasil Absen Masuk"
         
     # 3. Logic Absen Pulang
@@ -392,7 +285,7 @@ async def absen(
         # Logic Kunci Jam Kerja (Bounds) untuk Pulang
         karyawan_check = db.query(Karyawan).filter(Karyawan.nik == nik).first()
         if karyawan_check and str(karyawan_check.lock_jam_kerja) == '1' and setting and str(setting.batasi_absen) == '1':
-            jk = db.query(PresensiJamkerja).filter(PresensiJamkerja.kode_jam_kerja == presensi.kode_jam_kerja).first()
+            jk = master_cache.get_jam_kerja(db, presensi.kode_jam_kerja)
             if jk:
                 batas_absen_pulang = int(setting.batas_jam_absen_pulang) if setting.batas_jam_absen_pulang else 0
                 
@@ -419,6 +312,9 @@ async def absen(
         db.commit()
         message = "Berhasil Absen Pulang"
 
+    # Presensi berubah → waktu reminder NIK ini dihitung ulang
+    reminder_timeline.invalidate(nik)
+
     return {
         "status": True,
         "message": message,
@@ -426,7 +322,7 @@ async def absen(
     }
 
 @router.post("/request-bypass-radius")
-async def request_bypass_radius(
+def request_bypass_radius(
     request: Request,
     lokasi: str = Form(None),
     keterangan: str = Form(None),
@@ -434,7 +330,6 @@ async def request_bypass_radius(
     db: Session = Depends(get_db)
 ):
     from app.models.models import SecurityReports, Karyawan, KaryawanDevices, Cabang
-    from firebase_admin import messaging
     nik = user.nik
     
     # 1. Pastikan belum ada request pending
@@ -486,44 +381,24 @@ async def request_bypass_radius(
         updated_at=datetime.now()
     )
     db.add(report)
-    db.commit()
-    
-    # 2. Eskalasi ke Danru/Admin
-    karyawan = db.query(Karyawan).filter(Karyawan.nik == nik).first()
-    if karyawan and karyawan.kode_cabang:
-        # Kirim notif ke seluruh Danru/Admin di Cabang tersebut
-        target_karyawans = db.query(Karyawan.nik).filter(
-             Karyawan.kode_cabang == karyawan.kode_cabang,
-             Karyawan.nik != nik
-        ).all()
-        target_niks = [r[0] for r in target_karyawans]
-        
-        if target_niks:
-            devices = db.query(KaryawanDevices).filter(KaryawanDevices.nik.in_(target_niks)).all()
-            tokens = [d.fcm_token for d in devices if d.fcm_token]
-            
-            if tokens:
-                try:
-                    nama_pemohon = karyawan.nama_karyawan or nik
-                    cabang_info = db.query(Cabang).filter(Cabang.kode_cabang == karyawan.kode_cabang).first()
-                    nama_cabang = cabang_info.nama_cabang if cabang_info else "Cabang"
+    db.flush()
 
-                    msg = messaging.MulticastMessage(
-                        notification=messaging.Notification(
-                            title="Izin Absen Luar Tapak",
-                            body=f"Personel {nama_pemohon} meminta bypass radius absen di Area {nama_cabang}."
-                        ),
-                        data={
-                            "type": "SECURITY_ALERT_BYPASS",
-                            "subtype": "RADIUS_BYPASS",
-                            "nik_pemohon": nik,
-                            "nama_pemohon": nama_pemohon 
-                        },
-                        tokens=tokens[:500],
-                        android=messaging.AndroidConfig(priority='high')
-                    )
-                    messaging.send_each_for_multicast(msg)
-                except Exception as e:
-                    pass
+    # 2. Eskalasi ke Danru/Admin di cabang yang sama (dikirim dispatcher notification_outbox)
+    notification_outbox.enqueue(
+        db,
+        type='RADIUS_BYPASS',
+        nik=nik,
+        title="Izin Absen Luar Tapak",
+        body="Personel {nama} meminta bypass radius absen di Area {cabang}.",
+        data={
+            "type": "SECURITY_ALERT_BYPASS",
+            "subtype": "RADIUS_BYPASS",
+            "nik_pemohon": nik,
+            "nama_pemohon": "{nama}"
+        },
+        dedup=f"RADIUS_BYPASS:{report.id}",
+        commit=False
+    )
+    db.commit()
 
     return {"status": True, "message": "Izin absen luar tapak berhasil diajukan. Silakan tunggu persetujuan Atasan."}
@@ -27,7 +27,7 @@ router = APIRouter(
 )
 
 @router.post("/login", response_model=LoginResponse)
-async def login(req: Request, request: LoginRequest, db: Session = Depends(get_db)):
+def login(req: Request, request: LoginRequest, db: Session = Depends(get_db)):
     try:
         # 1. Cari user
         user = db.query(Users).filter(Users.username == request.username).first()
@@ -145,7 +145,7 @@ async def login(req: Request, request: LoginRequest, db: Session = Depends(get_d
         )
 
 @router.get("/auth/me")
-async def get_current_user(
+def get_current_user(
     db: Session = Depends(get_db), 
     authorization: Optional[str] = Header(None)
 ):
@@ -243,7 +243,7 @@ import shutil
 from pathlib import Path
 
 @router.get("/auth/profile")
-async def get_profile(
+def get_profile(
     current_user: dict = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
@@ -316,7 +316,7 @@ async def get_profile(
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.put("/auth/profile")
-async def update_profile(
+def update_profile(
     name: Optional[str] = Form(None),
     username: Optional[str] = Form(None),
     email: Optional[str] = Form(None),
@@ -505,7 +505,7 @@ async def update_profile(
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.post("/auth/change-password")
-async def change_password(
+def change_password(
     current_password: str = Form(...),
     new_password: str = Form(...),
     current_user: dict = Depends(get_current_user),
@@ -6,11 +6,12 @@ from typing import Optional, List, Dict, Any
 import datetime
 from jose import jwt
 from app.database import get_db
-from app.models.models import Users, Karyawan, LoginLogs, PengaturanUmum, WalkieChannels, WalkieChannelCabangs
+from app.models.models import Users, Karyawan, LoginLogs, PengaturanUmum
 from app.core.security import verify_password, get_password_hash # Pakai util security yg sdh ada
 from app.core.security import SECRET_KEY, ALGORITHM # Pakai config yg sdh ada
 import hashlib
 from app.models.models import PersonalAccessTokens
+from app.core import principal_cache, walkie_acl
 
 # Router khusus untuk Migrasi Android (Tanpa Blocking Karyawan)
 router = APIRouter(
@@ -64,26 +65,7 @@ def create_android_token(data: dict):
     return encoded_jwt
 
 def get_allowed_channels_helper(db: Session, nik: str):
-    karyawan = db.query(Karyawan).filter(Karyawan.nik == nik).first()
-    if not karyawan: return []
-    kode_cabang = karyawan.kode_cabang
-    kode_dept = karyawan.kode_dept
-    channels = db.query(WalkieChannels).filter(WalkieChannels.active == 1).all()
-    allowed = []
-    for c in channels:
-        if c.dept_members:
-            depts = [d.strip() for d in c.dept_members.split(',')]
-            if kode_dept not in depts: continue
-        
-        channel_cabangs = db.query(WalkieChannelCabangs).filter(WalkieChannelCabangs.walkie_channel_id == c.id).all()
-        allowed_cabangs = [cc.kode_cabang for cc in channel_cabangs]
-        
-        if allowed_cabangs and kode_cabang not in allowed_cabangs: continue
-            
-        allowed.append(c)
-    
-    allowed.sort(key=lambda x: (x.priority, x.name))
-    return sorted(allowed, key=lambda x: x.priority, reverse=True)
+    return list(walkie_acl.allowed_channels(db, nik))
 
 
 # --- SANCTUM VALIDATION ---
@@ -126,12 +108,20 @@ def get_current_user_sanctum(
     token = authorization.replace("Bearer ", "").strip()
     user_id = None
     username = None
+    token_exp = None
+
+    # 0. Principal cache (heartbeat /tracking/location dll. tanpa query DB)
+    cached = principal_cache.get(token, principal_cache.SCOPE_ANDROID)
+    if cached is not None:
+        return CurrentUser(id=cached["id"], username=cached["username"], nik=cached["nik"])
+    cache_epoch = principal_cache.current_epoch()
 
     # 1. Coba JWT
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         user_id = payload.get("sub")
         username = payload.get("username") # Bisa none klo JWT lama
+        token_exp = payload.get("exp")
     except Exception:
         # 2. Jika Gagal JWT, Coba Sanctum
         user_id = validate_sanctum_token(db, token)
@@ -153,6 +143,13 @@ def get_current_user_sanctum(
     # Fallback NIK
     if not nik and user.username.isdigit() and len(user.username) > 5:
          nik = user.username
+
+    principal_cache.put(
+        token, principal_cache.SCOPE_ANDROID, user.id,
+        {"id": user.id, "username": user.username, "nik": nik},
+        epoch=cache_epoch,
+        exp=token_exp
+    )
          
     return CurrentUser(
         id=user.id,
@@ -165,7 +162,7 @@ def get_current_user_sanctum(
 from fastapi import Form
 
 @router.post("/login", response_model=AndroidLoginResponse)
-async def login_android(
+def login_android(
     request: Request,
     username: str = Form(...), 
     password: str = Form(...),
@@ -339,9 +336,11 @@ async def login_android(
     )
 
 @router.post("/logout")
-async def logout(authorization: Optional[str] = Header(None)):
+def logout(authorization: Optional[str] = Header(None)):
     # Stateless JWT cannot really be invalidated server-side without blacklist.
-    # Just return success.
+    # Cukup buang dari principal cache lalu return success.
+    if authorization:
+        principal_cache.invalidate_token(authorization.replace("Bearer ", "").strip())
     return {"message": "Logout Berhasil"}
 
 
@@ -350,35 +349,56 @@ from fastapi.security import OAuth2PasswordBearer
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="api/android/login")
 
+def _android_jwt_principal(db: Session, token: str) -> dict:
+    """
+    Validasi JWT Android + cari NIK, dengan principal cache.
+    Raise exception apa pun jika token tidak valid (pemanggil mengubahnya menjadi 401).
+    """
+    cached = principal_cache.get(token, principal_cache.SCOPE_ANDROID_JWT)
+    if cached is not None:
+        return cached
+    cache_epoch = principal_cache.current_epoch()
+
+    payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    user_id = payload.get("sub")
+
+    user = db.query(Users).filter(Users.id == user_id).first()
+    if not user:
+        raise HTTPException(status_code=401, detail="User not found")
+
+    # Invalidate old tokens if user was reset
+    if "iat" in payload and user.updated_at:
+        token_dt = datetime.datetime.fromtimestamp(payload["iat"])
+        if token_dt < (user.updated_at - datetime.timedelta(seconds=2)):
+            raise HTTPException(status_code=401, detail="Token Invalid/Expired")
+
+    # Cari NIK
+    pivot = db.execute(text("SELECT nik FROM users_karyawan WHERE id_user = :uid"), {"uid": user_id}).fetchone()
+    nik = pivot[0] if pivot else None
+
+    if not nik:
+        # Fallback Username
+        k = db.query(Karyawan).filter(Karyawan.nik == user.username).first()
+        if k:
+            nik = k.nik
+
+    principal = {"id": int(user_id), "username": payload.get("username"), "nik": nik}
+    principal_cache.put(
+        token, principal_cache.SCOPE_ANDROID_JWT, user.id, principal,
+        epoch=cache_epoch,
+        exp=payload.get("exp")
+    )
+    return principal
+
 def get_current_user_nik(authorization: Optional[str] = Header(None), db: Session = Depends(get_db)):
     if not authorization:
         raise HTTPException(status_code=401, detail="Token Required")
     
     try:
         token = authorization.replace("Bearer ", "")
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        user_id = payload.get("sub")
-        
-        user = db.query(Users).filter(Users.id == user_id).first()
-        if not user:
-            raise HTTPException(status_code=401, detail="User not found")
-
-        # Invalidate old tokens if user was reset
-        if "iat" in payload and user.updated_at:
-            token_dt = datetime.datetime.fromtimestamp(payload["iat"])
-            if token_dt < (user.updated_at - datetime.timedelta(seconds=2)):
-                raise HTTPException(status_code=401, detail="Token Invalid/Expired")
-
-        # Cari NIK
-        pivot = db.execute(text("SELECT nik FROM users_karyawan WHERE id_user = :uid"), {"uid": user_id}).fetchone()
-        if pivot:
-            return pivot[0]
-            
-        # Fallback Username
-        if user:
-             k = db.query(Karyawan).filter(Karyawan.nik == user.username).first()
-             if k:
-                 return k.nik
+        principal = _android_jwt_principal(db, token)
+        if principal["nik"]:
+            return principal["nik"]
                  
         raise HTTPException(status_code=404, detail="Data Karyawan Tidak Ditemukan")
 
@@ -391,38 +411,16 @@ def get_current_user_data(authorization: Optional[str] = Header(None), db: Sessi
     
     try:
         token = authorization.replace("Bearer ", "")
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        user_id = payload.get("sub")
-        username = payload.get("username")
-        
-        user = db.query(Users).filter(Users.id == user_id).first()
-        if not user:
-            raise HTTPException(status_code=401, detail="User not found")
-
-        # Invalidate old tokens if user was reset
-        if "iat" in payload and user.updated_at:
-            token_dt = datetime.datetime.fromtimestamp(payload["iat"])
-            if token_dt < (user.updated_at - datetime.timedelta(seconds=2)):
-                raise HTTPException(status_code=401, detail="Token Invalid/Expired")
-
-        # Cari NIK
-        pivot = db.execute(text("SELECT nik FROM users_karyawan WHERE id_user = :uid"), {"uid": user_id}).fetchone()
-        nik = pivot[0] if pivot else None
-            
-        if not nik:
-            # Fallback Username
-            k = db.query(Karyawan).filter(Karyawan.nik == user.username).first()
-            if k:
-                nik = k.nik
+        principal = _android_jwt_principal(db, token)
         
         # Jika NIK tetap None, mungkin admin/non-karyawan. Tetap return user data.
-        return CurrentUser(id=int(user_id), username=username, nik=nik)
+        return CurrentUser(id=principal["id"], username=principal["username"], nik=principal["nik"])
 
     except Exception as e:
         raise HTTPException(status_code=401, detail="Token Invalid/Expired")
 
 @router.get("/validate-user")
-async def validate_user_token_endpoint(token: str, db: Session = Depends(get_db)):
+def validate_user_token_endpoint(token: str, db: Session = Depends(get_db)):
     """
     Endpoint internal untuk Node.js Service memvalidasi token Android.
     """
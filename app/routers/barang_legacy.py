@@ -12,6 +12,8 @@ from PIL import Image
 import io
 
 from app.database import get_db
+from app.core import master_cache
+from app.services import daily_stats
 from app.routers.auth_legacy import get_current_user_data, CurrentUser
 # Reusing models and utility functions from Tamu Legacy (or duplicate if cleaner separation desired)
 # Let's clean up later. Now duplicate logic.
@@ -60,11 +62,11 @@ def get_jam_kerja_karyawan(db: Session, nik: str, kode_cabang: str, kode_dept: s
     # Note: PresensiJamkerjaBydateExtra needs to be imported securely
     try:
         from app.models.models import PresensiJamkerjaBydateExtra
-        jk_extra = db.query(PresensiJamkerja)\
-            .join(PresensiJamkerjaBydateExtra, PresensiJamkerjaBydateExtra.kode_jam_kerja == PresensiJamkerja.kode_jam_kerja)\
+        jk_extra_row = db.query(PresensiJamkerjaBydateExtra.kode_jam_kerja)\
             .filter(PresensiJamkerjaBydateExtra.nik == nik)\
             .filter(PresensiJamkerjaBydateExtra.tanggal == tanggal)\
             .first()
+        jk_extra = master_cache.get_jam_kerja(db, jk_extra_row.kode_jam_kerja) if jk_extra_row else None
             
         if jk_extra:
             return jk_extra
@@ -74,21 +76,21 @@ def get_jam_kerja_karyawan(db: Session, nik: str, kode_cabang: str, kode_dept: s
         logger.error(f"Error querying PresensiJamkerjaBydateExtra: {e}")
     
     # 1. Start Check By Date (Tukar Shift / Rotasi)
-    jk_by_date = db.query(PresensiJamkerja)\
-        .join(SetJamKerjaByDate, SetJamKerjaByDate.kode_jam_kerja == PresensiJamkerja.kode_jam_kerja)\
+    jk_by_date_row = db.query(SetJamKerjaByDate.kode_jam_kerja)\
         .filter(SetJamKerjaByDate.nik == nik)\
         .filter(SetJamKerjaByDate.tanggal == tanggal)\
         .first()
+    jk_by_date = master_cache.get_jam_kerja(db, jk_by_date_row.kode_jam_kerja) if jk_by_date_row else None
         
     if jk_by_date:
         return jk_by_date
         
     # 2. Check By Day (Jadwal Rutin Personal)
-    jk_by_day = db.query(PresensiJamkerja)\
-        .join(SetJamKerjaByDay, SetJamKerjaByDay.kode_jam_kerja == PresensiJamkerja.kode_jam_kerja)\
+    jk_by_day_row = db.query(SetJamKerjaByDay.kode_jam_kerja)\
         .filter(SetJamKerjaByDay.nik == nik)\
         .filter(SetJamKerjaByDay.hari == hari)\
         .first()
+    jk_by_day = master_cache.get_jam_kerja(db, jk_by_day_row.kode_jam_kerja) if jk_by_day_row else None
         
     if jk_by_day:
         return jk_by_day
@@ -107,13 +109,7 @@ def get_jam_kerja_karyawan(db: Session, nik: str, kode_cabang: str, kode_dept: s
         # But wait, one dept can have multiple shifts? Yes?
         # Usually presensi_jamkerja_bydept links a SchedulePattern to a Dept.
         
-        jk_dept = db.query(PresensiJamkerja)\
-            .join(PresensiJamkerjaByDeptDetail, PresensiJamkerjaByDeptDetail.kode_jam_kerja == PresensiJamkerja.kode_jam_kerja)\
-            .join(PresensiJamkerjaBydept, PresensiJamkerjaBydept.kode_jk_dept == PresensiJamkerjaByDeptDetail.kode_jk_dept)\
-            .filter(PresensiJamkerjaBydept.kode_cabang == kode_cabang)\
-            .filter(PresensiJamkerjaBydept.kode_dept == kode_dept)\
-            .filter(PresensiJamkerjaByDeptDetail.hari == hari)\
-            .first()
+        jk_dept = master_cache.get_jam_kerja(db, master_cache.get_dept_kode_jam_kerja(db, kode_cabang, kode_dept, hari))
             
         if jk_dept:
             return jk_dept
@@ -186,7 +182,7 @@ def _build_foto_url(path: str) -> Optional[str]:
 # --- ENDPOINTS ---
 
 @router.get("/barang")
-async def list_barang(
+def list_barang(
     limit: int = 20,
     user: CurrentUser = Depends(get_current_user_data),
     db: Session = Depends(get_db)
@@ -285,7 +281,7 @@ async def list_barang(
     }
 
 @router.post("/barang/store")
-async def store_barang(
+def store_barang(
     jenis_barang: str = Form(...),
     dari: str = Form(...),
     untuk: str = Form(...),
@@ -328,6 +324,7 @@ async def store_barang(
     db.add(bm)
     db.commit()
     db.refresh(bm)
+    daily_stats.mark(bm.nik_satpam, bm.tgl_jam_masuk)
 
     foto_masuk_url = _build_foto_url(new_barang.image)
 
@@ -355,7 +352,7 @@ async def store_barang(
     }
 
 @router.post("/barang/keluar")
-async def barang_keluar(
+def barang_keluar(
     id_barang: int = Form(...),
     nama_penerima: str = Form(...),
     no_handphone: str = Form(...),
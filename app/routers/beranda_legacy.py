@@ -32,7 +32,7 @@ def get_image_url(path: str):
     return f"{BASE_STORAGE_URL}karyawan/{path}"
 
 @router.get("/beranda")
-async def get_beranda(
+def get_beranda(
     db: Session = Depends(get_db),
     nik: str = Depends(get_current_user_nik)
 ):
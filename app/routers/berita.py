@@ -73,7 +73,7 @@ def strip_tags(text: str) -> str:
 
 @router.get("", response_model=BeritaListResponse)
 @router.get("/list", response_model=BeritaListResponse)
-async def get_berita_list(
+def get_berita_list(
     page: int = Query(1, ge=1),
     per_page: int = Query(10, ge=1),
     judul: Optional[str] = None,
@@ -191,7 +191,7 @@ async def get_berita_list(
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/{id}")
-async def get_berita_detail(
+def get_berita_detail(
     id: int,
     raw: bool = Query(False),
     current_user: CurrentUser = Depends(get_current_user),
@@ -255,7 +255,7 @@ async def get_berita_detail(
     }
 
 @router.post("")
-async def create_berita(
+def create_berita(
     judul: str = Form(...),
     isi: str = Form(...),
     kode_dept_target: Optional[str] = Form(None),
@@ -311,7 +311,7 @@ async def create_berita(
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.put("/{id}")
-async def update_berita(
+def update_berita(
     id: int,
     judul: str = Form(...),
     isi: str = Form(...),
@@ -378,7 +378,7 @@ async def update_berita(
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.delete("/{id}")
-async def delete_berita(
+def delete_berita(
     id: int, 
     current_user: CurrentUser = Depends(get_current_user),
     db: Session = Depends(get_db)
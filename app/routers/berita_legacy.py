@@ -19,7 +19,7 @@ router = APIRouter(
 # Support multiple potentially used endpoints.
 @router.get("/berita/list", response_model=BeritaListResponse)
 @router.get("/berita", response_model=BeritaListResponse)
-async def get_android_berita_list(
+def get_android_berita_list(
     page: int = Query(1, ge=1),
     per_page: int = Query(10, ge=1),
     judul: Optional[str] = None,
@@ -31,7 +31,7 @@ async def get_android_berita_list(
     Proxy to the main Berita implementation.
     The main implementation handles response formatting matching Laravel.
     """
-    return await original_get_berita_list(
+    return original_get_berita_list(
         page=page,
         per_page=per_page,
         judul=judul,
@@ -42,12 +42,12 @@ async def get_android_berita_list(
 
 @router.get("/berita/detail/{id}")
 @router.get("/berita/{id}")
-async def get_android_berita_detail(
+def get_android_berita_detail(
     id: int,
     current_user: CoreCurrentUser = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    return await original_get_berita_detail(
+    return original_get_berita_detail(
         id=id,
         raw=False, # Android never needs raw HTML editing
         current_user=current_user,
@@ -55,6 +55,6 @@ async def get_android_berita_detail(
     )
 
 @router.get("/notifications")
-async def get_notifications():
+def get_notifications():
     # Stub for notifications
     return {"status": True, "data": []}
@@ -10,6 +10,7 @@ import shutil
 import os
 import secrets
 from app.core.permissions import get_current_user
+from app.core.date_range import date_between
 
 router = APIRouter(
     prefix="/api/chat-management",
@@ -53,7 +54,7 @@ class CreateMessageDTO(BaseModel):
     role: str
 
 @router.get("", response_model=dict)
-async def get_chat_threads(
+def get_chat_threads(
     room: Optional[str] = None,
     sender: Optional[str] = None,
     q: Optional[str] = None,
@@ -74,10 +75,8 @@ async def get_chat_threads(
         ))
     if q:
          query = query.filter(WalkieRtcMessages.message.ilike(f"%{q}%"))
-    if date_from:
-        query = query.filter(func.date(WalkieRtcMessages.created_at) >= date_from)
-    if date_to:
-        query = query.filter(func.date(WalkieRtcMessages.created_at) <= date_to)
+    if date_from or date_to:
+        query = query.filter(date_between(WalkieRtcMessages.created_at, date_from, date_to))
 
     # Summary Stats
     total_messages = query.count()
@@ -146,7 +145,7 @@ async def get_chat_threads(
     }
 
 @router.get("/thread/{room}", response_model=dict)
-async def get_thread_messages(
+def get_thread_messages(
     room: str,
     sender: Optional[str] = None,
     q: Optional[str] = None,
@@ -170,10 +169,8 @@ async def get_thread_messages(
         ))
     if q:
          query = query.filter(WalkieRtcMessages.message.ilike(f"%{q}%"))
-    if date_from:
-        query = query.filter(func.date(WalkieRtcMessages.created_at) >= date_from)
-    if date_to:
-        query = query.filter(func.date(WalkieRtcMessages.created_at) <= date_to)
+    if date_from or date_to:
+        query = query.filter(date_between(WalkieRtcMessages.created_at, date_from, date_to))
 
     # Pagination
     total_messages = query.count()
@@ -258,7 +255,7 @@ async def get_thread_messages(
     }
 
 @router.post("/send")
-async def send_message(
+def send_message(
     room: str = Form(...),
     message: Optional[str] = Form(None),
     role: str = Form("admin"), 
@@ -310,7 +307,7 @@ async def send_message(
     return {"status": "success", "data": {"id": new_msg.id}}
 
 @router.delete("/{id}")
-async def delete_message(id: int, db: Session = Depends(get_db)):
+def delete_message(id: int, db: Session = Depends(get_db)):
     msg = db.query(WalkieRtcMessages).filter(WalkieRtcMessages.id == id).first()
     if not msg:
         raise HTTPException(status_code=404, detail="Message not found")
@@ -331,7 +328,7 @@ async def delete_message(id: int, db: Session = Depends(get_db)):
     return {"status": "success", "message": "Message deleted"}
 
 @router.delete("/thread/{room}")
-async def delete_thread(room: str, db: Session = Depends(get_db)):
+def delete_thread(room: str, db: Session = Depends(get_db)):
     msgs = db.query(WalkieRtcMessages).filter(WalkieRtcMessages.room == room).all()
     if not msgs:
          raise HTTPException(status_code=404, detail="Thread not found")
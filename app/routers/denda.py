@@ -31,12 +31,12 @@ class DendaResponse(BaseModel):
         from_attributes = True
 
 @router.get("", response_model=List[DendaResponse])
-async def get_all_denda(db: Session = Depends(get_db)):
+def get_all_denda(db: Session = Depends(get_db)):
     denda_list = db.query(Denda).order_by(Denda.id).all()
     return denda_list
 
 @router.post("", response_model=DendaResponse)
-async def create_denda(denda_data: DendaCreate, db: Session = Depends(get_db)):
+def create_denda(denda_data: DendaCreate, db: Session = Depends(get_db)):
     # Validate overlaps if necessary, but following simple Laravel structure
     new_denda = Denda(
         dari=denda_data.dari,
@@ -49,7 +49,7 @@ async def create_denda(denda_data: DendaCreate, db: Session = Depends(get_db)):
     return new_denda
 
 @router.put("/{denda_id}", response_model=DendaResponse)
-async def update_denda(denda_id: int, denda_data: DendaUpdate, db: Session = Depends(get_db)):
+def update_denda(denda_id: int, denda_data: DendaUpdate, db: Session = Depends(get_db)):
     existing = db.query(Denda).filter(Denda.id == denda_id).first()
     if not existing:
         raise HTTPException(status_code=404, detail="Denda tidak ditemukan")
@@ -63,7 +63,7 @@ async def update_denda(denda_id: int, denda_data: DendaUpdate, db: Session = Dep
     return existing
 
 @router.delete("/{denda_id}")
-async def delete_denda(denda_id: int, db: Session = Depends(get_db)):
+def delete_denda(denda_id: int, db: Session = Depends(get_db)):
     existing = db.query(Denda).filter(Denda.id == denda_id).first()
     if not existing:
         raise HTTPException(status_code=404, detail="Denda tidak ditemukan")
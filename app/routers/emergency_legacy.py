@@ -7,23 +7,17 @@ from app.database import get_db
 from app.routers.auth_legacy import get_current_user_data, CurrentUser
 from app.models.models import EmergencyAlerts, SecurityReports, Users, Karyawan, Cabang, KaryawanDevices, PengaturanUmum
 from app.sio import sio as sio_server
+from app.services import notification_outbox
+from app.core.offload import run_blocking
 from sqlalchemy import desc
-import firebase_admin
-from firebase_admin import credentials, messaging
-
-# Initialize Firebase if not already initialized
-try:
-    if not firebase_admin._apps:
-        cred = credentials.Certificate("/var/www/appPatrol-python/serviceAccountKey.json")
-        firebase_admin.initialize_app(cred)
-except Exception as e:
-    pass
 
 router = APIRouter(
     prefix="/api/android",
     tags=["Emergency Legacy"],
 )
 
+COOLDOWN_SECONDS = 60   # cegah spam trigger
+
 class EmergencyTriggerReq(BaseModel):
     branch_code: Optional[str] = None
     user_id: Optional[int] = None
@@ -31,15 +25,11 @@ class EmergencyTriggerReq(BaseModel):
     location: Optional[str] = None
     alarm_type: str
 
-@router.post("/emergency/trigger")
-async def trigger_emergency(
-    req: EmergencyTriggerReq,
-    user: CurrentUser = Depends(get_current_user_data),
-    db: Session = Depends(get_db)
-):
-    if not user.nik:
-        raise HTTPException(400, "User tidak memiliki NIK valid untuk emergency.")
-
+def _catat_emergency(db: Session, req: EmergencyTriggerReq, user: CurrentUser) -> dict:
+    """
+    Bagian DB trigger_emergency (dijalankan di thread pool lewat run_blocking).
+    Return {"cooldown": response} bila masih dalam jeda, selain itu data alarm baru.
+    """
     # 1. Cek absen masuk aktif (konsisten dengan fitur operasional lainnya)
     from datetime import date, timedelta
     from app.models.models import Presensi
@@ -67,26 +57,24 @@ async def trigger_emergency(
         raise HTTPException(status_code=403, detail="Anda belum absen masuk atau sudah absen pulang.")
 
     # 2. Cooldown: cegah spam trigger (60 detik)
-    cooldown_seconds = 60
     recent = db.query(EmergencyAlerts).filter(
         EmergencyAlerts.nik == user.nik
     ).order_by(desc(EmergencyAlerts.triggered_at)).first()
 
     if recent and recent.triggered_at:
         elapsed = (datetime.now() - recent.triggered_at).total_seconds()
-        if elapsed < cooldown_seconds:
-            retry_after = int(cooldown_seconds - elapsed)
-            return {
+        if elapsed < COOLDOWN_SECONDS:
+            retry_after = int(COOLDOWN_SECONDS - elapsed)
+            return {"cooldown": {
                 "status": False,
                 "message": f"Harap tunggu {retry_after} detik sebelum mengirim alarm lagi.",
                 "retry_after": retry_after
-            }
+            }}
 
     # 3. Ambil nama cabang dari karyawan
     karyawan = db.query(Karyawan).filter(Karyawan.nik == user.nik).first()
     branch_name = ""
     if karyawan:
-        from app.models.models import Cabang
         cabang = db.query(Cabang).filter(Cabang.kode_cabang == req.branch_code).first()
         branch_name = cabang.nama_cabang if cabang and hasattr(cabang, 'nama_cabang') else (karyawan.nama_cabang if hasattr(karyawan, 'nama_cabang') else "")
 
@@ -105,69 +93,78 @@ async def trigger_emergency(
     db.commit()
     db.refresh(new_alert)
 
-    # Broadcast Socket
-    await sio_server.emit("emergency_broadcast", {
-        "id": new_alert.id,
-        "type": req.alarm_type,
-        "lokasi": req.location,
-        "branch": req.branch_code,
+    return {
+        "alarm_id": new_alert.id,
         "branch_name": branch_name,
-        "user": user.username,
-        "nik": user.nik,
-        "timestamp": str(datetime.now())
-    })
+        "kode_cabang": req.branch_code if req.branch_code else (karyawan.kode_cabang if karyawan else None),
+        "nama_pelapor": karyawan.nama_karyawan if karyawan and hasattr(karyawan, 'nama_karyawan') else user.username,
+    }
 
-    # Broadcast FCM Push Notification (Hanya untuk cabang yang sama)
-    try:
-        target_kode_cabang = req.branch_code if req.branch_code else (karyawan.kode_cabang if karyawan else None)
-        tokens = []
-        
-        if target_kode_cabang:
-            target_karyawans = db.query(Karyawan.nik).filter(Karyawan.kode_cabang == target_kode_cabang).all()
-            target_niks = [r.nik for r in target_karyawans if r.nik]
-            
-            if target_niks:
-                devices = db.query(KaryawanDevices).filter(
-                    KaryawanDevices.nik.in_(target_niks),
-                    KaryawanDevices.fcm_token != None
-                ).all()
-                tokens = list(set([d.fcm_token for d in devices if d.fcm_token]))
-        
-        if tokens:
-            nama_pelapor = karyawan.nama_karyawan if karyawan and hasattr(karyawan, 'nama_karyawan') else user.username
 
-            
-            msg = messaging.MulticastMessage(
+def _antrekan_sos(db: Session, req: EmergencyTriggerReq, alarm: dict):
+    """Broadcast FCM Push Notification (Hanya untuk cabang yang sama) via notification_outbox."""
+    try:
+        if alarm["kode_cabang"]:
+            notification_outbox.enqueue(
+                db,
+                type='EMERGENCY',
+                kode_cabang=alarm["kode_cabang"],
                 data={
                     "type": "emergency",
-                    "alarm_id": str(new_alert.id),
+                    "alarm_id": str(alarm["alarm_id"]),
                     "alarm_type": req.alarm_type,
                     "branch_code": req.branch_code or "",
-                    "branch_name": branch_name or "Pusat",
+                    "branch_name": alarm["branch_name"] or "Pusat",
                     "title": "🚨 ALARM DARURAT 🚨",
-                    "body": f"SOS ditekan oleh {nama_pelapor} di {branch_name or 'lokasi tidak diketahui'}!",
+                    "body": f"SOS ditekan oleh {alarm['nama_pelapor']} di {alarm['branch_name'] or 'lokasi tidak diketahui'}!",
                 },
-                tokens=tokens[:500],
-                android=messaging.AndroidConfig(priority='high')
+                dedup=f"EMERGENCY:{alarm['alarm_id']}"
             )
-            response = messaging.send_each_for_multicast(msg)
-            print(f"SOS FCM SENT. Success: {response.success_count}, Failed: {response.failure_count}")
     except Exception as e:
-        print(f"Failed to send SOS FCM: {e}")
+        print(f"Failed to enqueue SOS FCM: {e}")
+
+
+@router.post("/emergency/trigger")
+async def trigger_emergency(
+    req: EmergencyTriggerReq,
+    user: CurrentUser = Depends(get_current_user_data),
+    db: Session = Depends(get_db)
+):
+    if not user.nik:
+        raise HTTPException(400, "User tidak memiliki NIK valid untuk emergency.")
+
+    # Query & insert di thread pool; handler tetap async untuk sio emit
+    alarm = await run_blocking(_catat_emergency, db, req, user)
+    if "cooldown" in alarm:
+        return alarm["cooldown"]
+
+    # Broadcast Socket
+    await sio_server.emit("emergency_broadcast", {
+        "id": alarm["alarm_id"],
+        "type": req.alarm_type,
+        "lokasi": req.location,
+        "branch": req.branch_code,
+        "branch_name": alarm["branch_name"],
+        "user": user.username,
+        "nik": user.nik,
+        "timestamp": str(datetime.now())
+    })
+
+    await run_blocking(_antrekan_sos, db, req, alarm)
 
     return {
         "status": True,
         "message": "Alarm darurat berhasil dikirim!",
-        "alarm_id": new_alert.id,
+        "alarm_id": alarm["alarm_id"],
         "branch_code": req.branch_code,
-        "branch_name": branch_name,
+        "branch_name": alarm["branch_name"],
         "alarm_type": req.alarm_type,
-        "retry_after": cooldown_seconds
+        "retry_after": COOLDOWN_SECONDS
     }
 
 
 @router.get("/emergency/logs")
-async def get_emergency_logs(
+def get_emergency_logs(
     branch_code: Optional[str] = None,
     alarm_type: Optional[str] = None,
     user_id: Optional[int] = None,
@@ -214,7 +211,7 @@ async def get_emergency_logs(
     }
 
 @router.post("/security/report-abuse")
-async def report_abuse(
+def report_abuse(
     request: Request,
     type: str = Form(...),
     detail: str = Form(""),
@@ -310,43 +307,22 @@ async def report_abuse(
         alert_body = "Personel {nama} terdeteksi menutup paksa aplikasi K3Guard dari Recent Apps / Pemaksaan Berhenti di Area {cabang}."
 
     if needs_escalation:
-        # --- ENTERPRISE OPTIMIZATION: ESCALATION PUSH NOTIFICATION ---
+        # --- ENTERPRISE OPTIMIZATION: ESCALATION PUSH NOTIFICATION (notification_outbox) ---
         try:
-            karyawan = db.query(Karyawan).filter(Karyawan.nik == used_nik).first()
-            if karyawan and karyawan.kode_cabang:
-                target_karyawans = db.query(Karyawan.nik).filter(
-                     Karyawan.kode_cabang == karyawan.kode_cabang,
-                     Karyawan.nik != used_nik
-                ).all()
-                target_niks = [r[0] for r in target_karyawans]
-                
-                if target_niks:
-                    devices = db.query(KaryawanDevices).filter(KaryawanDevices.nik.in_(target_niks)).all()
-                    tokens = [d.fcm_token for d in devices if d.fcm_token]
-                    
-                    if tokens:
-                        nama_pelanggar = karyawan.nama_karyawan or used_nik
-                        cabang_info = db.query(Cabang).filter(Cabang.kode_cabang == karyawan.kode_cabang).first()
-                        nama_cabang = cabang_info.nama_cabang if cabang_info else "Cabang"
-
-                        msg = messaging.MulticastMessage(
-                            notification=messaging.Notification(
-                                title=alert_title,
-                                body=alert_body.format(nama=nama_pelanggar, cabang=nama_cabang)
-                            ),
-                            data={
-                                "type": "SECURITY_ALERT",
-                                "subtype": type,
-                                "nik_pelanggar": used_nik,
-                                "nama_pelanggar": nama_pelanggar
-                            },
-                            tokens=tokens[:500], # Max 500 per batch
-                            android=messaging.AndroidConfig(priority='high')
-                        )
-                        
-                        response = messaging.send_each_for_multicast(msg)
-                        print(f"SECURITY ESCALATION SENT. Success: {response.success_count}, Failed: {response.failure_count}")
-
+            notification_outbox.enqueue(
+                db,
+                type=type,
+                nik=used_nik,
+                title=alert_title,
+                body=alert_body,
+                data={
+                    "type": "SECURITY_ALERT",
+                    "subtype": type,
+                    "nik_pelanggar": used_nik,
+                    "nama_pelanggar": "{nama}"
+                },
+                dedup_window=3600
+            )
         except Exception as push_err:
             print(f"Failed to push escalate security concern: {push_err}")
         # -------------------------------------------------------------
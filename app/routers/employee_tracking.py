@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 from sqlalchemy.orm import Session, aliased
 from sqlalchemy import func, text, desc, and_, or_, case, literal_column
 from app.database import get_db
@@ -9,8 +9,11 @@ from app.models.models import (
 from typing import List, Optional, Any
 from pydantic import BaseModel
 from datetime import datetime, date, time, timedelta
+import math
 
 from app.core.permissions import get_current_user
+from app.core.date_range import TZ_WIB
+from app.services import geofence, trajectory
 
 router = APIRouter(
     prefix="/api/employee-tracking",
@@ -19,6 +22,15 @@ router = APIRouter(
     responses={404: {"description": "Not found"}},
 )
 
+TRAJECTORY_MAX_DAYS = 7
+
+
+def _naive_wib(value: Optional[datetime]) -> Optional[datetime]:
+    """Datetime ber-offset (mis. ...Z / +00:00) → WIB naive, seperti kolom recorded_at."""
+    if value is None or value.tzinfo is None:
+        return value
+    return value.astimezone(TZ_WIB).replace(tzinfo=None)
+
 # Pydantic Models for Response
 class EmployeeTrackingDTO(BaseModel):
     nik: str
@@ -78,20 +90,8 @@ class HistoryDTO(BaseModel):
     class Config:
         from_attributes = True
 
-def haversine_distance(lat1, lon1, lat2, lon2):
-    import math
-    R = 6371000  # radius of Earth in meters
-    phi1 = math.radians(lat1)
-    phi2 = math.radians(lat2)
-    delta_phi = math.radians(lat2 - lat1)
-    delta_lambda = math.radians(lon2 - lon1)
-    a = math.sin(delta_phi / 2)**2 + math.cos(phi1) * math.cos(phi2) * math.sin(delta_lambda / 2)**2
-    c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
-    d = R * c
-    return d
-
 @router.get("/map-data", response_model=dict)
-async def get_map_data(
+def get_map_data(
     kode_cabang: Optional[str] = Query(None),
     kode_dept: Optional[str] = Query(None), # Added
     kode_jadwal: Optional[str] = Query(None),
@@ -207,7 +207,14 @@ async def get_map_data(
 
         temp_data_list = []
 
-        for row in results:
+        # Jarak ke kantor cabang untuk seluruh baris sekaligus (NaN = pagar tidak valid)
+        office_distances, _ = geofence.branches(db).evaluate(
+            [row.kode_cabang for row in results],
+            [row.latitude for row in results],
+            [row.longitude for row in results]
+        )
+
+        for row, office_dist in zip(results, office_distances):
             # Recalculate is_online based on last_seen (1 hour threshold)
             is_online_calc = 0
             if row.last_seen:
@@ -307,28 +314,23 @@ async def get_map_data(
 
             # Radius Logic
             if dto.latitude is not None and dto.longitude is not None and row.lokasi_cabang and dto.office_radius_meter:
-                 parts = row.lokasi_cabang.split(',')
-                 if len(parts) >= 2:
-                     try:
-                         office_lat = float(parts[0].strip())
-                         office_lng = float(parts[1].strip())
-                         dist = haversine_distance(office_lat, office_lng, dto.latitude, dto.longitude)
-                         dto.distance_to_office_meter = int(dist)
-                         dto.is_outside_office_radius = dto.distance_to_office_meter > dto.office_radius_meter
-                         
-                         if dto.is_outside_office_radius:
-                             # FIX: Check Lock Location
-                             if dto.lock_location == '0':
-                                  dto.radius_status_label = 'Bebas Lokasi (Unlocked)'
-                                  dto.radius_status_tone = 'success'
-                             else:
-                                  dto.radius_status_label = 'Di Luar Radius Kantor'
-                                  dto.radius_status_tone = 'danger'
+                 if math.isnan(office_dist):
+                     dto.radius_status_label = 'Lokasi kantor invalid'
+                 else:
+                     dto.distance_to_office_meter = int(office_dist)
+                     dto.is_outside_office_radius = dto.distance_to_office_meter > dto.office_radius_meter
+                     
+                     if dto.is_outside_office_radius:
+                         # FIX: Check Lock Location
+                         if dto.lock_location == '0':
+                              dto.radius_status_label = 'Bebas Lokasi (Unlocked)'
+                              dto.radius_status_tone = 'success'
                          else:
-                             dto.radius_status_label = 'Di Dalam Radius Kantor'
-                             dto.radius_status_tone = 'success'
-                     except:
-                         dto.radius_status_label = 'Lokasi kantor invalid'
+                              dto.radius_status_label = 'Di Luar Radius Kantor'
+                              dto.radius_status_tone = 'danger'
+                     else:
+                         dto.radius_status_label = 'Di Dalam Radius Kantor'
+                         dto.radius_status_tone = 'success'
             elif dto.latitude is None:
                 dto.radius_status_label = 'Lokasi belum terbaca'
                 dto.radius_status_tone = 'warning'
@@ -360,15 +362,12 @@ async def get_map_data(
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/{nik}/history", response_model=List[HistoryDTO])
-async def get_history(
+def get_history(
     nik: str,
     db: Session = Depends(get_db)
 ):
     try:
-        # Cleanup old history first (optional, maybe skip or do async)
-        # DELETE FROM employee_location_histories WHERE recorded_at < NOW() - INTERVAL 1 DAY
-        # Skip for now to keep read-only fast
-        
+        # Ping lama dipindah ke location_tracks oleh app.services.location_retention
         histories = db.query(EmployeeLocationHistories)\
             .filter(EmployeeLocationHistories.nik == nik)\
             .order_by(desc(EmployeeLocationHistories.recorded_at))\
@@ -378,3 +377,38 @@ async def get_history(
         return histories
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/{nik}/trajectory")
+def get_trajectory(
+    nik: str,
+    mulai: Optional[datetime] = Query(None, description="Awal rentang (default: sampai - 12 jam)"),
+    sampai: Optional[datetime] = Query(None, description="Akhir rentang, eksklusif (default: sekarang)"),
+    toleransi: float = Query(trajectory.DEFAULT_TOLERANSI_M, ge=0, le=500, description="Toleransi penyederhanaan (meter), 0 = semua titik"),
+    radius_berhenti: float = Query(trajectory.DEFAULT_RADIUS_BERHENTI_M, gt=0, le=1000),
+    min_berhenti: int = Query(trajectory.DEFAULT_MIN_BERHENTI_DETIK, ge=30, description="Durasi minimal titik berhenti (detik)"),
+    format: str = Query("json", pattern="^(json|msgpack)$"),
+    db: Session = Depends(get_db)
+):
+    """
+    Jejak lokasi untuk replay peta: polyline terenkode + offset waktu + titik berhenti
+    dalam satu response (lihat app.services.trajectory).
+    """
+    # mulai/sampai tanpa offset dianggap WIB; yang ber-offset dikonversi ke WIB
+    sampai = _naive_wib(sampai) or datetime.now(TZ_WIB).replace(tzinfo=None)
+    mulai = _naive_wib(mulai) or sampai - timedelta(hours=12)
+    if mulai >= sampai:
+        raise HTTPException(status_code=400, detail="mulai harus sebelum sampai")
+    if sampai - mulai > timedelta(days=TRAJECTORY_MAX_DAYS):
+        raise HTTPException(status_code=400, detail=f"Rentang maksimal {TRAJECTORY_MAX_DAYS} hari")
+
+    data = trajectory.bangun(db, nik, mulai, sampai, toleransi, radius_berhenti, min_berhenti)
+
+    payload = {"status": True, "data": data}
+    if format == "msgpack":
+        try:
+            import msgpack
+        except ImportError:
+            raise HTTPException(status_code=400, detail="Format msgpack tidak tersedia di server")
+        return Response(content=msgpack.packb(payload, use_bin_type=True), media_type="application/x-msgpack")
+
+    return payload
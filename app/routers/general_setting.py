@@ -1,6 +1,7 @@
 from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form, status
 from sqlalchemy.orm import Session
 from app.database import get_db
+from app.core import master_cache
 from app.models.models import PengaturanUmum
 from pydantic import BaseModel, HttpUrl
 from typing import Optional
@@ -63,14 +64,14 @@ class GeneralSettingDTO(BaseModel):
         from_attributes = True
 
 @router.get("", response_model=GeneralSettingDTO)
-async def get_general_setting(db: Session = Depends(get_db)):
+def get_general_setting(db: Session = Depends(get_db)):
     setting = db.query(PengaturanUmum).filter(PengaturanUmum.id == 1).first()
     if not setting:
         raise HTTPException(status_code=404, detail="Settings not found")
     return setting
 
 @router.put("", response_model=GeneralSettingDTO)
-async def update_general_setting(
+def update_general_setting(
     nama_perusahaan: str = Form(...),
     alamat: str = Form(...),
     telepon: str = Form(...),
@@ -184,6 +185,12 @@ async def update_general_setting(
         setting.logo = filename
 
     db.commit()
+    master_cache.invalidate(master_cache.PENGATURAN)
     db.refresh(setting)
     
     return setting
+
+@router.get("/cache-stats")
+def get_master_cache_stats():
+    """Hit/miss counter master cache (jam kerja, pengaturan umum, cabang, departemen)."""
+    return master_cache.cache_stats()
@@ -37,7 +37,7 @@ class UpdateHariLiburDTO(BaseModel):
     keterangan: str
 
 @router.get("")
-async def get_hari_libur_list(
+def get_hari_libur_list(
     kode_cabang: Optional[str] = None,
     dari: Optional[date] = None,
     sampai: Optional[date] = None,
@@ -70,7 +70,7 @@ async def get_hari_libur_list(
     return data
 
 @router.post("")
-async def create_hari_libur(payload: CreateHariLiburDTO, db: Session = Depends(get_db)):
+def create_hari_libur(payload: CreateHariLiburDTO, db: Session = Depends(get_db)):
     try:
         # Generate kode_libur: LB + YY + sequential number
         year_suffix = payload.tanggal.strftime('%y')
@@ -110,7 +110,7 @@ async def create_hari_libur(payload: CreateHariLiburDTO, db: Session = Depends(g
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/{kode_libur}")
-async def get_hari_libur_detail(kode_libur: str, db: Session = Depends(get_db)):
+def get_hari_libur_detail(kode_libur: str, db: Session = Depends(get_db)):
     record = db.query(HariLibur, Cabang.nama_cabang)\
         .join(Cabang, HariLibur.kode_cabang == Cabang.kode_cabang)\
         .filter(HariLibur.kode_libur == kode_libur)\
@@ -129,7 +129,7 @@ async def get_hari_libur_detail(kode_libur: str, db: Session = Depends(get_db)):
     }
 
 @router.put("/{kode_libur}")
-async def update_hari_libur(kode_libur: str, payload: UpdateHariLiburDTO, db: Session = Depends(get_db)):
+def update_hari_libur(kode_libur: str, payload: UpdateHariLiburDTO, db: Session = Depends(get_db)):
     record = db.query(HariLibur).filter(HariLibur.kode_libur == kode_libur).first()
     if not record:
         raise HTTPException(status_code=404, detail="Data not found")
@@ -148,7 +148,7 @@ async def update_hari_libur(kode_libur: str, payload: UpdateHariLiburDTO, db: Se
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.delete("/{kode_libur}")
-async def delete_hari_libur(kode_libur: str, db: Session = Depends(get_db)):
+def delete_hari_libur(kode_libur: str, db: Session = Depends(get_db)):
     record = db.query(HariLibur).filter(HariLibur.kode_libur == kode_libur).first()
     if not record:
         raise HTTPException(status_code=404, detail="Data not found")
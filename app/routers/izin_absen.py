@@ -53,7 +53,7 @@ class ApprovalDTO(BaseModel):
     keterangan_hrd: Optional[str] = None
 
 @router.get("")
-async def get_izin_absen_list(
+def get_izin_absen_list(
     dari: Optional[date] = None,
     sampai: Optional[date] = None,
     nama_karyawan: Optional[str] = None,
@@ -115,7 +115,7 @@ async def get_izin_absen_list(
     return data
 
 @router.post("")
-async def create_izin_absen(payload: CreateIzinAbsenDTO, db: Session = Depends(get_db)):
+def create_izin_absen(payload: CreateIzinAbsenDTO, db: Session = Depends(get_db)):
     try:
         # Generate kode_izin: IA{YYMM}{sequence}
         year_month = payload.dari.strftime('%y%m')
@@ -158,7 +158,7 @@ async def create_izin_absen(payload: CreateIzinAbsenDTO, db: Session = Depends(g
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/{kode_izin}")
-async def get_izin_absen_detail(kode_izin: str, db: Session = Depends(get_db)):
+def get_izin_absen_detail(kode_izin: str, db: Session = Depends(get_db)):
     result = db.query(
         PresensiIzinabsen,
         Karyawan.nama_karyawan,
@@ -193,7 +193,7 @@ async def get_izin_absen_detail(kode_izin: str, db: Session = Depends(get_db)):
     }
 
 @router.put("/{kode_izin}")
-async def update_izin_absen(kode_izin: str, payload: UpdateIzinAbsenDTO, db: Session = Depends(get_db)):
+def update_izin_absen(kode_izin: str, payload: UpdateIzinAbsenDTO, db: Session = Depends(get_db)):
     record = db.query(PresensiIzinabsen).filter(PresensiIzinabsen.kode_izin == kode_izin).first()
     if not record:
         raise HTTPException(status_code=404, detail="Data not found")
@@ -214,7 +214,7 @@ async def update_izin_absen(kode_izin: str, payload: UpdateIzinAbsenDTO, db: Ses
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.delete("/{kode_izin}")
-async def delete_izin_absen(kode_izin: str, db: Session = Depends(get_db)):
+def delete_izin_absen(kode_izin: str, db: Session = Depends(get_db)):
     record = db.query(PresensiIzinabsen).filter(PresensiIzinabsen.kode_izin == kode_izin).first()
     if not record:
         raise HTTPException(status_code=404, detail="Data not found")
@@ -228,7 +228,7 @@ async def delete_izin_absen(kode_izin: str, db: Session = Depends(get_db)):
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.post("/{kode_izin}/approve")
-async def approve_izin_absen(kode_izin: str, payload: ApprovalDTO, db: Session = Depends(get_db)):
+def approve_izin_absen(kode_izin: str, payload: ApprovalDTO, db: Session = Depends(get_db)):
     record = db.query(PresensiIzinabsen).filter(PresensiIzinabsen.kode_izin == kode_izin).first()
     if not record:
         raise HTTPException(status_code=404, detail="Data not found")
@@ -253,7 +253,7 @@ async def approve_izin_absen(kode_izin: str, payload: ApprovalDTO, db: Session =
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.post("/{kode_izin}/cancel-approve")
-async def cancel_approve_izin_absen(kode_izin: str, db: Session = Depends(get_db)):
+def cancel_approve_izin_absen(kode_izin: str, db: Session = Depends(get_db)):
     record = db.query(PresensiIzinabsen).filter(PresensiIzinabsen.kode_izin == kode_izin).first()
     if not record:
         raise HTTPException(status_code=404, detail="Data not found")
@@ -52,7 +52,7 @@ class ApprovalDTO(BaseModel):
     keterangan_hrd: Optional[str] = None
 
 @router.get("")
-async def get_izin_cuti_list(
+def get_izin_cuti_list(
     dari: Optional[date] = None,
     sampai: Optional[date] = None,
     nama_karyawan: Optional[str] = None,
@@ -97,7 +97,7 @@ async def get_izin_cuti_list(
     } for r in results]
 
 @router.post("")
-async def create_izin_cuti(payload: CreateIzinCutiDTO, db: Session = Depends(get_db)):
+def create_izin_cuti(payload: CreateIzinCutiDTO, db: Session = Depends(get_db)):
     try:
         year_month = payload.dari.strftime('%y%m')
         prefix = f"IC{year_month}"
@@ -119,7 +119,7 @@ async def create_izin_cuti(payload: CreateIzinCutiDTO, db: Session = Depends(get
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/{kode_cuti}")
-async def get_izin_cuti_detail(kode_cuti: str, db: Session = Depends(get_db)):
+def get_izin_cuti_detail(kode_cuti: str, db: Session = Depends(get_db)):
     result = db.query(PresensiIzincuti, Karyawan.nama_karyawan, Jabatan.nama_jabatan, Departemen.nama_dept, Cabang.nama_cabang)\
         .join(Karyawan, PresensiIzincuti.nik == Karyawan.nik)\
         .join(Jabatan, Karyawan.kode_jabatan == Jabatan.kode_jabatan)\
@@ -137,7 +137,7 @@ async def get_izin_cuti_detail(kode_cuti: str, db: Session = Depends(get_db)):
     }
 
 @router.put("/{kode_cuti}")
-async def update_izin_cuti(kode_cuti: str, payload: UpdateIzinCutiDTO, db: Session = Depends(get_db)):
+def update_izin_cuti(kode_cuti: str, payload: UpdateIzinCutiDTO, db: Session = Depends(get_db)):
     record = db.query(PresensiIzincuti).filter(PresensiIzincuti.kode_cuti == kode_cuti).first()
     if not record:
         raise HTTPException(status_code=404, detail="Data not found")
@@ -155,7 +155,7 @@ async def update_izin_cuti(kode_cuti: str, payload: UpdateIzinCutiDTO, db: Sessi
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.delete("/{kode_cuti}")
-async def delete_izin_cuti(kode_cuti: str, db: Session = Depends(get_db)):
+def delete_izin_cuti(kode_cuti: str, db: Session = Depends(get_db)):
     record = db.query(PresensiIzincuti).filter(PresensiIzincuti.kode_cuti == kode_cuti).first()
     if not record:
         raise HTTPException(status_code=404, detail="Data not found")
@@ -168,7 +168,7 @@ async def delete_izin_cuti(kode_cuti: str, db: Session = Depends(get_db)):
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.post("/{kode_cuti}/approve")
-async def approve_izin_cuti(kode_cuti: str, payload: ApprovalDTO, db: Session = Depends(get_db)):
+def approve_izin_cuti(kode_cuti: str, payload: ApprovalDTO, db: Session = Depends(get_db)):
     record = db.query(PresensiIzincuti).filter(PresensiIzincuti.kode_cuti == kode_cuti).first()
     if not record:
         raise HTTPException(status_code=404, detail="Data not found")
@@ -184,7 +184,7 @@ async def approve_izin_cuti(kode_cuti: str, payload: ApprovalDTO, db: Session =
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.post("/{kode_cuti}/cancel-approve")
-async def cancel_approve_izin_cuti(kode_cuti: str, db: Session = Depends(get_db)):
+def cancel_approve_izin_cuti(kode_cuti: str, db: Session = Depends(get_db)):
     record = db.query(PresensiIzincuti).filter(PresensiIzincuti.kode_cuti == kode_cuti).first()
     if not record:
         raise HTTPException(status_code=404, detail="Data not found")
@@ -51,7 +51,7 @@ class ApprovalDTO(BaseModel):
     keterangan_hrd: Optional[str] = None
 
 @router.get("")
-async def get_izin_dinas_list(
+def get_izin_dinas_list(
     dari: Optional[date] = None,
     sampai: Optional[date] = None,
     nama_karyawan: Optional[str] = None,
@@ -97,7 +97,7 @@ async def get_izin_dinas_list(
     } for r in results]
 
 @router.post("")
-async def create_izin_dinas(payload: CreateIzinDinasDTO, db: Session = Depends(get_db)):
+def create_izin_dinas(payload: CreateIzinDinasDTO, db: Session = Depends(get_db)):
     try:
         year_month = payload.dari.strftime('%y%m')
         prefix = f"ID{year_month}"
@@ -119,7 +119,7 @@ async def create_izin_dinas(payload: CreateIzinDinasDTO, db: Session = Depends(g
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/{kode_izin_dinas}")
-async def get_izin_dinas_detail(kode_izin_dinas: str, db: Session = Depends(get_db)):
+def get_izin_dinas_detail(kode_izin_dinas: str, db: Session = Depends(get_db)):
     result = db.query(PresensiIzindinas, Karyawan.nama_karyawan, Jabatan.nama_jabatan, Departemen.nama_dept, Cabang.nama_cabang)\
         .join(Karyawan, PresensiIzindinas.nik == Karyawan.nik)\
         .join(Jabatan, Karyawan.kode_jabatan == Jabatan.kode_jabatan)\
@@ -137,7 +137,7 @@ async def get_izin_dinas_detail(kode_izin_dinas: str, db: Session = Depends(get_
     }
 
 @router.put("/{kode_izin_dinas}")
-async def update_izin_dinas(kode_izin_dinas: str, payload: UpdateIzinDinasDTO, db: Session = Depends(get_db)):
+def update_izin_dinas(kode_izin_dinas: str, payload: UpdateIzinDinasDTO, db: Session = Depends(get_db)):
     record = db.query(PresensiIzindinas).filter(PresensiIzindinas.kode_izin_dinas == kode_izin_dinas).first()
     if not record:
         raise HTTPException(status_code=404, detail="Data not found")
@@ -155,7 +155,7 @@ async def update_izin_dinas(kode_izin_dinas: str, payload: UpdateIzinDinasDTO, d
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.delete("/{kode_izin_dinas}")
-async def delete_izin_dinas(kode_izin_dinas: str, db: Session = Depends(get_db)):
+def delete_izin_dinas(kode_izin_dinas: str, db: Session = Depends(get_db)):
     record = db.query(PresensiIzindinas).filter(PresensiIzindinas.kode_izin_dinas == kode_izin_dinas).first()
     if not record:
         raise HTTPException(status_code=404, detail="Data not found")
@@ -168,7 +168,7 @@ async def delete_izin_dinas(kode_izin_dinas: str, db: Session = Depends(get_db))
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.post("/{kode_izin_dinas}/approve")
-async def approve_izin_dinas(kode_izin_dinas: str, payload: ApprovalDTO, db: Session = Depends(get_db)):
+def approve_izin_dinas(kode_izin_dinas: str, payload: ApprovalDTO, db: Session = Depends(get_db)):
     record = db.query(PresensiIzindinas).filter(PresensiIzindinas.kode_izin_dinas == kode_izin_dinas).first()
     if not record:
         raise HTTPException(status_code=404, detail="Data not found")
@@ -184,7 +184,7 @@ async def approve_izin_dinas(kode_izin_dinas: str, payload: ApprovalDTO, db: Ses
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.post("/{kode_izin_dinas}/cancel-approve")
-async def cancel_approve_izin_dinas(kode_izin_dinas: str, db: Session = Depends(get_db)):
+def cancel_approve_izin_dinas(kode_izin_dinas: str, db: Session = Depends(get_db)):
     record = db.query(PresensiIzindinas).filter(PresensiIzindinas.kode_izin_dinas == kode_izin_dinas).first()
     if not record:
         raise HTTPException(status_code=404, detail="Data not found")
@@ -80,7 +80,7 @@ def check_conflict(nik: str, dari: date, sampai: date, db: Session, exclude_type
 # --- IZIN ABSEN ---
 
 @router.get("/izin-absen")
-async def list_izin_absen(
+def list_izin_absen(
     dari: Optional[str] = None,
     sampai: Optional[str] = None,
     status: Optional[str] = None,
@@ -135,7 +135,7 @@ async def list_izin_absen(
     } # Match Laravel Pagination Structure loosely or adapt
 
 @router.post("/izin-absen/store")
-async def store_izin_absen(
+def store_izin_absen(
     dari: str = Form(...),
     sampai: str = Form(...),
     keterangan: str = Form(...),
@@ -178,7 +178,7 @@ async def store_izin_absen(
 # --- IZIN SAKIT ---
 
 @router.get("/izin-sakit")
-async def list_izin_sakit(
+def list_izin_sakit(
     dari: Optional[str] = None,
     sampai: Optional[str] = None,
     status: Optional[str] = None,
@@ -233,7 +233,7 @@ async def list_izin_sakit(
     }
 
 @router.post("/izin-sakit/store")
-async def store_izin_sakit(
+def store_izin_sakit(
     dari: str = Form(...),
     sampai: str = Form(...),
     keterangan: str = Form(...),
@@ -288,7 +288,7 @@ async def store_izin_sakit(
 # --- IZIN CUTI ---
 
 @router.get("/izin-cuti")
-async def list_izin_cuti(
+def list_izin_cuti(
     dari: Optional[str] = None,
     sampai: Optional[str] = None,
     status: Optional[str] = None,
@@ -334,7 +334,7 @@ async def list_izin_cuti(
     }
 
 @router.get("/izin-cuti/{kode}")
-async def detail_izin_cuti(
+def detail_izin_cuti(
     kode: str,
     user: CurrentUser = Depends(get_current_user_data),
     db: Session = Depends(get_db)
@@ -363,7 +363,7 @@ async def detail_izin_cuti(
     return {"status": True, "data": d}
 
 @router.post("/izin-cuti/store")
-async def store_izin_cuti(
+def store_izin_cuti(
     dari: str = Form(...),
     sampai: str = Form(...),
     kode_cuti: str = Form(...),
@@ -407,7 +407,7 @@ async def store_izin_cuti(
 # --- IZIN DINAS ---
 
 @router.get("/izin-dinas")
-async def list_izin_dinas(
+def list_izin_dinas(
     dari: Optional[str] = None,
     sampai: Optional[str] = None,
     status: Optional[str] = None,
@@ -450,7 +450,7 @@ async def list_izin_dinas(
     }
 
 @router.get("/izin-dinas/{kode}")
-async def detail_izin_dinas(
+def detail_izin_dinas(
     kode: str,
     user: CurrentUser = Depends(get_current_user_data),
     db: Session = Depends(get_db)
@@ -471,7 +471,7 @@ async def detail_izin_dinas(
     return {"status": True, "data": d}
 
 @router.post("/izin-dinas/store")
-async def store_izin_dinas(
+def store_izin_dinas(
     dari: str = Form(...),
     sampai: str = Form(...),
     keterangan: str = Form(...),
@@ -52,7 +52,7 @@ class ApprovalDTO(BaseModel):
     keterangan_hrd: Optional[str] = None
 
 @router.get("")
-async def get_izin_sakit_list(
+def get_izin_sakit_list(
     dari: Optional[date] = None,
     sampai: Optional[date] = None,
     nama_karyawan: Optional[str] = None,
@@ -97,7 +97,7 @@ async def get_izin_sakit_list(
     } for r in results]
 
 @router.post("")
-async def create_izin_sakit(payload: CreateIzinSakitDTO, db: Session = Depends(get_db)):
+def create_izin_sakit(payload: CreateIzinSakitDTO, db: Session = Depends(get_db)):
     try:
         year_month = payload.dari.strftime('%y%m')
         prefix = f"IS{year_month}"
@@ -119,7 +119,7 @@ async def create_izin_sakit(payload: CreateIzinSakitDTO, db: Session = Depends(g
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/{kode_izin_sakit}")
-async def get_izin_sakit_detail(kode_izin_sakit: str, db: Session = Depends(get_db)):
+def get_izin_sakit_detail(kode_izin_sakit: str, db: Session = Depends(get_db)):
     result = db.query(PresensiIzinsakit, Karyawan.nama_karyawan, Jabatan.nama_jabatan, Departemen.nama_dept, Cabang.nama_cabang)\
         .join(Karyawan, PresensiIzinsakit.nik == Karyawan.nik)\
         .join(Jabatan, Karyawan.kode_jabatan == Jabatan.kode_jabatan)\
@@ -137,7 +137,7 @@ async def get_izin_sakit_detail(kode_izin_sakit: str, db: Session = Depends(get_
     }
 
 @router.put("/{kode_izin_sakit}")
-async def update_izin_sakit(kode_izin_sakit: str, payload: UpdateIzinSakitDTO, db: Session = Depends(get_db)):
+def update_izin_sakit(kode_izin_sakit: str, payload: UpdateIzinSakitDTO, db: Session = Depends(get_db)):
     record = db.query(PresensiIzinsakit).filter(PresensiIzinsakit.kode_izin_sakit == kode_izin_sakit).first()
     if not record:
         raise HTTPException(status_code=404, detail="Data not found")
@@ -155,7 +155,7 @@ async def update_izin_sakit(kode_izin_sakit: str, payload: UpdateIzinSakitDTO, d
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.delete("/{kode_izin_sakit}")
-async def delete_izin_sakit(kode_izin_sakit: str, db: Session = Depends(get_db)):
+def delete_izin_sakit(kode_izin_sakit: str, db: Session = Depends(get_db)):
     record = db.query(PresensiIzinsakit).filter(PresensiIzinsakit.kode_izin_sakit == kode_izin_sakit).first()
     if not record:
         raise HTTPException(status_code=404, detail="Data not found")
@@ -168,7 +168,7 @@ async def delete_izin_sakit(kode_izin_sakit: str, db: Session = Depends(get_db))
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.post("/{kode_izin_sakit}/approve")
-async def approve_izin_sakit(kode_izin_sakit: str, payload: ApprovalDTO, db: Session = Depends(get_db)):
+def approve_izin_sakit(kode_izin_sakit: str, payload: ApprovalDTO, db: Session = Depends(get_db)):
     record = db.query(PresensiIzinsakit).filter(PresensiIzinsakit.kode_izin_sakit == kode_izin_sakit).first()
     if not record:
         raise HTTPException(status_code=404, detail="Data not found")
@@ -184,7 +184,7 @@ async def approve_izin_sakit(kode_izin_sakit: str, payload: ApprovalDTO, db: Ses
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.post("/{kode_izin_sakit}/cancel-approve")
-async def cancel_approve_izin_sakit(kode_izin_sakit: str, db: Session = Depends(get_db)):
+def cancel_approve_izin_sakit(kode_izin_sakit: str, db: Session = Depends(get_db)):
     record = db.query(PresensiIzinsakit).filter(PresensiIzinsakit.kode_izin_sakit == kode_izin_sakit).first()
     if not record:
         raise HTTPException(status_code=404, detail="Data not found")
@@ -2,6 +2,8 @@ from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
 from sqlalchemy import text
 from app.database import get_db
+from app.core import master_cache
+from app.services import reminder_timeline
 from app.models.models import PresensiJamkerjaBydept, PresensiJamkerja, Cabang, Departemen, PresensiJamkerjaByDeptDetail
 from pydantic import BaseModel
 from typing import List, Optional
@@ -40,7 +42,7 @@ class UpdateJamKerjaDeptDTO(BaseModel):
     kode_jam_kerja: List[str]
 
 @router.get("")
-async def get_jam_kerja_dept(
+def get_jam_kerja_dept(
     page: int = 1,
     limit: int = 15,
     kode_cabang: Optional[str] = None,
@@ -80,11 +82,11 @@ async def get_jam_kerja_dept(
     }
 
 @router.get("/options/jam-kerja")
-async def get_jam_kerja_options(db: Session = Depends(get_db)):
+def get_jam_kerja_options(db: Session = Depends(get_db)):
     return db.query(PresensiJamkerja).order_by(PresensiJamkerja.kode_jam_kerja).all()
 
 @router.post("")
-async def create_jam_kerja_dept(payload: CreateJamKerjaDeptDTO, db: Session = Depends(get_db)):
+def create_jam_kerja_dept(payload: CreateJamKerjaDeptDTO, db: Session = Depends(get_db)):
     # Check existing
     existing = db.query(PresensiJamkerjaBydept).filter(
         PresensiJamkerjaBydept.kode_cabang == payload.kode_cabang,
@@ -120,6 +122,8 @@ async def create_jam_kerja_dept(payload: CreateJamKerjaDeptDTO, db: Session = De
                 db.add(new_detail)
                 
         db.commit()
+        master_cache.invalidate(master_cache.JAM_KERJA_DEPT)
+        reminder_timeline.invalidate()
         return {"message": "Data Berhasil Disimpan"}
         
     except Exception as e:
@@ -127,7 +131,7 @@ async def create_jam_kerja_dept(payload: CreateJamKerjaDeptDTO, db: Session = De
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/{kode_jk_dept}")
-async def get_jam_kerja_dept_detail(kode_jk_dept: str, db: Session = Depends(get_db)):
+def get_jam_kerja_dept_detail(kode_jk_dept: str, db: Session = Depends(get_db)):
     jk_dept = db.query(PresensiJamkerjaBydept, Cabang.nama_cabang, Departemen.nama_dept)\
         .join(Cabang, PresensiJamkerjaBydept.kode_cabang == Cabang.kode_cabang)\
         .join(Departemen, PresensiJamkerjaBydept.kode_dept == Departemen.kode_dept)\
@@ -158,7 +162,7 @@ async def get_jam_kerja_dept_detail(kode_jk_dept: str, db: Session = Depends(get
     }
 
 @router.put("/{kode_jk_dept}")
-async def update_jam_kerja_dept(kode_jk_dept: str, payload: UpdateJamKerjaDeptDTO, db: Session = Depends(get_db)):
+def update_jam_kerja_dept(kode_jk_dept: str, payload: UpdateJamKerjaDeptDTO, db: Session = Depends(get_db)):
     jk_dept = db.query(PresensiJamkerjaBydept).filter(PresensiJamkerjaBydept.kode_jk_dept == kode_jk_dept).first()
     if not jk_dept:
         raise HTTPException(status_code=404, detail="Data not found")
@@ -183,6 +187,8 @@ async def update_jam_kerja_dept(kode_jk_dept: str, payload: UpdateJamKerjaDeptDT
         
         jk_dept.updated_at = datetime.now()
         db.commit()
+        master_cache.invalidate(master_cache.JAM_KERJA_DEPT)
+        reminder_timeline.invalidate()
         return {"message": "Data Berhasil Diupdate"}
         
     except Exception as e:
@@ -190,7 +196,7 @@ async def update_jam_kerja_dept(kode_jk_dept: str, payload: UpdateJamKerjaDeptDT
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.delete("/{kode_jk_dept}")
-async def delete_jam_kerja_dept(kode_jk_dept: str, db: Session = Depends(get_db)):
+def delete_jam_kerja_dept(kode_jk_dept: str, db: Session = Depends(get_db)):
     jk_dept = db.query(PresensiJamkerjaBydept).filter(PresensiJamkerjaBydept.kode_jk_dept == kode_jk_dept).first()
     if not jk_dept:
         raise HTTPException(status_code=404, detail="Data not found")
@@ -201,6 +207,8 @@ async def delete_jam_kerja_dept(kode_jk_dept: str, db: Session = Depends(get_db)
         
         db.delete(jk_dept)
         db.commit()
+        master_cache.invalidate(master_cache.JAM_KERJA_DEPT)
+        reminder_timeline.invalidate()
         return {"message": "Data Berhasil Dihapus"}
     except Exception as e:
         db.rollback()
@@ -1,6 +1,7 @@
 from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
-from sqlalchemy import text, func, extract
+from sqlalchemy import text, func
+from app.core.date_range import in_month
 from app.database import get_db
 from app.routers.auth_legacy import get_current_user_data, CurrentUser
 from app.models.models import (
@@ -19,7 +20,7 @@ router = APIRouter(
 )
 
 @router.get("/bulanan")
-async def get_jadwal_bulanan(
+def get_jadwal_bulanan(
     month: int = Query(..., description="Bulan (1-12)"),
     year: int = Query(..., description="Tahun (YYYY)"),
     current_user: CurrentUser = Depends(get_current_user_data),
@@ -52,16 +53,14 @@ async def get_jadwal_bulanan(
     # Priority 0: Extra Date
     extra_date_records = db.query(PresensiJamkerjaBydateExtra).filter(
         PresensiJamkerjaBydateExtra.nik == nik,
-        extract('month', PresensiJamkerjaBydateExtra.tanggal) == month,
-        extract('year', PresensiJamkerjaBydateExtra.tanggal) == year
+        in_month(PresensiJamkerjaBydateExtra.tanggal, year, month)
     ).all()
     extra_date_map = {r.tanggal: r.kode_jam_kerja for r in extra_date_records}
 
     # Priority 1: Roster Date
     roster_records = db.query(SetJamKerjaByDate).filter(
         SetJamKerjaByDate.nik == nik,
-        extract('month', SetJamKerjaByDate.tanggal) == month,
-        extract('year', SetJamKerjaByDate.tanggal) == year
+        in_month(SetJamKerjaByDate.tanggal, year, month)
     ).all()
     roster_map = {r.tanggal: r.kode_jam_kerja for r in roster_records}
 
@@ -85,8 +84,7 @@ async def get_jadwal_bulanan(
     # 5. Fetch Actual Presensi (Realisasi)
     presensi_records = db.query(Presensi).filter(
         Presensi.nik == nik,
-        extract('month', Presensi.tanggal) == month,
-        extract('year', Presensi.tanggal) == year
+        in_month(Presensi.tanggal, year, month)
     ).all()
     
     presensi_map = {p.tanggal: p for p in presensi_records}
@@ -56,7 +56,7 @@ class ApprovalDTO(BaseModel):
     approve: bool  # True for approve, False for reject
 
 @router.get("")
-async def get_lembur_list(
+def get_lembur_list(
     dari: Optional[date] = None,
     sampai: Optional[date] = None,
     nama_karyawan: Optional[str] = None,
@@ -122,7 +122,7 @@ async def get_lembur_list(
     return data
 
 @router.post("")
-async def create_lembur(payload: CreateLemburDTO, db: Session = Depends(get_db)):
+def create_lembur(payload: CreateLemburDTO, db: Session = Depends(get_db)):
     try:
         new_record = Lembur(
             nik=payload.nik,
@@ -146,7 +146,7 @@ async def create_lembur(payload: CreateLemburDTO, db: Session = Depends(get_db))
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/{id}")
-async def get_lembur_detail(id: int, db: Session = Depends(get_db)):
+def get_lembur_detail(id: int, db: Session = Depends(get_db)):
     result = db.query(
         Lembur,
         Karyawan.nama_karyawan,
@@ -182,7 +182,7 @@ async def get_lembur_detail(id: int, db: Session = Depends(get_db)):
     }
 
 @router.put("/{id}")
-async def update_lembur(id: int, payload: UpdateLemburDTO, db: Session = Depends(get_db)):
+def update_lembur(id: int, payload: UpdateLemburDTO, db: Session = Depends(get_db)):
     record = db.query(Lembur).filter(Lembur.id == id).first()
     if not record:
         raise HTTPException(status_code=404, detail="Data not found")
@@ -213,7 +213,7 @@ async def update_lembur(id: int, payload: UpdateLemburDTO, db: Session = Depends
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.delete("/{id}")
-async def delete_lembur(id: int, db: Session = Depends(get_db)):
+def delete_lembur(id: int, db: Session = Depends(get_db)):
     record = db.query(Lembur).filter(Lembur.id == id).first()
     if not record:
         raise HTTPException(status_code=404, detail="Data not found")
@@ -227,7 +227,7 @@ async def delete_lembur(id: int, db: Session = Depends(get_db)):
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.post("/{id}/approve")
-async def approve_lembur(id: int, payload: ApprovalDTO, db: Session = Depends(get_db)):
+def approve_lembur(id: int, payload: ApprovalDTO, db: Session = Depends(get_db)):
     record = db.query(Lembur).filter(Lembur.id == id).first()
     if not record:
         raise HTTPException(status_code=404, detail="Data not found")
@@ -249,7 +249,7 @@ async def approve_lembur(id: int, payload: ApprovalDTO, db: Session = Depends(ge
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.post("/{id}/cancel-approve")
-async def cancel_approve_lembur(id: int, db: Session = Depends(get_db)):
+def cancel_approve_lembur(id: int, db: Session = Depends(get_db)):
     record = db.query(Lembur).filter(Lembur.id == id).first()
     if not record:
         raise HTTPException(status_code=404, detail="Data not found")
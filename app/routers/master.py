@@ -12,6 +12,8 @@ import uuid
 from pathlib import Path
 from fastapi import File, UploadFile, Form
 from app.core.security import get_password_hash
+from app.core import master_cache, principal_cache
+from app.services import reminder_timeline, geofence
 from app.core.permissions import CurrentUser, get_current_user, require_permission_dependency
 
 router = APIRouter(
@@ -149,7 +151,7 @@ class CabangCreateRequest(BaseModel):
     kode_up3: Optional[str] = None
 
 @router.get("/departemen", response_model=List[DepartemenDTO])
-async def get_departemen_list(db: Session = Depends(get_db)):
+def get_departemen_list(db: Session = Depends(get_db)):
     try:
         data = db.query(Departemen).order_by(Departemen.kode_dept).all()
         return data
@@ -157,7 +159,7 @@ async def get_departemen_list(db: Session = Depends(get_db)):
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.post("/departemen", response_model=DepartemenDTO)
-async def create_departemen(request: DepartemenCreateRequest, db: Session = Depends(get_db)):
+def create_departemen(request: DepartemenCreateRequest, db: Session = Depends(get_db)):
     try:
         # Check if exists
         existing = db.query(Departemen).filter(Departemen.kode_dept == request.kode_dept).first()
@@ -172,6 +174,7 @@ async def create_departemen(request: DepartemenCreateRequest, db: Session = Depe
         )
         db.add(new_dept)
         db.commit()
+        master_cache.invalidate(master_cache.DEPARTEMEN)
         db.refresh(new_dept)
         return new_dept
     except HTTPException:
@@ -182,7 +185,7 @@ async def create_departemen(request: DepartemenCreateRequest, db: Session = Depe
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.put("/departemen/{kode_dept}", response_model=DepartemenDTO)
-async def update_departemen(kode_dept: str, request: DepartemenCreateRequest, db: Session = Depends(get_db)):
+def update_departemen(kode_dept: str, request: DepartemenCreateRequest, db: Session = Depends(get_db)):
     try:
         dept = db.query(Departemen).filter(Departemen.kode_dept == kode_dept).first()
         if not dept:
@@ -193,6 +196,7 @@ async def update_departemen(kode_dept: str, request: DepartemenCreateRequest, db
         dept.updated_at = datetime.now()
         
         db.commit()
+        master_cache.invalidate(master_cache.DEPARTEMEN)
         db.refresh(dept)
         return dept
     except Exception as e:
@@ -201,7 +205,7 @@ async def update_departemen(kode_dept: str, request: DepartemenCreateRequest, db
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.delete("/departemen/{kode_dept}")
-async def delete_departemen(kode_dept: str, db: Session = Depends(get_db)):
+def delete_departemen(kode_dept: str, db: Session = Depends(get_db)):
     try:
         dept = db.query(Departemen).filter(Departemen.kode_dept == kode_dept).first()
         if not dept:
@@ -209,6 +213,7 @@ async def delete_departemen(kode_dept: str, db: Session = Depends(get_db)):
         
         db.delete(dept)
         db.commit()
+        master_cache.invalidate(master_cache.DEPARTEMEN)
         return {"status": True, "message": "Departemen berhasil dihapus"}
     except Exception as e:
         db.rollback()
@@ -222,7 +227,7 @@ async def delete_departemen(kode_dept: str, db: Session = Depends(get_db)):
 # ==========================================
 
 @router.get("/jabatan", response_model=List[JabatanDTO])
-async def get_jabatan_list(
+def get_jabatan_list(
     current_user: CurrentUser = Depends(require_permission_dependency("jabatan.index")),
     db: Session = Depends(get_db)
 ):
@@ -233,7 +238,7 @@ async def get_jabatan_list(
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.post("/jabatan", response_model=JabatanDTO)
-async def create_jabatan(
+def create_jabatan(
     request: JabatanCreateRequest,
     current_user: CurrentUser = Depends(require_permission_dependency("jabatan.create")),
     db: Session = Depends(get_db)
@@ -262,7 +267,7 @@ async def create_jabatan(
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.put("/jabatan/{kode_jabatan}", response_model=JabatanDTO)
-async def update_jabatan(
+def update_jabatan(
     kode_jabatan: str,
     request: JabatanCreateRequest,
     current_user: CurrentUser = Depends(require_permission_dependency("jabatan.update")),
@@ -286,7 +291,7 @@ async def update_jabatan(
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.delete("/jabatan/{kode_jabatan}")
-async def delete_jabatan(
+def delete_jabatan(
     kode_jabatan: str,
     current_user: CurrentUser = Depends(require_permission_dependency("jabatan.delete")),
     db: Session = Depends(get_db)
@@ -312,7 +317,7 @@ async def delete_jabatan(
 # ==========================================
 
 @router.get("/karyawan/options")
-async def get_karyawan_options(db: Session = Depends(get_db)):
+def get_karyawan_options(db: Session = Depends(get_db)):
     try:
         data = db.query(Karyawan).order_by(Karyawan.nama_karyawan).all()
         return [{"nik": k.nik, "nama_karyawan": k.nama_karyawan} for k in data]
@@ -320,7 +325,7 @@ async def get_karyawan_options(db: Session = Depends(get_db)):
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/cabang/options")
-async def get_cabang_options(db: Session = Depends(get_db)):
+def get_cabang_options(db: Session = Depends(get_db)):
     try:
         data = db.query(Cabang).order_by(Cabang.kode_cabang).all()
         return [{"kode_cabang": c.kode_cabang, "nama_cabang": c.nama_cabang} for c in data]
@@ -328,7 +333,7 @@ async def get_cabang_options(db: Session = Depends(get_db)):
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/departemen/options")
-async def get_departemen_options(db: Session = Depends(get_db)):
+def get_departemen_options(db: Session = Depends(get_db)):
     try:
         data = db.query(Departemen).order_by(Departemen.kode_dept).all()
         return [{"kode_dept": d.kode_dept, "nama_dept": d.nama_dept} for d in data]
@@ -336,7 +341,7 @@ async def get_departemen_options(db: Session = Depends(get_db)):
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/cabang", response_model=List[CabangDTO])
-async def get_cabang_list(
+def get_cabang_list(
     current_user: CurrentUser = Depends(require_permission_dependency("cabang.index")),
     db: Session = Depends(get_db)
 ):
@@ -347,7 +352,7 @@ async def get_cabang_list(
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.post("/cabang", response_model=CabangDTO)
-async def create_cabang(
+def create_cabang(
     request: CabangCreateRequest,
     current_user: CurrentUser = Depends(require_permission_dependency("cabang.create")),
     db: Session = Depends(get_db)
@@ -371,6 +376,7 @@ async def create_cabang(
         )
         db.add(new_data)
         db.commit()
+        master_cache.invalidate(master_cache.CABANG)
         db.refresh(new_data)
         return new_data
     except HTTPException:
@@ -381,7 +387,7 @@ async def create_cabang(
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.put("/cabang/{kode_cabang}", response_model=CabangDTO)
-async def update_cabang(
+def update_cabang(
     kode_cabang: str,
     request: CabangCreateRequest,
     current_user: CurrentUser = Depends(require_permission_dependency("cabang.update")),
@@ -402,6 +408,7 @@ async def update_cabang(
         data.updated_at = datetime.now()
         
         db.commit()
+        master_cache.invalidate(master_cache.CABANG)
         db.refresh(data)
         return data
     except Exception as e:
@@ -410,7 +417,7 @@ async def update_cabang(
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.delete("/cabang/{kode_cabang}")
-async def delete_cabang(
+def delete_cabang(
     kode_cabang: str,
     current_user: CurrentUser = Depends(require_permission_dependency("cabang.delete")),
     db: Session = Depends(get_db)
@@ -422,6 +429,7 @@ async def delete_cabang(
         
         db.delete(data)
         db.commit()
+        master_cache.invalidate(master_cache.CABANG)
         return {"status": True, "message": "Cabang berhasil dihapus"}
     except Exception as e:
         db.rollback()
@@ -457,7 +465,7 @@ class PatrolPointCreateRequest(BaseModel):
     urutan: int = 0
 
 @router.get("/patrol-points", response_model=List[PatrolPointDTO])
-async def get_patrol_points(
+def get_patrol_points(
     kode_cabang: Optional[str] = Query(None, description="Filter Kode Cabang"),
     search: Optional[str] = Query(None, description="Search Nama Titik"),
     current_user: CurrentUser = Depends(require_permission_dependency("patrolpoint.index")),
@@ -476,7 +484,7 @@ async def get_patrol_points(
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.post("/patrol-points", response_model=PatrolPointDTO)
-async def create_patrol_point(
+def create_patrol_point(
     request: PatrolPointCreateRequest,
     current_user: CurrentUser = Depends(require_permission_dependency("patrolpoint.create")),
     db: Session = Depends(get_db)
@@ -494,6 +502,7 @@ async def create_patrol_point(
         )
         db.add(new_point)
         db.commit()
+        geofence.invalidate()
         db.refresh(new_point)
         return new_point
     except Exception as e:
@@ -502,7 +511,7 @@ async def create_patrol_point(
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.put("/patrol-points/{id}", response_model=PatrolPointDTO)
-async def update_patrol_point(
+def update_patrol_point(
     id: int,
     request: PatrolPointCreateRequest,
     current_user: CurrentUser = Depends(require_permission_dependency("patrolpoint.update")),
@@ -522,6 +531,7 @@ async def update_patrol_point(
         point.updated_at = datetime.now()
         
         db.commit()
+        geofence.invalidate()
         db.refresh(point)
         return point
     except Exception as e:
@@ -530,7 +540,7 @@ async def update_patrol_point(
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.delete("/patrol-points/{id}")
-async def delete_patrol_point(
+def delete_patrol_point(
     id: int,
     current_user: CurrentUser = Depends(require_permission_dependency("patrolpoint.delete")),
     db: Session = Depends(get_db)
@@ -542,6 +552,7 @@ async def delete_patrol_point(
         
         db.delete(point)
         db.commit()
+        geofence.invalidate()
         return {"status": True, "message": "Patrol Point berhasil dihapus"}
     except Exception as e:
         db.rollback()
@@ -569,7 +580,7 @@ class CutiCreateRequest(BaseModel):
     jumlah_hari: int
 
 @router.get("/cuti", response_model=List[CutiDTO])
-async def get_cuti_list(
+def get_cuti_list(
     current_user: CurrentUser = Depends(require_permission_dependency("cuti.index")),
     db: Session = Depends(get_db)
 ):
@@ -580,7 +591,7 @@ async def get_cuti_list(
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.post("/cuti", response_model=CutiDTO)
-async def create_cuti(
+def create_cuti(
     request: CutiCreateRequest,
     current_user: CurrentUser = Depends(require_permission_dependency("cuti.create")),
     db: Session = Depends(get_db)
@@ -609,7 +620,7 @@ async def create_cuti(
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.put("/cuti/{kode_cuti}", response_model=CutiDTO)
-async def update_cuti(
+def update_cuti(
     kode_cuti: str,
     request: CutiCreateRequest,
     current_user: CurrentUser = Depends(require_permission_dependency("cuti.update")),
@@ -634,7 +645,7 @@ async def update_cuti(
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.delete("/cuti/{kode_cuti}")
-async def delete_cuti(
+def delete_cuti(
     kode_cuti: str,
     current_user: CurrentUser = Depends(require_permission_dependency("cuti.delete")),
     db: Session = Depends(get_db)
@@ -701,7 +712,7 @@ class JamKerjaCreateRequest(BaseModel):
         return v
 
 @router.get("/jamkerja", response_model=List[JamKerjaDTO])
-async def get_jamkerja_list(
+def get_jamkerja_list(
     current_user: CurrentUser = Depends(require_permission_dependency("jamkerja.index")),
     db: Session = Depends(get_db)
 ):
@@ -712,7 +723,7 @@ async def get_jamkerja_list(
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.post("/jamkerja", response_model=JamKerjaDTO)
-async def create_jamkerja(
+def create_jamkerja(
     request: JamKerjaCreateRequest,
     current_user: CurrentUser = Depends(require_permission_dependency("jamkerja.create")),
     db: Session = Depends(get_db)
@@ -755,6 +766,8 @@ async def create_jamkerja(
         )
         db.add(new_data)
         db.commit()
+        master_cache.invalidate(master_cache.JAM_KERJA)
+        reminder_timeline.invalidate()
         db.refresh(new_data)
         return new_data
     except HTTPException:
@@ -765,7 +778,7 @@ async def create_jamkerja(
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.put("/jamkerja/{kode}", response_model=JamKerjaDTO)
-async def update_jamkerja(
+def update_jamkerja(
     kode: str,
     request: JamKerjaCreateRequest,
     current_user: CurrentUser = Depends(require_permission_dependency("jamkerja.update")),
@@ -810,6 +823,8 @@ async def update_jamkerja(
         data.updated_at = datetime.now()
         
         db.commit()
+        master_cache.invalidate(master_cache.JAM_KERJA)
+        reminder_timeline.invalidate()
         db.refresh(data)
         return data
     except Exception as e:
@@ -818,7 +833,7 @@ async def update_jamkerja(
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.delete("/jamkerja/{kode}")
-async def delete_jamkerja(
+def delete_jamkerja(
     kode: str,
     current_user: CurrentUser = Depends(require_permission_dependency("jamkerja.delete")),
     db: Session = Depends(get_db)
@@ -830,6 +845,8 @@ async def delete_jamkerja(
         
         db.delete(data)
         db.commit()
+        master_cache.invalidate(master_cache.JAM_KERJA)
+        reminder_timeline.invalidate()
         return {"status": True, "message": "Data Jam Kerja berhasil dihapus"}
     except Exception as e:
         db.rollback()
@@ -866,7 +883,7 @@ class PatrolScheduleCreateRequest(BaseModel):
     is_active: int = 1
 
 @router.get("/patrol-schedules", response_model=List[PatrolScheduleDTO])
-async def get_patrol_schedules(
+def get_patrol_schedules(
     kode_cabang: Optional[str] = Query(None, description="Filter Kode Cabang"),
      kode_dept: Optional[str] = Query(None, description="Filter Kode Dept"),
     db: Session = Depends(get_db)
@@ -884,7 +901,7 @@ async def get_patrol_schedules(
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.post("/patrol-schedules", response_model=PatrolScheduleDTO)
-async def create_patrol_schedule(request: PatrolScheduleCreateRequest, db: Session = Depends(get_db)):
+def create_patrol_schedule(request: PatrolScheduleCreateRequest, db: Session = Depends(get_db)):
     try:
         def to_time(val):
             if not val: return None
@@ -907,6 +924,7 @@ async def create_patrol_schedule(request: PatrolScheduleCreateRequest, db: Sessi
         )
         db.add(new_data)
         db.commit()
+        reminder_timeline.invalidate()
         db.refresh(new_data)
         return new_data
     except Exception as e:
@@ -915,7 +933,7 @@ async def create_patrol_schedule(request: PatrolScheduleCreateRequest, db: Sessi
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.put("/patrol-schedules/{id}", response_model=PatrolScheduleDTO)
-async def update_patrol_schedule(id: int, request: PatrolScheduleCreateRequest, db: Session = Depends(get_db)):
+def update_patrol_schedule(id: int, request: PatrolScheduleCreateRequest, db: Session = Depends(get_db)):
     try:
         data = db.query(PatrolSchedules).filter(PatrolSchedules.id == id).first()
         if not data:
@@ -939,6 +957,7 @@ async def update_patrol_schedule(id: int, request: PatrolScheduleCreateRequest,
         data.updated_at = datetime.now()
         
         db.commit()
+        reminder_timeline.invalidate()
         db.refresh(data)
         return data
     except Exception as e:
@@ -947,7 +966,7 @@ async def update_patrol_schedule(id: int, request: PatrolScheduleCreateRequest,
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.delete("/patrol-schedules/{id}")
-async def delete_patrol_schedule(id: int, db: Session = Depends(get_db)):
+def delete_patrol_schedule(id: int, db: Session = Depends(get_db)):
     try:
         data = db.query(PatrolSchedules).filter(PatrolSchedules.id == id).first()
         if not data:
@@ -955,6 +974,7 @@ async def delete_patrol_schedule(id: int, db: Session = Depends(get_db)):
         
         db.delete(data)
         db.commit()
+        reminder_timeline.invalidate()
         return {"status": True, "message": "Patrol Schedule berhasil dihapus"}
     except Exception as e:
         db.rollback()
@@ -993,7 +1013,7 @@ class DeptTaskPointCreateRequest(BaseModel):
     longitude: Optional[float] = None
 
 @router.get("/dept-task-points", response_model=List[DeptTaskPointDTO])
-async def get_dept_task_points(
+def get_dept_task_points(
     kode_cabang: Optional[str] = Query(None, description="Filter Kode Cabang"),
     kode_dept: Optional[str] = Query(None, description="Filter Kode Dept"),
     search: Optional[str] = Query(None, description="Search Nama Titik"),
@@ -1014,7 +1034,7 @@ async def get_dept_task_points(
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.post("/dept-task-points", response_model=DeptTaskPointDTO)
-async def create_dept_task_point(request: DeptTaskPointCreateRequest, db: Session = Depends(get_db)):
+def create_dept_task_point(request: DeptTaskPointCreateRequest, db: Session = Depends(get_db)):
     try:
         new_point = DepartmentTaskPointMaster(
             kode_cabang=request.kode_cabang,
@@ -1038,7 +1058,7 @@ async def create_dept_task_point(request: DeptTaskPointCreateRequest, db: Sessio
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.put("/dept-task-points/{id}", response_model=DeptTaskPointDTO)
-async def update_dept_task_point(id: int, request: DeptTaskPointCreateRequest, db: Session = Depends(get_db)):
+def update_dept_task_point(id: int, request: DeptTaskPointCreateRequest, db: Session = Depends(get_db)):
     try:
         point = db.query(DepartmentTaskPointMaster).filter(DepartmentTaskPointMaster.id == id).first()
         if not point:
@@ -1063,7 +1083,7 @@ async def update_dept_task_point(id: int, request: DeptTaskPointCreateRequest, d
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.delete("/dept-task-points/{id}")
-async def delete_dept_task_point(id: int, db: Session = Depends(get_db)):
+def delete_dept_task_point(id: int, db: Session = Depends(get_db)):
     try:
         point = db.query(DepartmentTaskPointMaster).filter(DepartmentTaskPointMaster.id == id).first()
         if not point:
@@ -1080,7 +1100,7 @@ async def delete_dept_task_point(id: int, db: Session = Depends(get_db)):
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/options", response_model=MasterOptionsResponse)
-async def get_master_options(db: Session = Depends(get_db)):
+def get_master_options(db: Session = Depends(get_db)):
     try:
         dept = db.query(Departemen).order_by(Departemen.kode_dept).all()
         jab = db.query(Jabatan).order_by(Jabatan.kode_jabatan).all()
@@ -1099,7 +1119,7 @@ async def get_master_options(db: Session = Depends(get_db)):
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/karyawan", response_model=KaryawanListResponse)
-async def get_karyawan_list(
+def get_karyawan_list(
     page: int = Query(1, ge=1),
     per_page: int = Query(20, ge=1, le=10000),
     search: Optional[str] = None,
@@ -1269,7 +1289,7 @@ def save_upload(file_obj: UploadFile, subfolder: str = "") -> str:
         return None
 
 @router.post("/karyawan")
-async def create_karyawan(
+def create_karyawan(
     nik: str = Form(...),
     nama_karyawan: str = Form(...),
     no_ktp: str = Form(...),
@@ -1373,6 +1393,7 @@ async def create_karyawan(
         
         db.add(new_karyawan)
         db.commit()
+        reminder_timeline.invalidate()     # target reminder per cabang / dept
         db.refresh(new_karyawan)
         
         return {"status": True, "message": "Karyawan berhasil ditambahkan", "data": {"nik": nik}}
@@ -1402,7 +1423,7 @@ class KaryawanDetailResponse(BaseModel):
     message: Optional[str] = None
 
 @router.get("/karyawan/{nik}", response_model=KaryawanDetailResponse)
-async def get_karyawan_detail(
+def get_karyawan_detail(
     nik: str,
     current_user: CurrentUser = Depends(require_permission_dependency("karyawan.index")),
     db: Session = Depends(get_db)
@@ -1520,7 +1541,7 @@ async def get_karyawan_detail(
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.put("/karyawan/{nik}")
-async def update_karyawan(
+def update_karyawan(
     nik: str,
     nama_karyawan: str = Form(...),
     no_ktp: str = Form(...),
@@ -1632,6 +1653,7 @@ async def update_karyawan(
         karyawan.updated_at = datetime.now()
         
         db.commit()
+        reminder_timeline.invalidate()     # cabang / dept / kode_jadwal bisa berubah
         db.refresh(karyawan)
         
         return {"status": True, "message": "Karyawan berhasil diperbarui"}
@@ -1643,7 +1665,7 @@ async def update_karyawan(
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.delete("/karyawan/{nik}")
-async def delete_karyawan(
+def delete_karyawan(
     nik: str,
     current_user: CurrentUser = Depends(require_permission_dependency("karyawan.delete")),
     db: Session = Depends(get_db)
@@ -1655,6 +1677,7 @@ async def delete_karyawan(
             
         db.delete(karyawan)
         db.commit()
+        reminder_timeline.invalidate()
         return {"status": True, "message": "Karyawan berhasil dihapus"}
     except Exception as e:
         db.rollback()
@@ -1667,7 +1690,7 @@ async def delete_karyawan(
 # --------------------------------------------------------------------------------------
 
 @router.patch("/karyawan/{nik}/toggle/location")
-async def toggle_location(nik: str, db: Session = Depends(get_db)):
+def toggle_location(nik: str, db: Session = Depends(get_db)):
     try:
         karyawan = db.query(Karyawan).filter(Karyawan.nik == nik).first()
         if not karyawan:
@@ -1686,7 +1709,7 @@ async def toggle_location(nik: str, db: Session = Depends(get_db)):
 
 
 @router.patch("/karyawan/{nik}/toggle/jamkerja")
-async def toggle_jamkerja(nik: str, db: Session = Depends(get_db)):
+def toggle_jamkerja(nik: str, db: Session = Depends(get_db)):
     try:
         karyawan = db.query(Karyawan).filter(Karyawan.nik == nik).first()
         if not karyawan:
@@ -1704,7 +1727,7 @@ async def toggle_jamkerja(nik: str, db: Session = Depends(get_db)):
 
 
 @router.patch("/karyawan/{nik}/toggle/device")
-async def toggle_device(nik: str, db: Session = Depends(get_db)):
+def toggle_device(nik: str, db: Session = Depends(get_db)):
     try:
         karyawan = db.query(Karyawan).filter(Karyawan.nik == nik).first()
         if not karyawan:
@@ -1722,7 +1745,7 @@ async def toggle_device(nik: str, db: Session = Depends(get_db)):
 
 
 @router.patch("/karyawan/{nik}/toggle/multidevice")
-async def toggle_multidevice(nik: str, db: Session = Depends(get_db)):
+def toggle_multidevice(nik: str, db: Session = Depends(get_db)):
     try:
         karyawan = db.query(Karyawan).filter(Karyawan.nik == nik).first()
         if not karyawan:
@@ -1740,7 +1763,7 @@ async def toggle_multidevice(nik: str, db: Session = Depends(get_db)):
 
 
 @router.post("/karyawan/{nik}/reset-session")
-async def reset_session(nik: str, db: Session = Depends(get_db)):
+def reset_session(nik: str, db: Session = Depends(get_db)):
     try:
         karyawan = db.query(Karyawan).filter(Karyawan.nik == nik).first()
         if not karyawan:
@@ -1763,6 +1786,8 @@ async def reset_session(nik: str, db: Session = Depends(get_db)):
                 msg_extra = " & Token Invalidated"
         
         db.commit()
+        if user_karyawan:
+            principal_cache.invalidate_user(user_karyawan.id_user)
         
         return {"status": True, "message": f"Sesi berhasil direset (Lock Device dibuka){msg_extra}."}
     except Exception as e:
@@ -1785,7 +1810,7 @@ class SetJamKerjaDTO(BaseModel):
     jam_by_day: List[JamKerjaItemDTO] 
 
 @router.get("/jam-kerja-options")
-async def get_jam_kerja_options(db: Session = Depends(get_db)):
+def get_jam_kerja_options(db: Session = Depends(get_db)):
     try:
         data = db.query(PresensiJamkerja).order_by(PresensiJamkerja.nama_jam_kerja).all()
         return [{"kode_jam_kerja": r.kode_jam_kerja, "nama_jam_kerja": r.nama_jam_kerja, "jam_masuk": str(r.jam_masuk), "jam_pulang": str(r.jam_pulang)} for r in data]
@@ -1793,7 +1818,7 @@ async def get_jam_kerja_options(db: Session = Depends(get_db)):
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/karyawan/{nik}/jam-kerja")
-async def get_karyawan_jam_kerja(nik: str, db: Session = Depends(get_db)):
+def get_karyawan_jam_kerja(nik: str, db: Session = Depends(get_db)):
     try:
         by_day = db.query(SetJamKerjaByDay).filter(SetJamKerjaByDay.nik == nik).all()
         return {
@@ -1803,7 +1828,7 @@ async def get_karyawan_jam_kerja(nik: str, db: Session = Depends(get_db)):
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.post("/karyawan/{nik}/jam-kerja")
-async def save_karyawan_jam_kerja(nik: str, payload: SetJamKerjaDTO, db: Session = Depends(get_db)):
+def save_karyawan_jam_kerja(nik: str, payload: SetJamKerjaDTO, db: Session = Depends(get_db)):
     try:
         # Delete existing by day for this NIK
         db.query(SetJamKerjaByDay).filter(SetJamKerjaByDay.nik == nik).delete(synchronize_session=False)
@@ -1822,6 +1847,7 @@ async def save_karyawan_jam_kerja(nik: str, payload: SetJamKerjaDTO, db: Session
             db.add_all(records)
             
         db.commit()
+        reminder_timeline.invalidate(nik)
         return {"status": True, "message": "Jam kerja berhasil disimpan"}
     except Exception as e:
         db.rollback()
@@ -1843,7 +1869,7 @@ class JamKerjaDateExtraDTO(BaseModel):
     keterangan: Optional[str] = None
 
 @router.get("/karyawan/{nik}/jam-kerja-date")
-async def get_jam_kerja_by_date(nik: str, bulan: int = Query(...), tahun: int = Query(...), db: Session = Depends(get_db)):
+def get_jam_kerja_by_date(nik: str, bulan: int = Query(...), tahun: int = Query(...), db: Session = Depends(get_db)):
     try:
         data = db.query(SetJamKerjaByDate, PresensiJamkerja)\
             .join(PresensiJamkerja, SetJamKerjaByDate.kode_jam_kerja == PresensiJamkerja.kode_jam_kerja)\
@@ -1867,7 +1893,7 @@ async def get_jam_kerja_by_date(nik: str, bulan: int = Query(...), tahun: int =
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.post("/karyawan/{nik}/jam-kerja-date")
-async def create_jam_kerja_by_date(nik: str, payload: JamKerjaDateDTO, db: Session = Depends(get_db)):
+def create_jam_kerja_by_date(nik: str, payload: JamKerjaDateDTO, db: Session = Depends(get_db)):
     try:
         # Cek duplicate
         existing = db.query(SetJamKerjaByDate).filter(
@@ -1890,19 +1916,21 @@ async def create_jam_kerja_by_date(nik: str, payload: JamKerjaDateDTO, db: Sessi
             db.add(new_item)
             
         db.commit()
+        reminder_timeline.invalidate(nik)
         return {"status": True, "message": "Jadwal berhasil disimpan"}
     except Exception as e:
         db.rollback()
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.delete("/karyawan/{nik}/jam-kerja-date")
-async def delete_jam_kerja_by_date(nik: str, tanggal: date = Query(...), db: Session = Depends(get_db)):
+def delete_jam_kerja_by_date(nik: str, tanggal: date = Query(...), db: Session = Depends(get_db)):
     try:
         db.query(SetJamKerjaByDate).filter(
             SetJamKerjaByDate.nik == nik,
             SetJamKerjaByDate.tanggal == tanggal
         ).delete()
         db.commit()
+        reminder_timeline.invalidate(nik)
         return {"status": True, "message": "Jadwal berhasil dihapus"}
     except Exception as e:
         db.rollback()
@@ -1911,7 +1939,7 @@ async def delete_jam_kerja_by_date(nik: str, tanggal: date = Query(...), db: Ses
 # EXTRA JAM KERJA
 
 @router.get("/karyawan/{nik}/jam-kerja-extra")
-async def get_jam_kerja_extra(nik: str, bulan: int = Query(...), tahun: int = Query(...), db: Session = Depends(get_db)):
+def get_jam_kerja_extra(nik: str, bulan: int = Query(...), tahun: int = Query(...), db: Session = Depends(get_db)):
     try:
         data = db.query(PresensiJamkerjaBydateExtra, PresensiJamkerja)\
             .join(PresensiJamkerja, PresensiJamkerjaBydateExtra.kode_jam_kerja == PresensiJamkerja.kode_jam_kerja)\
@@ -1937,7 +1965,7 @@ async def get_jam_kerja_extra(nik: str, bulan: int = Query(...), tahun: int = Qu
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.post("/karyawan/{nik}/jam-kerja-extra")
-async def create_jam_kerja_extra(nik: str, payload: JamKerjaDateExtraDTO, db: Session = Depends(get_db)):
+def create_jam_kerja_extra(nik: str, payload: JamKerjaDateExtraDTO, db: Session = Depends(get_db)):
     try:
         # Max 1 per tanggal validation? Laravel says "Max 1 per tanggal"
         existing = db.query(PresensiJamkerjaBydateExtra).filter(
@@ -1964,19 +1992,21 @@ async def create_jam_kerja_extra(nik: str, payload: JamKerjaDateExtraDTO, db: Se
             db.add(new_item)
             
         db.commit()
+        reminder_timeline.invalidate(nik)
         return {"status": True, "message": "Jadwal Tambahan berhasil disimpan"}
     except Exception as e:
         db.rollback()
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.delete("/karyawan/{nik}/jam-kerja-extra")
-async def delete_jam_kerja_extra(nik: str, tanggal: date = Query(...), db: Session = Depends(get_db)):
+def delete_jam_kerja_extra(nik: str, tanggal: date = Query(...), db: Session = Depends(get_db)):
     try:
         db.query(PresensiJamkerjaBydateExtra).filter(
             PresensiJamkerjaBydateExtra.nik == nik,
             PresensiJamkerjaBydateExtra.tanggal == tanggal
         ).delete()
         db.commit()
+        reminder_timeline.invalidate(nik)
         return {"status": True, "message": "Jadwal Tambahan berhasil dihapus"}
     except Exception as e:
         db.rollback()
@@ -1987,7 +2017,7 @@ async def delete_jam_kerja_extra(nik: str, tanggal: date = Query(...), db: Sessi
 # --------------------------------------------------------------------------------------
 
 @router.post("/karyawan/{nik}/create-user")
-async def create_user_from_karyawan(nik: str, db: Session = Depends(get_db)):
+def create_user_from_karyawan(nik: str, db: Session = Depends(get_db)):
     try:
         karyawan = db.query(Karyawan).filter(Karyawan.nik == nik).first()
         if not karyawan:
@@ -2046,7 +2076,7 @@ async def create_user_from_karyawan(nik: str, db: Session = Depends(get_db)):
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.delete("/karyawan/{nik}/delete-user")
-async def delete_user_from_karyawan(nik: str, db: Session = Depends(get_db)):
+def delete_user_from_karyawan(nik: str, db: Session = Depends(get_db)):
     try:
         # Check link
         user_karyawan = db.query(Userkaryawan).filter(Userkaryawan.nik == nik).first()
@@ -23,7 +23,7 @@ STORAGE_BASE = "/var/www/appPatrol/storage/app/public/uploads/facerecognition"
 os.makedirs(STORAGE_BASE, exist_ok=True)
 
 @router.get("/{nik}")
-async def get_wajah(
+def get_wajah(
     nik: str,
     user: CurrentUser = Depends(get_current_user_data),
     db: Session = Depends(get_db)
@@ -59,7 +59,7 @@ async def get_wajah(
     }
 
 @router.post("/store")
-async def store_master_wajah(
+def store_master_wajah(
     nik: str = Form(...),
     images: List[UploadFile] = File(default=None, alias="images[]"),
     images_simple: List[UploadFile] = File(default=None, alias="images"),
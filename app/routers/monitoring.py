@@ -8,6 +8,7 @@ from pydantic import BaseModel
 from datetime import date, datetime, time
 from app.routers.master import get_full_image_url
 from app.core.permissions import get_current_user
+from app.services import daily_stats
 import math
 
 router = APIRouter(
@@ -72,7 +73,7 @@ def _parse_to_datetime(val: Optional[str], ref_date: date) -> Optional[datetime]
 # ─── GET: Daftar Presensi (paginasi + filter) ─────────────────────────────────
 
 @router.get("/presensi", response_model=MonitoringResponse)
-async def get_monitoring_presensi(
+def get_monitoring_presensi(
     date: Optional[date] = Query(None),
     dept_code: Optional[str] = Query(None),
     cabang_code: Optional[str] = Query(None),
@@ -165,7 +166,7 @@ async def get_monitoring_presensi(
 # ─── GET: Detail Presensi ─────────────────────────────────────────────────────
 
 @router.get("/presensi/{id}", response_model=PresensiItem)
-async def get_monitoring_presensi_detail(id: int, db: Session = Depends(get_db)):
+def get_monitoring_presensi_detail(id: int, db: Session = Depends(get_db)):
     try:
         result = db.query(
             Presensi, Karyawan.nama_karyawan, Departemen.nama_dept, Cabang.nama_cabang, PresensiJamkerja.nama_jam_kerja
@@ -205,7 +206,7 @@ async def get_monitoring_presensi_detail(id: int, db: Session = Depends(get_db))
 # ─── PUT: Edit Presensi ───────────────────────────────────────────────────────
 
 @router.put("/presensi/{id}")
-async def update_monitoring_presensi(
+def update_monitoring_presensi(
     id: int,
     payload: PresensiUpdatePayload,
     db: Session = Depends(get_db)
@@ -229,6 +230,7 @@ async def update_monitoring_presensi(
             presensi.kode_jam_kerja = payload.kode_jam_kerja or None
 
         db.commit()
+        daily_stats.mark(presensi.nik, presensi.tanggal)
 
         # Format response — ambil hanya bagian jam dari datetime/time/string
         def fmt_time(t) -> str:
@@ -267,13 +269,15 @@ async def update_monitoring_presensi(
 # ─── DELETE: Hapus Presensi ───────────────────────────────────────────────────
 
 @router.delete("/presensi/{id}")
-async def delete_monitoring_presensi(id: int, db: Session = Depends(get_db)):
+def delete_monitoring_presensi(id: int, db: Session = Depends(get_db)):
     try:
         presensi = db.query(Presensi).filter(Presensi.id == id).first()
         if not presensi:
             raise HTTPException(status_code=404, detail="Data presensi tidak ditemukan")
+        nik, tanggal = presensi.nik, presensi.tanggal
         db.delete(presensi)
         db.commit()
+        daily_stats.mark(nik, tanggal)
         return {"status": True, "message": "Data presensi berhasil dihapus"}
     except HTTPException:
         raise
@@ -285,7 +289,7 @@ async def delete_monitoring_presensi(id: int, db: Session = Depends(get_db)):
 # ─── GET: Opsi Jam Kerja (untuk dropdown modal edit) ─────────────────────────
 
 @router.get("/jam-kerja-options")
-async def get_jam_kerja_options(db: Session = Depends(get_db)):
+def get_jam_kerja_options(db: Session = Depends(get_db)):
     rows = db.query(PresensiJamkerja).order_by(PresensiJamkerja.nama_jam_kerja).all()
     return {
         "status": True,
@@ -38,7 +38,7 @@ class PatrolDetailResponse(BaseModel):
     points: List[PointDetail]
 
 @router.get("/{id}", response_model=PatrolDetailResponse)
-async def get_patrol_detail(
+def get_patrol_detail(
     id: int = Path(..., description="ID Patrol Session"),
     db: Session = Depends(get_db)
 ):
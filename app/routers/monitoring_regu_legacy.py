@@ -97,7 +97,7 @@ def is_patrol_in_window(p: PatrolSessions, window: dict, tgl: date) -> bool:
 # --- Main Logic ---
 
 @router.get("", response_model=MonitoringResponse, dependencies=[Depends(require_permission_dependency("monitoringpatrol.index"))])
-async def get_monitoring_regu(
+def get_monitoring_regu(
     tanggal: Optional[date] = Query(None),
     kode_cabang: Optional[str] = Query(None),
     kode_dept: Optional[str] = Query(None),
@@ -15,17 +15,7 @@ from datetime import datetime, date, timedelta
 import math
 import requests
 import json
-import firebase_admin
-from firebase_admin import credentials, messaging
-
-# Initialize Firebase Admin SDK
-try:
-    if not firebase_admin._apps:
-        cred = credentials.Certificate("/var/www/appPatrol-python/serviceAccountKey.json")
-        firebase_admin.initialize_app(cred)
-    print("Firebase Admin SDK Initialized")
-except Exception as e:
-    print(f"Failed to initialize Firebase Admin SDK: {e}")
+from app.core import fcm, walkie_acl
 
 # FCM_SERVER_KEY removed as we use service account now
 
@@ -381,7 +371,7 @@ class StartCallRequest(BaseModel):
     caller_name: str = None
 
 @router.post("/video-call/start")
-async def start_video_call(
+def start_video_call(
     payload: StartCallRequest,
     current_user: CurrentUser = Depends(get_current_user_sanctum),
     db: Session = Depends(get_db)
@@ -406,9 +396,8 @@ async def start_video_call(
         # 1. Identify Participants
         target_niks = []
         
-        # A. Check if room is a defined Walkie Channel
-        from app.models.models import WalkieChannels, WalkieChannelCabangs
-        channel = db.query(WalkieChannels).filter(WalkieChannels.code == room_id).first()
+        # A. Check if room is a defined Walkie Channel (snapshot dari index ACL walkie)
+        channel = walkie_acl.get_channel(db, room_id)
         
         if channel:
             # Query eligible employees
@@ -416,17 +405,13 @@ async def start_video_call(
             query = db.query(Karyawan.nik)
             
             # Filter by Dept if specified
-            if channel.dept_members:
-                depts = [d.strip() for d in channel.dept_members.split(',')]
-                query = query.filter(Karyawan.kode_dept.in_(depts))
+            if channel.depts is not None:
+                query = query.filter(Karyawan.kode_dept.in_(sorted(channel.depts)))
                 
             # Filter by Cabang if linked
-            channel_cabangs = db.query(WalkieChannelCabangs).filter(WalkieChannelCabangs.walkie_channel_id == channel.id).all()
-            if channel_cabangs:
-                 cabangs = [cc.kode_cabang for cc in channel_cabangs]
-                 query = query.filter(Karyawan.kode_cabang.in_(cabangs))
+            if channel.cabangs:
+                 query = query.filter(Karyawan.kode_cabang.in_(sorted(channel.cabangs)))
             
-            results = query.all()
             results = query.all()
             target_niks = [r[0] for r in results if r[0] != sender_id]
             print(f"DEBUG VIDEO CALL: Found {len(target_niks)} participants via Channel rules.")
@@ -457,78 +442,30 @@ async def start_video_call(
         ).all()
                     
         tokens = [d.fcm_token for d in devices if d.fcm_token]
-        # Map token -> device id for cleanup
-        token_to_device_id = {d.fcm_token: d.id for d in devices if d.fcm_token}
         
         if not tokens:
              return {"status": False, "message": "No target devices found"}
 
-        # 3. Send FCM Notification (Using Firebase Admin SDK)
+        # 3. Send FCM Notification (dispatcher app.core.fcm — token invalid otomatis dihapus)
         
         actual_caller_name = caller_name
         if not actual_caller_name:
             karyawan = db.query(Karyawan).filter(Karyawan.nik == sender_id).first()
             actual_caller_name = karyawan.nama_karyawan if karyawan else current_user.username
 
-        success_count = 0
-        failure_count = 0
-        
-        # Prepare Message
-        # Note: Android high priority is better handled by 'data' payload for background processing
-        # but 'android' config can also specific priority.
-        
-        # Split tokens into chunks of 500 (Multicast limit)
-        def chunks(lst, n):
-            for i in range(0, len(lst), n):
-                yield lst[i:i + n]
-
-        for token_batch in chunks(tokens, 500):
-            try:
-                msg = messaging.MulticastMessage(
-                    data={
-                        "type": "video_call_offer",
-                        "room": room_id,
-                        "caller_name": actual_caller_name,
-                        "ttl": "60s"
-                    },
-                    tokens=token_batch,
-                    android=messaging.AndroidConfig(
-                        priority='high',
-                        ttl=timedelta(seconds=60) # 60 seconds TTL
-                    )
-                )
-                
-                response = messaging.send_each_for_multicast(msg)
-                success_count += response.success_count
-                failure_count += response.failure_count
-                
-                print(f"🔥 FCM BATCH RESULT: Success={response.success_count}, Failed={response.failure_count}")
-                
-                if response.failure_count > 0:
-                    for idx, resp in enumerate(response.responses):
-                        if not resp.success:
-                            # Tampilkan Error Detail dari Firebase
-                            err = resp.exception
-                            token_failed = token_batch[idx]
-                            print(f"🔥 FCM ERROR for token {token_failed[:10]}... : {err}")
-                            if hasattr(err, 'cause'): print(f"   CAUSE: {err.cause}")
-                            if hasattr(err, 'code'): print(f"   CODE: {err.code}")
-                            if hasattr(err, 'http_response'): print(f"   HTTP: {err.http_response}")
-                            
-                            # Auto-delete token invalid (NOT_FOUND) dari DB
-                            error_code = getattr(err, 'code', '')
-                            if error_code in ('NOT_FOUND', 'registration-token-not-registered', 'INVALID_ARGUMENT'):
-                                device_id = token_to_device_id.get(token_failed)
-                                if device_id:
-                                    print(f"🗑️ Deleting stale token from DB: device_id={device_id}")
-                                    stale = db.query(KaryawanDevices).filter(KaryawanDevices.id == device_id).first()
-                                    if stale:
-                                        db.delete(stale)
-                                        db.commit()
-
-            except Exception as e:
-                print(f"Error sending batch notification: {e}")
-                failure_count += len(token_batch)
+        response = fcm.send_multicast(
+            tokens,
+            data={
+                "type": "video_call_offer",
+                "room": room_id,
+                "caller_name": actual_caller_name,
+                "ttl": "60s"
+            },
+            ttl_seconds=60 # 60 seconds TTL
+        )
+        success_count = response.success_count
+        failure_count = response.failure_count
+        print(f"🔥 FCM RESULT: Success={success_count}, Failed={failure_count}, Pruned={response.pruned}")
                 
         return {
             "status": True, 
@@ -541,7 +478,7 @@ async def start_video_call(
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.post("/firebase/token")
-async def save_fcm_token(
+def save_fcm_token(
     payload: dict = Body(...),
     current_user: CurrentUser = Depends(get_current_user),
     db: Session = Depends(get_db)
@@ -4,7 +4,8 @@ from sqlalchemy import desc, func, text, distinct
 from app.database import get_db
 from app.models.models import Karyawan, WalkieRtcMessages, Users
 from app.core.permissions import get_current_user
-from app.core.fcm import send_chat_notification
+from app.services import notification_outbox
+from app.core.offload import run_blocking
 from datetime import datetime
 import shutil, os, secrets, asyncio
 from typing import Optional, List, Dict, Any, Union
@@ -23,11 +24,15 @@ os.makedirs(UPLOAD_DIR, exist_ok=True)
 # URL untuk akses file via browser/app
 BASE_STORAGE_URL = "https://frontend.k3guard.com/api-py/static"
 
+def _write_file(path: str, content: bytes):
+    with open(path, "wb") as buffer:
+        buffer.write(content)
+
 def format_response(success: bool, message: str, data: Any = None):
     return {"status": success, "message": message, "data": data}
 
 @router.get("/messages/{room}")
-async def get_messages(room: str, db: Session = Depends(get_db)):
+def get_messages(room: str, db: Session = Depends(get_db)):
     try:
         # Fetch latest 50 messages
         msgs = db.query(WalkieRtcMessages)\
@@ -83,6 +88,65 @@ async def get_messages(room: str, db: Session = Depends(get_db)):
     except Exception as e:
         return format_response(False, str(e), [])
 
+def _simpan_pesan(db: Session, room, sender_id, sender_nama, role, message, reply_to,
+                  attachment_path, attachment_type):
+    """Simpan pesan + antrekan push notif ke peserta lain (sinkron, via run_blocking)."""
+    # Create Message
+    # Fix: Android sometimes sends NIK as sender_nama. Force lookup actual name.
+    karyawan = db.query(Karyawan).filter(Karyawan.nik == sender_id).first()
+    actual_sender_nama = karyawan.nama_karyawan if karyawan else (sender_nama or sender_id)
+
+    new_msg = WalkieRtcMessages(
+        room=room,
+        sender_id=sender_id,
+        sender_nama=actual_sender_nama,
+        role=role or "user",
+        message=message or "",
+        reply_to=str(reply_to) if reply_to else None,
+        attachment=attachment_path,
+        attachment_type=attachment_type,
+        created_at=datetime.now()
+    )
+    
+    db.add(new_msg)
+    db.commit()
+    db.refresh(new_msg)
+
+    # 🔔 KIRIM PUSH NOTIFICATION ke peserta lain di room
+    try:
+        # Ambil daftar NIK peserta lain yang pernah chat di room ini
+        other_niks_result = db.query(WalkieRtcMessages.sender_id).filter(
+            WalkieRtcMessages.room == room,
+            WalkieRtcMessages.sender_id != sender_id,
+            WalkieRtcMessages.sender_id.isnot(None)
+        ).distinct().all()
+
+        other_niks = [r[0] for r in other_niks_result if r[0]]
+
+        if other_niks:
+            preview = message or ("📎 Mengirim foto" if attachment_type == "image" else "📎 Mengirim video" if attachment_type == "video" else "📎 Mengirim file")
+            # Ambil nama asli pengirim dari karyawan jika ada
+            karyawan = db.query(Karyawan).filter(Karyawan.nik == sender_id).first()
+            nama_pengirim = karyawan.nama_karyawan if karyawan else (sender_nama or sender_id)
+
+            # Token di-resolve & dikirim oleh dispatcher notification_outbox
+            notification_outbox.enqueue(
+                db,
+                type='CHAT',
+                nik=sender_id,
+                data={"type": "chat", "title": nama_pengirim, "body": preview, "room": room},
+                recipient_scope='niks',
+                recipient_niks=other_niks
+            )
+            print(f"[FCM CHAT] Push notif masuk outbox untuk {len(other_niks)} NIK | room={room}")
+        else:
+            print(f"[FCM CHAT] Tidak ada NIK lain di room {room}")
+    except Exception as fcm_err:
+        # Jangan gagalkan request hanya karena notifikasi gagal
+        print(f"[FCM CHAT] Error push notif (non-fatal): {fcm_err}")
+
+    return new_msg.id
+
 @router.post("/send")
 async def send_message(request: Request, db: Session = Depends(get_db)):
     try:
@@ -128,10 +192,9 @@ async def send_message(request: Request, db: Session = Depends(get_db)):
             filename = f"{int(datetime.now().timestamp())}_{secrets.token_hex(4)}_{file.filename}"
             file_path = os.path.join(UPLOAD_DIR, filename)
             
-            # Async read/write
+            # Async read, tulis file di thread pool
             content = await file.read()
-            with open(file_path, "wb") as buffer:
-                buffer.write(content)
+            await run_blocking(_write_file, file_path, content)
                 
             # Path for frontend/API access
             attachment_path = f"chat/{filename}"
@@ -145,58 +208,13 @@ async def send_message(request: Request, db: Session = Depends(get_db)):
             else:
                 attachment_type = "file"
 
-        # Create Message
-        # Fix: Android sometimes sends NIK as sender_nama. Force lookup actual name.
-        karyawan = db.query(Karyawan).filter(Karyawan.nik == sender_id).first()
-        actual_sender_nama = karyawan.nama_karyawan if karyawan else (sender_nama or sender_id)
-
-        new_msg = WalkieRtcMessages(
-            room=room,
-            sender_id=sender_id,
-            sender_nama=actual_sender_nama,
-            role=role or "user",
-            message=message or "",
-            reply_to=str(reply_to) if reply_to else None,
-            attachment=attachment_path,
-            attachment_type=attachment_type,
-            created_at=datetime.now()
+        # Query & insert di thread pool (handler tetap async untuk request.form())
+        new_msg_id = await run_blocking(
+            _simpan_pesan, db, room, sender_id, sender_nama, role, message, reply_to,
+            attachment_path, attachment_type
         )
-        
-        db.add(new_msg)
-        db.commit()
-        db.refresh(new_msg)
-
-        # 🔔 KIRIM PUSH NOTIFICATION ke peserta lain di room
-        try:
-            # Ambil daftar NIK peserta lain yang pernah chat di room ini
-            other_niks_result = db.query(WalkieRtcMessages.sender_id).filter(
-                WalkieRtcMessages.room == room,
-                WalkieRtcMessages.sender_id != sender_id,
-                WalkieRtcMessages.sender_id.isnot(None)
-            ).distinct().all()
-
-            other_niks = [r[0] for r in other_niks_result if r[0]]
-
-            if other_niks:
-                preview = message or ("📎 Mengirim foto" if attachment_type == "image" else "📎 Mengirim video" if attachment_type == "video" else "📎 Mengirim file")
-                # Ambil nama asli pengirim dari karyawan jika ada
-                karyawan = db.query(Karyawan).filter(Karyawan.nik == sender_id).first()
-                nama_pengirim = karyawan.nama_karyawan if karyawan else (sender_nama or sender_id)
-
-                # Kirim notif di background (non-blocking)
-                loop = asyncio.get_event_loop()
-                loop.run_in_executor(
-                    None,
-                    lambda: send_chat_notification(other_niks, nama_pengirim, preview, room, db)
-                )
-                print(f"[FCM CHAT] Memulai push notif ke {len(other_niks)} NIK | room={room}")
-            else:
-                print(f"[FCM CHAT] Tidak ada NIK lain di room {room}")
-        except Exception as fcm_err:
-            # Jangan gagalkan request hanya karena notifikasi gagal
-            print(f"[FCM CHAT] Error push notif (non-fatal): {fcm_err}")
 
-        return format_response(True, "Pesan terkirim", {"id": new_msg.id})
+        return format_response(True, "Pesan terkirim", {"id": new_msg_id})
 
     except Exception as e:
         print(f"Error sending message: {e}")
@@ -15,6 +15,7 @@ import io
 
 from app.database import get_db
 from app.routers.auth_legacy import get_current_user_data, CurrentUser
+from app.services import daily_stats
 from app.models.models import SafetyBriefings, Turlalin, SuratMasuk, SuratKeluar, Tamu, Karyawan, Userkaryawan, PengaturanUmum, Users, Cabang, Jabatan, Departemen
 
 router = APIRouter(
@@ -33,7 +34,7 @@ os.makedirs(STORAGE_SURAT, exist_ok=True)
 # --- SAFETY BRIEFING ---
 
 @router.post("/regu/parameter")
-async def store_regu_parameter():
+def store_regu_parameter():
     return {"status": True, "message": "Regu Disimpan"}
 
 # @router.get("/safetybriefing")
@@ -87,7 +88,7 @@ async def store_regu_parameter():
 # --- TURLALIN ---
 
 @router.get("/turlalin")
-async def list_turlalin(
+def list_turlalin(
     limit: int = 20,
     user: CurrentUser = Depends(get_current_user_data),
     db: Session = Depends(get_db)
@@ -141,7 +142,7 @@ async def list_turlalin(
     }
 
 @router.post("/turlalin/store")
-async def store_turlalin_masuk(
+def store_turlalin_masuk(
     nomor_polisi: str = Form(...),
     keterangan: str = Form(""),
     foto: UploadFile = File(...),
@@ -179,6 +180,7 @@ async def store_turlalin_masuk(
     db.add(new_data)
     db.commit()
     db.refresh(new_data)
+    daily_stats.mark(user.nik, jam_masuk_wib)
 
     base_url = "https://frontend.k3guard.com/api-py/storage/"
 
@@ -203,7 +205,7 @@ async def store_turlalin_masuk(
     }
 
 @router.post("/turlalin/keluar")
-async def store_turlalin_keluar(
+def store_turlalin_keluar(
     id: int = Form(...),
     foto_keluar: UploadFile = File(None),
     jam_keluar: Optional[str] = Form(None),
@@ -339,20 +341,20 @@ async def store_turlalin_keluar(
 # --- PENGATURAN (User Profile?) & VERSION ---
 
 @router.get("/pengaturan")
-async def get_pengaturan_android(
+def get_pengaturan_android(
     user: CurrentUser = Depends(get_current_user_data),
     db: Session = Depends(get_db)
 ):
-    return await _get_profile_data(user, db)
+    return _get_profile_data(user, db)
 
 @router.get("/pengaturan/profil")
-async def get_profil_android(
+def get_profil_android(
     user: CurrentUser = Depends(get_current_user_data),
     db: Session = Depends(get_db)
 ):
-    return await _get_profile_data(user, db)
+    return _get_profile_data(user, db)
 
-async def _get_profile_data(user, db):
+def _get_profile_data(user, db):
     u = db.query(Users).filter(Users.id == user.id).first()
     if not u:
          raise HTTPException(401, "User not found")
@@ -417,7 +419,7 @@ async def _get_profile_data(user, db):
     return {"status": "success", "data": data_pengaturan}
 
 @router.post("/pengaturan/updatefotoprofil")
-async def update_foto_profil(
+def update_foto_profil(
     foto: UploadFile = File(...),
     user: CurrentUser = Depends(get_current_user_data),
     db: Session = Depends(get_db)
@@ -433,7 +435,7 @@ async def update_foto_profil(
     # Compress & save image
     base_url = "https://frontend.k3guard.com/api-py/storage/"
     try:
-        image_content = await foto.read()
+        image_content = foto.file.read()
         image = Image.open(io.BytesIO(image_content))
         if image.mode in ("RGBA", "P"):
             image = image.convert("RGB")
@@ -481,7 +483,7 @@ async def update_foto_profil(
     }
 
 @router.patch("/pengaturan/password")
-async def update_password_android(
+def update_password_android(
     password_lama: str = Form(...),
     password_baru: str = Form(...),
     password_baru_confirmation: str = Form(...),
@@ -515,7 +517,7 @@ async def update_password_android(
     }
 
 @router.get("/app/version-policy")
-async def get_version_policy(db: Session = Depends(get_db)):
+def get_version_policy(db: Session = Depends(get_db)):
     setting = db.query(PengaturanUmum).first()
     if not setting:
         return {}
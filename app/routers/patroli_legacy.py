@@ -2,6 +2,9 @@ from fastapi import APIRouter, Depends, UploadFile, File, Form, HTTPException, s
 from sqlalchemy.orm import Session
 from sqlalchemy import text, func, and_, or_
 from app.database import get_db
+from app.core import master_cache
+from app.core.date_range import in_month
+from app.services import daily_stats, geofence
 from app.routers.auth_legacy import get_current_user_data, CurrentUser
 from app.models.models import (
     PatrolSessions, PatrolPoints, PatrolPointMaster, Presensi, PresensiJamkerja, Karyawan,
@@ -14,7 +17,6 @@ from datetime import datetime, date, time, timedelta
 import shutil
 import os
 import uuid
-import math
 
 router = APIRouter(
     prefix="/api/android/patroli",
@@ -27,18 +29,6 @@ STORAGE_PATH = "storage/app/public/uploads/patroli" # Matches PHP: "uploads/patr
 # PHP uses: uploads/patroli/NIK-DATE-absenpatrol/FILENAME
 # I should mimic this structure if possible for compatibility.
 
-def haversine_great_circle_distance(lat1, lon1, lat2, lon2):
-    R = 6371000 # Earth radius in meters
-    phi1 = math.radians(lat1)
-    phi2 = math.radians(lat2)
-    delta_phi = math.radians(lat2 - lat1)
-    delta_lambda = math.radians(lon2 - lon1)
-    
-    a = math.sin(delta_phi / 2)**2 + math.cos(phi1) * math.cos(phi2) * math.sin(delta_lambda / 2)**2
-    c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
-    
-    return R * c
-
 def save_upload(file_obj: UploadFile, subfolder: str) -> str:
     # subfolder e.g. "12345-20231010-absenpatrol"
     base_dir = "/var/www/appPatrol/storage/app/public/uploads/patroli"
@@ -67,12 +57,12 @@ def get_jam_kerja(nik: str, kode_cabang: str, kode_dept: str, db: Session):
     # 1. By Date
     jk_date = db.query(SetJamKerjaByDate).filter(SetJamKerjaByDate.nik == nik, SetJamKerjaByDate.tanggal == today).first()
     if jk_date:
-        return db.query(PresensiJamkerja).filter(PresensiJamkerja.kode_jam_kerja == jk_date.kode_jam_kerja).first()
+        return master_cache.get_jam_kerja(db, jk_date.kode_jam_kerja)
         
     # 2. By Day
     jk_day = db.query(SetJamKerjaByDay).filter(SetJamKerjaByDay.nik == nik, SetJamKerjaByDay.hari == hari_ini).first()
     if jk_day:
-        return db.query(PresensiJamkerja).filter(PresensiJamkerja.kode_jam_kerja == jk_day.kode_jam_kerja).first()
+        return master_cache.get_jam_kerja(db, jk_day.kode_jam_kerja)
         
     # 3. By Dept (skipping for now as it requires tables I'm not 100% sure about, but falling back to None is safer than crashing)
     # Ref: getJamKerja in PHP
@@ -98,7 +88,7 @@ def get_next_point_by_order(session_id: int, db: Session):
     return next_point
 
 @router.get("/getAbsenPatrol")
-async def get_absen_patrol(
+def get_absen_patrol(
     current_user: CurrentUser = Depends(get_current_user_data),
     db: Session = Depends(get_db)
 ):
@@ -124,7 +114,7 @@ async def get_absen_patrol(
     
     # 2. Get Jam Kerja
     if presensi_aktif:
-        jam_kerja = db.query(PresensiJamkerja).filter(PresensiJamkerja.kode_jam_kerja == presensi_aktif.kode_jam_kerja).first()
+        jam_kerja = master_cache.get_jam_kerja(db, presensi_aktif.kode_jam_kerja)
     else:
         jam_kerja = get_jam_kerja(nik, karyawan.kode_cabang, karyawan.kode_dept, db)
         
@@ -132,7 +122,7 @@ async def get_absen_patrol(
         return {"status": False, "message": "Tidak memiliki jadwal kerja hari ini."}
         
     # 3. Get Cabang Location
-    cabang = db.query(Cabang).filter(Cabang.kode_cabang == karyawan.kode_cabang).first()
+    cabang = master_cache.get_cabang(db, karyawan.kode_cabang)
     lat = lon = None
     if cabang and cabang.lokasi_cabang:
         parts = cabang.lokasi_cabang.split(',')
@@ -161,7 +151,7 @@ async def get_absen_patrol(
     group_niks_list = [n[0] for n in group_niks]
     
     # Get Global Settings for Face Recognition
-    pengaturan = db.query(PengaturanUmum).first()
+    pengaturan = master_cache.get_pengaturan(db)
     face_recog_status = 1 if pengaturan and pengaturan.face_recognition == 1 else 0
     
     # Schedules
@@ -391,7 +381,7 @@ async def get_absen_patrol(
     }
 
 @router.post("/absen")
-async def patroli_absen(
+def patroli_absen(
     request: Request,
     loc_patrol: str = Form(...),
     foto_patrol: UploadFile = File(...),
@@ -412,11 +402,15 @@ async def patroli_absen(
     tanggal_fmt = str(tanggal).replace('-', '')
     
     # check radius
-    cabang = db.query(Cabang).filter(Cabang.kode_cabang == karyawan.kode_cabang).first()
+    cabang = master_cache.get_cabang(db, karyawan.kode_cabang)
     if karyawan.lock_location == '1' and cabang and cabang.lokasi_cabang:
-        clat, clon = map(float, cabang.lokasi_cabang.split(','))
         ulat, ulon = map(float, loc_patrol.split(','))
-        dist = haversine_great_circle_distance(ulat, ulon, clat, clon)
+        dist = geofence.branches(db).distance(karyawan.kode_cabang, ulat, ulon)
+        if dist is None:
+            # radius_cabang 0 tidak masuk pagar → setiap jarak > 0 dianggap di luar (seperti sebelumnya)
+            clat, clon = map(float, cabang.lokasi_cabang.split(','))
+            dist = geofence.haversine(clat, clon, ulat, ulon)
+        dist = float(dist)
         if dist > cabang.radius_cabang:
             try:
                 real_ip = request.headers.get("x-forwarded-for")
@@ -493,6 +487,7 @@ async def patroli_absen(
     db.add(session)
     db.commit()
     db.refresh(session)
+    daily_stats.mark(nik, tanggal)
     
     # SEED POINTS
     master_points = db.query(PatrolPointMaster).filter(PatrolPointMaster.kode_cabang == karyawan.kode_cabang).order_by(PatrolPointMaster.urutan).all()
@@ -521,7 +516,7 @@ async def patroli_absen(
     }
 
 @router.post("/storePatroliPoint")
-async def store_patroli_point(
+def store_patroli_point(
     session_id: int = Form(...),
     patrol_point_master_id: int = Form(...),
     loc_patrol: str = Form(...),
@@ -554,8 +549,19 @@ async def store_patroli_point(
         return {"status": False, "message": "Harap ikuti urutan titik patroli"}
         
     # Radius Tolerance
-    mp = db.query(PatrolPointMaster).filter(PatrolPointMaster.id == patrol_point_master_id).first()
-    # Check radius logic (similar to above)
+    karyawan = db.query(Karyawan).filter(Karyawan.nik == nik).first()
+    fence = geofence.patrol_points(db).get(patrol_point_master_id)
+    if karyawan and karyawan.lock_location == '1' and fence and fence[2] > 0:
+        try:
+            ulat, ulon = map(float, loc_patrol.split(','))
+        except ValueError:
+            return {"status": False, "message": "Lokasi tidak valid"}
+        dist = float(geofence.haversine(fence[0], fence[1], ulat, ulon))
+        if dist > fence[2]:
+            return {
+                "status": False,
+                "message": f"Anda berada di luar radius titik patroli (Jarak: {int(dist)}m dari Max Radius {int(fence[2])}m)."
+            }
     
     tanggal_fmt = str(session.tanggal).replace('-', '')
     subfolder = f"{nik}-{tanggal_fmt}-patrol"
@@ -573,6 +579,7 @@ async def store_patroli_point(
         session.status = 'complete'
         session.updated_at = datetime.now()
         db.commit()
+        daily_stats.mark(session.nik, session.tanggal)
         
     foto_url = f"https://frontend.k3guard.com/api-py/storage/uploads/patroli/{subfolder}/{fname}"
     
@@ -634,9 +641,7 @@ def _resolve_jam_kerja_for_date(nik: str, kode_cabang: str, kode_dept: str,
         Presensi.tanggal == target_date
     ).first()
     if presensi and presensi.kode_jam_kerja:
-        jk = db.query(PresensiJamkerja).filter(
-            PresensiJamkerja.kode_jam_kerja == presensi.kode_jam_kerja
-        ).first()
+        jk = master_cache.get_jam_kerja(db, presensi.kode_jam_kerja)
         if jk:
             return jk, presensi
 
@@ -646,9 +651,7 @@ def _resolve_jam_kerja_for_date(nik: str, kode_cabang: str, kode_dept: str,
         SetJamKerjaByDate.tanggal == target_date
     ).first()
     if jk_date:
-        jk = db.query(PresensiJamkerja).filter(
-            PresensiJamkerja.kode_jam_kerja == jk_date.kode_jam_kerja
-        ).first()
+        jk = master_cache.get_jam_kerja(db, jk_date.kode_jam_kerja)
         if jk:
             return jk, presensi
 
@@ -658,18 +661,14 @@ def _resolve_jam_kerja_for_date(nik: str, kode_cabang: str, kode_dept: str,
         SetJamKerjaByDay.hari == hari_indo
     ).first()
     if jk_day:
-        jk = db.query(PresensiJamkerja).filter(
-            PresensiJamkerja.kode_jam_kerja == jk_day.kode_jam_kerja
-        ).first()
+        jk = master_cache.get_jam_kerja(db, jk_day.kode_jam_kerja)
         if jk:
             return jk, presensi
 
     # 4. Master karyawan
     karyawan = db.query(Karyawan).filter(Karyawan.nik == nik).first()
     if karyawan and karyawan.kode_jadwal:
-        jk = db.query(PresensiJamkerja).filter(
-            PresensiJamkerja.kode_jam_kerja == karyawan.kode_jadwal
-        ).first()
+        jk = master_cache.get_jam_kerja(db, karyawan.kode_jadwal)
         if jk:
             return jk, presensi
 
@@ -824,7 +823,7 @@ def _build_quality_payload(session: PatrolSessions, db: Session) -> dict:
 # ─────────────────────────────────────────────────────────────────────────────
 
 @router.get("/getPatrolHistory")
-async def get_patrol_history(
+def get_patrol_history(
     start_date: str = None,
     end_date: str = None,
     current_user: CurrentUser = Depends(get_current_user_data),
@@ -886,7 +885,7 @@ async def get_patrol_history(
 
 
 @router.get("/violation-notifications")
-async def get_violation_notifications(
+def get_violation_notifications(
     current_user: CurrentUser = Depends(get_current_user_data),
     db: Session = Depends(get_db)
 ):
@@ -939,7 +938,7 @@ async def get_violation_notifications(
 
 
 @router.get("/quality/{session_id}")
-async def get_patrol_quality(
+def get_patrol_quality(
     session_id: int,
     current_user: CurrentUser = Depends(get_current_user_data),
     db: Session = Depends(get_db)
@@ -970,7 +969,7 @@ async def get_patrol_quality(
 
 
 @router.get("/quality")
-async def get_patrol_quality_list(
+def get_patrol_quality_list(
     month: int = None,
     year: int = None,
     current_user: CurrentUser = Depends(get_current_user_data),
@@ -989,11 +988,9 @@ async def get_patrol_quality_list(
     if not year:
         year = today.year
 
-    from sqlalchemy import extract
     sessions = db.query(PatrolSessions).filter(
         PatrolSessions.nik == karyawan.nik,
-        extract('month', PatrolSessions.tanggal) == month,
-        extract('year',  PatrolSessions.tanggal) == year
+        in_month(PatrolSessions.tanggal, year, month)
     ).order_by(PatrolSessions.tanggal.desc(), PatrolSessions.id.desc()).all()
 
     session_list = []
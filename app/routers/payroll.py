@@ -9,6 +9,7 @@ from datetime import datetime, date
 from fastapi import Query
 from fastapi import Query
 from sqlalchemy import func, or_
+from app.services import payroll_calculator
 router = APIRouter(
     prefix="/api/payroll",
     tags=["Payroll"]
@@ -24,7 +25,7 @@ class JenistunjanganDTO(BaseModel):
         from_attributes = True
 
 @router.get("/jenis-tunjangan", response_model=List[JenistunjanganDTO])
-async def get_jenis_tunjangan(db: Session = Depends(get_db)):
+def get_jenis_tunjangan(db: Session = Depends(get_db)):
     return db.query(JenisTunjangan).all()
 
 class EmployeeOption(BaseModel):
@@ -32,7 +33,7 @@ class EmployeeOption(BaseModel):
     nama_karyawan: str
     
 @router.get("/employees-list", response_model=List[EmployeeOption])
-async def get_employees_list(db: Session = Depends(get_db)):
+def get_employees_list(db: Session = Depends(get_db)):
     karyawan = db.query(Karyawan).order_by(Karyawan.nama_karyawan).all()
     return [{"nik": k.nik, "nama_karyawan": k.nama_karyawan} for k in karyawan]
 
@@ -41,7 +42,7 @@ class CreateJenistunjanganDTO(BaseModel):
     jenis_tunjangan: str
 
 @router.post("/jenis-tunjangan", response_model=JenistunjanganDTO)
-async def create_jenis_tunjangan(
+def create_jenis_tunjangan(
     payload: CreateJenistunjanganDTO,
     db: Session = Depends(get_db)
 ):
@@ -65,7 +66,7 @@ async def create_jenis_tunjangan(
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.put("/jenis-tunjangan/{kode}", response_model=JenistunjanganDTO)
-async def update_jenis_tunjangan(
+def update_jenis_tunjangan(
     kode: str,
     payload: CreateJenistunjanganDTO,
     db: Session = Depends(get_db)
@@ -93,7 +94,7 @@ async def update_jenis_tunjangan(
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.delete("/jenis-tunjangan/{kode}")
-async def delete_jenis_tunjangan(kode: str, db: Session = Depends(get_db)):
+def delete_jenis_tunjangan(kode: str, db: Session = Depends(get_db)):
     try:
         item = db.query(JenisTunjangan).filter(JenisTunjangan.kode_jenis_tunjangan == kode).first()
         if not item:
@@ -145,7 +146,7 @@ class GajiPokokListResponse(BaseModel):
     meta: Optional[PaginationMeta] = None
 
 @router.get("/gaji-pokok", response_model=GajiPokokListResponse)
-async def get_gaji_pokok(
+def get_gaji_pokok(
     keyword: Optional[str] = Query(None),
     kode_cabang: Optional[str] = Query(None),
     kode_dept: Optional[str] = Query(None),
@@ -192,7 +193,7 @@ async def get_gaji_pokok(
     }
 
 @router.post("/gaji-pokok")
-async def create_gaji_pokok(payload: CreateGajiPokokDTO, db: Session = Depends(get_db)):
+def create_gaji_pokok(payload: CreateGajiPokokDTO, db: Session = Depends(get_db)):
     try:
         # Code Generation Logic: G + YY + XXXX (4 digit sequence)
         year_suffix = payload.tanggal_berlaku.strftime('%y') # YY
@@ -260,7 +261,7 @@ async def create_gaji_pokok(payload: CreateGajiPokokDTO, db: Session = Depends(g
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.put("/gaji-pokok/{kode}", response_model=GajiPokokDTO)
-async def update_gaji_pokok(kode: str, payload: UpdateGajiPokokDTO, db: Session = Depends(get_db)):
+def update_gaji_pokok(kode: str, payload: UpdateGajiPokokDTO, db: Session = Depends(get_db)):
     try:
         item = db.query(KaryawanGajiPokok).filter(KaryawanGajiPokok.kode_gaji == kode).first()
         if not item:
@@ -286,7 +287,7 @@ async def update_gaji_pokok(kode: str, payload: UpdateGajiPokokDTO, db: Session
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.delete("/gaji-pokok/{kode}")
-async def delete_gaji_pokok(kode: str, db: Session = Depends(get_db)):
+def delete_gaji_pokok(kode: str, db: Session = Depends(get_db)):
     try:
         item = db.query(KaryawanGajiPokok).filter(KaryawanGajiPokok.kode_gaji == kode).first()
         if not item:
@@ -338,7 +339,7 @@ class TunjanganDTO(BaseModel):
         from_attributes = True
 
 @router.get("/tunjangan", response_model=List[TunjanganDTO])
-async def get_tunjangan(
+def get_tunjangan(
     keyword: Optional[str] = Query(None),
     kode_cabang: Optional[str] = Query(None),
     kode_dept: Optional[str] = Query(None),
@@ -382,7 +383,7 @@ async def get_tunjangan(
     return result
 
 @router.post("/tunjangan", response_model=TunjanganDTO)
-async def create_tunjangan(payload: CreateTunjanganDTO, db: Session = Depends(get_db)):
+def create_tunjangan(payload: CreateTunjanganDTO, db: Session = Depends(get_db)):
     try:
         # Code Generation Logic: T + YY + XXXX
         year_suffix = payload.tanggal_berlaku.strftime('%y') # YY
@@ -428,13 +429,13 @@ async def create_tunjangan(payload: CreateTunjanganDTO, db: Session = Depends(ge
         db.refresh(new_tunjangan)
         
         # Re-fetch to ensure full data structure
-        return await get_tunjangan_by_id(new_code, db)
+        return get_tunjangan_by_id(new_code, db)
         
     except Exception as e:
         db.rollback()
         raise HTTPException(status_code=500, detail=str(e))
 
-async def get_tunjangan_by_id(kode: str, db: Session):
+def get_tunjangan_by_id(kode: str, db: Session):
     item = db.query(KaryawanTunjangan).filter(KaryawanTunjangan.kode_tunjangan == kode).first()
     if not item:
         raise HTTPException(status_code=404, detail="Tunjangan not found")
@@ -460,7 +461,7 @@ async def get_tunjangan_by_id(kode: str, db: Session):
     return dto
 
 @router.put("/tunjangan/{kode}", response_model=TunjanganDTO)
-async def update_tunjangan(kode: str, payload: UpdateTunjanganDTO, db: Session = Depends(get_db)):
+def update_tunjangan(kode: str, payload: UpdateTunjanganDTO, db: Session = Depends(get_db)):
     try:
         item = db.query(KaryawanTunjangan).filter(KaryawanTunjangan.kode_tunjangan == kode).first()
         if not item:
@@ -486,13 +487,13 @@ async def update_tunjangan(kode: str, payload: UpdateTunjanganDTO, db: Session =
         db.commit()
         db.refresh(item)
         
-        return await get_tunjangan_by_id(kode, db)
+        return get_tunjangan_by_id(kode, db)
     except Exception as e:
         db.rollback()
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.delete("/tunjangan/{kode}")
-async def delete_tunjangan(kode: str, db: Session = Depends(get_db)):
+def delete_tunjangan(kode: str, db: Session = Depends(get_db)):
     try:
         item = db.query(KaryawanTunjangan).filter(KaryawanTunjangan.kode_tunjangan == kode).first()
         if not item:
@@ -537,7 +538,7 @@ class BpjsKesehatanDTO(BaseModel):
         from_attributes = True
 
 @router.get("/bpjs-kesehatan", response_model=List[BpjsKesehatanDTO])
-async def get_bpjs_kesehatan(
+def get_bpjs_kesehatan(
     keyword: Optional[str] = Query(None),
     kode_cabang: Optional[str] = Query(None),
     kode_dept: Optional[str] = Query(None),
@@ -566,7 +567,7 @@ async def get_bpjs_kesehatan(
     return result
 
 @router.post("/bpjs-kesehatan", response_model=BpjsKesehatanDTO)
-async def create_bpjs_kesehatan(payload: CreateBpjsKesehatanDTO, db: Session = Depends(get_db)):
+def create_bpjs_kesehatan(payload: CreateBpjsKesehatanDTO, db: Session = Depends(get_db)):
     try:
         # Code Generation Logic: K + YY + XXXX
         year_suffix = payload.tanggal_berlaku.strftime('%y') # YY
@@ -613,7 +614,7 @@ async def create_bpjs_kesehatan(payload: CreateBpjsKesehatanDTO, db: Session = D
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.put("/bpjs-kesehatan/{kode}", response_model=BpjsKesehatanDTO)
-async def update_bpjs_kesehatan(kode: str, payload: UpdateBpjsKesehatanDTO, db: Session = Depends(get_db)):
+def update_bpjs_kesehatan(kode: str, payload: UpdateBpjsKesehatanDTO, db: Session = Depends(get_db)):
     try:
         item = db.query(KaryawanBpjsKesehatan).filter(KaryawanBpjsKesehatan.kode_bpjs_kesehatan == kode).first()
         if not item:
@@ -639,7 +640,7 @@ async def update_bpjs_kesehatan(kode: str, payload: UpdateBpjsKesehatanDTO, db:
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.delete("/bpjs-kesehatan/{kode}")
-async def delete_bpjs_kesehatan(kode: str, db: Session = Depends(get_db)):
+def delete_bpjs_kesehatan(kode: str, db: Session = Depends(get_db)):
     try:
         item = db.query(KaryawanBpjsKesehatan).filter(KaryawanBpjsKesehatan.kode_bpjs_kesehatan == kode).first()
         if not item:
@@ -685,7 +686,7 @@ class BpjsTkListResponse(BaseModel):
     meta: Optional[PaginationMeta] = None
 
 @router.get("/bpjs-tenagakerja", response_model=BpjsTkListResponse)
-async def get_bpjs_tenagakerja(
+def get_bpjs_tenagakerja(
     keyword: Optional[str] = Query(None),
     kode_cabang: Optional[str] = Query(None),
     kode_dept: Optional[str] = Query(None),
@@ -733,7 +734,7 @@ async def get_bpjs_tenagakerja(
     }
 
 @router.post("/bpjs-tenagakerja", response_model=BpjsTkDTO)
-async def create_bpjs_tenagakerja(payload: CreateBpjsTkDTO, db: Session = Depends(get_db)):
+def create_bpjs_tenagakerja(payload: CreateBpjsTkDTO, db: Session = Depends(get_db)):
     try:
         # Code Generation Logic: K + YY + XXXX (same as BPJS Health but for TK table)
         year_suffix = payload.tanggal_berlaku.strftime('%y') # YY
@@ -780,7 +781,7 @@ async def create_bpjs_tenagakerja(payload: CreateBpjsTkDTO, db: Session = Depend
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.put("/bpjs-tenagakerja/{kode}", response_model=BpjsTkDTO)
-async def update_bpjs_tenagakerja(kode: str, payload: UpdateBpjsTkDTO, db: Session = Depends(get_db)):
+def update_bpjs_tenagakerja(kode: str, payload: UpdateBpjsTkDTO, db: Session = Depends(get_db)):
     try:
         item = db.query(KaryawanBpjstenagakerja).filter(KaryawanBpjstenagakerja.kode_bpjs_tk == kode).first()
         if not item:
@@ -806,7 +807,7 @@ async def update_bpjs_tenagakerja(kode: str, payload: UpdateBpjsTkDTO, db: Sessi
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.delete("/bpjs-tenagakerja/{kode}")
-async def delete_bpjs_tenagakerja(kode: str, db: Session = Depends(get_db)):
+def delete_bpjs_tenagakerja(kode: str, db: Session = Depends(get_db)):
     try:
         item = db.query(KaryawanBpjstenagakerja).filter(KaryawanBpjstenagakerja.kode_bpjs_tk == kode).first()
         if not item:
@@ -864,7 +865,7 @@ class UpdateDetailPenyesuaianDTO(BaseModel):
     keterangan: str
 
 @router.get("/penyesuaian-gaji", response_model=List[PenyesuaianGajiDTO])
-async def get_penyesuaian_gaji(
+def get_penyesuaian_gaji(
     tahun: int = Query(datetime.now().year),
     db: Session = Depends(get_db)
 ):
@@ -875,7 +876,7 @@ async def get_penyesuaian_gaji(
     return data
 
 @router.post("/penyesuaian-gaji", response_model=PenyesuaianGajiDTO)
-async def create_penyesuaian_gaji(payload: CreatePenyesuaianGajiDTO, db: Session = Depends(get_db)):
+def create_penyesuaian_gaji(payload: CreatePenyesuaianGajiDTO, db: Session = Depends(get_db)):
     try:
         # Check existing
         existing = db.query(KaryawanPenyesuaianGaji)\
@@ -905,14 +906,14 @@ async def create_penyesuaian_gaji(payload: CreatePenyesuaianGajiDTO, db: Session
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/penyesuaian-gaji/{kode}", response_model=PenyesuaianGajiDTO)
-async def get_penyesuaian_gaji_by_code(kode: str, db: Session = Depends(get_db)):
+def get_penyesuaian_gaji_by_code(kode: str, db: Session = Depends(get_db)):
     item = db.query(KaryawanPenyesuaianGaji).filter(KaryawanPenyesuaianGaji.kode_penyesuaian_gaji == kode).first()
     if not item:
         raise HTTPException(status_code=404, detail="Data not found")
     return item
 
 @router.put("/penyesuaian-gaji/{kode}", response_model=PenyesuaianGajiDTO)
-async def update_penyesuaian_gaji(kode: str, payload: UpdatePenyesuaianGajiDTO, db: Session = Depends(get_db)):
+def update_penyesuaian_gaji(kode: str, payload: UpdatePenyesuaianGajiDTO, db: Session = Depends(get_db)):
     try:
         item = db.query(KaryawanPenyesuaianGaji).filter(KaryawanPenyesuaianGaji.kode_penyesuaian_gaji == kode).first()
         if not item:
@@ -953,7 +954,7 @@ async def update_penyesuaian_gaji(kode: str, payload: UpdatePenyesuaianGajiDTO,
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.delete("/penyesuaian-gaji/{kode}")
-async def delete_penyesuaian_gaji(kode: str, db: Session = Depends(get_db)):
+def delete_penyesuaian_gaji(kode: str, db: Session = Depends(get_db)):
     try:
         item = db.query(KaryawanPenyesuaianGaji).filter(KaryawanPenyesuaianGaji.kode_penyesuaian_gaji == kode).first()
         if not item:
@@ -967,7 +968,7 @@ async def delete_penyesuaian_gaji(kode: str, db: Session = Depends(get_db)):
 
 # Details
 @router.get("/penyesuaian-gaji/{kode}/details", response_model=List[PenyesuaianGajiDetailDTO])
-async def get_penyesuaian_details(kode: str, db: Session = Depends(get_db)):
+def get_penyesuaian_details(kode: str, db: Session = Depends(get_db)):
     items = db.query(KaryawanPenyesuaianGajiDetail).filter(KaryawanPenyesuaianGajiDetail.kode_penyesuaian_gaji == kode).all()
     result = []
     for item in items:
@@ -985,7 +986,7 @@ async def get_penyesuaian_details(kode: str, db: Session = Depends(get_db)):
     return result
 
 @router.post("/penyesuaian-gaji/{kode}/details", response_model=PenyesuaianGajiDetailDTO)
-async def add_penyesuaian_detail(kode: str, payload: CreateDetailPenyesuaianDTO, db: Session = Depends(get_db)):
+def add_penyesuaian_detail(kode: str, payload: CreateDetailPenyesuaianDTO, db: Session = Depends(get_db)):
     try:
         existing = db.query(KaryawanPenyesuaianGajiDetail)\
             .filter(KaryawanPenyesuaianGajiDetail.kode_penyesuaian_gaji == kode, KaryawanPenyesuaianGajiDetail.nik == payload.nik)\
@@ -1024,7 +1025,7 @@ async def add_penyesuaian_detail(kode: str, payload: CreateDetailPenyesuaianDTO,
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.put("/penyesuaian-gaji/{kode}/details/{nik}", response_model=PenyesuaianGajiDetailDTO)
-async def update_penyesuaian_detail(kode: str, nik: str, payload: UpdateDetailPenyesuaianDTO, db: Session = Depends(get_db)):
+def update_penyesuaian_detail(kode: str, nik: str, payload: UpdateDetailPenyesuaianDTO, db: Session = Depends(get_db)):
     try:
         item = db.query(KaryawanPenyesuaianGajiDetail)\
             .filter(KaryawanPenyesuaianGajiDetail.kode_penyesuaian_gaji == kode, KaryawanPenyesuaianGajiDetail.nik == nik)\
@@ -1056,7 +1057,7 @@ async def update_penyesuaian_detail(kode: str, nik: str, payload: UpdateDetailPe
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.delete("/penyesuaian-gaji/{kode}/details/{nik}")
-async def delete_penyesuaian_detail(kode: str, nik: str, db: Session = Depends(get_db)):
+def delete_penyesuaian_detail(kode: str, nik: str, db: Session = Depends(get_db)):
     try:
         item = db.query(KaryawanPenyesuaianGajiDetail)\
             .filter(KaryawanPenyesuaianGajiDetail.kode_penyesuaian_gaji == kode, KaryawanPenyesuaianGajiDetail.nik == nik)\
@@ -1097,14 +1098,14 @@ class SlipGajiDTO(BaseModel):
         from_attributes = True
 
 @router.get("/slip-gaji", response_model=List[SlipGajiDTO])
-async def get_slip_gaji(
+def get_slip_gaji(
     db: Session = Depends(get_db)
 ):
     items = db.query(SlipGaji).order_by(desc(SlipGaji.tahun), desc(SlipGaji.bulan)).all()
     return items
 
 @router.post("/slip-gaji", response_model=SlipGajiDTO)
-async def create_slip_gaji(payload: CreateSlipGajiDTO, db: Session = Depends(get_db)):
+def create_slip_gaji(payload: CreateSlipGajiDTO, db: Session = Depends(get_db)):
     try:
         # Check if already exists for the month/year
         existing = db.query(SlipGaji).filter(SlipGaji.bulan == payload.bulan, SlipGaji.tahun == str(payload.tahun)).first()
@@ -1132,14 +1133,14 @@ async def create_slip_gaji(payload: CreateSlipGajiDTO, db: Session = Depends(get
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/slip-gaji/{kode}", response_model=SlipGajiDTO)
-async def get_slip_gaji_by_code(kode: str, db: Session = Depends(get_db)):
+def get_slip_gaji_by_code(kode: str, db: Session = Depends(get_db)):
     item = db.query(SlipGaji).filter(SlipGaji.kode_slip_gaji == kode).first()
     if not item:
         raise HTTPException(status_code=404, detail="DATA NOT FOUND")
     return item
 
 @router.put("/slip-gaji/{kode}", response_model=SlipGajiDTO)
-async def update_slip_gaji(kode: str, payload: UpdateSlipGajiDTO, db: Session = Depends(get_db)):
+def update_slip_gaji(kode: str, payload: UpdateSlipGajiDTO, db: Session = Depends(get_db)):
     try:
         item = db.query(SlipGaji).filter(SlipGaji.kode_slip_gaji == kode).first()
         if not item:
@@ -1161,12 +1162,13 @@ async def update_slip_gaji(kode: str, payload: UpdateSlipGajiDTO, db: Session =
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.delete("/slip-gaji/{kode}")
-async def delete_slip_gaji(kode: str, db: Session = Depends(get_db)):
+def delete_slip_gaji(kode: str, db: Session = Depends(get_db)):
     try:
         item = db.query(SlipGaji).filter(SlipGaji.kode_slip_gaji == kode).first()
         if not item:
             raise HTTPException(status_code=404, detail="DATA NOT FOUND")
             
+        payroll_calculator.hapus_snapshot(db, kode)
         db.delete(item)
         db.commit()
         return {"message": "Deleted successfully"}
@@ -1175,101 +1177,56 @@ async def delete_slip_gaji(kode: str, db: Session = Depends(get_db)):
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/slip-gaji/{kode}/recap", response_model=List[dict])
-async def get_slip_gaji_recap(kode: str, nik: Optional[str] = Query(None), db: Session = Depends(get_db)):
+def get_slip_gaji_recap(
+    kode: str,
+    nik: Optional[str] = Query(None),
+    live: bool = Query(False, description="Abaikan snapshot dan hitung ulang dari master gaji"),
+    db: Session = Depends(get_db)
+):
     try:
         slip = db.query(SlipGaji).filter(SlipGaji.kode_slip_gaji == kode).first()
         if not slip:
              raise HTTPException(status_code=404, detail="DATA NOT FOUND")
 
-        # Determine period end date (end of the month)
-        import calendar
-        last_day = calendar.monthrange(int(slip.tahun), int(slip.bulan))[1]
-        periode_sampai = date(int(slip.tahun), int(slip.bulan), last_day)
-        
-        # 1. Get List of Active Employees
-        q = db.query(Karyawan).filter(Karyawan.status_aktif_karyawan == '1')
+        # Snapshot periode (jika sudah dibuat) dipakai apa adanya; selain itu hitung langsung
+        rows = [] if live else payroll_calculator.baca_snapshot(db, kode, nik=nik)
+        if not rows:
+            rows = payroll_calculator.hitung_gaji(db, int(slip.bulan), int(slip.tahun), nik=nik)["data"]
+
+        return [
+            {
+                "nik": r["nik"],
+                "nama_karyawan": r["nama_karyawan"],
+                "jabatan": r["nama_jabatan"],
+                "gaji_pokok": r["gaji_pokok"],
+                "tunjangan": r["total_tunjangan"],
+                "bpjs_kesehatan": r["bpjs_kesehatan"],
+                "bpjs_tenagakerja": r["bpjs_tenagakerja"],
+                "penambah": r["penambah"],
+                "pengurang": r["pengurang"],
+                "gaji_bersih": r["gaji_bersih"]
+            }
+            for r in rows
+        ]
 
-        if nik:
-            q = q.filter(Karyawan.nik == nik)
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(e)
+        raise HTTPException(status_code=500, detail=str(e))
 
-        employees = q.order_by(Karyawan.nama_karyawan).all()
-            
-        result = []
-        
-        for emp in employees:
-            # 2. Get Gaji Pokok (Latest valid)
-            gaji_pokok_item = db.query(KaryawanGajiPokok)\
-                .filter(KaryawanGajiPokok.nik == emp.nik)\
-                .filter(KaryawanGajiPokok.tanggal_berlaku <= periode_sampai)\
-                .order_by(desc(KaryawanGajiPokok.tanggal_berlaku))\
-                .first()
-            gaji_pokok = gaji_pokok_item.jumlah if gaji_pokok_item else 0
-            
-            # 3. Get Tunjangan (Sum of latest per type)
-            # Find latest kode_tunjangan for this employee valid for the period
-            tunjangan_header = db.query(KaryawanTunjangan)\
-                 .filter(KaryawanTunjangan.nik == emp.nik)\
-                 .filter(KaryawanTunjangan.tanggal_berlaku <= periode_sampai)\
-                 .order_by(desc(KaryawanTunjangan.tanggal_berlaku))\
-                 .first()
-            
-            total_tunjangan = 0
-            if tunjangan_header:
-                details = db.query(KaryawanTunjanganDetail)\
-                    .filter(KaryawanTunjanganDetail.kode_tunjangan == tunjangan_header.kode_tunjangan)\
-                    .all()
-                total_tunjangan = sum([d.jumlah for d in details])
-
-            # 4. Get BPJS
-            bpjs_kes_item = db.query(KaryawanBpjsKesehatan)\
-                .filter(KaryawanBpjsKesehatan.nik == emp.nik)\
-                .filter(KaryawanBpjsKesehatan.tanggal_berlaku <= periode_sampai)\
-                .order_by(desc(KaryawanBpjsKesehatan.tanggal_berlaku))\
-                .first()
-            bpjs_kes = bpjs_kes_item.jumlah if bpjs_kes_item else 0
-            
-            bpjs_tk_item = db.query(KaryawanBpjstenagakerja)\
-                .filter(KaryawanBpjstenagakerja.nik == emp.nik)\
-                .filter(KaryawanBpjstenagakerja.tanggal_berlaku <= periode_sampai)\
-                .order_by(desc(KaryawanBpjstenagakerja.tanggal_berlaku))\
-                .first()
-            bpjs_tk = bpjs_tk_item.jumlah if bpjs_tk_item else 0
-            
-            # 5. Get Penyesuaian
-            # This is specific for this period (month/year)
-            # Find kode_penyesuaian_gaji for this month/year
-            # PYG + MM + YYYY
-            bulan_str = str(slip.bulan).zfill(2)
-            kode_pyg = f"PYG{bulan_str}{slip.tahun}"
-            
-            penyesuaian_item = db.query(KaryawanPenyesuaianGajiDetail)\
-                .filter(KaryawanPenyesuaianGajiDetail.kode_penyesuaian_gaji == kode_pyg)\
-                .filter(KaryawanPenyesuaianGajiDetail.nik == emp.nik)\
-                .first()
-            
-            penambah = penyesuaian_item.penambah if penyesuaian_item else 0
-            pengurang = penyesuaian_item.pengurang if penyesuaian_item else 0
-            
-            # Calculate Total
-            total_penerimaan = gaji_pokok + total_tunjangan + penambah
-            total_potongan = bpjs_kes + bpjs_tk + pengurang
-            gaji_bersih = total_penerimaan - total_potongan
-            
-            result.append({
-                "nik": emp.nik,
-                "nama_karyawan": emp.nama_karyawan,
-                "jabatan": emp.jabatan.nama_jabatan if emp.jabatan else "-",
-                "gaji_pokok": gaji_pokok,
-                "tunjangan": total_tunjangan,
-                "bpjs_kesehatan": bpjs_kes,
-                "bpjs_tenagakerja": bpjs_tk,
-                "penambah": penambah,
-                "pengurang": pengurang,
-                "gaji_bersih": gaji_bersih
-            })
-            
-        return result
+@router.post("/slip-gaji/{kode}/snapshot")
+def create_slip_gaji_snapshot(kode: str, db: Session = Depends(get_db)):
+    """Bekukan hasil hitung gaji periode ini ke slip_gaji_detail (menimpa snapshot sebelumnya)."""
+    try:
+        slip = db.query(SlipGaji).filter(SlipGaji.kode_slip_gaji == kode).first()
+        if not slip:
+            raise HTTPException(status_code=404, detail="DATA NOT FOUND")
 
+        total = payroll_calculator.simpan_snapshot(db, kode, int(slip.bulan), int(slip.tahun))
+        return {"message": "Snapshot created successfully", "total_karyawan": total}
+    except HTTPException:
+        raise
     except Exception as e:
-        print(e)
+        db.rollback()
         raise HTTPException(status_code=500, detail=str(e))
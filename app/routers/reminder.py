@@ -9,6 +9,10 @@ Routes:
   PUT    /api/reminder-settings/{id}    — Update konfigurasi
   DELETE /api/reminder-settings/{id}    — Hapus konfigurasi
   PATCH  /api/reminder-settings/{id}/toggle — Toggle aktif/nonaktif
+  GET    /api/reminder-settings/timeline    — Status timeline reminder hari ini
+
+Setiap perubahan setting memanggil reminder_timeline.invalidate() agar timeline
+disusun ulang pada tick scheduler berikutnya.
 """
 
 from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks
@@ -22,6 +26,7 @@ from app.database import get_db
 from app.models.models import ReminderSettings, Karyawan
 from app.core.permissions import get_current_user
 from app.core.fcm import _send_to_tokens
+from app.services import reminder_timeline
 
 router = APIRouter(
     prefix="/api/reminder-settings",
@@ -98,6 +103,14 @@ def list_reminders(db: Session = Depends(get_db)):
     }
 
 
+# ─────────────────────────────────────────────────────────────────────────────
+# GET: Status timeline reminder (jumlah entry, tembak berikutnya, rebuild)
+# ─────────────────────────────────────────────────────────────────────────────
+@router.get("/timeline")
+def get_reminder_timeline():
+    return {"status": True, "data": {**reminder_timeline.timeline.stats(), "log": reminder_timeline.log_stats()}}
+
+
 # ─────────────────────────────────────────────────────────────────────────────
 # POST: Buat konfigurasi baru
 # ─────────────────────────────────────────────────────────────────────────────
@@ -126,6 +139,7 @@ def create_reminder(
     )
     db.add(row)
     db.commit()
+    reminder_timeline.invalidate()
     db.refresh(row)
     return {"status": True, "message": "Reminder berhasil dibuat", "data": _to_dict(row)}
 
@@ -154,6 +168,7 @@ def update_reminder(
 
     row.updated_at = datetime.now()
     db.commit()
+    reminder_timeline.invalidate()
     db.refresh(row)
     return {"status": True, "message": "Reminder berhasil diupdate", "data": _to_dict(row)}
 
@@ -171,6 +186,7 @@ def delete_reminder(
         raise HTTPException(404, "Reminder tidak ditemukan")
     db.delete(row)
     db.commit()
+    reminder_timeline.invalidate()
     return {"status": True, "message": "Reminder berhasil dihapus"}
 
 
@@ -188,6 +204,7 @@ def toggle_reminder(
     row.is_active  = 0 if row.is_active else 1
     row.updated_at = datetime.now()
     db.commit()
+    reminder_timeline.invalidate()
     db.refresh(row)
     status_str = "diaktifkan" if row.is_active else "dinonaktifkan"
     return {"status": True, "message": f"Reminder {status_str}", "data": _to_dict(row)}
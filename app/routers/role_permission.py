@@ -3,6 +3,7 @@ from sqlalchemy.orm import Session
 from sqlalchemy import text
 from app.database import get_db
 from app.core.permissions import require_role, is_super_admin
+from app.core import principal_cache
 from app.schemas.role_permission import (
     RoleCreate, RoleUpdate, RoleResponse,
     PermissionCreate, PermissionUpdate, PermissionResponse,
@@ -26,7 +27,7 @@ router = APIRouter(
 # ==================== ROLES ====================
 
 @router.get("/roles", response_model=List[RoleResponse])
-async def get_all_roles(
+def get_all_roles(
     db: Session = Depends(get_db),
     current_user = Depends(get_current_user)
 ):
@@ -64,7 +65,7 @@ async def get_all_roles(
     ]
 
 @router.get("/roles/{role_id}", response_model=RolePermissionsResponse)
-async def get_role_details(
+def get_role_details(
     role_id: int,
     db: Session = Depends(get_db),
     current_user = Depends(get_current_user)
@@ -129,7 +130,7 @@ async def get_role_details(
     }
 
 @router.post("/roles", response_model=RoleResponse)
-async def create_role(
+def create_role(
     role: RoleCreate,
     db: Session = Depends(get_db),
     current_user = Depends(get_current_user)
@@ -173,7 +174,7 @@ async def create_role(
     }
 
 @router.put("/roles/{role_id}", response_model=RoleResponse)
-async def update_role(
+def update_role(
     role_id: int,
     role: RoleUpdate,
     db: Session = Depends(get_db),
@@ -203,6 +204,7 @@ async def update_role(
             WHERE id = :role_id
         """), {"name": role.name, "role_id": role_id})
         db.commit()
+        principal_cache.invalidate_all()
     
     # Get updated role
     result = db.execute(text("""
@@ -225,7 +227,7 @@ async def update_role(
     }
 
 @router.delete("/roles/{role_id}")
-async def delete_role(
+def delete_role(
     role_id: int,
     db: Session = Depends(get_db),
     current_user = Depends(get_current_user)
@@ -249,13 +251,14 @@ async def delete_role(
     db.execute(text("DELETE FROM model_has_roles WHERE role_id = :role_id"), {"role_id": role_id})
     db.execute(text("DELETE FROM roles WHERE id = :role_id"), {"role_id": role_id})
     db.commit()
+    principal_cache.invalidate_all()
     
     return {"message": "Role deleted successfully"}
 
 # ==================== PERMISSION GROUPS ====================
 
 @router.get("/permission-groups", response_model=List[PermissionGroupResponse])
-async def get_all_permission_groups(
+def get_all_permission_groups(
     db: Session = Depends(get_db),
     current_user = Depends(get_current_user)
 ):
@@ -291,7 +294,7 @@ async def get_all_permission_groups(
     ]
 
 @router.post("/permission-groups", response_model=PermissionGroupResponse)
-async def create_permission_group(
+def create_permission_group(
     group: PermissionGroupCreate,
     db: Session = Depends(get_db),
     current_user = Depends(get_current_user)
@@ -327,7 +330,7 @@ async def create_permission_group(
 # ==================== PERMISSIONS ====================
 
 @router.get("/permissions", response_model=List[PermissionResponse])
-async def get_all_permissions(
+def get_all_permissions(
     group_id: int = None,
     db: Session = Depends(get_db),
     current_user = Depends(get_current_user)
@@ -375,7 +378,7 @@ async def get_all_permissions(
     ]
 
 @router.post("/permissions", response_model=PermissionResponse)
-async def create_permission(
+def create_permission(
     permission: PermissionCreate,
     db: Session = Depends(get_db),
     current_user = Depends(get_current_user)
@@ -406,6 +409,7 @@ async def create_permission(
         "group_id": permission.id_permission_group
     })
     db.commit()
+    principal_cache.invalidate_all()
     
     # Get created permission
     result = db.execute(text("""
@@ -430,7 +434,7 @@ async def create_permission(
 # ==================== ASSIGN/REMOVE PERMISSIONS ====================
 
 @router.post("/assign-permissions")
-async def assign_permissions_to_role(
+def assign_permissions_to_role(
     request: AssignPermissionRequest,
     db: Session = Depends(get_db),
     current_user = Depends(get_current_user)
@@ -450,11 +454,12 @@ async def assign_permissions_to_role(
         """), {"perm_id": perm_id, "role_id": request.role_id})
     
     db.commit()
+    principal_cache.invalidate_all()
     
     return {"message": f"Assigned {len(request.permission_ids)} permissions to role"}
 
 @router.post("/assign-permission-group")
-async def assign_permission_group_to_role(
+def assign_permission_group_to_role(
     request: AssignPermissionGroupRequest,
     db: Session = Depends(get_db),
     current_user = Depends(get_current_user)
@@ -475,6 +480,7 @@ async def assign_permission_group_to_role(
     """), {"role_id": request.role_id, "group_id": request.group_id})
     
     db.commit()
+    principal_cache.invalidate_all()
     
     # Count assigned
     count = db.execute(
@@ -485,7 +491,7 @@ async def assign_permission_group_to_role(
     return {"message": f"Assigned {count} permissions from group to role"}
 
 @router.post("/remove-permissions")
-async def remove_permissions_from_role(
+def remove_permissions_from_role(
     request: RemovePermissionRequest,
     db: Session = Depends(get_db),
     current_user = Depends(get_current_user)
@@ -505,13 +511,14 @@ async def remove_permissions_from_role(
         """), {"perm_id": perm_id, "role_id": request.role_id})
     
     db.commit()
+    principal_cache.invalidate_all()
     
     return {"message": f"Removed {len(request.permission_ids)} permissions from role"}
 
 # ==================== USER ROLES ====================
 
 @router.post("/assign-roles-to-user")
-async def assign_roles_to_user(
+def assign_roles_to_user(
     request: AssignRoleToUserRequest,
     db: Session = Depends(get_db),
     current_user = Depends(get_current_user)
@@ -531,11 +538,12 @@ async def assign_roles_to_user(
         """), {"role_id": role_id, "user_id": request.user_id})
     
     db.commit()
+    principal_cache.invalidate_user(request.user_id)
     
     return {"message": f"Assigned {len(request.role_ids)} roles to user"}
 
 @router.get("/users/{user_id}/roles", response_model=UserRolesResponse)
-async def get_user_roles(
+def get_user_roles(
     user_id: int,
     db: Session = Depends(get_db),
     current_user = Depends(get_current_user)
@@ -3,6 +3,7 @@ from sqlalchemy.orm import Session
 from sqlalchemy import text, or_, and_, desc
 from app.database import get_db
 from app.routers.auth_legacy import get_current_user_data, CurrentUser
+from app.services import daily_stats
 from app.models.models import (
     Userkaryawan, Karyawan, Presensi, PresensiJamkerja,
     SetJamKerjaByDate, SetJamKerjaByDay, PresensiJamkerjaByDeptDetail, 
@@ -87,7 +88,7 @@ def save_upload_briefing(file_obj: UploadFile, kode_cabang: str, nik: str) -> st
 # ===============================================
 
 @router.get("/safetybriefing")
-async def get_safety_briefing(
+def get_safety_briefing(
     current_user: CurrentUser = Depends(get_current_user_data),
     db: Session = Depends(get_db)
 ):
@@ -181,7 +182,7 @@ async def get_safety_briefing(
 
 
 @router.post("/safetybriefing/store")
-async def store_safety_briefing(
+def store_safety_briefing(
     keterangan: str = Form(...),
     foto: UploadFile = File(...),
     tanggal_jam: str = Form(None),  # WIB timestamp dari device Android
@@ -322,6 +323,7 @@ async def store_safety_briefing(
     db.add(new_sb)
     db.commit()
     db.refresh(new_sb)
+    daily_stats.mark(new_sb.nik, new_sb.tanggal_jam)
     
     foto_url = f"https://frontend.k3guard.com/api-py/storage/{new_sb.foto}" if new_sb.foto else None
 
@@ -11,6 +11,8 @@ import secrets
 from fastapi.responses import FileResponse
 
 from app.core.permissions import get_current_user
+from app.core.date_range import on_date
+from app.services import reminder_timeline, daily_stats
 
 STORAGE_BASE_URL = "https://frontend.k3guard.com/api-py/storage/"
 
@@ -60,7 +62,7 @@ class TurlalinUpdateRequest(BaseModel):
     foto_keluar: Optional[str] = None
 
 @router.get("/turlalin", response_model=List[TurlalinDTO])
-async def get_turlalin_list(
+def get_turlalin_list(
     search: Optional[str] = Query(None, description="Search by No Polisi"),
     date_start: Optional[datetime] = Query(None),
     date_end: Optional[datetime] = Query(None),
@@ -107,7 +109,7 @@ async def get_turlalin_list(
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.post("/turlalin", response_model=TurlalinDTO)
-async def create_turlalin(request: TurlalinCreateRequest, db: Session = Depends(get_db)):
+def create_turlalin(request: TurlalinCreateRequest, db: Session = Depends(get_db)):
     try:
         new_data = Turlalin(
             nomor_polisi=request.nomor_polisi,
@@ -121,6 +123,7 @@ async def create_turlalin(request: TurlalinCreateRequest, db: Session = Depends(
         db.add(new_data)
         db.commit()
         db.refresh(new_data)
+        daily_stats.mark(new_data.nik, new_data.jam_masuk)
         
         # Populate name manually for response
         dto = TurlalinDTO.from_orm(new_data)
@@ -137,11 +140,12 @@ async def create_turlalin(request: TurlalinCreateRequest, db: Session = Depends(
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.put("/turlalin/{id}", response_model=TurlalinDTO)
-async def update_turlalin(id: int, request: TurlalinUpdateRequest, db: Session = Depends(get_db)):
+def update_turlalin(id: int, request: TurlalinUpdateRequest, db: Session = Depends(get_db)):
     try:
         data = db.query(Turlalin).filter(Turlalin.id == id).first()
         if not data:
             raise HTTPException(status_code=404, detail="Data Turlalin tidak ditemukan")
+        lama = (data.nik, data.jam_masuk)
         
         if request.nomor_polisi is not None: data.nomor_polisi = request.nomor_polisi
         if request.jam_masuk is not None: data.jam_masuk = request.jam_masuk
@@ -156,6 +160,8 @@ async def update_turlalin(id: int, request: TurlalinUpdateRequest, db: Session =
         
         db.commit()
         db.refresh(data)
+        daily_stats.mark(*lama)
+        daily_stats.mark(data.nik, data.jam_masuk)
         
         dto = TurlalinDTO.from_orm(data)
         if data.karyawan:
@@ -175,14 +181,16 @@ async def update_turlalin(id: int, request: TurlalinUpdateRequest, db: Session =
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.delete("/turlalin/{id}")
-async def delete_turlalin(id: int, db: Session = Depends(get_db)):
+def delete_turlalin(id: int, db: Session = Depends(get_db)):
     try:
         data = db.query(Turlalin).filter(Turlalin.id == id).first()
         if not data:
             raise HTTPException(status_code=404, detail="Data Turlalin tidak ditemukan")
         
+        lama = (data.nik, data.jam_masuk)
         db.delete(data)
         db.commit()
+        daily_stats.mark(*lama)
         return {"status": True, "message": "Data Turlalin berhasil dihapus"}
     except Exception as e:
         db.rollback()
@@ -221,7 +229,7 @@ class SafetyBriefingUpdateRequest(BaseModel):
     foto: Optional[str] = None
 
 @router.get("/safety-briefings", response_model=List[SafetyBriefingDTO])
-async def get_safety_briefings(
+def get_safety_briefings(
     search: Optional[str] = Query(None, description="Search by Keterangan/Nama"),
     date_start: Optional[datetime] = Query(None),
     date_end: Optional[datetime] = Query(None),
@@ -261,7 +269,7 @@ async def get_safety_briefings(
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.post("/safety-briefings", response_model=SafetyBriefingDTO)
-async def create_safety_briefing(request: SafetyBriefingCreateRequest, db: Session = Depends(get_db)):
+def create_safety_briefing(request: SafetyBriefingCreateRequest, db: Session = Depends(get_db)):
     try:
         new_data = SafetyBriefings(
             nik=request.nik,
@@ -274,6 +282,7 @@ async def create_safety_briefing(request: SafetyBriefingCreateRequest, db: Sessi
         db.add(new_data)
         db.commit()
         db.refresh(new_data)
+        daily_stats.mark(new_data.nik, new_data.tanggal_jam)
         
         dto = SafetyBriefingDTO.from_orm(new_data)
         if new_data.karyawan:
@@ -291,11 +300,12 @@ async def create_safety_briefing(request: SafetyBriefingCreateRequest, db: Sessi
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.put("/safety-briefings/{id}", response_model=SafetyBriefingDTO)
-async def update_safety_briefing(id: int, request: SafetyBriefingUpdateRequest, db: Session = Depends(get_db)):
+def update_safety_briefing(id: int, request: SafetyBriefingUpdateRequest, db: Session = Depends(get_db)):
     try:
         data = db.query(SafetyBriefings).filter(SafetyBriefings.id == id).first()
         if not data:
              raise HTTPException(status_code=404, detail="Safety Briefing tidak ditemukan")
+        lama = (data.nik, data.tanggal_jam)
              
         if request.nik is not None: data.nik = request.nik
         if request.keterangan is not None: data.keterangan = request.keterangan
@@ -305,6 +315,8 @@ async def update_safety_briefing(id: int, request: SafetyBriefingUpdateRequest,
         
         db.commit()
         db.refresh(data)
+        daily_stats.mark(*lama)
+        daily_stats.mark(data.nik, data.tanggal_jam)
         
         dto = SafetyBriefingDTO.from_orm(data)
         if data.karyawan:
@@ -320,14 +332,16 @@ async def update_safety_briefing(id: int, request: SafetyBriefingUpdateRequest,
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.delete("/safety-briefings/{id}")
-async def delete_safety_briefing(id: int, db: Session = Depends(get_db)):
+def delete_safety_briefing(id: int, db: Session = Depends(get_db)):
     try:
         data = db.query(SafetyBriefings).filter(SafetyBriefings.id == id).first()
         if not data:
             raise HTTPException(status_code=404, detail="Safety Briefing tidak ditemukan")
             
+        lama = (data.nik, data.tanggal_jam)
         db.delete(data)
         db.commit()
+        daily_stats.mark(*lama)
         return {"status": True, "message": "Safety Briefing berhasil dihapus"}
     except Exception as e:
         db.rollback()
@@ -365,7 +379,7 @@ class BarangCreateRequest(BaseModel):
     foto_keluar: Optional[str] = None
     
 @router.get("/barang", response_model=List[BarangDTO])
-async def get_barang_list(
+def get_barang_list(
     search: Optional[str] = Query(None, description="Search by ID/Jenis/Dari/Untuk"),
     date_start: Optional[datetime] = Query(None),
     date_end: Optional[datetime] = Query(None),
@@ -411,7 +425,7 @@ async def get_barang_list(
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.post("/barang", response_model=BarangDTO)
-async def create_barang(request: BarangCreateRequest, db: Session = Depends(get_db)):
+def create_barang(request: BarangCreateRequest, db: Session = Depends(get_db)):
     try:
         new_data = Barang(
             jenis_barang=request.jenis_barang,
@@ -434,7 +448,7 @@ async def create_barang(request: BarangCreateRequest, db: Session = Depends(get_
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.put("/barang/{id}", response_model=BarangDTO)
-async def update_barang(id: int, request: BarangCreateRequest, db: Session = Depends(get_db)):
+def update_barang(id: int, request: BarangCreateRequest, db: Session = Depends(get_db)):
     try:
         data = db.query(Barang).filter(Barang.id_barang == id).first()
         if not data:
@@ -458,7 +472,7 @@ async def update_barang(id: int, request: BarangCreateRequest, db: Session = Dep
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.delete("/barang/{id}")
-async def delete_barang(id: int, db: Session = Depends(get_db)):
+def delete_barang(id: int, db: Session = Depends(get_db)):
     try:
         data = db.query(Barang).filter(Barang.id_barang == id).first()
         if not data:
@@ -522,7 +536,7 @@ class TamuCreateRequest(BaseModel):
     nik_satpam_keluar: Optional[str] = None
 
 @router.get("/tamu", response_model=List[TamuDTO])
-async def get_tamu_list(
+def get_tamu_list(
     search: Optional[str] = Query(None, description="Search by Nama/Perusahaan/Keperluan"),
     date_start: Optional[datetime] = Query(None),
     date_end: Optional[datetime] = Query(None),
@@ -570,7 +584,7 @@ async def get_tamu_list(
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.post("/tamu", response_model=TamuDTO)
-async def create_tamu(request: TamuCreateRequest, db: Session = Depends(get_db)):
+def create_tamu(request: TamuCreateRequest, db: Session = Depends(get_db)):
     try:
         new_data = Tamu(
             nama=request.nama,
@@ -594,6 +608,7 @@ async def create_tamu(request: TamuCreateRequest, db: Session = Depends(get_db))
         db.add(new_data)
         db.commit()
         db.refresh(new_data)
+        daily_stats.mark(new_data.nik_satpam, new_data.jam_masuk)
         
         dto = TamuDTO.from_orm(new_data)
         if new_data.karyawan:
@@ -611,11 +626,12 @@ async def create_tamu(request: TamuCreateRequest, db: Session = Depends(get_db))
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.put("/tamu/{id}", response_model=TamuDTO)
-async def update_tamu(id: int, request: TamuCreateRequest, db: Session = Depends(get_db)):
+def update_tamu(id: int, request: TamuCreateRequest, db: Session = Depends(get_db)):
     try:
         data = db.query(Tamu).filter(Tamu.id_tamu == id).first()
         if not data:
             raise HTTPException(status_code=404, detail="Data Tamu tidak ditemukan")
+        lama = (data.nik_satpam, data.jam_masuk)
             
         if request.nama is not None: data.nama = request.nama
         if request.alamat is not None: data.alamat = request.alamat
@@ -637,6 +653,8 @@ async def update_tamu(id: int, request: TamuCreateRequest, db: Session = Depends
         
         db.commit()
         db.refresh(data)
+        daily_stats.mark(*lama)
+        daily_stats.mark(data.nik_satpam, data.jam_masuk)
         
         dto = TamuDTO.from_orm(data)
         if data.karyawan:
@@ -654,14 +672,16 @@ async def update_tamu(id: int, request: TamuCreateRequest, db: Session = Depends
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.delete("/tamu/{id}")
-async def delete_tamu(id: int, db: Session = Depends(get_db)):
+def delete_tamu(id: int, db: Session = Depends(get_db)):
     try:
         data = db.query(Tamu).filter(Tamu.id_tamu == id).first()
         if not data:
             raise HTTPException(status_code=404, detail="Data Tamu tidak ditemukan")
             
+        lama = (data.nik_satpam, data.jam_masuk)
         db.delete(data)
         db.commit()
+        daily_stats.mark(*lama)
         return {"status": True, "message": "Data Tamu berhasil dihapus"}
     except Exception as e:
         db.rollback()
@@ -704,7 +724,7 @@ class PatrolSessionCreateRequest(BaseModel):
     lokasi_absen: Optional[str] = None
 
 @router.get("/patrol", response_model=List[PatrolSessionDTO])
-async def get_patrol_list(
+def get_patrol_list(
     search: Optional[str] = Query(None, description="Search by NIK/Nama"),
     date_start: Optional[date] = Query(None),
     date_end: Optional[date] = Query(None),
@@ -776,7 +796,7 @@ async def get_patrol_list(
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.post("/patrol", response_model=PatrolSessionDTO)
-async def create_patrol(request: PatrolSessionCreateRequest, db: Session = Depends(get_db)):
+def create_patrol(request: PatrolSessionCreateRequest, db: Session = Depends(get_db)):
     try:
         new_data = PatrolSessions(
             nik=request.nik,
@@ -792,6 +812,7 @@ async def create_patrol(request: PatrolSessionCreateRequest, db: Session = Depen
         db.add(new_data)
         db.commit()
         db.refresh(new_data)
+        daily_stats.mark(new_data.nik, new_data.tanggal)
         
         dto = PatrolSessionDTO.from_orm(new_data)
         karyawan = db.query(Karyawan).filter(Karyawan.nik == new_data.nik).first()
@@ -805,11 +826,12 @@ async def create_patrol(request: PatrolSessionCreateRequest, db: Session = Depen
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.put("/patrol/{id}", response_model=PatrolSessionDTO)
-async def update_patrol(id: int, request: PatrolSessionCreateRequest, db: Session = Depends(get_db)):
+def update_patrol(id: int, request: PatrolSessionCreateRequest, db: Session = Depends(get_db)):
     try:
         data = db.query(PatrolSessions).filter(PatrolSessions.id == id).first()
         if not data:
             raise HTTPException(status_code=404, detail="Data Patrol tidak ditemukan")
+        lama = (data.nik, data.tanggal)
             
         if request.nik is not None: data.nik = request.nik
         if request.tanggal is not None: data.tanggal = request.tanggal
@@ -822,6 +844,8 @@ async def update_patrol(id: int, request: PatrolSessionCreateRequest, db: Sessio
         
         db.commit()
         db.refresh(data)
+        daily_stats.mark(*lama)
+        daily_stats.mark(data.nik, data.tanggal)
         
         dto = PatrolSessionDTO.from_orm(data)
         karyawan = db.query(Karyawan).filter(Karyawan.nik == data.nik).first()
@@ -835,14 +859,16 @@ async def update_patrol(id: int, request: PatrolSessionCreateRequest, db: Sessio
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.delete("/patrol/{id}")
-async def delete_patrol(id: int, db: Session = Depends(get_db)):
+def delete_patrol(id: int, db: Session = Depends(get_db)):
     try:
         data = db.query(PatrolSessions).filter(PatrolSessions.id == id).first()
         if not data:
             raise HTTPException(status_code=404, detail="Data Patrol tidak ditemukan")
             
+        lama = (data.nik, data.tanggal)
         db.delete(data)
         db.commit()
+        daily_stats.mark(*lama)
         return {"status": True, "message": "Data Patrol berhasil dihapus"}
     except Exception as e:
         db.rollback()
@@ -878,7 +904,7 @@ class PatrolScheduleCreateRequest(BaseModel):
     name: Optional[str] = None
 
 @router.get("/schedules", response_model=List[PatrolScheduleDTO])
-async def get_patrol_schedules(
+def get_patrol_schedules(
     search: Optional[str] = Query(None, description="Search by Name/Kode Jam Kerja"),
     db: Session = Depends(get_db)
 ):
@@ -897,7 +923,7 @@ async def get_patrol_schedules(
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.post("/schedules", response_model=PatrolScheduleDTO)
-async def create_patrol_schedule(request: PatrolScheduleCreateRequest, db: Session = Depends(get_db)):
+def create_patrol_schedule(request: PatrolScheduleCreateRequest, db: Session = Depends(get_db)):
     try:
         new_data = PatrolSchedules(
             kode_jam_kerja=request.kode_jam_kerja,
@@ -910,6 +936,7 @@ async def create_patrol_schedule(request: PatrolScheduleCreateRequest, db: Sessi
         )
         db.add(new_data)
         db.commit()
+        reminder_timeline.invalidate()
         db.refresh(new_data)
         return new_data
     except Exception as e:
@@ -918,7 +945,7 @@ async def create_patrol_schedule(request: PatrolScheduleCreateRequest, db: Sessi
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.put("/schedules/{id}", response_model=PatrolScheduleDTO)
-async def update_patrol_schedule(id: int, request: PatrolScheduleCreateRequest, db: Session = Depends(get_db)):
+def update_patrol_schedule(id: int, request: PatrolScheduleCreateRequest, db: Session = Depends(get_db)):
     try:
         data = db.query(PatrolSchedules).filter(PatrolSchedules.id == id).first()
         if not data:
@@ -934,6 +961,7 @@ async def update_patrol_schedule(id: int, request: PatrolScheduleCreateRequest,
         data.updated_at = datetime.now()
         
         db.commit()
+        reminder_timeline.invalidate()
         db.refresh(data)
         return data
     except Exception as e:
@@ -942,7 +970,7 @@ async def update_patrol_schedule(id: int, request: PatrolScheduleCreateRequest,
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.delete("/schedules/{id}")
-async def delete_patrol_schedule(id: int, db: Session = Depends(get_db)):
+def delete_patrol_schedule(id: int, db: Session = Depends(get_db)):
     try:
         data = db.query(PatrolSchedules).filter(PatrolSchedules.id == id).first()
         if not data:
@@ -950,6 +978,7 @@ async def delete_patrol_schedule(id: int, db: Session = Depends(get_db)):
             
         db.delete(data)
         db.commit()
+        reminder_timeline.invalidate()
         return {"status": True, "message": "Data Schedule berhasil dihapus"}
     except Exception as e:
         db.rollback()
@@ -1025,7 +1054,7 @@ class SuratCreateRequest(BaseModel):
 
 # Surat Masuk Endpoints
 @router.get("/surat-masuk", response_model=List[SuratMasukDTO])
-async def get_surat_masuk(
+def get_surat_masuk(
     search: Optional[str] = Query(None, description="Search by No Surat/Asal/Perihal"),
     date_start: Optional[datetime] = Query(None),
     date_end: Optional[datetime] = Query(None),
@@ -1074,7 +1103,7 @@ async def get_surat_masuk(
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.post("/surat-masuk", response_model=SuratMasukDTO)
-async def create_surat_masuk(request: SuratCreateRequest, db: Session = Depends(get_db)):
+def create_surat_masuk(request: SuratCreateRequest, db: Session = Depends(get_db)):
     try:
         new_data = SuratMasuk(
             nomor_surat=request.nomor_surat,
@@ -1094,6 +1123,7 @@ async def create_surat_masuk(request: SuratCreateRequest, db: Session = Depends(
         db.add(new_data)
         db.commit()
         db.refresh(new_data)
+        daily_stats.mark(new_data.nik_satpam, new_data.tanggal_surat)
         dto = SuratMasukDTO.from_orm(new_data)
         if new_data.karyawan:
              dto.nama_satpam = new_data.karyawan.nama_karyawan
@@ -1110,11 +1140,12 @@ async def create_surat_masuk(request: SuratCreateRequest, db: Session = Depends(
         raise HTTPException(status_code=500, detail=str(e))
         
 @router.put("/surat-masuk/{id}", response_model=SuratMasukDTO)
-async def update_surat_masuk(id: int, request: SuratCreateRequest, db: Session = Depends(get_db)):
+def update_surat_masuk(id: int, request: SuratCreateRequest, db: Session = Depends(get_db)):
     try:
         data = db.query(SuratMasuk).filter(SuratMasuk.id == id).first()
         if not data:
              raise HTTPException(status_code=404, detail="Data Surat Masuk tidak ditemukan")
+        lama = (data.nik_satpam, data.tanggal_surat)
         
         data.nomor_surat = request.nomor_surat
         data.tanggal_surat = request.tanggal_surat
@@ -1133,6 +1164,8 @@ async def update_surat_masuk(id: int, request: SuratCreateRequest, db: Session =
         
         db.commit()
         db.refresh(data)
+        daily_stats.mark(*lama)
+        daily_stats.mark(data.nik_satpam, data.tanggal_surat)
         dto = SuratMasukDTO.from_orm(data)
         if data.karyawan:
              dto.nama_satpam = data.karyawan.nama_karyawan
@@ -1148,13 +1181,15 @@ async def update_surat_masuk(id: int, request: SuratCreateRequest, db: Session =
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.delete("/surat-masuk/{id}")
-async def delete_surat_masuk(id: int, db: Session = Depends(get_db)):
+def delete_surat_masuk(id: int, db: Session = Depends(get_db)):
     try:
         data = db.query(SuratMasuk).filter(SuratMasuk.id == id).first()
         if not data:
             raise HTTPException(status_code=404, detail="Data Surat Masuk tidak ditemukan")
+        lama = (data.nik_satpam, data.tanggal_surat)
         db.delete(data)
         db.commit()
+        daily_stats.mark(*lama)
         return {"status": True, "message": "Data berhasil dihapus"}
     except Exception as e:
         db.rollback()
@@ -1162,7 +1197,7 @@ async def delete_surat_masuk(id: int, db: Session = Depends(get_db)):
 
 # Surat Keluar Endpoints
 @router.get("/surat-keluar", response_model=List[SuratKeluarDTO])
-async def get_surat_keluar(
+def get_surat_keluar(
     search: Optional[str] = Query(None, description="Search by No Surat/Perihal"),
     date_start: Optional[datetime] = Query(None),
     date_end: Optional[datetime] = Query(None),
@@ -1210,7 +1245,7 @@ async def get_surat_keluar(
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.post("/surat-keluar", response_model=SuratKeluarDTO)
-async def create_surat_keluar(request: SuratCreateRequest, db: Session = Depends(get_db)):
+def create_surat_keluar(request: SuratCreateRequest, db: Session = Depends(get_db)):
     try:
         new_data = SuratKeluar(
             nomor_surat=request.nomor_surat,
@@ -1245,7 +1280,7 @@ async def create_surat_keluar(request: SuratCreateRequest, db: Session = Depends
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.put("/surat-keluar/{id}", response_model=SuratKeluarDTO)
-async def update_surat_keluar(id: int, request: SuratCreateRequest, db: Session = Depends(get_db)):
+def update_surat_keluar(id: int, request: SuratCreateRequest, db: Session = Depends(get_db)):
     try:
         data = db.query(SuratKeluar).filter(SuratKeluar.id == id).first()
         if not data:
@@ -1282,7 +1317,7 @@ async def update_surat_keluar(id: int, request: SuratCreateRequest, db: Session
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.delete("/surat-keluar/{id}")
-async def delete_surat_keluar(id: int, db: Session = Depends(get_db)):
+def delete_surat_keluar(id: int, db: Session = Depends(get_db)):
     try:
         data = db.query(SuratKeluar).filter(SuratKeluar.id == id).first()
         if not data:
@@ -1318,7 +1353,7 @@ class PatrolTrackingDTO(BaseModel):
         from_attributes = True
 
 @router.get("/tracking", response_model=List[PatrolTrackingDTO])
-async def get_patrol_tracking(
+def get_patrol_tracking(
     date_filter: Optional[date] = Query(None),
     nik: Optional[str] = Query(None),
     limit: Optional[int] = Query(500),
@@ -1334,7 +1369,7 @@ async def get_patrol_tracking(
         
         # Filter by date on created_at or join session date
         # PatrolPoints.created_at is timestamp
-        query = query.filter(func.date(PatrolPoints.created_at) == today)
+        query = query.filter(on_date(PatrolPoints.created_at, today))
         
         if nik:
              # Need to join with PatrolSessions to filter by NIK
@@ -1440,7 +1475,7 @@ class DeptTaskCreateRequest(BaseModel):
     lokasi_absen: Optional[str] = None
 
 @router.get("/tasks", response_model=List[DeptTaskSessionDTO])
-async def get_department_tasks(
+def get_department_tasks(
     kode_dept: str = Query(..., description="Department Code (e.g., UCS, GA)"),
     search: Optional[str] = Query(None, description="Search by NIK/Name"),
     date_start: Optional[date] = Query(None),
@@ -1488,7 +1523,7 @@ async def get_department_tasks(
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.post("/tasks", response_model=DeptTaskSessionDTO)
-async def create_department_task(request: DeptTaskCreateRequest, db: Session = Depends(get_db)):
+def create_department_task(request: DeptTaskCreateRequest, db: Session = Depends(get_db)):
     try:
         new_data = DepartmentTaskSessions(
             nik=request.nik,
@@ -1518,7 +1553,7 @@ async def create_department_task(request: DeptTaskCreateRequest, db: Session = D
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.put("/tasks/{id}", response_model=DeptTaskSessionDTO)
-async def update_department_task(id: int, request: DeptTaskCreateRequest, db: Session = Depends(get_db)):
+def update_department_task(id: int, request: DeptTaskCreateRequest, db: Session = Depends(get_db)):
     try:
         data = db.query(DepartmentTaskSessions).filter(DepartmentTaskSessions.id == id).first()
         if not data:
@@ -1553,7 +1588,7 @@ async def update_department_task(id: int, request: DeptTaskCreateRequest, db: Se
 
 
 @router.get("/tasks/{id}", response_model=DeptTaskDetailDTO)
-async def get_department_task_detail(id: int, db: Session = Depends(get_db)):
+def get_department_task_detail(id: int, db: Session = Depends(get_db)):
     try:
         # Fetch Session
         data = db.query(DepartmentTaskSessions).filter(DepartmentTaskSessions.id == id).first()
@@ -1614,7 +1649,7 @@ async def get_department_task_detail(id: int, db: Session = Depends(get_db)):
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.delete("/tasks/{id}")
-async def delete_department_task(id: int, db: Session = Depends(get_db)):
+def delete_department_task(id: int, db: Session = Depends(get_db)):
     try:
         data = db.query(DepartmentTaskSessions).filter(DepartmentTaskSessions.id == id).first()
         if not data:
@@ -1652,7 +1687,7 @@ class TeamMonitorGroupDTO(BaseModel):
     members: List[TeamMemberMonitorDTO]
 
 @router.get("/teams/monitoring", response_model=List[TeamMonitorGroupDTO])
-async def monitor_teams(
+def monitor_teams(
     date_filter: Optional[date] = Query(None),
     db: Session = Depends(get_db)
 ):
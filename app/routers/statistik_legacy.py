@@ -9,6 +9,7 @@ from app.models.models import (
     Users, Karyawan, Userkaryawan, Presensi, PresensiJamkerja, 
     PatrolSessions, PatrolSchedules, Jabatan, Departemen, Cabang
 )
+from app.services import daily_stats
 import calendar
 
 router = APIRouter(
@@ -17,7 +18,7 @@ router = APIRouter(
 )
 
 @router.get("/kinerja")
-async def get_kinerja(
+def get_kinerja(
     tipe_laporan: str = Query("bulanan", enum=["harian", "bulanan"]),
     bulan: Optional[str] = Query(None),
     tahun: Optional[str] = Query(None),
@@ -68,38 +69,20 @@ async def get_kinerja(
     start_date = datetime.strptime(start_date_str, "%Y-%m-%d").date()
     end_date = datetime.strptime(end_date_str, "%Y-%m-%d").date()
 
-    # 4. Attendance Summary
-    # PHP: leftJoin presensi_jamkerja
-    # Select count status
+    # 4. Attendance Summary & 5. Individual Patrols (Completed) — rollup harian
+    summary = daily_stats.ringkasan(
+        db, start_date, end_date, niks=[karyawan.nik],
+        kolom=("total_jam", "hadir", "izin", "sakit", "cuti", "alfa", "patroli_selesai")
+    ).get(karyawan.nik, {})
     
-    summary_query = db.query(
-        func.count(func.distinct(Presensi.tanggal)).label("total_hari"),
-        func.coalesce(func.sum(PresensiJamkerja.total_jam), 0).label("total_jam"),
-        func.sum(func.if_(Presensi.status == 'h', 1, 0)).label("hadir"),
-        func.sum(func.if_(Presensi.status == 'i', 1, 0)).label("izin"),
-        func.sum(func.if_(Presensi.status == 's', 1, 0)).label("sakit"),
-        func.sum(func.if_(Presensi.status == 'c', 1, 0)).label("cuti"),
-        func.sum(func.if_(Presensi.status == 'a', 1, 0)).label("alfa")
-    ).outerjoin(PresensiJamkerja, Presensi.kode_jam_kerja == PresensiJamkerja.kode_jam_kerja)\
-     .filter(Presensi.nik == karyawan.nik)\
-     .filter(Presensi.tanggal >= start_date, Presensi.tanggal <= end_date)
-    
-    summary = summary_query.first()
-    
-    total_hari = int(summary.total_hari or 0)
-    total_jam = float(summary.total_jam or 0)
-    hadir = int(summary.hadir or 0)
-    izin = int(summary.izin or 0)
-    sakit = int(summary.sakit or 0)
-    cuti = int(summary.cuti or 0)
-    alfa = int(summary.alfa or 0)
-
-    # 5. Individual Patrols (Completed)
-    patroli_individu = db.query(func.count(PatrolSessions.id))\
-        .filter(PatrolSessions.nik == karyawan.nik)\
-        .filter(PatrolSessions.status == 'complete')\
-        .filter(PatrolSessions.tanggal >= start_date, PatrolSessions.tanggal <= end_date)\
-        .scalar() or 0
+    total_hari = summary.get("hari", 0)
+    total_jam = float(summary.get("total_jam", 0))
+    hadir = summary.get("hadir", 0)
+    izin = summary.get("izin", 0)
+    sakit = summary.get("sakit", 0)
+    cuti = summary.get("cuti", 0)
+    alfa = summary.get("alfa", 0)
+    patroli_individu = summary.get("patroli_selesai", 0)
 
     # 6. Target & Group Realisation (Complex Logic)
     target_patroli = 0
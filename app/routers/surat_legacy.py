@@ -2,6 +2,8 @@ from fastapi import APIRouter, Depends, UploadFile, File, Form, HTTPException, s
 from sqlalchemy.orm import Session
 from sqlalchemy import text, or_, and_, desc
 from app.database import get_db
+from app.core import master_cache
+from app.services import daily_stats
 from app.routers.auth_legacy import get_current_user_data, CurrentUser
 from app.models.models import (
     SuratMasuk, SuratKeluar, Karyawan, Userkaryawan, Presensi, 
@@ -35,11 +37,11 @@ def get_jam_kerja_karyawan(nik, kode_cabang, kode_dept, db: Session):
     # 0.5 By Team Bulk Schedule
     try:
         from app.models.models import PresensiJamkerjaBydateExtra, EmployeeSchedule
-        jk_extra = db.query(PresensiJamkerja)\
-            .join(PresensiJamkerjaBydateExtra, PresensiJamkerjaBydateExtra.kode_jam_kerja == PresensiJamkerja.kode_jam_kerja)\
+        jk_extra_row = db.query(PresensiJamkerjaBydateExtra.kode_jam_kerja)\
             .filter(PresensiJamkerjaBydateExtra.nik == nik)\
             .filter(PresensiJamkerjaBydateExtra.tanggal == today)\
             .first()
+        jk_extra = master_cache.get_jam_kerja(db, jk_extra_row.kode_jam_kerja) if jk_extra_row else None
         if jk_extra:
             return jk_extra
             
@@ -48,7 +50,7 @@ def get_jam_kerja_karyawan(nik, kode_cabang, kode_dept, db: Session):
             EmployeeSchedule.tanggal == today
         ).first()
         if bs:
-            jk_bulk = db.query(PresensiJamkerja).filter(PresensiJamkerja.kode_jam_kerja == bs.kode_jam_kerja).first()
+            jk_bulk = master_cache.get_jam_kerja(db, bs.kode_jam_kerja)
             if jk_bulk:
                 return jk_bulk
     except Exception:
@@ -57,23 +59,17 @@ def get_jam_kerja_karyawan(nik, kode_cabang, kode_dept, db: Session):
     # 1. By DATE (Tukar Shift / Rotasi)
     jk_date = db.query(SetJamKerjaByDate).filter(SetJamKerjaByDate.nik == nik, SetJamKerjaByDate.tanggal == today).first()
     if jk_date:
-        return db.query(PresensiJamkerja).filter(PresensiJamkerja.kode_jam_kerja == jk_date.kode_jam_kerja).first()
+        return master_cache.get_jam_kerja(db, jk_date.kode_jam_kerja)
 
     # 2. By DAY (Jadwal Rutin Personal)
     jk_day = db.query(SetJamKerjaByDay).filter(SetJamKerjaByDay.nik == nik, SetJamKerjaByDay.hari == namahari).first()
     if jk_day:
-        return db.query(PresensiJamkerja).filter(PresensiJamkerja.kode_jam_kerja == jk_day.kode_jam_kerja).first()
+        return master_cache.get_jam_kerja(db, jk_day.kode_jam_kerja)
 
     # 3. By DEPT (Jadwal Default Departemen)
-    jk_dept = db.query(PresensiJamkerjaByDeptDetail)\
-        .join(PresensiJamkerjaBydept, PresensiJamkerjaByDeptDetail.kode_jk_dept == PresensiJamkerjaBydept.kode_jk_dept)\
-        .filter(PresensiJamkerjaBydept.kode_cabang == kode_cabang)\
-        .filter(PresensiJamkerjaBydept.kode_dept == kode_dept)\
-        .filter(PresensiJamkerjaByDeptDetail.hari == namahari)\
-        .first()
-
-    if jk_dept:
-        return db.query(PresensiJamkerja).filter(PresensiJamkerja.kode_jam_kerja == jk_dept.kode_jam_kerja).first()
+    kode_jk_dept = master_cache.get_dept_kode_jam_kerja(db, kode_cabang, kode_dept, namahari)
+    if kode_jk_dept:
+        return master_cache.get_jam_kerja(db, kode_jk_dept)
 
     return None
 
@@ -172,7 +168,7 @@ def save_upload_surat(file_obj: UploadFile, kode_cabang: str, subfolder_name: st
 # ===============================================
 
 @router.get("/suratmasuk")
-async def surat_masuk(
+def surat_masuk(
     current_user: CurrentUser = Depends(get_current_user_data),
     db: Session = Depends(get_db)
 ):
@@ -229,7 +225,7 @@ async def surat_masuk(
     }
 
 @router.post("/suratmasuk/store")
-async def tambah_surat_masuk(
+def tambah_surat_masuk(
     asal_surat: str = Form(...),
     tujuan_surat: str = Form(...),
     perihal: str = Form(...),
@@ -272,6 +268,7 @@ async def tambah_surat_masuk(
     db.add(new_sm)
     db.commit()
     db.refresh(new_sm)
+    daily_stats.mark(new_sm.nik_satpam, new_sm.tanggal_surat)
 
     base_url = "https://frontend.k3guard.com/api-py/storage/"
     foto_url = f"{base_url}{foto_thumb_path}" if foto_thumb_path else (f"{base_url}{new_sm.foto}" if new_sm.foto else None)
@@ -304,7 +301,7 @@ async def tambah_surat_masuk(
     }
 
 @router.post("/suratmasuk/status/{id}")
-async def update_surat_masuk(
+def update_surat_masuk(
     id: int,
     nama_penerima: str = Form(...),
     no_penerima: Optional[str] = Form(None),
@@ -378,7 +375,7 @@ async def update_surat_masuk(
 # ===============================================
 
 @router.get("/suratkeluar")
-async def surat_keluar(
+def surat_keluar(
     current_user: CurrentUser = Depends(get_current_user_data),
     db: Session = Depends(get_db)
 ):
@@ -432,7 +429,7 @@ async def surat_keluar(
     }
 
 @router.post("/suratkeluar/store")
-async def tambah_surat_keluar(
+def tambah_surat_keluar(
     tujuan_surat: str = Form(...),
     perihal: Optional[str] = Form(None),
     foto: Optional[UploadFile] = File(None),
@@ -498,7 +495,7 @@ async def tambah_surat_keluar(
     }
 
 @router.post("/suratkeluar/status/{id}")
-async def update_surat_keluar(
+def update_surat_keluar(
     id: int,
     nama_penerima: str = Form(...),
     no_penerima: Optional[str] = Form(None),
@@ -12,6 +12,8 @@ from PIL import Image
 import io
 
 from app.database import get_db
+from app.core import master_cache
+from app.services import daily_stats
 from app.routers.auth_legacy import get_current_user_data, CurrentUser
 from app.models.models import Karyawan, Tamu, Presensi, PresensiJamkerja, SetJamKerjaByDate, SetJamKerjaByDay, PresensiJamkerjaByDeptDetail, EmployeeSchedule
 
@@ -57,11 +59,11 @@ def get_jam_kerja_karyawan(db: Session, nik: str, kode_cabang: str, kode_dept: s
     # 0. Check By Date Extra (Lembur / Double Shift) - Highest Priority
     try:
         from app.models.models import PresensiJamkerjaBydateExtra
-        jk_extra = db.query(PresensiJamkerja)\
-            .join(PresensiJamkerjaBydateExtra, PresensiJamkerjaBydateExtra.kode_jam_kerja == PresensiJamkerja.kode_jam_kerja)\
+        jk_extra_row = db.query(PresensiJamkerjaBydateExtra.kode_jam_kerja)\
             .filter(PresensiJamkerjaBydateExtra.nik == nik)\
             .filter(PresensiJamkerjaBydateExtra.tanggal == tanggal)\
             .first()
+        jk_extra = master_cache.get_jam_kerja(db, jk_extra_row.kode_jam_kerja) if jk_extra_row else None
             
         if jk_extra:
             return jk_extra
@@ -77,28 +79,28 @@ def get_jam_kerja_karyawan(db: Session, nik: str, kode_cabang: str, kode_dept: s
             EmployeeSchedule.tanggal == tanggal
         ).first()
         if bs:
-            jk_bulk = db.query(PresensiJamkerja).filter(PresensiJamkerja.kode_jam_kerja == bs.kode_jam_kerja).first()
+            jk_bulk = master_cache.get_jam_kerja(db, bs.kode_jam_kerja)
             if jk_bulk:
                 return jk_bulk
     except Exception as e:
         logger.error(f"Error querying EmployeeSchedule: {e}")
 
     # 1. Start Check By Date (Tukar Shift / Rotasi)
-    jk_by_date = db.query(PresensiJamkerja)\
-        .join(SetJamKerjaByDate, SetJamKerjaByDate.kode_jam_kerja == PresensiJamkerja.kode_jam_kerja)\
+    jk_by_date_row = db.query(SetJamKerjaByDate.kode_jam_kerja)\
         .filter(SetJamKerjaByDate.nik == nik)\
         .filter(SetJamKerjaByDate.tanggal == tanggal)\
         .first()
+    jk_by_date = master_cache.get_jam_kerja(db, jk_by_date_row.kode_jam_kerja) if jk_by_date_row else None
         
     if jk_by_date:
         return jk_by_date
         
     # 2. Check By Day (Jadwal Rutin Personal)
-    jk_by_day = db.query(PresensiJamkerja)\
-        .join(SetJamKerjaByDay, SetJamKerjaByDay.kode_jam_kerja == PresensiJamkerja.kode_jam_kerja)\
+    jk_by_day_row = db.query(SetJamKerjaByDay.kode_jam_kerja)\
         .filter(SetJamKerjaByDay.nik == nik)\
         .filter(SetJamKerjaByDay.hari == hari)\
         .first()
+    jk_by_day = master_cache.get_jam_kerja(db, jk_by_day_row.kode_jam_kerja) if jk_by_day_row else None
         
     if jk_by_day:
         return jk_by_day
@@ -107,13 +109,7 @@ def get_jam_kerja_karyawan(db: Session, nik: str, kode_cabang: str, kode_dept: s
     try:
         from app.models.models import PresensiJamkerjaBydept, PresensiJamkerjaByDeptDetail
         
-        jk_dept = db.query(PresensiJamkerja)\
-            .join(PresensiJamkerjaByDeptDetail, PresensiJamkerjaByDeptDetail.kode_jam_kerja == PresensiJamkerja.kode_jam_kerja)\
-            .join(PresensiJamkerjaBydept, PresensiJamkerjaBydept.kode_jk_dept == PresensiJamkerjaByDeptDetail.kode_jk_dept)\
-            .filter(PresensiJamkerjaBydept.kode_cabang == kode_cabang)\
-            .filter(PresensiJamkerjaBydept.kode_dept == kode_dept)\
-            .filter(PresensiJamkerjaByDeptDetail.hari == hari)\
-            .first()
+        jk_dept = master_cache.get_jam_kerja(db, master_cache.get_dept_kode_jam_kerja(db, kode_cabang, kode_dept, hari))
             
         if jk_dept:
             return jk_dept
@@ -232,7 +228,7 @@ def save_compressed_image(upload_file: UploadFile, prefix: str):
 # --- ENDPOINTS ---
 
 @router.get("/tamu/riwayat")
-async def get_tamu_riwayat(
+def get_tamu_riwayat(
     limit: int = 20,
     page: int = 1,
     user: CurrentUser = Depends(get_current_user_data),
@@ -341,7 +337,7 @@ async def get_tamu_riwayat(
 
 
 @router.post("/tamu/store")
-async def store_tamu(
+def store_tamu(
     nama: str = Form(...),
     alamat: str = Form(None),
     jenis_id: str = Form(None),
@@ -415,6 +411,7 @@ async def store_tamu(
     })
     db.commit()
     new_id = result.lastrowid
+    daily_stats.mark(user.nik, now_wib())
 
     # Ambil data yang baru disimpan
     new_tamu = db.query(Tamu).filter(Tamu.id_tamu == new_id).first()
@@ -448,7 +445,7 @@ async def store_tamu(
 
 
 @router.post("/tamu/pulang/{id_tamu}")
-async def tamu_pulang(
+def tamu_pulang(
     id_tamu: int,
     foto_keluar: UploadFile = File(...),           # match field name dari Android
     jam_keluar: Optional[str] = Form(None),         # timestamp WIB dari device Android
@@ -27,7 +27,7 @@ os.makedirs(STORAGE_TASK_POINT, exist_ok=True)
 # --- GENERAL TASK (Insidentil) ---
 
 @router.get("/department-task/options")
-async def get_options(
+def get_options(
     user: CurrentUser = Depends(get_current_user_data),
     db: Session = Depends(get_db)
 ):
@@ -66,7 +66,7 @@ async def get_options(
     return {"status": True, "data": data} # Assuming data is list or object with list
 
 @router.post("/department-task/store")
-async def store_task(
+def store_task(
     tanggal: str = Form(...),
     jam_kegiatan: str = Form(..., alias="jamKegiatan"),
     jenis_kegiatan: str = Form(..., alias="jenisKegiatan"),
@@ -121,7 +121,7 @@ async def store_task(
 # --- ROUTINE TASK (Session Check) ---
 
 @router.get("/department-task/absen/data")
-async def get_task_absen_data(
+def get_task_absen_data(
     user: CurrentUser = Depends(get_current_user_data),
     db: Session = Depends(get_db)
 ):
@@ -152,7 +152,7 @@ async def get_task_absen_data(
     return {"status": True, "data": None}
 
 @router.post("/department-task/absen")
-async def absen_task(
+def absen_task(
     lokasi: str = Form(None),
     keterangan: str = Form(None),
     foto_task: UploadFile = File(..., alias="fotoTask"),
@@ -230,7 +230,7 @@ async def absen_task(
         return {"status": True, "message": "Sesi Tugas Dimulai", "data": {"status": "active", "id": new_session.id}}
 
 @router.post("/department-task/point/store")
-async def store_task_point(
+def store_task_point(
     sessionId: int = Form(..., alias="sessionId"),
     taskPointMasterId: int = Form(..., alias="taskPointMasterId"),
     lokasi: str = Form(None),
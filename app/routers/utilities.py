@@ -10,6 +10,8 @@ import sys
 import traceback
 from app.core.permissions import CurrentUser, get_current_user, require_permission_dependency
 from app.core.security import get_password_hash
+from app.core import principal_cache
+from app.core.date_range import date_between
 
 router = APIRouter(
     prefix="/api/utilities",
@@ -42,7 +44,7 @@ class UserListResponse(BaseModel):
     meta: Optional[PaginationMeta] = None
 
 @router.get("/users", response_model=UserListResponse)
-async def get_users(
+def get_users(
     search: Optional[str] = Query(None, description="Search by Name/Email"),
     page: int = Query(1, ge=1),
     limit: int = Query(20, le=1000),
@@ -110,7 +112,7 @@ class CreateUserDTO(BaseModel):
     role_id: Optional[int] = None
 
 @router.post("/users", response_model=UserDTO)
-async def create_user(
+def create_user(
     payload: CreateUserDTO,
     current_user: CurrentUser = Depends(require_permission_dependency("users.create")),
     db: Session = Depends(get_db)
@@ -164,7 +166,7 @@ class UpdateUserDTO(BaseModel):
     role_id: Optional[int] = None
 
 @router.put("/users/{id}", response_model=UserDTO)
-async def update_user(
+def update_user(
     id: int,
     payload: UpdateUserDTO,
     current_user: CurrentUser = Depends(require_permission_dependency("users.update")),
@@ -200,6 +202,7 @@ async def update_user(
             db.execute(text("INSERT INTO model_has_roles (role_id, model_type, model_id) VALUES (:rid, 'App\\\\Models\\\\User', :uid)"), {"rid": payload.role_id, "uid": id})
 
         db.commit()
+        principal_cache.invalidate_user(id)
         db.refresh(user)
         
         dto = UserDTO.model_validate(user)
@@ -217,7 +220,7 @@ async def update_user(
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.delete("/users/{id}")
-async def delete_user(
+def delete_user(
     id: int,
     current_user: CurrentUser = Depends(require_permission_dependency("users.delete")),
     db: Session = Depends(get_db)
@@ -232,6 +235,7 @@ async def delete_user(
         # Delete user
         db.delete(user)
         db.commit()
+        principal_cache.invalidate_user(id)
         
         return {"message": "User deleted successfully"}
     except Exception as e:
@@ -252,7 +256,7 @@ class RoleDTO(BaseModel):
         from_attributes = True
 
 @router.get("/roles", response_model=List[RoleDTO])
-async def get_roles(
+def get_roles(
     name: Optional[str] = Query(None, description="Filter by Role Name"),
     current_user: CurrentUser = Depends(require_permission_dependency("roles.index")),
     db: Session = Depends(get_db)
@@ -288,7 +292,7 @@ class PermissionDTO(BaseModel):
         from_attributes = True
 
 @router.get("/permission-groups", response_model=List[PermissionGroupDTO])
-async def get_permission_groups(
+def get_permission_groups(
     current_user: CurrentUser = Depends(require_permission_dependency("permissiongroups.index")),
     db: Session = Depends(get_db)
 ):
@@ -299,7 +303,7 @@ async def get_permission_groups(
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.post("/permission-groups", response_model=PermissionGroupDTO)
-async def create_permission_group(
+def create_permission_group(
     payload: PermissionGroupDTO,
     current_user: CurrentUser = Depends(require_permission_dependency("permissiongroups.create")),
     db: Session = Depends(get_db)
@@ -315,7 +319,7 @@ async def create_permission_group(
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.put("/permission-groups/{id}", response_model=PermissionGroupDTO)
-async def update_permission_group(
+def update_permission_group(
     id: int,
     payload: PermissionGroupDTO,
     current_user: CurrentUser = Depends(require_permission_dependency("permissiongroups.update")),
@@ -337,7 +341,7 @@ async def update_permission_group(
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.delete("/permission-groups/{id}")
-async def delete_permission_group(
+def delete_permission_group(
     id: int,
     current_user: CurrentUser = Depends(require_permission_dependency("permissiongroups.delete")),
     db: Session = Depends(get_db)
@@ -357,7 +361,7 @@ async def delete_permission_group(
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/permissions", response_model=List[PermissionDTO])
-async def get_permissions(
+def get_permissions(
     id_permission_group: Optional[int] = Query(None, description="Filter by Permission Group ID"),
     current_user: CurrentUser = Depends(require_permission_dependency("permissions.index")),
     db: Session = Depends(get_db)
@@ -385,7 +389,7 @@ class CreatePermissionDTO(BaseModel):
     id_permission_group: int
 
 @router.post("/permissions", response_model=PermissionDTO)
-async def create_permission(
+def create_permission(
     payload: CreatePermissionDTO,
     current_user: CurrentUser = Depends(require_permission_dependency("permissions.create")),
     db: Session = Depends(get_db)
@@ -408,6 +412,7 @@ async def create_permission(
         
         db.add(new_permission)
         db.commit()
+        principal_cache.invalidate_all()
         db.refresh(new_permission)
         
         # Load relationship
@@ -435,7 +440,7 @@ class RolePermissionDTO(BaseModel):
         from_attributes = True
 
 @router.get("/roles/{role_id}/permissions")
-async def get_role_permissions(
+def get_role_permissions(
     role_id: int,
     db: Session = Depends(get_db)
 ):
@@ -462,7 +467,7 @@ class AssignPermissionsDTO(BaseModel):
     permission_ids: List[int]
 
 @router.post("/roles/{role_id}/permissions")
-async def assign_permissions_to_role(
+def assign_permissions_to_role(
     role_id: int,
     payload: AssignPermissionsDTO,
     db: Session = Depends(get_db)
@@ -484,6 +489,7 @@ async def assign_permissions_to_role(
         # Clear existing permissions and assign new ones
         role.permission = permissions
         db.commit()
+        principal_cache.invalidate_all()
         
         return {
             "message": "Permissions assigned successfully",
@@ -498,7 +504,7 @@ async def assign_permissions_to_role(
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.delete("/roles/{role_id}/permissions/{permission_id}")
-async def remove_permission_from_role(
+def remove_permission_from_role(
     role_id: int,
     permission_id: int,
     db: Session = Depends(get_db)
@@ -517,6 +523,7 @@ async def remove_permission_from_role(
         if permission in role.permission:
             role.permission.remove(permission)
             db.commit()
+            principal_cache.invalidate_all()
             return {"message": "Permission removed successfully"}
         else:
             raise HTTPException(status_code=404, detail="Permission not assigned to this role")
@@ -546,7 +553,7 @@ class LoginLogDTO(BaseModel):
         from_attributes = True
 
 @router.get("/logs", response_model=List[LoginLogDTO])
-async def get_logs(
+def get_logs(
     user: Optional[str] = Query(None),
     ip: Optional[str] = Query(None),
     device: Optional[str] = Query(None),
@@ -631,7 +638,7 @@ async def get_logs(
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.delete("/logs/{id}")
-async def delete_log(
+def delete_log(
     id: int,
     current_user: CurrentUser = Depends(require_permission_dependency("logs.delete")),
     db: Session = Depends(get_db)
@@ -668,7 +675,7 @@ class SecurityReportDTO(BaseModel):
         from_attributes = True
 
 @router.get("/security-reports", response_model=List[SecurityReportDTO])
-async def get_security_reports(
+def get_security_reports(
     keyword: Optional[str] = Query(None),
     nik_filter: Optional[str] = Query(None),
     kode_cabang: Optional[str] = Query(None),
@@ -711,11 +718,8 @@ async def get_security_reports(
         if kode_dept:
             query = query.filter(Karyawan.kode_dept == kode_dept)
             
-        if date_start:
-            query = query.filter(func.date(SecurityReports.created_at) >= date_start)
-            
-        if date_end:
-            query = query.filter(func.date(SecurityReports.created_at) <= date_end)
+        if date_start or date_end:
+            query = query.filter(date_between(SecurityReports.created_at, date_start, date_end))
             
         if type_filter:
             query = query.filter(SecurityReports.type == type_filter)
@@ -759,7 +763,7 @@ async def get_security_reports(
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.delete("/security-reports/{id}")
-async def delete_security_report(id: int, db: Session = Depends(get_db)):
+def delete_security_report(id: int, db: Session = Depends(get_db)):
     try:
         report = db.query(SecurityReports).filter(SecurityReports.id == id).first()
         if not report:
@@ -791,7 +795,7 @@ class MultiDeviceDTO(BaseModel):
     last_login: datetime
 
 @router.get("/multi-device", response_model=List[MultiDeviceDTO])
-async def get_multi_device(
+def get_multi_device(
     from_date: Optional[str] = Query(None, alias="from"),
     to_date: Optional[str] = Query(None, alias="to"),
     limit: int = 15,
@@ -871,7 +875,7 @@ class IgnoreDeviceDTO(BaseModel):
     device: str
 
 @router.post("/multi-device/ignore")
-async def ignore_multi_device(
+def ignore_multi_device(
     payload: IgnoreDeviceDTO,
     db: Session = Depends(get_db)
 ):
@@ -895,7 +899,7 @@ class DeleteDeviceDTO(BaseModel):
     device: str
 
 @router.delete("/multi-device/logs")
-async def delete_multi_device_logs(
+def delete_multi_device_logs(
     # Use payload body for DELETE is often discouraged but works, or use query params.
     # FastAPI supports body in DELETE via dependencies or distinct model, but simpler to use query for key.
     # But let's stick to payload for consistency with 'ignore' if feasible, or query params.
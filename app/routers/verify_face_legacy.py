@@ -2,6 +2,7 @@ from fastapi import APIRouter, Depends, UploadFile, File, Form, HTTPException
 from app.routers.auth_legacy import get_current_user_nik
 from app.database import get_db
 from sqlalchemy.orm import Session
+from app.core.offload import run_blocking
 
 router = APIRouter(
     prefix="/api/android/deteksiwajah",
@@ -9,6 +10,27 @@ router = APIRouter(
     responses={404: {"description": "Not found"}},
 )
 
+def _buka_kunci(db: Session, nik: str):
+    """Clear Lock & Unlock Device setelah wajah terverifikasi (sinkron, via run_blocking)."""
+    from sqlalchemy import text
+    try:
+        # 1. Update status Security Reports jadi resolved (alih-alih dihapus)
+        db.execute(
+            text("UPDATE security_reports SET status_flag = 'resolved' WHERE type = 'FACE_LIVENESS_LOCK' AND nik = :nik"), 
+            {"nik": nik}
+        )
+        
+        # 2. Unlock Karyawan Device
+        db.execute(
+            text("UPDATE karyawan SET lock_device_login = '0' WHERE nik = :nik"), 
+            {"nik": nik}
+        )
+        
+        db.commit()
+    except Exception as db_e:
+        print(f"DB Error clearing lock: {db_e}")
+        # Continue anyway, don't fail the verification
+
 @router.post("/verify")
 async def verify_face(
     image: UploadFile = File(...),
@@ -16,7 +38,6 @@ async def verify_face(
     db: Session = Depends(get_db)
 ):
     import httpx
-    from sqlalchemy import text
     
     # URL Service Flask (Port 5000)
     FLASK_SERVICE_URL = "http://localhost:5000/api/deteksiwajah/verify"
@@ -49,23 +70,7 @@ async def verify_face(
             # --- LARAVEL LOGIC REPLICATION ---
             # If Verified: Clear Lock & Unlock Device
             if response.status_code == 200 and is_verified:
-                try:
-                    # 1. Update status Security Reports jadi resolved (alih-alih dihapus)
-                    db.execute(
-                        text("UPDATE security_reports SET status_flag = 'resolved' WHERE type = 'FACE_LIVENESS_LOCK' AND nik = :nik"), 
-                        {"nik": nik}
-                    )
-                    
-                    # 2. Unlock Karyawan Device
-                    db.execute(
-                        text("UPDATE karyawan SET lock_device_login = '0' WHERE nik = :nik"), 
-                        {"nik": nik}
-                    )
-                    
-                    db.commit()
-                except Exception as db_e:
-                    print(f"DB Error clearing lock: {db_e}")
-                    # Continue anyway, don't fail the verification
+                await run_blocking(_buka_kunci, db, nik)
             
             # Return Flask respose merged with status message, matching Android VerifyFaceResponse
             # Android expects: status, message, best_distance, best_ref, threshold
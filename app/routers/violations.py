@@ -1,41 +1,26 @@
 
-from fastapi import APIRouter, Depends, HTTPException, Query, UploadFile, File, Form, BackgroundTasks
+from fastapi import APIRouter, Depends, HTTPException, Query, UploadFile, File, Form
 from sqlalchemy.orm import Session
 from typing import Optional, List
 from datetime import datetime, date, timedelta
-from app.database import get_db, SessionLocal
+from app.database import get_db
 from app.models.models import (
-    Violation, Karyawan, Presensi, PresensiJamkerja, Cabang,
+    Violation, Karyawan, Presensi, PresensiJamkerja,
     PatrolSchedules, PatrolSessions, DepartmentTaskSessions, Departemen, AppFraud,
     EmployeeLocationHistories, SecurityReports
 )
 from sqlalchemy import func, or_, and_, desc
+from sqlalchemy.exc import IntegrityError
 import shutil
 import os
 import uuid
-from sqlalchemy import text
-
-def get_excluded_niks(db: Session):
-    excluded_roles = [
-        "Super Admin", 
-        "Admin Departemen", 
-        "Unit Pelaksana Pelayanan Pelanggan", 
-        "Unit Layanan Pelanggan"
-    ]
-    try:
-        query = text("""
-            SELECT uk.nik 
-            FROM users_karyawan uk
-            JOIN model_has_roles mhr ON uk.id_user = mhr.model_id
-            JOIN roles r ON mhr.role_id = r.id
-            WHERE mhr.model_type = 'App\\\\Models\\\\User'
-            AND r.name IN :roles
-        """)
-        result = db.execute(query, {"roles": tuple(excluded_roles)}).fetchall()
-        return [row[0] for row in result]
-    except Exception as e:
-        print(f"Error fetching excluded NIKs: {e}")
-        return []
+import numpy as np
+from app.core.date_range import on_date
+from app.services import daily_stats, geofence
+from app.services.violation_detector import (
+    get_excluded_niks, cek_terlambat, severity_fraud, severity_report,
+    FRAUD_LABELS, REPORT_LABELS, REPORT_CODES
+)
 
 router = APIRouter(
     prefix="/api/security/violations",
@@ -46,46 +31,8 @@ router = APIRouter(
 UPLOAD_DIR = "/var/www/appPatrol/storage/app/public/violations"
 os.makedirs(UPLOAD_DIR, exist_ok=True)
 
-def background_sync_violations():
-    db = SessionLocal()
-    try:
-        today = date.today()
-        # scan today and yesterday
-        detected_today = scan_violations(date_scan=today, db=db)
-        yesterday = today - timedelta(days=1)
-        detected_yesterday = scan_violations(date_scan=yesterday, db=db)
-        
-        detected = detected_today + detected_yesterday
-        for d in detected:
-            timestamp_str = str(d['timestamp']).split(' ')[0]
-            exists = db.query(Violation).filter(
-                Violation.nik == d['nik'],
-                Violation.tanggal_pelanggaran == timestamp_str,
-                Violation.violation_type == d['violation_code']
-            ).first()
-            
-            if not exists:
-                new_v = Violation(
-                    nik=d['nik'],
-                    tanggal_pelanggaran=timestamp_str,
-                    jenis_pelanggaran=d['severity'],
-                    keterangan=d['description'],
-                    sanksi='',
-                    status='OPEN',
-                    source='SYSTEM',
-                    violation_type=d['violation_code']
-                )
-                db.add(new_v)
-        
-        db.commit()
-    except Exception as e:
-        print(f"Background auto-sync failed: {e}")
-    finally:
-        db.close()
-
 @router.get("")
 def get_violations(
-    background_tasks: BackgroundTasks,
     page: int = 1,
     per_page: int = 10,
     search: Optional[str] = None,
@@ -96,18 +43,7 @@ def get_violations(
     kode_dept: Optional[str] = None,
     db: Session = Depends(get_db)
 ):
-    today = date.today()
-    
-    # Fire and forget sync if querying recent dates
-    should_sync = False
-    if not date_start and not date_end:
-        should_sync = True
-    elif date_start and date_start <= today and (not date_end or date_end >= today):
-        should_sync = True
-        
-    if should_sync:
-        background_tasks.add_task(background_sync_violations)
-
+    # Deteksi otomatis berjalan sebagai job terjadwal (app.services.violation_detector)
     query = db.query(Violation).join(Karyawan, Violation.nik == Karyawan.nik)
 
     if kode_cabang:
@@ -173,7 +109,7 @@ def get_violations(
     return result
 
 @router.post("")
-async def create_violation(
+def create_violation(
     nik: str = Form(...),
     tanggal_pelanggaran: date = Form(...),
     jenis_pelanggaran: str = Form(...), # RINGAN, SEDANG, BERAT
@@ -204,8 +140,13 @@ async def create_violation(
         violation_type=violation_type
     )
     db.add(new_violation)
-    db.commit()
+    try:
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        raise HTTPException(status_code=409, detail="Pelanggaran dengan jenis yang sama sudah tercatat pada tanggal tersebut")
     db.refresh(new_violation)
+    daily_stats.mark(new_violation.nik, new_violation.tanggal_pelanggaran)
     return {"message": "Violation created", "id": new_violation.id}
 
 @router.delete("/{id}")
@@ -214,8 +155,10 @@ def delete_violation(id: int, db: Session = Depends(get_db)):
     if not violation:
         raise HTTPException(status_code=404, detail="Violation not found")
     
+    nik, tanggal = violation.nik, violation.tanggal_pelanggaran
     db.delete(violation)
     db.commit()
+    daily_stats.mark(nik, tanggal)
     return {"message": "Violation deleted"}
 
 @router.get("/scan")
@@ -251,23 +194,19 @@ def scan_violations(
 
     for p, k, pj in presensi_list:
         # Check Late
-        if p.jam_in and pj:
-            jam_in_time_str = p.jam_in.strftime("%H:%M:%S") if hasattr(p.jam_in, 'strftime') else str(p.jam_in)[-8:]
-            if len(jam_in_time_str) > 8: # Just in case it's still datetime format like '2026-02-22 08:15:00'
-                jam_in_time_str = jam_in_time_str.split(' ')[-1]
-            jam_masuk_str = pj.jam_masuk.strftime("%H:%M:%S") if hasattr(pj.jam_masuk, 'strftime') else str(pj.jam_masuk)[:8]
-            
-            if jam_in_time_str > jam_masuk_str:
-                if is_new(p.nik, 'LATE'):
-                    results.append({
-                        "nik": p.nik,
-                        "nama_karyawan": k.nama_karyawan,
-                        "type": "Terlambat",
-                        "description": f"Check-in pada {jam_in_time_str} (Jadwal: {jam_masuk_str})",
-                        "timestamp": f"{date_scan} {jam_in_time_str}",
-                        "severity": "RINGAN",
-                        "violation_code": "LATE"
-                    })
+        telat = cek_terlambat(p.jam_in, pj.jam_masuk) if pj else None
+        if telat:
+            jam_in_time_str, jam_masuk_str = telat
+            if is_new(p.nik, 'LATE'):
+                results.append({
+                    "nik": p.nik,
+                    "nama_karyawan": k.nama_karyawan,
+                    "type": "Terlambat",
+                    "description": f"Check-in pada {jam_in_time_str} (Jadwal: {jam_masuk_str})",
+                    "timestamp": f"{date_scan} {jam_in_time_str}",
+                    "severity": "RINGAN",
+                    "violation_code": "LATE"
+                })
 
         # Check No Checkout (if applicable)
         # Logic: If date_scan < today AND jam_out is NULL with jam_in.
@@ -379,12 +318,12 @@ def scan_violations(
     # This is a bit weak without strict schedule binding.
     # Check if they are PRESENT but have 0 patrol sessions
     security_present = [(p, k) for p, k, _ in presensi_list if k.kode_dept in ['SEC', 'UK3', 'SAT'] and p.status == 'H']
+    patrol_counts = daily_stats.ringkasan(
+        db, date_scan, date_scan, niks=[p.nik for p, _ in security_present], kolom=("patroli",)
+    ) if security_present else {}
 
     for p, k in security_present:
-        patrol_count = db.query(PatrolSessions).filter(
-            PatrolSessions.nik == p.nik,
-            PatrolSessions.tanggal == date_scan
-        ).count()
+        patrol_count = patrol_counts.get(p.nik, {}).get("patroli", 0)
 
         if patrol_count == 0:
             if is_new(p.nik, 'MISSED_PATROL'):
@@ -400,26 +339,16 @@ def scan_violations(
 
     # 4. App Fraud (Fake GPS, Force Close, Rooted)
     # 4. App Fraud
-    q_frauds = db.query(AppFraud).filter(func.date(AppFraud.timestamp) == date_scan)
+    q_frauds = db.query(AppFraud).filter(on_date(AppFraud.timestamp, date_scan))
     if excluded_niks:
         q_frauds = q_frauds.filter(AppFraud.nik.notin_(excluded_niks))
     frauds = q_frauds.all()
 
-    label_map = {
-        'FAKE_GPS': 'Terdeteksi Fake GPS',
-        'FORCE_CLOSE': 'Aplikasi Force Close',
-        'ROOT_DEVICE': 'Perangkat Rooted'
-    }
-
     for f in frauds:
         violation_code = f.fraud_type
         # Only process known types or just pass through
-        label = label_map.get(violation_code, violation_code)
-        
-        # Severity
-        sev = 'SEDANG'
-        if violation_code in ['FAKE_GPS', 'ROOT_DEVICE']:
-            sev = 'BERAT'
+        label = FRAUD_LABELS.get(violation_code, violation_code)
+        sev = severity_fraud(violation_code)
             
         if is_new(f.nik, violation_code):
             results.append({
@@ -433,35 +362,15 @@ def scan_violations(
             })
 
     # 4b. Security Reports (Force Close, Fake GPS, Face Verify Fail)
-    q_reports = db.query(SecurityReports, Karyawan).join(Karyawan, SecurityReports.nik == Karyawan.nik).filter(func.date(SecurityReports.created_at) == date_scan, SecurityReports.status_flag == 'pending')
+    q_reports = db.query(SecurityReports, Karyawan).join(Karyawan, SecurityReports.nik == Karyawan.nik).filter(on_date(SecurityReports.created_at, date_scan), SecurityReports.status_flag == 'pending')
     if excluded_niks:
         q_reports = q_reports.filter(SecurityReports.nik.notin_(excluded_niks))
     reports = q_reports.all()
 
-    report_map = {
-        'FAKE_GPS': 'Terdeteksi Fake GPS (FCM)',
-        'APP_FORCE_CLOSE': 'Aplikasi Force Close',
-        'FACE_VERIFICATION_FAILED': 'Gagal Verifikasi Wajah',
-        'RADIUS_BYPASS': 'Melanggar Batas Radius Absensi',
-        'OUT_OF_LOCATION': 'Melanggar Batas Radius Patroli'
-    }
-    
-    code_map = {
-        'FAKE_GPS': 'FAKE_GPS',
-        'APP_FORCE_CLOSE': 'FORCE_CLOSE',
-        'FACE_VERIFICATION_FAILED': 'FACE_VERIFY_FAIL',
-        'RADIUS_BYPASS': 'OUT_OF_LOCATION',
-        'OUT_OF_LOCATION': 'OUT_OF_LOCATION'
-    }
-
     for r, k in reports:
-        report_type = code_map.get(r.type, r.type)
-        label = report_map.get(r.type, r.type)
-        
-        # Severity
-        sev = 'SEDANG'
-        if r.type in ['FAKE_GPS', 'FACE_VERIFICATION_FAILED']:
-            sev = 'BERAT'
+        report_type = REPORT_CODES.get(r.type, r.type)
+        label = REPORT_LABELS.get(r.type, r.type)
+        sev = severity_report(r.type)
             
         if is_new(r.nik, report_type):
             results.append({
@@ -477,7 +386,7 @@ def scan_violations(
     # 5. Laravel Mock Location Check (EmployeeLocationHistories.is_mocked = 1)
     # This might overlap with AppFraud(FAKE_GPS), but we check both sources as requested.
     q_mocked = db.query(EmployeeLocationHistories).filter(
-        func.date(EmployeeLocationHistories.recorded_at) == date_scan,
+        on_date(EmployeeLocationHistories.recorded_at, date_scan),
         EmployeeLocationHistories.is_mocked == 1
     )
     if excluded_niks:
@@ -499,18 +408,20 @@ def scan_violations(
             })
 
     # 6. Out of Location / Radius Violation (Live Tracking Check)
-    # Checks live location streams from EmployeeLocationHistories
-    import math
-
-    q_tracking = db.query(EmployeeLocationHistories, Karyawan, Cabang).join(
-        Karyawan, EmployeeLocationHistories.nik == Karyawan.nik
+    # Checks live location streams from EmployeeLocationHistories; jarak seluruh baris
+    # dihitung sekaligus terhadap pagar cabang masing-masing (app.services.geofence)
+    q_tracking = db.query(
+        EmployeeLocationHistories.nik,
+        EmployeeLocationHistories.latitude,
+        EmployeeLocationHistories.longitude,
+        EmployeeLocationHistories.recorded_at,
+        Karyawan.nama_karyawan,
+        Karyawan.kode_cabang
     ).join(
-        Cabang, Karyawan.kode_cabang == Cabang.kode_cabang
+        Karyawan, EmployeeLocationHistories.nik == Karyawan.nik
     ).filter(
-        func.date(EmployeeLocationHistories.recorded_at) == date_scan,
-        Karyawan.lock_location == '1',
-        Cabang.radius_cabang > 0,
-        Cabang.lokasi_cabang != None
+        on_date(EmployeeLocationHistories.recorded_at, date_scan),
+        Karyawan.lock_location == '1'
     )
     
     if excluded_niks:
@@ -518,36 +429,26 @@ def scan_violations(
         
     trackings = q_tracking.all()
 
-    for loc, k, c in trackings:
-        # Check if already processed to avoid expensive distance calculations and duplicates
-        if not is_new(k.nik, 'OUT_OF_LOCATION'):
-            continue
-            
-        try:
-            of_lat, of_lon = map(float, c.lokasi_cabang.split(','))
-            u_lat, u_lon = float(loc.latitude), float(loc.longitude)
-            
-            dLat = math.radians(of_lat - u_lat)
-            dLon = math.radians(of_lon - u_lon)
-            a = math.sin(dLat/2) * math.sin(dLat/2) + \
-                math.cos(math.radians(u_lat)) * math.cos(math.radians(of_lat)) * \
-                math.sin(dLon/2) * math.sin(dLon/2)
-            c_val = 2 * math.atan2(math.sqrt(a), math.sqrt(1-a))
-            distance = 6371000 * c_val
-            
-            if distance > c.radius_cabang:
-                 results.append({
-                     "nik": k.nik,
-                     "nama_karyawan": k.nama_karyawan,
-                     "type": "Di Luar Radius Kantor",
-                     "description": f"Terdeteksi lokasi di luar jangkauan saat bertugas ({int(distance)}m > {int(c.radius_cabang)}m)",
-                     "timestamp": str(loc.recorded_at),
-                     "severity": "SEDANG",
-                     "violation_code": "OUT_OF_LOCATION"
-                 })
-                 # Prevent multiple entries for the same NIK
-                 existing_map.add((k.nik, 'OUT_OF_LOCATION'))
-        except Exception:
-            continue
+    if trackings:
+        outside, distance, radius = geofence.branches(db).outside(
+            [t.kode_cabang for t in trackings],
+            [t.latitude for t in trackings],
+            [t.longitude for t in trackings]
+        )
+        for i in np.flatnonzero(outside):
+            t = trackings[i]
+            if not is_new(t.nik, 'OUT_OF_LOCATION'):
+                continue
+            results.append({
+                "nik": t.nik,
+                "nama_karyawan": t.nama_karyawan,
+                "type": "Di Luar Radius Kantor",
+                "description": f"Terdeteksi lokasi di luar jangkauan saat bertugas ({int(distance[i])}m > {int(radius[i])}m)",
+                "timestamp": str(t.recorded_at),
+                "severity": "SEDANG",
+                "violation_code": "OUT_OF_LOCATION"
+            })
+            # Prevent multiple entries for the same NIK
+            existing_map.add((t.nik, 'OUT_OF_LOCATION'))
 
     return results
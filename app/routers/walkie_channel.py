@@ -2,6 +2,7 @@ from fastapi import APIRouter, Depends, HTTPException, Query, status
 from sqlalchemy.orm import Session
 from sqlalchemy import or_
 from app.database import get_db
+from app.core import walkie_acl
 from app.models.models import WalkieChannels, WalkieChannelCabangs, Cabang, Departemen
 from typing import List, Optional
 from pydantic import BaseModel, constr
@@ -50,7 +51,7 @@ class DepartemenDTO(BaseModel):
         from_attributes = True
 
 @router.get("", response_model=dict)
-async def get_walkie_channels(
+def get_walkie_channels(
     search: Optional[str] = None,
     rule_type: Optional[str] = None,
     active: Optional[str] = None,
@@ -118,7 +119,7 @@ async def get_walkie_channels(
     }
 
 @router.post("", response_model=dict)
-async def create_walkie_channel(item: WalkieChannelCreate, db: Session = Depends(get_db)):
+def create_walkie_channel(item: WalkieChannelCreate, db: Session = Depends(get_db)):
     # Check if code exists
     existing = db.query(WalkieChannels).filter(WalkieChannels.code == item.code).first()
     if existing:
@@ -157,10 +158,11 @@ async def create_walkie_channel(item: WalkieChannelCreate, db: Session = Depends
         ))
         
     db.commit()
+    walkie_acl.invalidate()
     return {"status": "success", "message": "Channel created successfully", "data": {"id": new_channel.id}}
 
 @router.get("/{id}", response_model=dict)
-async def get_walkie_channel(id: int, db: Session = Depends(get_db)):
+def get_walkie_channel(id: int, db: Session = Depends(get_db)):
     channel = db.query(WalkieChannels).filter(WalkieChannels.id == id).first()
     if not channel:
         raise HTTPException(status_code=404, detail="Channel not found")
@@ -190,7 +192,7 @@ async def get_walkie_channel(id: int, db: Session = Depends(get_db)):
     return data
 
 @router.put("/{id}", response_model=dict)
-async def update_walkie_channel(id: int, item: WalkieChannelUpdate, db: Session = Depends(get_db)):
+def update_walkie_channel(id: int, item: WalkieChannelUpdate, db: Session = Depends(get_db)):
     channel = db.query(WalkieChannels).filter(WalkieChannels.id == id).first()
     if not channel:
         raise HTTPException(status_code=404, detail="Channel not found")
@@ -228,10 +230,11 @@ async def update_walkie_channel(id: int, item: WalkieChannelUpdate, db: Session
         ))
         
     db.commit()
+    walkie_acl.invalidate()
     return {"status": "success", "message": "Channel updated successfully"}
 
 @router.delete("/{id}", response_model=dict)
-async def delete_walkie_channel(id: int, db: Session = Depends(get_db)):
+def delete_walkie_channel(id: int, db: Session = Depends(get_db)):
     channel = db.query(WalkieChannels).filter(WalkieChannels.id == id).first()
     if not channel:
          raise HTTPException(status_code=404, detail="Channel not found")
@@ -239,14 +242,15 @@ async def delete_walkie_channel(id: int, db: Session = Depends(get_db)):
     db.query(WalkieChannelCabangs).filter(WalkieChannelCabangs.walkie_channel_id == id).delete()
     db.delete(channel)
     db.commit()
+    walkie_acl.invalidate()
     
     return {"status": "success", "message": "Channel deleted successfully"}
 
 # Helper endpoints for frontend dropdowns
 @router.get("/options/cabang", response_model=List[CabangDTO])
-async def get_cabang_options(db: Session = Depends(get_db)):
+def get_cabang_options(db: Session = Depends(get_db)):
     return db.query(Cabang).order_by(Cabang.nama_cabang).all()
 
 @router.get("/options/departemen", response_model=List[DepartemenDTO])
-async def get_departemen_options(db: Session = Depends(get_db)):
+def get_departemen_options(db: Session = Depends(get_db)):
     return db.query(Departemen).order_by(Departemen.kode_dept).all()
@@ -2,8 +2,8 @@ from fastapi import APIRouter, Depends, Query, HTTPException, Header
 from sqlalchemy.orm import Session
 from sqlalchemy import text
 from app.database import get_db
-from app.models.models import WalkieChannels, WalkieChannelCabangs, Karyawan, Users, WalkieChannelCabangs
 from app.routers.auth_legacy import get_current_user_data, CurrentUser, SECRET_KEY, ALGORITHM
+from app.core import walkie_acl
 from typing import List, Optional, Dict, Any
 from jose import jwt
 
@@ -24,44 +24,8 @@ router_node = APIRouter(
 # --- HELPER LOGIC ---
 
 def get_allowed_channels_query(db: Session, nik: str):
-    # 1. Get Karyawan Data (Cabang & Dept)
-    karyawan = db.query(Karyawan).filter(Karyawan.nik == nik).first()
-    if not karyawan:
-        return []
-
-    kode_cabang = karyawan.kode_cabang
-    kode_dept = karyawan.kode_dept
-    # print(f"DEBUG: User {nik} Cabang={kode_cabang} Dept={kode_dept}", flush=True)
-
-    # 2. Get All Active Channels
-    channels = db.query(WalkieChannels).filter(WalkieChannels.active == 1).all()
-    
-    allowed = []
-    for c in channels:
-        # Check Department Membership (if defined)
-        if c.dept_members:
-            depts = [d.strip() for d in c.dept_members.split(',')]
-            if kode_dept not in depts:
-                continue # Skip if not in allowed dept
-        
-        # Check Cabang Membership (via relation)
-        # Assuming rule_type='cabang_group' implies checking WalkieChannelCabangs
-        # We check relation if it exists
-        channel_cabangs = db.query(WalkieChannelCabangs).filter(WalkieChannelCabangs.walkie_channel_id == c.id).all()
-        allowed_cabangs = [cc.kode_cabang for cc in channel_cabangs]
-        
-        # LOGIC: If channel has specific cabangs assigned, you MUST be in one of them.
-        # If channel has NO cabangs assigned, is it open for all? Or closed? 
-        # Usually checking 'allowed_cabangs' existence implies restriction.
-        if allowed_cabangs and kode_cabang not in allowed_cabangs:
-            continue # Skip if not in allowed cabang
-            
-        allowed.append(c)
-        
-    # Sort: Priority desc, Name asc
-    allowed.sort(key=lambda x: (x.priority, x.name)) 
-    
-    return sorted(allowed, key=lambda x: x.priority, reverse=True)
+    # Index ACL channel (cache, satu query join) — lihat app.core.walkie_acl
+    return list(walkie_acl.allowed_channels(db, nik))
 
 # --- ANDROID ENDPOINT ---
 
@@ -87,7 +51,7 @@ def get_android_channels(token: Optional[str] = Query(None), db: Session = Depen
          channels = get_allowed_channels_query(db, user_nik)
     else:
          # Fallback: all active channels
-         channels = db.query(WalkieChannels).filter(WalkieChannels.active == 1).order_by(WalkieChannels.priority.desc(), WalkieChannels.code.asc()).all()
+         channels = sorted(walkie_acl.get_acl(db).active, key=lambda c: (-c.priority, c.code))
     
     data = []
     for c in channels:
@@ -0,0 +1,161 @@
+"""
+Attendance Metrics
+==================
+Perhitungan metrik presensi secara kolumnar (NumPy) — dipakai bersama oleh
+laporan harian, rekap presensi (app.services.laporan_presensi) dan dashboard.
+
+Input berupa kolom (list/array) per baris presensi, bukan objek per record:
+- tanggal             → datetime64[D]
+- jam_in / jam_out    → datetime64[us], None = NaT
+- jam_masuk / pulang  → timedelta64[us] sejak tengah malam, None = NaT
+- lintashari          → bool (jam pulang jatuh di hari berikutnya)
+
+Aturan sama dengan perhitungan lama per record:
+- telat        : jam_in > tanggal + jam_masuk; menit dibulatkan ke bawah
+- pulang_cepat : tanggal + jam_pulang (+1 hari jika lintashari) - jam_out, jam 2 desimal
+- total_jam    : jam_out - jam_in, jam 2 desimal
+Baris dengan nilai kosong (NaT) menghasilkan 0 / False.
+
+Pembulatan jam dilakukan half-up pada mikrodetik eksak (6.525 jam → 6.53);
+round() float lama bisa meleset 0.01 ke bawah pada nilai tepat di tengah (x.xx5).
+"""
+
+from datetime import date, datetime, timedelta
+
+import numpy as np
+
+EPOCH = datetime(1970, 1, 1)
+EPOCH_ORDINAL = EPOCH.toordinal()
+ONE_US = timedelta(microseconds=1)
+NAT = np.iinfo(np.int64).min
+US_PER_HOUR = 3600 * 10**6
+ONE_DAY = np.timedelta64(1, 'D')
+ZERO = np.timedelta64(0, 'us')
+
+# Kunci summary rekap dan kode status (lower-case) yang dihitung ke masing-masing kunci
+SUMMARY_KEYS = (
+    "hadir", "sakit", "izin", "alpha", "cuti",
+    "terlambat", "tidak_scan_masuk", "tidak_scan_pulang", "ta", "dl", "libur"
+)
+STATUS_SUMMARY = {
+    "hadir": ("h",),
+    "sakit": ("s",),
+    "izin": ("i",),
+    "alpha": ("a",),
+    "cuti": ("c",),
+    "ta": ("ta",),
+    "dl": ("dl",),
+    "libur": ("lb", "libr"),
+}
+
+
+# ─── Konversi kolom ────────────────────────────────────────────────────────
+# Konversi lewat integer (ordinal / mikrodetik sejak epoch) — jauh lebih cepat
+# daripada np.array(list_of_datetime, dtype='datetime64[...]').
+def to_date64(values) -> np.ndarray:
+    return (np.fromiter(map(date.toordinal, values), dtype=np.int64, count=len(values))
+            - EPOCH_ORDINAL).view('datetime64[D]')
+
+
+def to_datetime64(values) -> np.ndarray:
+    """datetime/None → datetime64[us] (None jadi NaT)."""
+    return np.array(
+        [(dt - EPOCH) // ONE_US if dt is not None else NAT for dt in values], dtype=np.int64
+    ).view('datetime64[us]')
+
+
+def to_time_offset(values) -> np.ndarray:
+    """time/None → timedelta64[us] sejak 00:00 (None jadi NaT)."""
+    offsets = {
+        t: ((t.hour * 60 + t.minute) * 60 + t.second) * 10**6 + t.microsecond
+        for t in set(values) if t is not None
+    }
+    return np.array([offsets.get(t, NAT) for t in values], dtype=np.int64).view('timedelta64[us]')
+
+
+# ─── Metrik per baris ──────────────────────────────────────────────────────
+def hitung(tanggal, jam_in, jam_out=None, jam_masuk=None, jam_pulang=None, lintashari=None) -> dict:
+    """
+    Hitung metrik untuk N baris sekaligus. Kolom yang None dianggap kosong semua.
+
+    Return dict array panjang N:
+        telat (bool), telat_menit (int64), pulang_cepat (bool),
+        pulang_cepat_jam (float64), total_jam (float64)
+    """
+    tgl = to_date64(tanggal).astype('datetime64[us]')
+    n = len(tgl)
+    nat_dt = np.full(n, np.datetime64('NaT'), dtype='datetime64[us]')
+    nat_td = np.full(n, np.timedelta64('NaT'), dtype='timedelta64[us]')
+
+    jam_in = to_datetime64(jam_in) if jam_in is not None else nat_dt
+    jam_out = to_datetime64(jam_out) if jam_out is not None else nat_dt
+    jam_masuk = to_time_offset(jam_masuk) if jam_masuk is not None else nat_td
+    jam_pulang = to_time_offset(jam_pulang) if jam_pulang is not None else nat_td
+    lintas = np.asarray(lintashari, dtype=bool) if lintashari is not None else np.zeros(n, dtype=bool)
+
+    with np.errstate(invalid='ignore'):
+        # Terlambat
+        selisih_masuk = jam_in - (tgl + jam_masuk)
+        telat = selisih_masuk > ZERO
+        telat_menit = np.where(telat, selisih_masuk, ZERO) // np.timedelta64(1, 'm')
+
+        # Pulang cepat
+        batas_pulang = tgl + jam_pulang + np.where(lintas, ONE_DAY, ZERO)
+        selisih_pulang = batas_pulang - jam_out
+        pulang_cepat = selisih_pulang > ZERO
+        pulang_cepat_jam = np.where(pulang_cepat, _jam(selisih_pulang), 0.0)
+
+        # Total jam kerja
+        lengkap = ~np.isnat(jam_in) & ~np.isnat(jam_out)
+        total_jam = np.where(lengkap, _jam(jam_out - jam_in), 0.0)
+
+    return {
+        "telat": telat,
+        "telat_menit": telat_menit.astype(np.int64),
+        "pulang_cepat": pulang_cepat,
+        "pulang_cepat_jam": pulang_cepat_jam,
+        "total_jam": total_jam,
+    }
+
+
+def _jam(delta: np.ndarray) -> np.ndarray:
+    """Selisih → jam, dibulatkan 2 desimal (half-up) dari nilai mikrodetik eksak."""
+    us = np.where(np.isnat(delta), ZERO, delta).astype(np.int64)
+    seperseratus = (np.abs(us) * 100 + US_PER_HOUR // 2) // US_PER_HOUR
+    return np.sign(us) * seperseratus / 100
+
+
+def dari_presensi(records) -> dict:
+    """Metrik untuk list (Presensi, PresensiJamkerja|None) — urutan hasil sama dengan input."""
+    tanggal, jam_in, jam_out, jam_masuk, jam_pulang, lintas = [], [], [], [], [], []
+    for p, jk in records:
+        tanggal.append(p.tanggal)
+        jam_in.append(p.jam_in)
+        jam_out.append(p.jam_out)
+        jam_masuk.append(jk.jam_masuk if jk else None)
+        jam_pulang.append(jk.jam_pulang if jk else None)
+        lintas.append(bool(p.lintashari))
+    return hitung(tanggal, jam_in, jam_out, jam_masuk, jam_pulang, lintas)
+
+
+# ─── Ringkasan ─────────────────────────────────────────────────────────────
+def ringkas_status(kode: np.ndarray, telat: np.ndarray, tanpa_masuk: np.ndarray,
+                   tanpa_pulang: np.ndarray) -> dict:
+    """
+    Summary rekap per baris dari matriks karyawan × tanggal.
+
+    kode         : kode status lower-case ('h', 's', 'libr', ...)
+    telat        : bool, jam_in terlambat
+    tanpa_masuk  : bool, presensi tanpa jam_in
+    tanpa_pulang : bool, presensi tanpa jam_out
+    Terlambat / tidak scan hanya dihitung untuk sel berstatus hadir.
+    """
+    summary = {}
+    for key, codes in STATUS_SUMMARY.items():
+        summary[key] = np.isin(kode, codes).sum(axis=1)
+    hadir = kode == 'h'
+    summary["terlambat"] = (hadir & telat).sum(axis=1)
+    summary["tidak_scan_masuk"] = (hadir & tanpa_masuk).sum(axis=1)
+    summary["tidak_scan_pulang"] = (hadir & tanpa_pulang).sum(axis=1)
+    return {key: summary[key] for key in SUMMARY_KEYS}
+
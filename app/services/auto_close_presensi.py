@@ -7,39 +7,99 @@ Alur:
 1. Ambil pengaturan: batas_jam_absen_pulang (dalam JAM)
 2. Cari semua presensi: jam_in != null, jam_out = null, status != 'ta'
 3. Hitung deadline = tanggal + jam_pulang + batas_jam_absen_pulang jam
-   (handle lintas hari: tambah 1 hari jika lintashari=1)
+   (handle lintas hari: tambah 1 hari jika jam_pulang <= jam_masuk)
 4. Jika now_wib > deadline → update:
-   - jam_out = deadline (waktu batas terakhir)
+   - jam_out = NULL (dikosongkan untuk menghindari rancu lembur)
    - status  = 'ta'   (Tidak Absen / lupa absen pulang)
+
+Langkah 2–4 dikerjakan sepenuhnya di MySQL dengan UPDATE … JOIN presensi_jamkerja,
+diproses per chunk (AUTO_CLOSE_CHUNK_SIZE baris, default 500) dengan commit per chunk
+agar row lock tidak ditahan lama. dry_run=True hanya mengembalikan ID yang akan ditutup.
+
+Manual:
+    python -m app.services.auto_close_presensi --dry-run
 """
 
+import os
+import sys
 import logging
-from datetime import datetime, date, timedelta, time as dtime, timezone
+from datetime import datetime, timedelta, timezone
 
+from sqlalchemy import text
 from sqlalchemy.orm import Session
 
 from app.database import SessionLocal
-from app.models.models import Presensi, PresensiJamkerja
+from app.core import master_cache
+from app.services import daily_stats
 
 logger = logging.getLogger("auto_close_presensi")
 
 TZ_WIB = timezone(timedelta(hours=7))
 
+CHUNK_SIZE = int(os.getenv("AUTO_CLOSE_CHUNK_SIZE", 500))
+
+# Presensi yang belum pulang (hari ini / kemarin lintas hari) dan sudah lewat deadline:
+#   tanggal + jam_pulang (+1 hari jika jam_pulang <= jam_masuk) + batas_jam jam < now
+_OVERDUE_FROM = """
+    FROM presensi p
+    JOIN presensi_jamkerja jk ON jk.kode_jam_kerja = p.kode_jam_kerja
+    WHERE p.jam_in IS NOT NULL
+      AND p.jam_out IS NULL
+      AND p.status != 'ta'
+      AND p.tanggal IN (:today, :yesterday)
+      AND jk.jam_pulang IS NOT NULL
+      AND TIMESTAMP(p.tanggal, jk.jam_pulang)
+          + INTERVAL IF(jk.jam_masuk IS NOT NULL AND jk.jam_pulang <= jk.jam_masuk, 1, 0) DAY
+          + INTERVAL :batas_jam HOUR < :now
+"""
+
 
 def _get_pengaturan(db: Session) -> dict:
-    """Ambil batas_jam_absen_pulang dari tabel pengaturan_umum."""
+    """Ambil batas_jam_absen_pulang dari pengaturan_umum (via master cache)."""
     try:
-        from sqlalchemy import text
-        row = db.execute(
-            text("SELECT batas_jam_absen_pulang FROM pengaturan_umum LIMIT 1")
-        ).fetchone()
-        return {"batas_jam_absen_pulang": int(row[0]) if row else 3}
+        setting = master_cache.get_pengaturan(db)
+        return {"batas_jam_absen_pulang": int(setting.batas_jam_absen_pulang) if setting else 3}
     except Exception as e:
         logger.warning(f"[AutoClose] Gagal ambil pengaturan: {e}")
         return {"batas_jam_absen_pulang": 3}
 
 
-def run_auto_close_presensi():
+def close_overdue_presensi(db: Session, now: datetime, batas_jam: int,
+                           dry_run: bool = False, chunk_size: int = CHUNK_SIZE):
+    """
+    Tandai presensi yang lewat deadline sebagai 'ta'.
+
+    dry_run=True → return list ID presensi yang akan ditutup (tanpa perubahan).
+    dry_run=False → return jumlah baris yang ditutup; commit setiap chunk.
+    """
+    params = {
+        "today": now.date(),
+        "yesterday": now.date() - timedelta(days=1),
+        "batas_jam": batas_jam,
+        "now": now,
+    }
+
+    if dry_run:
+        rows = db.execute(text(f"SELECT p.id {_OVERDUE_FROM} ORDER BY p.id"), params).fetchall()
+        return [r[0] for r in rows]
+
+    # Derived table ber-LIMIT dimaterialisasi MySQL, sehingga boleh membaca tabel yang di-update
+    stmt = text(f"""
+        UPDATE presensi
+        JOIN (SELECT p.id {_OVERDUE_FROM} ORDER BY p.id LIMIT :chunk) batch ON batch.id = presensi.id
+        SET presensi.jam_out = NULL, presensi.status = 'ta'
+    """)
+    closed = 0
+    while True:
+        affected = db.execute(stmt, {**params, "chunk": chunk_size}).rowcount
+        db.commit()
+        closed += affected
+        if affected < chunk_size:
+            break
+    return closed
+
+
+def run_auto_close_presensi(dry_run: bool = False):
     """
     Dijalankan setiap 5 menit.
     Tandai presensi 'ta' (lupa absen pulang) jika sudah melewati deadline.
@@ -48,8 +108,6 @@ def run_auto_close_presensi():
     try:
         now_wib = datetime.now(TZ_WIB)
         now     = now_wib.replace(tzinfo=None)   # naive untuk perbandingan
-        today   = now.date()
-        yesterday = today - timedelta(days=1)
 
         pengaturan = _get_pengaturan(db)
         batas_jam  = pengaturan["batas_jam_absen_pulang"]   # dalam JAM
@@ -59,74 +117,25 @@ def run_auto_close_presensi():
             f"batas_jam_absen_pulang={batas_jam} jam"
         )
 
-        # Ambil semua presensi yang belum pulang (hari ini atau kemarin lintas hari)
-        kandidat = db.query(Presensi).filter(
-            Presensi.jam_in  != None,
-            Presensi.jam_out == None,
-            Presensi.status  != 'ta',
-            Presensi.tanggal.in_([today, yesterday])
-        ).all()
-
-        closed_count = 0
-        for p in kandidat:
-            try:
-                # Ambil jam_pulang dari shift
-                jk = db.query(PresensiJamkerja).filter(
-                    PresensiJamkerja.kode_jam_kerja == p.kode_jam_kerja
-                ).first()
-
-                if not jk or not jk.jam_pulang:
-                    continue
-
-                # Hitung deadline: tanggal presensi + jam_pulang + batas jam
-                base_date = p.tanggal  # date object
-                jam_pulang_time = (
-                    jk.jam_pulang
-                    if isinstance(jk.jam_pulang, dtime)
-                    else datetime.strptime(str(jk.jam_pulang), "%H:%M:%S").time()
-                )
-
-                end_dt = datetime.combine(base_date, jam_pulang_time)
-
-                # Lintas hari: jam_pulang <= jam_masuk → selesai di hari berikutnya
-                if jk.jam_masuk:
-                    jam_masuk_time = (
-                        jk.jam_masuk
-                        if isinstance(jk.jam_masuk, dtime)
-                        else datetime.strptime(str(jk.jam_masuk), "%H:%M:%S").time()
-                    )
-                    start_dt = datetime.combine(base_date, jam_masuk_time)
-                    if end_dt <= start_dt:
-                        end_dt += timedelta(days=1)
-
-                # Tambah batas toleransi
-                deadline = end_dt + timedelta(hours=batas_jam)
-
-                if now > deadline:
-                    # Tandai sebagai 'ta' — Tidak Absen Pulang
-                    p.jam_out = None       # jam_out dikosongkan untuk menghindari rancu lembur
-                    p.status  = 'ta'
-                    db.add(p)
-                    closed_count += 1
-                    logger.info(
-                        f"[AutoClose] NIK={p.nik} tanggal={p.tanggal} "
-                        f"shift={p.kode_jam_kerja} | "
-                        f"deadline={deadline.strftime('%Y-%m-%d %H:%M')} | "
-                        f"→ status=ta, jam_out=None"
-                    )
-
-            except Exception as e:
-                logger.error(f"[AutoClose] Error proses NIK={p.nik}: {e}")
-                continue
-
-        if closed_count:
-            db.commit()
-            logger.info(f"[AutoClose] ✅ {closed_count} presensi ditandai 'ta' (lupa absen pulang)")
+        result = close_overdue_presensi(db, now, batas_jam, dry_run=dry_run)
+
+        if dry_run:
+            logger.info(f"[AutoClose] (dry-run) {len(result)} presensi akan ditandai 'ta': {result}")
+        elif result:
+            logger.info(f"[AutoClose] ✅ {result} presensi ditandai 'ta' (lupa absen pulang)")
+            daily_stats.mark_day(now.date())
+            daily_stats.mark_day(now.date() - timedelta(days=1))
         else:
             logger.debug("[AutoClose] Tidak ada presensi yang perlu ditutup.")
+        return result
 
     except Exception as e:
         logger.error(f"[AutoClose] Fatal error: {e}")
         db.rollback()
     finally:
         db.close()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    run_auto_close_presensi(dry_run="--dry-run" in sys.argv)
@@ -0,0 +1,458 @@
+"""
+Daily Employee Stats
+====================
+Rollup harian per (nik, tanggal) di tabel daily_employee_stats — sumber angka bulanan
+dashboard, /api/laporan/performance, statistik kinerja Android dan scan pelanggaran.
+Endpoint cukup SUM() satu rentang tanggal pada tabel ber-PK (nik, tanggal), bukan COUNT
+ulang ke delapan tabel transaksi dengan predikat func.date()/extract() yang mematikan index.
+
+Definisi kolom (sama dengan query lama di masing-masing endpoint):
+- presensi                : jumlah baris presensi
+- hadir/izin/sakit/cuti/alfa/ta : baris presensi per status (hadir = 'h' / 'hadir')
+- terlambat               : presensi hadir dengan jam_in > tanggal + jam_masuk (attendance_metrics)
+- total_jam               : SUM(presensi_jamkerja.total_jam) shift yang dipakai
+- patroli/patroli_selesai : patrol_sessions (semua / status 'complete')
+- safety_briefing, tamu (nik_satpam), barang (barang_masuk), turlalin, surat (surat_masuk),
+  pelanggaran (violations)
+
+Pembaruan inkremental:
+- titik tulis memanggil mark(nik, tanggal) setelah commit, atau mark_day(tanggal) untuk
+  UPDATE massal (auto-close). Tanda di-upsert ke tabel daily_employee_stats_dirty (nik '*'
+  = seluruh NIK hari itu) sehingga terlihat oleh semua worker dan selamat dari restart;
+  bila tabel tidak bisa ditulis, tanda ditampung di memori worker sebagai cadangan.
+- flush() menghitung ulang tanda dari tabel sumber, upsert rollup, lalu menghapus tanda
+  yang versinya masih sama (mark baru selama flush tetap tertinggal) dalam satu
+  transaksi — idempoten, aman dijalankan beberapa worker. Scheduler setiap
+  DAILY_STATS_FLUSH_SECONDS.
+- ringkasan() tidak menulis apa pun: (nik, tanggal) yang masih bertanda di rentang yang
+  dibaca dihitung langsung dari tabel sumber lewat session pemanggil dan menggantikan
+  baris rollup-nya, sehingga perubahan dari worker mana pun langsung terlihat.
+- rekonsiliasi() (job leader setiap DAILY_STATS_RECONCILE_MINUTES dan saat start)
+  menjalankan check + perbaikan untuk DAILY_STATS_RECONCILE_DAYS hari terakhir (WIB),
+  menutup tanda yang hilang bila worker mati di antara commit dan mark(). Tanggal yang
+  lebih lama diperbaiki manual dengan `check --fix`.
+
+Manual:
+    python -m app.services.daily_stats backfill 2026-01-01 2026-01-31
+    python -m app.services.daily_stats check 2026-01-01 2026-01-31 [--fix]
+"""
+
+import os
+import sys
+import logging
+import threading
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import select, func, case, delete, tuple_, Date, DateTime
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.orm import Session
+
+from app.database import SessionLocal
+from app.models.models import (
+    Presensi, PresensiJamkerja, PatrolSessions, SafetyBriefings, Tamu,
+    BarangMasuk, Turlalin, SuratMasuk, Violation
+)
+from app.models.daily_employee_stats import DailyEmployeeStats, DailyEmployeeStatsDirty
+from app.core.date_range import today_wib
+from app.services import attendance_metrics
+
+logger = logging.getLogger("daily_stats")
+
+FLUSH_SECONDS = int(os.getenv("DAILY_STATS_FLUSH_SECONDS", 30))
+RECONCILE_MINUTES = int(os.getenv("DAILY_STATS_RECONCILE_MINUTES", 60))
+RECONCILE_DAYS = int(os.getenv("DAILY_STATS_RECONCILE_DAYS", 3))
+UPSERT_BATCH = 500
+FLUSH_LIMIT = 5000
+HARI = "*"      # nik tanda untuk seluruh NIK pada satu tanggal
+
+COLUMNS = (
+    "presensi", "hadir", "terlambat", "izin", "sakit", "cuti", "alfa", "ta", "total_jam",
+    "patroli", "patroli_selesai", "safety_briefing", "tamu", "barang", "turlalin", "surat",
+    "pelanggaran",
+)
+STATUS_COLUMN = {"h": "hadir", "hadir": "hadir", "i": "izin", "s": "sakit", "c": "cuti", "a": "alfa", "ta": "ta"}
+
+# (kolom nik, kolom tanggal, {kolom rollup: agregat}) per tabel aktivitas
+_AKTIVITAS = (
+    (PatrolSessions.nik, PatrolSessions.tanggal, {
+        "patroli": func.count(),
+        "patroli_selesai": func.sum(case((PatrolSessions.status == 'complete', 1), else_=0)),
+    }),
+    (SafetyBriefings.nik, SafetyBriefings.tanggal_jam, {"safety_briefing": func.count()}),
+    (Tamu.nik_satpam, Tamu.jam_masuk, {"tamu": func.count()}),
+    (BarangMasuk.nik_satpam, BarangMasuk.tgl_jam_masuk, {"barang": func.count()}),
+    (Turlalin.nik, Turlalin.jam_masuk, {"turlalin": func.count()}),
+    (SuratMasuk.nik_satpam, SuratMasuk.tanggal_surat, {"surat": func.count()}),
+    (Violation.nik, Violation.tanggal_pelanggaran, {"pelanggaran": func.count()}),
+)
+
+_lock = threading.Lock()
+_flush_lock = threading.Lock()
+_pending = set()        # cadangan bila tabel tanda gagal ditulis: {(nik, tanggal)}
+_pending_days = set()   # cadangan: {tanggal} → hitung ulang seluruh NIK hari itu
+_stats = {"marked": 0, "flushes": 0, "refreshed": 0, "errors": 0, "reconciled": 0}
+
+
+def _as_date(value) -> date:
+    return value.date() if isinstance(value, datetime) else value
+
+
+# ─── Penandaan ─────────────────────────────────────────────────────────────
+def _simpan_tanda(rows: list) -> bool:
+    """Upsert tanda ke daily_employee_stats_dirty (versi naik bila sudah ada). False bila gagal."""
+    d = DailyEmployeeStatsDirty
+    stmt = mysql_insert(d.__table__).values([{"nik": nik, "tanggal": tgl, "versi": 1} for nik, tgl in rows])
+    stmt = stmt.on_duplicate_key_update(versi=d.versi + 1)
+    db = SessionLocal()
+    try:
+        db.execute(stmt)
+        db.commit()
+        return True
+    except Exception as e:
+        db.rollback()
+        logger.warning(f"[DailyStats] Gagal menyimpan {len(rows)} tanda, ditampung di memori: {e}")
+        return False
+    finally:
+        db.close()
+
+
+def mark_many(pairs):
+    """Tandai banyak (nik, tanggal) sekaligus dengan satu INSERT."""
+    rows = sorted({(nik, _as_date(tgl)) for nik, tgl in pairs if nik and tgl is not None})
+    if not rows:
+        return
+    with _lock:
+        _stats["marked"] += len(rows)
+    if not _simpan_tanda(rows):
+        with _lock:
+            _pending.update(rows)
+
+
+def mark(nik: str, tanggal):
+    """Tandai (nik, tanggal) untuk dihitung ulang; tanggal boleh date atau datetime."""
+    mark_many([(nik, tanggal)])
+
+
+def mark_day(tanggal):
+    """Tandai seluruh NIK pada satu tanggal (untuk UPDATE massal)."""
+    tgl = _as_date(tanggal)
+    with _lock:
+        _stats["marked"] += 1
+    if not _simpan_tanda([(HARI, tgl)]):
+        with _lock:
+            _pending_days.add(tgl)
+
+
+# ─── Hitung dari tabel sumber ──────────────────────────────────────────────
+def _kosong() -> dict:
+    return dict.fromkeys(COLUMNS, 0)
+
+
+def hitung(db: Session, mulai: date, sampai: date, niks=None) -> dict:
+    """{(nik, tanggal): {kolom: nilai}} langsung dari tabel sumber, mulai..sampai inklusif."""
+    batas = sampai + timedelta(days=1)
+    hasil = defaultdict(_kosong)
+
+    # Presensi — status & total jam per baris, terlambat dihitung kolumnar
+    stmt = select(Presensi.nik, Presensi.tanggal, Presensi.status, Presensi.jam_in,
+                  PresensiJamkerja.jam_masuk, PresensiJamkerja.total_jam)\
+        .outerjoin(PresensiJamkerja, Presensi.kode_jam_kerja == PresensiJamkerja.kode_jam_kerja)\
+        .where(Presensi.tanggal >= mulai, Presensi.tanggal < batas)
+    if niks is not None:
+        stmt = stmt.where(Presensi.nik.in_(niks))
+    hadir = []
+    for row in db.execute(stmt).all():
+        baris = hasil[(row.nik, row.tanggal)]
+        baris["presensi"] += 1
+        baris["total_jam"] += row.total_jam or 0
+        kolom = STATUS_COLUMN.get((row.status or "").lower())
+        if kolom:
+            baris[kolom] += 1
+            if kolom == "hadir":
+                hadir.append(row)
+    if hadir:
+        telat = attendance_metrics.hitung(
+            [r.tanggal for r in hadir], [r.jam_in for r in hadir], jam_masuk=[r.jam_masuk for r in hadir]
+        )["telat"]
+        for row, t in zip(hadir, telat.tolist()):
+            if t:
+                hasil[(row.nik, row.tanggal)]["terlambat"] += 1
+
+    # Aktivitas — satu GROUP BY per tabel, predikat rentang langsung pada kolom ber-index
+    for nik_col, tgl_col, agregat in _AKTIVITAS:
+        hari = func.date(tgl_col, type_=Date) if isinstance(tgl_col.type, DateTime) else tgl_col
+        stmt = select(nik_col, hari, *agregat.values())\
+            .where(tgl_col >= mulai, tgl_col < batas, nik_col.isnot(None))\
+            .group_by(nik_col, hari)
+        if niks is not None:
+            stmt = stmt.where(nik_col.in_(niks))
+        for nik, tgl, *nilai in db.execute(stmt).all():
+            hasil[(nik, tgl)].update(zip(agregat, (int(v or 0) for v in nilai)))
+
+    return hasil
+
+
+def _upsert(db: Session, rows: list):
+    for i in range(0, len(rows), UPSERT_BATCH):
+        stmt = mysql_insert(DailyEmployeeStats.__table__).values(rows[i:i + UPSERT_BATCH])
+        update = {k: stmt.inserted[k] for k in COLUMNS}
+        update["updated_at"] = func.now()
+        db.execute(stmt.on_duplicate_key_update(update))
+
+
+def refresh(db: Session, pairs) -> int:
+    """Hitung ulang dan upsert pasangan (nik, tanggal); tanpa commit. Return jumlah baris."""
+    per_hari = defaultdict(set)
+    for nik, tgl in pairs:
+        per_hari[tgl].add(nik)
+    total = 0
+    for tgl, niks in per_hari.items():
+        niks = sorted(niks)
+        for i in range(0, len(niks), UPSERT_BATCH):
+            chunk = niks[i:i + UPSERT_BATCH]
+            hasil = hitung(db, tgl, tgl, chunk)
+            _upsert(db, [{"nik": nik, "tanggal": tgl, **hasil[(nik, tgl)]} for nik in chunk])
+            total += len(chunk)
+    return total
+
+
+def refresh_day(db: Session, tanggal: date) -> int:
+    """Ganti seluruh baris rollup satu tanggal; tanpa commit. Return jumlah baris."""
+    hasil = hitung(db, tanggal, tanggal)
+    db.execute(delete(DailyEmployeeStats).where(DailyEmployeeStats.tanggal == tanggal))
+    _upsert(db, [{"nik": nik, "tanggal": tgl, **nilai} for (nik, tgl), nilai in hasil.items()])
+    return len(hasil)
+
+
+def _hapus_tanda(db: Session, rows: list):
+    """Hapus tanda yang sudah dihitung, hanya bila versinya belum berubah sejak dibaca."""
+    d = DailyEmployeeStatsDirty
+    keys = [(r.nik, r.tanggal, r.versi) for r in rows]
+    for i in range(0, len(keys), UPSERT_BATCH):
+        db.execute(delete(d).where(tuple_(d.nik, d.tanggal, d.versi).in_(keys[i:i + UPSERT_BATCH])))
+
+
+def flush() -> int:
+    """
+    Proses tanda di tabel (dari worker mana pun) + cadangan lokal dengan session sendiri.
+    Gagal → tanda tabel tetap ada, cadangan lokal dikembalikan ke antrean.
+    """
+    with _flush_lock:
+        with _lock:
+            lokal_pairs, lokal_days = set(_pending), set(_pending_days)
+            _pending.clear()
+            _pending_days.clear()
+
+        d = DailyEmployeeStatsDirty
+        db = SessionLocal()
+        try:
+            rows = db.execute(
+                select(d.nik, d.tanggal, d.versi).order_by(d.tanggal, d.nik).limit(FLUSH_LIMIT)
+            ).all()
+            days = lokal_days | {r.tanggal for r in rows if r.nik == HARI}
+            pairs = lokal_pairs | {(r.nik, r.tanggal) for r in rows if r.nik != HARI}
+            pairs = {(nik, tgl) for nik, tgl in pairs if tgl not in days}
+            if not pairs and not days:
+                return 0
+
+            total = sum(refresh_day(db, tgl) for tgl in sorted(days))
+            total += refresh(db, pairs)
+            _hapus_tanda(db, rows)
+            db.commit()
+            with _lock:
+                _stats["flushes"] += 1
+                _stats["refreshed"] += total
+            logger.debug(f"[DailyStats] flush: {len(pairs)} pasangan, {len(days)} hari, {total} baris")
+            return total
+        except Exception as e:
+            db.rollback()
+            logger.error(f"[DailyStats] flush gagal: {e}")
+            with _lock:
+                _pending.update(lokal_pairs)
+                _pending_days.update(lokal_days)
+                _stats["errors"] += 1
+            return 0
+        finally:
+            db.close()
+
+
+# ─── Pembacaan ─────────────────────────────────────────────────────────────
+def _tanda_rentang(db: Session, mulai: date, sampai: date) -> tuple:
+    """(pairs, days) yang masih bertanda di mulai..sampai — tabel tanda + cadangan lokal."""
+    d = DailyEmployeeStatsDirty
+    rows = db.execute(
+        select(d.nik, d.tanggal).where(d.tanggal >= mulai, d.tanggal <= sampai)
+    ).all()
+    with _lock:
+        lokal_pairs = {(nik, tgl) for nik, tgl in _pending if mulai <= tgl <= sampai}
+        lokal_days = {tgl for tgl in _pending_days if mulai <= tgl <= sampai}
+    days = lokal_days | {tgl for nik, tgl in rows if nik == HARI}
+    pairs = lokal_pairs | {(nik, tgl) for nik, tgl in rows if nik != HARI}
+    return {(nik, tgl) for nik, tgl in pairs if tgl not in days}, days
+
+
+def _saring_nik(db: Session, niks, kandidat: set) -> set:
+    """Bagian kandidat yang termasuk filter niks (list atau subquery select satu kolom)."""
+    if niks is None or not kandidat:
+        return kandidat
+    if isinstance(niks, (list, tuple, set, frozenset)):
+        return kandidat & set(niks)
+    kolom = list(niks.subquery().c)[0]
+    return set(db.scalars(select(kolom).where(kolom.in_(sorted(kandidat)))).all())
+
+
+def _hitung_tanda(db: Session, pairs: set, days: set, niks) -> dict:
+    """Nilai terkini {(nik, tanggal): {kolom: nilai}} untuk tanda yang belum di-flush."""
+    hasil = {}
+    for tgl in sorted(days):
+        hasil.update(hitung(db, tgl, tgl, niks))
+    izin = _saring_nik(db, niks, {nik for nik, _ in pairs})
+    per_hari = defaultdict(set)
+    for nik, tgl in pairs:
+        if nik in izin:
+            per_hari[tgl].add(nik)
+    for tgl, kumpulan in per_hari.items():
+        kumpulan = sorted(kumpulan)
+        for i in range(0, len(kumpulan), UPSERT_BATCH):
+            chunk = kumpulan[i:i + UPSERT_BATCH]
+            baru = hitung(db, tgl, tgl, chunk)
+            for nik in chunk:
+                hasil[(nik, tgl)] = baru[(nik, tgl)]
+    return hasil
+
+
+def ringkasan(db: Session, mulai: date, sampai: date, niks=None, kolom=COLUMNS) -> dict:
+    """
+    {nik: {"hari": n, kolom: jumlah}} untuk mulai..sampai inklusif.
+
+    niks boleh list atau subquery select(Karyawan.nik); None = semua NIK.
+    "hari" = jumlah tanggal yang memiliki presensi. Hanya membaca: baris yang masih
+    bertanda dihitung dari tabel sumber dalam transaksi pemanggil.
+    """
+    pairs, days = _tanda_rentang(db, mulai, sampai)
+    t = DailyEmployeeStats
+    stmt = select(
+        t.nik,
+        func.sum(case((t.presensi > 0, 1), else_=0)).label("hari"),
+        *(func.sum(getattr(t, k)).label(k) for k in kolom)
+    ).where(t.tanggal >= mulai, t.tanggal <= sampai).group_by(t.nik)
+    if niks is not None:
+        stmt = stmt.where(t.nik.in_(niks))
+    if days:
+        stmt = stmt.where(t.tanggal.notin_(sorted(days)))
+    if pairs:
+        stmt = stmt.where(tuple_(t.nik, t.tanggal).notin_(sorted(pairs)))
+    keys = ("hari",) + tuple(kolom)
+    hasil = {
+        row.nik: {k: int(row._mapping[k] or 0) for k in keys}
+        for row in db.execute(stmt).all()
+    }
+    if not pairs and not days:
+        return hasil
+
+    for (nik, _tgl), nilai in _hitung_tanda(db, pairs, days, niks).items():
+        baris = hasil.setdefault(nik, dict.fromkeys(keys, 0))
+        baris["hari"] += 1 if nilai["presensi"] > 0 else 0
+        for k in kolom:
+            baris[k] += int(nilai[k] or 0)
+    return hasil
+
+
+# ─── Backfill & konsistensi ────────────────────────────────────────────────
+def backfill(db: Session, mulai: date, sampai: date) -> int:
+    """Bangun ulang rollup mulai..sampai, commit per tanggal."""
+    total = 0
+    tgl = mulai
+    while tgl <= sampai:
+        total += refresh_day(db, tgl)
+        db.commit()
+        tgl += timedelta(days=1)
+    logger.info(f"[DailyStats] backfill {mulai}..{sampai}: {total} baris")
+    return total
+
+
+def check(db: Session, mulai: date, sampai: date) -> list:
+    """
+    Bandingkan rollup dengan hitungan langsung dari tabel sumber.
+
+    Return list {"nik", "tanggal", "selisih": {kolom: (rollup, sumber)}}; baris rollup yang
+    hilang dianggap nol.
+    """
+    flush()
+    hasil = []
+    tgl = mulai
+    while tgl <= sampai:
+        sumber = hitung(db, tgl, tgl)
+        rollup = {
+            (r.nik, r.tanggal): {k: getattr(r, k) for k in COLUMNS}
+            for r in db.query(DailyEmployeeStats).filter(DailyEmployeeStats.tanggal == tgl).all()
+        }
+        for key in sorted(set(sumber) | set(rollup)):
+            a = rollup.get(key) or _kosong()
+            b = sumber[key] if key in sumber else _kosong()
+            selisih = {k: (a[k], b[k]) for k in COLUMNS if a[k] != b[k]}
+            if selisih:
+                hasil.append({"nik": key[0], "tanggal": key[1], "selisih": selisih})
+        tgl += timedelta(days=1)
+    return hasil
+
+
+def rekonsiliasi(hari: int = RECONCILE_DAYS) -> int:
+    """
+    Job scheduler (leader): perbaiki baris rollup yang berbeda dari tabel sumber untuk
+    `hari` tanggal terakhir — menutup tanda yang hilang saat worker crash. Return jumlah baris.
+    """
+    sampai = today_wib()
+    mulai = sampai - timedelta(days=max(hari, 1) - 1)
+    db = SessionLocal()
+    try:
+        beda = check(db, mulai, sampai)
+        if not beda:
+            return 0
+        total = refresh(db, [(b["nik"], b["tanggal"]) for b in beda])
+        db.commit()
+        with _lock:
+            _stats["reconciled"] += total
+        logger.warning(f"[DailyStats] rekonsiliasi {mulai}..{sampai}: {total} baris rollup diperbaiki")
+        return total
+    except Exception as e:
+        db.rollback()
+        logger.error(f"[DailyStats] rekonsiliasi gagal: {e}")
+        with _lock:
+            _stats["errors"] += 1
+        return 0
+    finally:
+        db.close()
+
+
+def stats() -> dict:
+    with _lock:
+        return {**_stats, "pending": len(_pending), "pending_days": len(_pending_days)}
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    if len(sys.argv) < 4 or sys.argv[1] not in ("backfill", "check"):
+        print("Usage: python -m app.services.daily_stats backfill|check <mulai> <sampai> [--fix]")
+        sys.exit(2)
+
+    perintah = sys.argv[1]
+    mulai, sampai = date.fromisoformat(sys.argv[2]), date.fromisoformat(sys.argv[3])
+    db = SessionLocal()
+    try:
+        if perintah == "backfill":
+            print(f"{backfill(db, mulai, sampai)} baris rollup ditulis")
+        else:
+            beda = check(db, mulai, sampai)
+            for b in beda[:50]:
+                print(f"{b['tanggal']} {b['nik']}: {b['selisih']}")
+            print(f"{len(beda)} baris berbeda")
+            if beda and "--fix" in sys.argv:
+                refresh(db, [(b["nik"], b["tanggal"]) for b in beda])
+                db.commit()
+                print("Diperbaiki.")
+            elif beda:
+                sys.exit(1)
+    finally:
+        db.close()
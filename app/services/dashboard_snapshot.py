@@ -0,0 +1,502 @@
+"""
+Dashboard Snapshot
+==================
+Snapshot GET /api/dashboard per (tanggal, kode_cabang, kode_dept).
+
+Isi dashboard (rekap hari ini & kemarin, patroli aktif, presensi terbuka, top karyawan
+bulanan, chart 30 hari, target patroli) dihitung oleh build() lalu disimpan di memori
+bersama ETag-nya. Request hanya membaca snapshot, sehingga beban DB tidak bergantung
+pada jumlah browser admin yang sedang polling:
+- refresh_all() dijalankan APScheduler setiap DASHBOARD_SNAPSHOT_SECONDS (default 30)
+  hanya untuk key tanggal hari ini yang diminta dalam DASHBOARD_SNAPSHOT_IDLE detik
+  terakhir; tanggal lampau jarang berubah sehingga tidak dihitung ulang periodik
+- key baru / snapshot lebih tua dari DASHBOARD_SNAPSHOT_MAX_AGE dihitung langsung,
+  satu kali per key (request lain menunggu hasil yang sama)
+- jumlah key dibatasi DASHBOARD_SNAPSHOT_MAX_KEYS (LRU); tanggal bebas dari query
+  string tidak bisa membuat store tumbuh tanpa batas
+- meta() memberi computed_at & age_seconds agar UI bisa menampilkan umur data
+"""
+
+import os
+import json
+import time
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from datetime import date, timedelta, datetime
+
+from sqlalchemy import func, desc, case, and_, or_, select
+from sqlalchemy.orm import Session
+
+from app.database import SessionLocal
+from app.models.models import Presensi, Karyawan, Cabang, PatrolSessions, Tamu, BarangMasuk, BarangKeluar
+from app.core.date_range import on_date, date_between
+from app.services import daily_stats
+
+logger = logging.getLogger("dashboard_snapshot")
+
+REFRESH_SECONDS = int(os.getenv("DASHBOARD_SNAPSHOT_SECONDS", 30))
+IDLE_SECONDS = int(os.getenv("DASHBOARD_SNAPSHOT_IDLE", 600))
+MAX_AGE_SECONDS = int(os.getenv("DASHBOARD_SNAPSHOT_MAX_AGE", 120))
+MAX_KEYS = int(os.getenv("DASHBOARD_SNAPSHOT_MAX_KEYS", 200))
+
+_lock = threading.Lock()
+_snapshots = OrderedDict()  # (tanggal, kode_cabang, kode_dept) -> {"data", "etag", "computed_at", "last_access"}
+_key_locks = {}             # key -> Lock (satu perhitungan per key)
+_stats = {"hits": 0, "misses": 0, "refreshed": 0, "errors": 0, "evicted": 0}
+
+
+def build(db: Session, target_date: date, kode_cabang: str = None, kode_dept: str = None) -> dict:
+    """Hitung isi dashboard langsung dari database."""
+    # Rekap Presensi
+    rekap_query = db.query(
+        func.sum(case((Presensi.status == 'h', 1), else_=0)).label('hadir'),
+        func.sum(case((Presensi.status == 'i', 1), else_=0)).label('izin'),
+        func.sum(case((Presensi.status == 's', 1), else_=0)).label('sakit'),
+        func.sum(case((Presensi.status == 'c', 1), else_=0)).label('cuti'),
+        func.sum(case((Presensi.status == 'a', 1), else_=0)).label('alfa'),
+        func.sum(case((Presensi.status == 'ta', 1), else_=0)).label('lupa_pulang'),  # ← baru
+    ).join(Karyawan, Presensi.nik == Karyawan.nik)\
+     .filter(Presensi.tanggal == target_date)
+    
+    if kode_cabang:
+        rekap_query = rekap_query.filter(Karyawan.kode_cabang == kode_cabang)
+    if kode_dept:
+        rekap_query = rekap_query.filter(Karyawan.kode_dept == kode_dept)
+    
+    rekap = rekap_query.first()
+    
+    # Patroli Aktif
+    patroli_aktif = db.query(PatrolSessions)\
+        .join(Karyawan, PatrolSessions.nik == Karyawan.nik)\
+        .filter(PatrolSessions.status == 'active')
+    
+    if kode_cabang:
+        patroli_aktif = patroli_aktif.filter(Karyawan.kode_cabang == kode_cabang)
+    
+    patroli_aktif_count = patroli_aktif.count()
+    
+    # Presensi Terbuka
+    presensi_open = db.query(Presensi)\
+        .join(Karyawan, Presensi.nik == Karyawan.nik)\
+        .filter(and_(Presensi.jam_in.isnot(None), Presensi.jam_out.is_(None)))
+    
+    if kode_cabang:
+        presensi_open = presensi_open.filter(Karyawan.kode_cabang == kode_cabang)
+    
+    presensi_open_count = presensi_open.count()
+    
+    # Total Karyawan Aktif
+    total_karyawan_query = db.query(func.count(Karyawan.nik))\
+        .filter(Karyawan.status_aktif_karyawan == '1')
+    
+    if kode_cabang:
+        total_karyawan_query = total_karyawan_query.filter(Karyawan.kode_cabang == kode_cabang)
+    if kode_dept:
+        total_karyawan_query = total_karyawan_query.filter(Karyawan.kode_dept == kode_dept)
+    
+    total_karyawan = total_karyawan_query.scalar()
+    
+    # Hitung perubahan dari kemarin
+    yesterday = target_date - timedelta(days=1)
+    rekap_yesterday = db.query(
+        func.sum(case((Presensi.status == 'h', 1), else_=0)).label('hadir')
+    ).join(Karyawan, Presensi.nik == Karyawan.nik)\
+     .filter(Presensi.tanggal == yesterday)
+    
+    if kode_cabang:
+        rekap_yesterday = rekap_yesterday.filter(Karyawan.kode_cabang == kode_cabang)
+    
+    yesterday_hadir = rekap_yesterday.first().hadir or 0
+    
+    # Top Karyawan Performance — dari rollup harian bulan berjalan
+    perf_start = target_date.replace(day=1)
+    perf_end = (perf_start + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+    
+    karyawans = db.query(Karyawan).filter(Karyawan.status_aktif_karyawan == '1').all()
+    perf = daily_stats.ringkasan(
+        db, perf_start, perf_end,
+        niks=select(Karyawan.nik).where(Karyawan.status_aktif_karyawan == '1'),
+        kolom=("hadir", "patroli", "terlambat")
+    )
+        
+    karyawan_scores = []
+    for k in karyawans:
+        st = perf.get(k.nik, {})
+        h = st.get("hadir", 0)
+        p = st.get("patroli", 0)
+        t = st.get("terlambat", 0)
+        total = h + p - t
+        if total > 0 or h > 0 or p > 0:
+            karyawan_scores.append({
+                "nama": k.nama_karyawan,
+                "hadir": h,
+                "patroli": p,
+                "terlambat": t,
+                "total": total
+            })
+            
+    karyawan_scores.sort(key=lambda x: x['total'], reverse=True)
+    top_5 = karyawan_scores[:5]
+    
+    top_karyawan_chart = {
+        "categories": [x["nama"] for x in top_5],
+        "series": [
+            {"name": "Hadir", "data": [x["hadir"] for x in top_5]},
+            {"name": "Patroli", "data": [x["patroli"] for x in top_5]},
+            {"name": "Terlambat", "data": [x["terlambat"] for x in top_5]},
+        ]
+    }
+    
+    # Patroli Aktif List
+    patroli_list = db.query(
+        PatrolSessions,
+        Karyawan.nama_karyawan,
+        Cabang.nama_cabang
+    )\
+        .join(Karyawan, PatrolSessions.nik == Karyawan.nik)\
+        .outerjoin(Cabang, Karyawan.kode_cabang == Cabang.kode_cabang)\
+        .filter(PatrolSessions.status == 'active')\
+        .order_by(desc(PatrolSessions.jam_patrol))\
+        .limit(5)\
+        .all()
+    
+    # Presensi Open List
+    open_list = db.query(
+        Presensi,
+        Karyawan.nama_karyawan,
+        Karyawan.kode_dept,
+        Cabang.nama_cabang
+    )\
+        .join(Karyawan, Presensi.nik == Karyawan.nik)\
+        .outerjoin(Cabang, Karyawan.kode_cabang == Cabang.kode_cabang)\
+        .filter(and_(Presensi.jam_in.isnot(None), Presensi.jam_out.is_(None)))\
+        .order_by(desc(Presensi.jam_in))\
+        .limit(5)\
+        .all()
+    
+    # Tidak Hadir List
+    tidak_hadir = db.query(
+        Karyawan.nik,
+        Karyawan.nama_karyawan,
+        Karyawan.kode_dept,
+        Cabang.nama_cabang,
+        Presensi.status
+    )\
+        .outerjoin(Cabang, Karyawan.kode_cabang == Cabang.kode_cabang)\
+        .outerjoin(Presensi, and_(
+            Presensi.nik == Karyawan.nik,
+            Presensi.tanggal == target_date
+        ))\
+        .filter(
+            Karyawan.status_aktif_karyawan == '1',
+            or_(Presensi.jam_in.is_(None), Presensi.status.in_(['i', 's', 'c', 'a']))
+        )\
+        .limit(5)\
+        .limit(5)\
+        .all()
+        
+    # Tamu Hari Ini
+    tamu_query = db.query(func.count(Tamu.id_tamu))\
+        .filter(on_date(Tamu.jam_masuk, target_date))
+        
+    # Barang Hari Ini (Masuk + Keluar)
+    # Note: BarangMasuk & BarangKeluar are separate tables.
+    barang_masuk_count = db.query(func.count(BarangMasuk.id_barang_masuk))\
+        .filter(on_date(BarangMasuk.tgl_jam_masuk, target_date)).scalar() or 0
+        
+    barang_keluar_count = db.query(func.count(BarangKeluar.id_barang_keluar))\
+        .filter(on_date(BarangKeluar.tgl_jam_keluar, target_date)).scalar() or 0
+        
+    barang_count = barang_masuk_count + barang_keluar_count
+    
+    if kode_cabang:
+        tamu_query = tamu_query.join(Karyawan, Tamu.nik_satpam == Karyawan.nik)\
+            .filter(Karyawan.kode_cabang == kode_cabang)
+            
+    tamu_count = tamu_query.scalar() or 0
+    
+    # 8. Chart Data: Monthly Performance Trend (Last 30 Days)
+    # Group by Date, Count Presence (H, I, S, A)
+    endDate = target_date
+    startDate = endDate - timedelta(days=29)
+    
+    chart_query = db.query(
+        Presensi.tanggal.label('date'),
+        func.sum(case((Presensi.status == 'h', 1), else_=0)).label('hadir'),
+        func.sum(case((Presensi.status.in_(['i', 's', 'c']), 1), else_=0)).label('tidak_hadir') # Izin/Sakit/Cuti
+    ).join(Karyawan, Presensi.nik == Karyawan.nik)\
+     .filter(date_between(Presensi.tanggal, startDate, endDate))\
+     .group_by(Presensi.tanggal)\
+     .order_by(Presensi.tanggal)
+     
+    if kode_cabang:
+        chart_query = chart_query.filter(Karyawan.kode_cabang == kode_cabang)
+    if kode_dept:
+        chart_query = chart_query.filter(Karyawan.kode_dept == kode_dept)
+        
+    chart_results = chart_query.all()
+    
+    # Format for ApexCharts (or similar)
+    chart_data = {
+        "categories": [],
+        "series": [
+            {"name": "Hadir", "data": []},
+            {"name": "Izin/Sakit", "data": []}
+        ]
+    }
+    
+    # Fill missing dates with 0
+    current_d = startDate
+    result_map = {r.date: r for r in chart_results}
+    
+    while current_d <= endDate:
+        d_str = current_d.strftime('%d %b')
+        chart_data["categories"].append(d_str)
+        
+        if current_d in result_map:
+            res = result_map[current_d]
+            chart_data["series"][0]["data"].append(int(res.hadir or 0))
+            chart_data["series"][1]["data"].append(int(res.tidak_hadir or 0))
+        else:
+            chart_data["series"][0]["data"].append(0)
+            chart_data["series"][1]["data"].append(0)
+            
+        current_d += timedelta(days=1)
+
+    # ... (existing code: Target Patroli)
+    
+    # Target Patroli (Active Schedules)
+    from app.models.models import PatrolSchedules # Ensure import is available or use existing
+    
+    target_patroli_query = db.query(func.count(PatrolSchedules.id))\
+        .filter(PatrolSchedules.is_active == 1)
+        
+    if kode_cabang:
+        target_patroli_query = target_patroli_query.filter(PatrolSchedules.kode_cabang == kode_cabang)
+    if kode_dept:
+        target_patroli_query = target_patroli_query.filter(PatrolSchedules.kode_dept == kode_dept)
+        
+    target_patroli_count = target_patroli_query.scalar() or 0
+    
+    # 7. Target Patroli Chart by Cabang
+    # 7. Target Patroli Chart by Cabang (Sudah vs Belum)
+    target_patroli_by_cabang = db.query(
+        Cabang.kode_cabang,
+        Cabang.nama_cabang,
+        func.count(PatrolSchedules.id).label('total')
+    )\
+    .outerjoin(PatrolSchedules, and_(PatrolSchedules.kode_cabang == Cabang.kode_cabang, PatrolSchedules.is_active == 1))\
+    .group_by(Cabang.kode_cabang, Cabang.nama_cabang)\
+    .order_by(desc('total'))\
+    .all()
+    
+    done_patroli_by_cabang = db.query(
+        Karyawan.kode_cabang,
+        func.count(PatrolSessions.id).label('done')
+    )\
+    .join(Karyawan, PatrolSessions.nik == Karyawan.nik)\
+    .filter(PatrolSessions.tanggal == target_date)\
+    .group_by(Karyawan.kode_cabang)\
+    .all()
+    done_map = {row.kode_cabang: row.done for row in done_patroli_by_cabang}
+    
+    cat_cabang = []
+    sudah_data = []
+    belum_data = []
+    
+    for c in target_patroli_by_cabang:
+        if c.total > 0:
+            sudah = done_map.get(c.kode_cabang, 0)
+            belum = c.total - sudah
+            if belum < 0: belum = 0
+            cat_cabang.append(c.nama_cabang)
+            sudah_data.append(sudah)
+            belum_data.append(belum)
+
+    target_patroli_chart = {
+        "categories": cat_cabang,
+        "series": [
+            {
+                "name": "Sudah Dilakukan",
+                "data": sudah_data
+            },
+            {
+                "name": "Belum Dilakukan",
+                "data": belum_data
+            }
+        ]
+    }
+    
+    return {
+        "stats": {
+            "kehadiran": {
+                "hadir": rekap.hadir or 0,
+                "izin": rekap.izin or 0,
+                "sakit": rekap.sakit or 0,
+                "cuti": rekap.cuti or 0,
+                "alfa": rekap.alfa or 0,
+                "lupa_pulang": rekap.lupa_pulang or 0,  # ← status 'ta'
+                "change": (rekap.hadir or 0) - yesterday_hadir,
+                "changePercent": round(((rekap.hadir or 0) - yesterday_hadir) / max(yesterday_hadir, 1) * 100, 1) if yesterday_hadir > 0 else 0
+            },
+            "patroli_aktif": {
+                "value": patroli_aktif_count,
+                "change": 5,
+                "changePercent": 7.9
+            },
+            "izin_sakit": {
+                "value": (rekap.izin or 0) + (rekap.sakit or 0),
+                "change": -2,
+                "changePercent": -15.4
+            },
+            "total_karyawan": {
+                "value": total_karyawan or 0,
+                "change": 3,
+                "changePercent": 1.9
+            },
+            "presensi_open": presensi_open_count,
+            "tamu_hari_ini": tamu_count,
+            "barang_hari_ini": barang_count,
+            "target_patroli": target_patroli_count
+        },
+        "top_karyawan_chart": top_karyawan_chart,
+        "patroli_aktif_list": [
+            {
+                "nama_karyawan": p[1],
+                "nama_cabang": p[2],
+                "jam_patrol": p[0].jam_patrol.isoformat() if p[0].jam_patrol else None,
+                "nik": p[0].nik
+            }
+            for p in patroli_list
+        ],
+        "presensi_open_list": [
+            {
+                "nama_karyawan": p[1],
+                "kode_dept": p[2],
+                "nama_cabang": p[3],
+                "jam_in": p[0].jam_in.isoformat() if p[0].jam_in else None,
+                "nik": p[0].nik
+            }
+            for p in open_list
+        ],
+        "tidak_hadir_list": [
+            {
+                "nik": t.nik,
+                "nama_karyawan": t.nama_karyawan,
+                "kode_dept": t.kode_dept,
+                "nama_cabang": t.nama_cabang,
+                "status": t.status or "a"
+            }
+            for t in tidak_hadir
+        ],
+        "target_patroli_chart": target_patroli_chart,
+        "chart_data": chart_data,
+        "tanggal": target_date.isoformat()
+    }
+
+
+# ─── Snapshot store ────────────────────────────────────────────────────────
+def _etag(data: dict) -> str:
+    raw = json.dumps(data, sort_keys=True, default=str).encode()
+    return '"' + hashlib.sha1(raw).hexdigest()[:20] + '"'
+
+
+def _compute(key: tuple) -> dict:
+    target_date, kode_cabang, kode_dept = key
+    db = SessionLocal()
+    try:
+        data = build(db, target_date, kode_cabang, kode_dept)
+    finally:
+        db.close()
+    entry = {"data": data, "etag": _etag(data), "computed_at": time.time()}
+    with _lock:
+        lama = _snapshots.get(key)
+        entry["last_access"] = lama["last_access"] if lama else entry["computed_at"]
+        _snapshots[key] = entry     # key lama tetap di posisinya: refresh bukan akses
+        while len(_snapshots) > MAX_KEYS:
+            oldest, _ = _snapshots.popitem(last=False)
+            _key_locks.pop(oldest, None)
+            _stats["evicted"] += 1
+    return entry
+
+
+def _key_lock(key: tuple) -> threading.Lock:
+    with _lock:
+        return _key_locks.setdefault(key, threading.Lock())
+
+
+def get(target_date: date, kode_cabang: str = None, kode_dept: str = None) -> dict:
+    """Snapshot untuk key tsb; dihitung langsung bila belum ada atau melewati MAX_AGE."""
+    key = (target_date, kode_cabang or None, kode_dept or None)
+    now = time.time()
+    with _lock:
+        entry = _snapshots.get(key)
+        if entry and now - entry["computed_at"] <= MAX_AGE_SECONDS:
+            entry["last_access"] = now
+            _snapshots.move_to_end(key)
+            _stats["hits"] += 1
+            return entry
+
+    with _key_lock(key):
+        # Request lain mungkin sudah menghitungnya selama kita menunggu
+        with _lock:
+            entry = _snapshots.get(key)
+            if entry and time.time() - entry["computed_at"] <= MAX_AGE_SECONDS:
+                entry["last_access"] = now
+                _snapshots.move_to_end(key)
+                _stats["hits"] += 1
+                return entry
+            _stats["misses"] += 1
+        entry = _compute(key)
+        with _lock:
+            entry["last_access"] = now
+            if key in _snapshots:
+                _snapshots.move_to_end(key)
+        return entry
+
+
+def meta(entry: dict) -> dict:
+    return {
+        "etag": entry["etag"],
+        "computed_at": datetime.fromtimestamp(entry["computed_at"]).isoformat(timespec="seconds"),
+        "age_seconds": round(time.time() - entry["computed_at"], 1),
+        "refresh_seconds": REFRESH_SECONDS,
+    }
+
+
+def refresh_all() -> int:
+    """Job scheduler: buang key yang sudah idle, hitung ulang key hari ini yang masih diminta."""
+    now = time.time()
+    today = date.today()
+    with _lock:
+        for key in [k for k, e in _snapshots.items() if now - e["last_access"] > IDLE_SECONDS]:
+            _snapshots.pop(key, None)
+            _key_locks.pop(key, None)
+        keys = [k for k in _snapshots if k[0] == today]
+
+    refreshed = 0
+    for key in keys:
+        try:
+            with _key_lock(key):
+                _compute(key)
+            refreshed += 1
+        except Exception as e:
+            logger.error(f"[DashboardSnapshot] Gagal refresh {key}: {e}")
+            with _lock:
+                _stats["errors"] += 1
+    with _lock:
+        _stats["refreshed"] += refreshed
+    return refreshed
+
+
+def invalidate():
+    with _lock:
+        _snapshots.clear()
+        _key_locks.clear()
+
+
+def stats() -> dict:
+    with _lock:
+        return {**_stats, "keys": len(_snapshots), "max_keys": MAX_KEYS}
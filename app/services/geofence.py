@@ -0,0 +1,262 @@
+"""
+Geofence
+========
+Evaluasi jarak/radius kantor cabang & titik patroli secara batch (NumPy).
+
+Sebelumnya setiap call site mem-parse string Cabang.lokasi_cabang ("lat,lon") dan
+menghitung haversine satu titik per satu di Python murni — scan_violations bahkan
+melakukannya untuk setiap baris employee_location_histories hari itu. Modul ini:
+
+- mem-parse koordinat pagar SEKALI menjadi array (lat, lon, radius) dan menyimpannya:
+    branches(db)      → pagar cabang (radius_cabang > 0), ikut versi/TTL master_cache
+    patrol_points(db) → pagar titik patroli (patrol_point_master), TTL GEOFENCE_TTL
+- menghitung jarak banyak titik sekaligus (haversine() menerima skalar maupun array)
+- membangun grid index (sel GEOFENCE_GRID_DEG derajat, default 0.01 ≈ 1.1 km) agar
+  pertanyaan "pagar mana yang memuat / dekat titik ini" hanya menghitung kandidat
+  di sel tsb, bukan seluruh pagar
+
+Pemakaian:
+    fences = geofence.branches(db)
+    dist, radius = fences.evaluate(kode_cabang_list, lat_list, lon_list)   # NaN = tanpa pagar
+    outside = fences.outside(kode_cabang_list, lat_list, lon_list)
+    fences.containing(lat, lon, margin=50)   # [(kode_cabang, jarak)] urut terdekat
+
+Pemakai pagar titik patroli: /storePatroliPoint (jarak ke titik yang dipindai) dan
+violation_detector (ping di dalam pagar titik patroli cabangnya sendiri tidak dianggap
+OUT_OF_LOCATION walau di luar radius kantor).
+
+Endpoint tulis patrol point memanggil invalidate() setelah commit; pagar cabang
+otomatis dibangun ulang ketika master_cache memuat ulang tabel cabang.
+"""
+
+import os
+import math
+import time
+import logging
+import threading
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from app.core import master_cache
+from app.models.models import PatrolPointMaster
+
+logger = logging.getLogger("geofence")
+
+EARTH_RADIUS_M = 6371000
+METERS_PER_DEG = 111320.0
+GRID_DEG = float(os.getenv("GEOFENCE_GRID_DEG", 0.01))
+CACHE_TTL_SECONDS = int(os.getenv("GEOFENCE_TTL", 300))
+MAX_CELLS = 64      # pagar yang lebih lebar dari ini tidak di-index per sel (selalu dicek)
+
+
+def parse_lokasi(lokasi: str):
+    """'lat,lon' → (lat, lon) float; None jika kosong / tidak valid."""
+    if not lokasi:
+        return None
+    parts = lokasi.split(',')
+    if len(parts) < 2:
+        return None
+    try:
+        lat, lon = float(parts[0]), float(parts[1])
+    except ValueError:
+        return None
+    if not (math.isfinite(lat) and math.isfinite(lon)):
+        return None
+    return lat, lon
+
+
+def haversine(lat1, lon1, lat2, lon2):
+    """Jarak great-circle dalam meter; argumen boleh skalar atau array (broadcast)."""
+    phi1 = np.radians(lat1)
+    phi2 = np.radians(lat2)
+    d_phi = np.radians(np.subtract(lat2, lat1))
+    d_lambda = np.radians(np.subtract(lon2, lon1))
+    a = np.sin(d_phi / 2) ** 2 + np.cos(phi1) * np.cos(phi2) * np.sin(d_lambda / 2) ** 2
+    a = np.clip(a, 0.0, 1.0)
+    return EARTH_RADIUS_M * 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+
+
+def _as_float_array(values) -> np.ndarray:
+    """List koordinat (boleh None / Decimal / string) → float64 array, tidak valid = NaN."""
+    out = np.full(len(values), np.nan)
+    for i, v in enumerate(values):
+        if v is None:
+            continue
+        try:
+            out[i] = float(v)
+        except (TypeError, ValueError):
+            pass
+    return out
+
+
+def _cell(lat: float, lon: float) -> tuple:
+    return int(math.floor(lat / GRID_DEG)), int(math.floor(lon / GRID_DEG))
+
+
+def _cell_range(lat: float, lon: float, meters: float):
+    dlat = meters / METERS_PER_DEG
+    dlon = meters / (METERS_PER_DEG * max(math.cos(math.radians(lat)), 0.01))
+    lat0, lon0 = _cell(lat - dlat, lon - dlon)
+    lat1, lon1 = _cell(lat + dlat, lon + dlon)
+    return range(lat0, lat1 + 1), range(lon0, lon1 + 1)
+
+
+class Fences:
+    """Kumpulan pagar lingkaran (pusat + radius meter) dalam array, plus grid index."""
+
+    def __init__(self, keys, lat, lon, radius, group=None):
+        self.keys = list(keys)
+        self.pos = {k: i for i, k in enumerate(self.keys)}
+        self.lat = np.asarray(lat, dtype=float)
+        self.lon = np.asarray(lon, dtype=float)
+        self.radius = np.asarray(radius, dtype=float)
+        self.group = list(group) if group is not None else None
+        self._cells = {}
+        wide = []
+        for i in range(len(self.keys)):
+            rows, cols = _cell_range(self.lat[i], self.lon[i], self.radius[i])
+            if len(rows) * len(cols) > MAX_CELLS:
+                wide.append(i)
+                continue
+            for r in rows:
+                for c in cols:
+                    self._cells.setdefault((r, c), []).append(i)
+        self._wide = wide
+
+    def __len__(self):
+        return len(self.keys)
+
+    def get(self, key):
+        """(lat, lon, radius) pagar tsb, atau None."""
+        i = self.pos.get(key)
+        if i is None:
+            return None
+        return float(self.lat[i]), float(self.lon[i]), float(self.radius[i])
+
+    def distance(self, key, lat, lon):
+        """Jarak titik (skalar/array) ke pusat pagar key; None jika key tidak punya pagar."""
+        i = self.pos.get(key)
+        if i is None:
+            return None
+        return haversine(self.lat[i], self.lon[i], lat, lon)
+
+    def evaluate(self, keys, lat, lon) -> tuple:
+        """
+        Jarak setiap titik ke pagar miliknya sendiri (keys[i] ↔ lat[i], lon[i]).
+        Return (jarak, radius) float array; NaN untuk key tanpa pagar / koordinat kosong.
+        """
+        n = len(keys)
+        idx = np.fromiter((self.pos.get(k, -1) for k in keys), dtype=np.int64, count=n)
+        dist = np.full(n, np.nan)
+        radius = np.full(n, np.nan)
+        ada = idx >= 0
+        if ada.any():
+            j = idx[ada]
+            radius[ada] = self.radius[j]
+            dist[ada] = haversine(self.lat[j], self.lon[j], _as_float_array(lat)[ada], _as_float_array(lon)[ada])
+        return dist, radius
+
+    def outside(self, keys, lat, lon) -> tuple:
+        """(mask di luar radius, jarak, radius) — titik tanpa pagar / NaN dianggap tidak di luar."""
+        dist, radius = self.evaluate(keys, lat, lon)
+        with np.errstate(invalid='ignore'):
+            mask = dist > radius
+        return mask, dist, radius
+
+    def candidates(self, lat: float, lon: float, margin: float = 0.0) -> np.ndarray:
+        """Indeks pagar yang mungkin memuat titik (dari grid index), tanpa hitung jarak."""
+        if margin > 0:
+            rows, cols = _cell_range(lat, lon, margin)
+            found = set(self._wide)
+            for r in rows:
+                for c in cols:
+                    found.update(self._cells.get((r, c), ()))
+            return np.fromiter(found, dtype=np.int64, count=len(found))
+        return np.asarray(self._cells.get(_cell(lat, lon), []) + self._wide, dtype=np.int64)
+
+    def containing(self, lat: float, lon: float, margin: float = 0.0) -> list:
+        """[(key, jarak)] pagar yang memuat titik (radius + margin meter), urut terdekat."""
+        idx = self.candidates(lat, lon, margin)
+        if not len(idx):
+            return []
+        dist = haversine(self.lat[idx], self.lon[idx], lat, lon)
+        hit = dist <= self.radius[idx] + margin
+        return sorted(((self.keys[i], float(d)) for i, d in zip(idx[hit], dist[hit])), key=lambda x: x[1])
+
+
+# ─── Cache ────────────────────────────────────────────────────────────────
+_lock = threading.Lock()
+_branch_cache = None    # (dict cabang master_cache, Fences)
+_point_cache = None     # (loaded_at, Fences)
+_stats = {"branch_builds": 0, "point_builds": 0, "invalidations": 0}
+
+
+def _build_branches(cabang: dict) -> Fences:
+    keys, lat, lon, radius = [], [], [], []
+    for kode, c in cabang.items():
+        coord = parse_lokasi(c.lokasi_cabang)
+        if coord is None or not c.radius_cabang or c.radius_cabang <= 0:
+            continue
+        keys.append(kode)
+        lat.append(coord[0])
+        lon.append(coord[1])
+        radius.append(c.radius_cabang)
+    return Fences(keys, lat, lon, radius)
+
+
+def branches(db: Session) -> Fences:
+    """Pagar radius kantor per kode_cabang (hanya cabang dengan koordinat valid & radius > 0)."""
+    global _branch_cache
+    cabang = master_cache.get_all_cabang(db)
+    with _lock:
+        if _branch_cache and _branch_cache[0] is cabang:
+            return _branch_cache[1]
+    fences = _build_branches(cabang)
+    with _lock:
+        _branch_cache = (cabang, fences)
+        _stats["branch_builds"] += 1
+    return fences
+
+
+def patrol_points(db: Session) -> Fences:
+    """Pagar titik patroli per id patrol_point_master; Fences.group = kode_cabang."""
+    global _point_cache
+    now = time.monotonic()
+    with _lock:
+        if _point_cache and now - _point_cache[0] < CACHE_TTL_SECONDS:
+            return _point_cache[1]
+    rows = db.query(
+        PatrolPointMaster.id, PatrolPointMaster.kode_cabang,
+        PatrolPointMaster.latitude, PatrolPointMaster.longitude, PatrolPointMaster.radius
+    ).all()
+    rows = [r for r in rows if r.latitude is not None and r.longitude is not None]
+    fences = Fences(
+        [r.id for r in rows],
+        [float(r.latitude) for r in rows],
+        [float(r.longitude) for r in rows],
+        [r.radius or 0 for r in rows],
+        group=[r.kode_cabang for r in rows]
+    )
+    with _lock:
+        _point_cache = (now, fences)
+        _stats["point_builds"] += 1
+    return fences
+
+
+def invalidate():
+    """Buang pagar titik patroli (dan cabang) agar dibangun ulang pada pembacaan berikutnya."""
+    global _branch_cache, _point_cache
+    with _lock:
+        _branch_cache = None
+        _point_cache = None
+        _stats["invalidations"] += 1
+
+
+def stats() -> dict:
+    with _lock:
+        return {
+            **_stats,
+            "branches": len(_branch_cache[1]) if _branch_cache else None,
+            "patrol_points": len(_point_cache[1]) if _point_cache else None,
+        }
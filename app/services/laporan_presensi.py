@@ -0,0 +1,506 @@
+"""
+Laporan Presensi Engine
+=======================
+Mesin laporan untuk /api/laporan/presensi (harian) dan /api/laporan/rekap-presensi.
+
+- Filter cabang/dept/search diterapkan di query karyawan, lalu daftar NIK hasilnya
+  didorong ke query presensi, izin dan jadwal (tidak lagi memuat presensi seluruh
+  perusahaan untuk rentang tanggal).
+- Karyawan diiterasi per chunk (LAPORAN_CHUNK_SIZE, default 200) dengan keyset
+  (nama_karyawan, nik); presensi/izin/jadwal hanya dimuat untuk chunk yang sedang
+  diproses, sehingga memori sebanding dengan ukuran chunk, bukan headcount × hari.
+- Hasil berupa generator dict per baris → bisa dikumpulkan (JSON biasa) atau
+  di-stream sebagai NDJSON (lihat stream_ndjson).
+
+Paginasi: `limit` = jumlah karyawan per halaman, `cursor` = token opaque (base64 dari
+key karyawan terakhir). next_cursor terisi setelah iterasi selesai jika masih ada
+halaman berikutnya.
+"""
+
+import os
+import json
+import base64
+import logging
+from collections import defaultdict
+from datetime import date, datetime, time, timedelta
+
+import numpy as np
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import Session
+
+from app.database import SessionLocal
+from app.core import master_cache
+from app.core.date_range import in_month
+from app.services import attendance_metrics
+from app.models.models import (
+    Presensi, Karyawan, Cabang, Departemen, Jabatan, PresensiJamkerja,
+    PresensiIzinabsen, PresensiIzinsakit, PresensiIzincuti, PresensiIzindinas,
+    PresensiJamkerjaBydateExtra, SetJamKerjaByDate, SetJamKerjaByDay,
+    PresensiJamkerjaBydept, PresensiJamkerjaBydeptDetail
+)
+
+logger = logging.getLogger("laporan_presensi")
+
+CHUNK_SIZE = int(os.getenv("LAPORAN_CHUNK_SIZE", 200))
+
+# (model, kode status) — hanya izin yang sudah disetujui (status '1')
+IZIN_SOURCES = (
+    (PresensiIzinabsen, 'I'),
+    (PresensiIzinsakit, 'S'),
+    (PresensiIzincuti, 'C'),
+    (PresensiIzindinas, 'DL'),
+)
+
+DAYS_MAP = {0: 'Senin', 1: 'Selasa', 2: 'Rabu', 3: 'Kamis', 4: 'Jumat', 5: 'Sabtu', 6: 'Minggu'}
+
+
+# ==========================================
+# HELPERS
+# ==========================================
+
+def build_schedule_map(db: Session, karyawans: list, dates: list) -> dict:
+    if not karyawans or not dates: return {}
+
+    nik_list = [k.nik for k in karyawans if hasattr(k, 'nik')]
+    if not nik_list:
+        try:
+             # handle tuple cases (Karyawan, Cabang, Departemen, Jabatan)
+             nik_list = [row[0].nik for row in karyawans]
+        except:
+             pass
+
+    start_date = min(dates)
+    end_date = max(dates)
+
+    # 1. Extra Date
+    extra_dates = db.query(PresensiJamkerjaBydateExtra)\
+        .filter(PresensiJamkerjaBydateExtra.tanggal >= start_date, PresensiJamkerjaBydateExtra.tanggal <= end_date, PresensiJamkerjaBydateExtra.nik.in_(nik_list)).all()
+    extra_date_map = {(e.nik, e.tanggal): e.kode_jam_kerja for e in extra_dates}
+
+    # 2. Roster
+    roster_date_map = {}
+    roster_months_map = {}
+    unique_months = set((d.year, d.month) for d in dates)
+    for y, m in unique_months:
+        rosters = db.query(SetJamKerjaByDate).filter(
+            in_month(SetJamKerjaByDate.tanggal, y, m),
+            SetJamKerjaByDate.nik.in_(nik_list)
+        ).all()
+        for r in rosters:
+            roster_months_map[(r.nik, y, m)] = True
+            if start_date <= r.tanggal <= end_date:
+                roster_date_map[(r.nik, r.tanggal)] = r.kode_jam_kerja
+
+    # 3. Regular
+    regular_days = db.query(SetJamKerjaByDay).filter(SetJamKerjaByDay.nik.in_(nik_list)).all()
+    regular_day_map = {}
+    has_regular_day_map = {}
+    for r in regular_days:
+        has_regular_day_map[r.nik] = True
+        regular_day_map[(r.nik, r.hari)] = r.kode_jam_kerja
+
+    # 4. Dept
+    dept_headers = db.query(PresensiJamkerjaBydept).all()
+    dept_header_map = {(d.kode_dept, d.kode_cabang): d.kode_jk_dept for d in dept_headers}
+    dept_details = db.query(PresensiJamkerjaBydeptDetail).all()
+    dept_detail_map = {}
+    has_dept_day_map = {}
+    for d in dept_details:
+        has_dept_day_map[d.kode_jk_dept] = True
+        dept_detail_map[(d.kode_jk_dept, d.hari)] = d.kode_jam_kerja
+
+    schedule_map = {}
+    for row in karyawans:
+        if hasattr(row, 'nik'):
+            k = row
+        else:
+            k = row[0]
+
+        nik = k.nik
+        kode_dept = getattr(k, 'kode_dept', None)
+        kode_cabang = getattr(k, 'kode_cabang', None)
+        kode_jadwal = getattr(k, 'kode_jadwal', None)
+
+        kode_jk_dept = dept_header_map.get((kode_dept, kode_cabang))
+        has_dept_day = has_dept_day_map.get(kode_jk_dept, False) if kode_jk_dept else False
+        has_regular_day = has_regular_day_map.get(nik, False)
+
+        for d in dates:
+            day_name = DAYS_MAP[d.weekday()]
+            y, m = d.year, d.month
+            has_roster_this_month = roster_months_map.get((nik, y, m), False)
+
+            final_kode = None
+            if (nik, d) in extra_date_map:
+                final_kode = extra_date_map[(nik, d)]
+            elif (nik, d) in roster_date_map:
+                final_kode = roster_date_map[(nik, d)]
+            elif has_roster_this_month:
+                final_kode = None
+            elif (nik, day_name) in regular_day_map:
+                final_kode = regular_day_map[(nik, day_name)]
+            elif has_regular_day:
+                final_kode = None
+            elif kode_jk_dept and (kode_jk_dept, day_name) in dept_detail_map:
+                final_kode = dept_detail_map[(kode_jk_dept, day_name)]
+            elif has_dept_day:
+                final_kode = None
+            else:
+                final_kode = kode_jadwal
+
+            schedule_map[(nik, d)] = final_kode
+
+    return schedule_map
+
+
+# ==========================================
+# CURSOR
+# ==========================================
+
+def encode_cursor(karyawan) -> str:
+    raw = json.dumps([karyawan.nama_karyawan, karyawan.nik]).encode()
+    return base64.urlsafe_b64encode(raw).decode()
+
+def decode_cursor(cursor: str):
+    """(nama_karyawan, nik) dari token cursor. ValueError jika token tidak valid."""
+    if not cursor:
+        return None
+    try:
+        nama, nik = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return nama, nik
+    except Exception:
+        raise ValueError("cursor tidak valid")
+
+
+def _fmt_time(t):
+    return t.strftime("%H:%M:%S") if t else "-"
+
+
+# ==========================================
+# ENGINE
+# ==========================================
+
+class PresensiReport:
+    """
+    Satu permintaan laporan (rentang tanggal + filter + halaman).
+
+    iter_harian() → dict per (karyawan, tanggal[, presensi]) — field LaporanPresensiDTO
+    iter_rekap()  → dict per karyawan — field RekapPresensiDTO
+    """
+
+    def __init__(self, db: Session, start_date: date, end_date: date,
+                 kode_cabang: str = None, kode_dept: str = None, search: str = None,
+                 aktif_only: bool = False, cursor: str = None, limit: int = None,
+                 chunk_size: int = CHUNK_SIZE):
+        self.db = db
+        self.start_date = start_date
+        self.end_date = end_date
+        self.kode_cabang = kode_cabang
+        self.kode_dept = kode_dept
+        self.search = search
+        self.aktif_only = aktif_only
+        self.after = decode_cursor(cursor)
+        self.limit = limit
+        self.chunk_size = chunk_size
+        self.next_cursor = None
+
+        self.dates = []
+        curr = start_date
+        while curr <= end_date:
+            self.dates.append(curr)
+            curr += timedelta(days=1)
+
+    # ─── Karyawan (keyset per chunk) ───────────────────────────────────────
+    def _karyawan_query(self):
+        query = self.db.query(Karyawan, Cabang, Departemen, Jabatan)\
+            .outerjoin(Cabang, Karyawan.kode_cabang == Cabang.kode_cabang)\
+            .outerjoin(Departemen, Karyawan.kode_dept == Departemen.kode_dept)\
+            .outerjoin(Jabatan, Karyawan.kode_jabatan == Jabatan.kode_jabatan)
+
+        if self.aktif_only:
+            query = query.filter(Karyawan.status_aktif_karyawan == '1')
+        if self.kode_cabang:
+            query = query.filter(Karyawan.kode_cabang == self.kode_cabang)
+        if self.kode_dept:
+            query = query.filter(Karyawan.kode_dept == self.kode_dept)
+        if self.search:
+            query = query.filter(
+                or_(
+                    Karyawan.nama_karyawan.like(f"%{self.search}%"),
+                    Karyawan.nik.like(f"%{self.search}%")
+                )
+            )
+        return query
+
+    def _chunks(self):
+        base = self._karyawan_query()
+        after = self.after
+        remaining = self.limit
+        while remaining is None or remaining > 0:
+            size = self.chunk_size if remaining is None else min(self.chunk_size, remaining)
+            query = base
+            if after:
+                nama, nik = after
+                query = query.filter(or_(
+                    Karyawan.nama_karyawan > nama,
+                    and_(Karyawan.nama_karyawan == nama, Karyawan.nik > nik)
+                ))
+            # +1 baris untuk mendeteksi apakah masih ada halaman berikutnya
+            peek = remaining is not None and size == remaining
+            rows = query.order_by(Karyawan.nama_karyawan, Karyawan.nik)\
+                .limit(size + 1 if peek else size).all()
+            if peek and len(rows) > size:
+                rows = rows[:size]
+                self.next_cursor = encode_cursor(rows[-1][0])
+            if not rows:
+                return
+            yield rows
+            if len(rows) < size:
+                return
+            after = (rows[-1][0].nama_karyawan, rows[-1][0].nik)
+            if remaining is not None:
+                remaining -= len(rows)
+
+    # ─── Data per chunk (difilter NIK) ─────────────────────────────────────
+    def _load_presensi(self, niks: list) -> dict:
+        presensi_map = defaultdict(lambda: defaultdict(list))  # nik -> tanggal -> [(p, jk)]
+        records = self.db.query(Presensi, PresensiJamkerja)\
+            .outerjoin(PresensiJamkerja, Presensi.kode_jam_kerja == PresensiJamkerja.kode_jam_kerja)\
+            .filter(Presensi.nik.in_(niks), Presensi.tanggal >= self.start_date, Presensi.tanggal <= self.end_date)\
+            .all()
+        for p, jk in records:
+            presensi_map[p.nik][p.tanggal].append((p, jk))
+        return presensi_map
+
+    def _load_izin(self, niks: list) -> dict:
+        izin_map = defaultdict(dict)  # nik -> tanggal -> kode izin
+        for model, status_code in IZIN_SOURCES:
+            records = self.db.query(model).filter(
+                model.nik.in_(niks),
+                model.dari <= self.end_date,
+                model.sampai >= self.start_date
+            ).all()
+            for r in records:
+                if str(r.status) != '1': continue
+                curr_izin = max(r.dari, self.start_date)
+                sampai = min(r.sampai, self.end_date)
+                while curr_izin <= sampai:
+                    izin_map[r.nik][curr_izin] = status_code
+                    curr_izin += timedelta(days=1)
+        return izin_map
+
+    def _load_chunk(self, rows: list):
+        niks = [row[0].nik for row in rows]
+        return (
+            self._load_presensi(niks),
+            self._load_izin(niks),
+            build_schedule_map(self.db, rows, self.dates),
+        )
+
+    # ─── Laporan harian ────────────────────────────────────────────────────
+    def iter_harian(self):
+        """Baris per karyawan (urut nama, nik) lalu tanggal terbaru lebih dulu."""
+        jk_detail_map = master_cache.get_all_jam_kerja(self.db)
+        for rows in self._chunks():
+            presensi_map, izin_map, schedule_map = self._load_chunk(rows)
+            metrik = self._metrik_chunk(presensi_map)
+            for karyawan, cabang, dept, jabatan in rows:
+                base = {
+                    "nik": karyawan.nik,
+                    "nama_karyawan": karyawan.nama_karyawan,
+                    "nama_dept": dept.nama_dept if dept else "-",
+                    "nama_cabang": cabang.nama_cabang if cabang else "-",
+                    "nama_jabatan": jabatan.nama_jabatan if jabatan else "-",
+                }
+                emp_presensi = presensi_map.get(karyawan.nik, {})
+                emp_izin = izin_map.get(karyawan.nik, {})
+                for d in reversed(self.dates):
+                    emp_records = emp_presensi.get(d)
+                    if emp_records:
+                        for presensi, jam_kerja in emp_records:
+                            yield {**base, **self._baris_presensi(presensi, jam_kerja, metrik[id(presensi)])}
+                    else:
+                        predicted_jk_kode = schedule_map.get((karyawan.nik, d))
+                        predicted_jk = jk_detail_map.get(predicted_jk_kode) if predicted_jk_kode else None
+                        default_status = emp_izin.get(d, "A")
+                        if default_status == "A" and predicted_jk_kode is None:
+                            default_status = "LIBR" # Libur
+                        yield {**base, **self._baris_kosong(d, predicted_jk_kode, predicted_jk, default_status)}
+
+    @staticmethod
+    def _metrik_chunk(presensi_map: dict) -> dict:
+        """{id(presensi): (telat_menit|None, pulang_cepat_jam|None, total_jam)} untuk seluruh chunk."""
+        records = [rec for per_tanggal in presensi_map.values() for recs in per_tanggal.values() for rec in recs]
+        if not records:
+            return {}
+        m = attendance_metrics.dari_presensi(records)
+        telat_menit = np.where(m["telat"], m["telat_menit"], -1).tolist()
+        pulang_cepat = m["pulang_cepat_jam"].tolist()
+        total_jam = m["total_jam"].tolist()
+        return {
+            id(p): (
+                telat_menit[i] if telat_menit[i] >= 0 else None,
+                pulang_cepat[i] if pulang_cepat[i] > 0 else None,
+                total_jam[i],
+            )
+            for i, (p, _) in enumerate(records)
+        }
+
+    @staticmethod
+    def _baris_kosong(d: date, kode_jam_kerja, jk, status: str) -> dict:
+        return {
+            "tanggal": d,
+            "kode_jam_kerja": kode_jam_kerja,
+            "nama_jam_kerja": jk.nama_jam_kerja if jk else None,
+            "jam_masuk_jadwal": _fmt_time(jk.jam_masuk) if jk else "-",
+            "jam_pulang_jadwal": _fmt_time(jk.jam_pulang) if jk else "-",
+            "jam_in": "-",
+            "jam_out": "-",
+            "status": status,
+            "keterangan": None,
+            "foto_in": None,
+            "foto_out": None,
+            "lokasi_in": None,
+            "lokasi_out": None,
+            "terlambat": "-",
+            "pulang_cepat": "-",
+            "denda": 0,
+            "potongan_jam": 0,
+            "lembur": 0,
+            "total_jam": 0,
+        }
+
+    @staticmethod
+    def _baris_presensi(presensi, jam_kerja, metrik: tuple) -> dict:
+        telat_menit, pulang_cepat_jam, total_jam = metrik
+
+        terlambat = "-"
+        if telat_menit is not None:
+            h, m = divmod(telat_menit, 60)
+            terlambat = f"{h} Jam {m} Menit" if h > 0 else f"{m} Menit"
+
+        return {
+            "tanggal": presensi.tanggal,
+            "kode_jam_kerja": presensi.kode_jam_kerja,
+            "nama_jam_kerja": jam_kerja.nama_jam_kerja if jam_kerja else None,
+            "jam_masuk_jadwal": _fmt_time(jam_kerja.jam_masuk if jam_kerja else None),
+            "jam_pulang_jadwal": _fmt_time(jam_kerja.jam_pulang if jam_kerja else None),
+            "jam_in": _fmt_time(presensi.jam_in),
+            "jam_out": _fmt_time(presensi.jam_out),
+            "status": str(presensi.status).upper() if presensi.status else "H",
+            "keterangan": None,
+            "foto_in": presensi.foto_in,
+            "foto_out": presensi.foto_out,
+            "lokasi_in": presensi.lokasi_in,
+            "lokasi_out": presensi.lokasi_out,
+            "terlambat": terlambat,
+            "pulang_cepat": f"{pulang_cepat_jam} Jam" if pulang_cepat_jam else "-",
+            "denda": 0,
+            "potongan_jam": pulang_cepat_jam or 0,
+            "lembur": 0,
+            "total_jam": total_jam,
+        }
+
+    # ─── Rekap ─────────────────────────────────────────────────────────────
+    def iter_rekap(self):
+        """Satu dict per karyawan (urut nama, nik) berisi data_tanggal + summary."""
+        date_keys = [str(d) for d in self.dates]
+        for rows in self._chunks():
+            presensi_map, izin_map, schedule_map = self._load_chunk(rows)
+            status, summary = self._rekap_chunk(rows, presensi_map, izin_map, schedule_map)
+            for i, (k, c, d, j) in enumerate(rows):
+                yield {
+                    "nik": k.nik,
+                    "nama_karyawan": k.nama_karyawan,
+                    "nama_dept": d.nama_dept if d else "-",
+                    "nama_cabang": c.nama_cabang if c else "-",
+                    "nama_jabatan": j.nama_jabatan if j else "-",
+                    "data_tanggal": {d_str: {"status": s, "ket": "-"} for d_str, s in zip(date_keys, status[i])},
+                    "summary": {key: values[i] for key, values in summary.items()},
+                }
+
+    def _rekap_chunk(self, rows: list, presensi_map: dict, izin_map: dict, schedule_map: dict):
+        """
+        Matriks status karyawan × tanggal untuk satu chunk + summary per karyawan.
+
+        Sel dengan presensi → status presensi (lower-case; jika ganda, baris terakhir).
+        Tanpa presensi → kode izin, lalu 'libr' jika tidak ada jadwal, selain itu 'a'.
+        """
+        niks = [row[0].nik for row in rows]
+        row_idx = {nik: i for i, nik in enumerate(niks)}
+        date_idx = {d: j for j, d in enumerate(self.dates)}
+        shape = (len(niks), len(self.dates))
+
+        # Default: alpha jika ada jadwal, libur jika tidak
+        tanpa_jadwal = np.array([[schedule_map.get((nik, d)) is None for d in self.dates] for nik in niks], dtype=bool)
+        sel = np.where(tanpa_jadwal, 'libr', 'a').astype('<U4')
+        kode = sel.copy()
+
+        for nik, per_tanggal in izin_map.items():
+            for d, status_izin in per_tanggal.items():
+                i, j = row_idx[nik], date_idx[d]
+                sel[i, j] = status_izin
+                kode[i, j] = status_izin.lower()
+
+        telat = np.zeros(shape, dtype=bool)
+        tanpa_masuk = np.zeros(shape, dtype=bool)
+        tanpa_pulang = np.zeros(shape, dtype=bool)
+
+        records = [recs[-1] for per_tanggal in presensi_map.values() for recs in per_tanggal.values()]
+        if records:
+            ri = np.array([row_idx[p.nik] for p, _ in records])
+            di = np.array([date_idx[p.tanggal] for p, _ in records])
+            status_presensi = [p.status.lower() if p.status else "-" for p, _ in records]
+            sel[ri, di] = status_presensi
+            kode[ri, di] = status_presensi
+            telat[ri, di] = attendance_metrics.dari_presensi(records)["telat"]
+            tanpa_masuk[ri, di] = [p.jam_in is None for p, _ in records]
+            tanpa_pulang[ri, di] = [p.jam_out is None for p, _ in records]
+
+        summary = attendance_metrics.ringkas_status(kode, telat, tanpa_masuk, tanpa_pulang)
+        return sel.tolist(), {key: values.tolist() for key, values in summary.items()}
+
+
+# ==========================================
+# STREAMING
+# ==========================================
+
+def _json_default(value):
+    if isinstance(value, (date, datetime, time)):
+        return value.isoformat()
+    return str(value)
+
+
+def stream_ndjson(mode: str, **params):
+    """
+    Generator NDJSON untuk StreamingResponse (mode 'harian' atau 'rekap').
+
+    Baris pertama : {"meta": {"start_date", "end_date", "dates"}}
+    Baris data    : satu objek per baris laporan / per karyawan (rekap)
+    Baris terakhir: {"meta": {"rows": n, "next_cursor": ...}}
+
+    Memakai session sendiri karena generator dijalankan setelah handler selesai
+    (session dari dependency get_db bisa sudah ditutup).
+    """
+    db = SessionLocal()
+    try:
+        report = PresensiReport(db, **params)
+        meta = {
+            "start_date": report.start_date,
+            "end_date": report.end_date,
+            "dates": [str(d) for d in report.dates],
+        }
+        yield json.dumps({"meta": meta}, default=_json_default) + "\n"
+
+        rows = 0
+        iterator = report.iter_rekap() if mode == "rekap" else report.iter_harian()
+        for row in iterator:
+            rows += 1
+            yield json.dumps(row, default=_json_default) + "\n"
+
+        yield json.dumps({"meta": {"rows": rows, "next_cursor": report.next_cursor}}) + "\n"
+    except Exception as e:
+        logger.error(f"[LaporanPresensi] Stream {mode} gagal: {e}")
+        yield json.dumps({"meta": {"error": str(e)}}) + "\n"
+    finally:
+        db.close()
@@ -0,0 +1,326 @@
+"""
+Location Retention
+==================
+Retensi employee_location_histories (satu baris per ping per karyawan, ±2 ping/menit).
+
+Ping yang lebih tua dari LOCATION_RAW_RETENTION_DAYS (default 7) diproses per hari,
+per kelompok NIK (LOCATION_RETENTION_NIK_BATCH):
+
+1. Arsip   → baris mentah ditulis ke LOCATION_ARCHIVE_DIR/<YYYY>/<MM>/ sebagai Parquet
+             (zstd, bila pyarrow terpasang) atau CSV gzip; LOCATION_ARCHIVE_FORMAT=none
+             untuk melewati arsip
+2. Kompaksi → ping dipecah per shift (jendela presensi jam_in..jam_out; di luar shift =
+             segmen tersendiri), disederhanakan Douglas-Peucker (LOCATION_DP_EPSILON meter)
+             lalu disimpan sebagai encoded polyline + offset waktu di location_tracks
+3. Hapus   → DELETE per LOCATION_DELETE_CHUNK id dengan commit & jeda di antaranya,
+             sehingga tabel tidak pernah terkunci lama dan replikasi tidak tertinggal
+
+Idempoten: setiap track menyimpan id_akhir (id ping mentah terbesar yang dikompaksi).
+Untuk NIK yang sudah punya location_tracks pada hari tsb, ping dengan id <= id_akhir
+terbesarnya adalah sisa penghapusan yang terhenti — cukup dihapus; ping dengan id lebih
+besar adalah ping terlambat (dikirim setelah hari itu dikompaksi) yang diarsip dan
+dikompaksi sebagai segmen tambahan NIK/hari tsb, lalu ikut dihapus.
+location_tracks sendiri dihapus setelah LOCATION_TRACK_RETENTION_DAYS (0 = simpan).
+
+Job APScheduler setiap LOCATION_RETENTION_INTERVAL menit memproses paling banyak
+LOCATION_RETENTION_DAYS_PER_RUN hari; MySQL GET_LOCK memastikan hanya satu worker
+uvicorn yang berjalan.
+
+CLI: python -m app.services.location_retention run | hari <tanggal>
+"""
+
+import os
+import sys
+import csv
+import gzip
+import time
+import logging
+import threading
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+
+import numpy as np
+from sqlalchemy import func, delete, text
+from sqlalchemy.orm import Session
+
+from app.database import SessionLocal, engine
+from app.core import polyline
+from app.core.date_range import on_date
+from app.models.models import EmployeeLocationHistories, Presensi
+from app.models.location_track import LocationTrack
+
+logger = logging.getLogger("location_retention")
+
+RAW_RETENTION_DAYS = int(os.getenv("LOCATION_RAW_RETENTION_DAYS", 7))
+TRACK_RETENTION_DAYS = int(os.getenv("LOCATION_TRACK_RETENTION_DAYS", 0))
+ARCHIVE_DIR = os.getenv("LOCATION_ARCHIVE_DIR", "storage/location_archive")
+ARCHIVE_FORMAT = os.getenv("LOCATION_ARCHIVE_FORMAT", "parquet")    # parquet | csv | none
+DP_EPSILON = float(os.getenv("LOCATION_DP_EPSILON", 10))
+NIK_BATCH = int(os.getenv("LOCATION_RETENTION_NIK_BATCH", 50))
+DELETE_CHUNK = int(os.getenv("LOCATION_DELETE_CHUNK", 2000))
+DELETE_PAUSE = float(os.getenv("LOCATION_DELETE_PAUSE", 0.1))
+INTERVAL_MINUTES = int(os.getenv("LOCATION_RETENTION_INTERVAL", 60))
+DAYS_PER_RUN = int(os.getenv("LOCATION_RETENTION_DAYS_PER_RUN", 1))
+SHIFT_MAX = timedelta(hours=24)     # presensi tanpa jam_out dianggap selesai 24 jam setelah jam_in
+LOCK_NAME = "location_retention"
+
+ARCHIVE_COLUMNS = (
+    "id", "nik", "user_id", "latitude", "longitude", "accuracy", "speed",
+    "bearing", "provider", "is_mocked", "recorded_at"
+)
+
+_lock = threading.Lock()
+_stats = {"runs": 0, "hari": 0, "ping_diarsip": 0, "ping_dihapus": 0, "track": 0, "track_dihapus": 0,
+          "errors": 0, "last_run_ms": None}
+
+
+def _bump(**kv):
+    with _lock:
+        for k, v in kv.items():
+            _stats[k] += v
+
+
+# ─── Arsip ─────────────────────────────────────────────────────────────────
+def _format_arsip() -> str:
+    if ARCHIVE_FORMAT == "parquet":
+        try:
+            import pyarrow  # noqa: F401
+            return "parquet"
+        except ImportError:
+            return "csv"
+    return ARCHIVE_FORMAT
+
+
+def arsip(rows: list, tanggal: date, bagian: str) -> str:
+    """Tulis baris mentah ke file arsip (atomic rename). Return path, atau None bila arsip nonaktif."""
+    fmt = _format_arsip()
+    if fmt == "none" or not rows:
+        return None
+    folder = os.path.join(ARCHIVE_DIR, f"{tanggal:%Y}", f"{tanggal:%m}")
+    os.makedirs(folder, exist_ok=True)
+    nama = f"employee_location_histories_{tanggal.isoformat()}_{bagian}"
+
+    if fmt == "parquet":
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        path = os.path.join(folder, nama + ".parquet")
+        table = pa.table({
+            "id": [r.id for r in rows],
+            "nik": [r.nik for r in rows],
+            "user_id": [r.user_id for r in rows],
+            "latitude": [float(r.latitude) for r in rows],
+            "longitude": [float(r.longitude) for r in rows],
+            "accuracy": [r.accuracy for r in rows],
+            "speed": [r.speed for r in rows],
+            "bearing": [r.bearing for r in rows],
+            "provider": [r.provider for r in rows],
+            "is_mocked": [r.is_mocked for r in rows],
+            "recorded_at": [r.recorded_at for r in rows],
+        })
+        pq.write_table(table, path + ".tmp", compression="zstd")
+    else:
+        path = os.path.join(folder, nama + ".csv.gz")
+        with gzip.open(path + ".tmp", "wt", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(ARCHIVE_COLUMNS)
+            for r in rows:
+                writer.writerow([getattr(r, c) for c in ARCHIVE_COLUMNS])
+    os.replace(path + ".tmp", path)
+    return path
+
+
+# ─── Kompaksi ──────────────────────────────────────────────────────────────
+def _shift_windows(db: Session, niks: list, tanggal: date) -> dict:
+    """{nik: [(jam_in, selesai, presensi_id, kode_jam_kerja)]} untuk shift yang bisa menyentuh tanggal tsb."""
+    windows = {}
+    for p in db.query(Presensi.id, Presensi.nik, Presensi.kode_jam_kerja, Presensi.jam_in, Presensi.jam_out).filter(
+        Presensi.nik.in_(niks),
+        Presensi.tanggal.between(tanggal - timedelta(days=1), tanggal),
+        Presensi.jam_in.isnot(None)
+    ).order_by(Presensi.jam_in).all():
+        windows.setdefault(p.nik, []).append((p.jam_in, p.jam_out or p.jam_in + SHIFT_MAX, p.id, p.kode_jam_kerja))
+    return windows
+
+
+def _segmen(rows: list, windows: list) -> list:
+    """Pecah ping satu NIK (urut waktu) menjadi run berurutan dengan shift yang sama."""
+    def shift_of(t):
+        for mulai, selesai, pid, kode in windows:
+            if mulai <= t < selesai:
+                return pid, kode
+        return None, None
+
+    hasil = []
+    for r in rows:
+        key = shift_of(r.recorded_at)
+        if hasil and hasil[-1][0] == key:
+            hasil[-1][1].append(r)
+        else:
+            hasil.append((key, [r]))
+    return hasil
+
+
+def kompaksi(nik: str, tanggal: date, rows: list, windows: list, epsilon_m: float = None) -> list:
+    """Baris location_tracks (dict) dari ping mentah satu NIK satu hari."""
+    epsilon_m = DP_EPSILON if epsilon_m is None else epsilon_m
+    tracks = []
+    for (presensi_id, kode_jam_kerja), seg in _segmen(rows, windows):
+        lat = np.array([float(r.latitude) for r in seg])
+        lon = np.array([float(r.longitude) for r in seg])
+        keep = polyline.simplify(lat, lon, epsilon_m)
+        mulai = seg[0].recorded_at
+        tracks.append({
+            "nik": nik,
+            "tanggal": tanggal,
+            "presensi_id": presensi_id,
+            "kode_jam_kerja": kode_jam_kerja,
+            "mulai": mulai,
+            "selesai": seg[-1].recorded_at,
+            "jumlah_titik": len(seg),
+            "jumlah_simpan": len(keep),
+            "mocked": sum(1 for r in seg if r.is_mocked == 1),
+            "epsilon_m": int(round(epsilon_m)),
+            "polyline": polyline.encode(lat[keep], lon[keep]),
+            "waktu": polyline.encode_ints(int((seg[i].recorded_at - mulai).total_seconds()) for i in keep),
+            "id_akhir": max(r.id for r in seg),
+        })
+    return tracks
+
+
+# ─── Penghapusan bertahap ──────────────────────────────────────────────────
+def _hapus(db: Session, model, ids: list) -> int:
+    total = 0
+    for i in range(0, len(ids), DELETE_CHUNK):
+        total += db.execute(delete(model).where(model.id.in_(ids[i:i + DELETE_CHUNK]))).rowcount
+        db.commit()
+        if DELETE_PAUSE and i + DELETE_CHUNK < len(ids):
+            time.sleep(DELETE_PAUSE)
+    return total
+
+
+# ─── Proses per hari ───────────────────────────────────────────────────────
+def proses_hari(db: Session, tanggal: date) -> dict:
+    """Arsip + kompaksi + hapus seluruh ping mentah pada tanggal tsb."""
+    ELH = EmployeeLocationHistories
+    hasil = {"ping": 0, "track": 0, "dihapus": 0, "arsip": []}
+    niks = sorted(n for (n,) in db.query(ELH.nik).filter(on_date(ELH.recorded_at, tanggal)).distinct().all())
+    # {nik: id_akhir terbesar}; NULL (track sebelum kolom id_akhir) → 0, semua sisa dianggap baru
+    sudah = {
+        n: int(i or 0) for n, i in db.query(LocationTrack.nik, func.max(LocationTrack.id_akhir)).filter(
+            LocationTrack.tanggal == tanggal
+        ).group_by(LocationTrack.nik).all()
+    }
+    bagian_prefix = datetime.now().strftime("%H%M%S")
+
+    for b in range(0, len(niks), NIK_BATCH):
+        batch = niks[b:b + NIK_BATCH]
+        rows = db.query(
+            ELH.id, ELH.nik, ELH.user_id, ELH.latitude, ELH.longitude, ELH.accuracy, ELH.speed,
+            ELH.bearing, ELH.provider, ELH.is_mocked, ELH.recorded_at
+        ).filter(
+            on_date(ELH.recorded_at, tanggal),
+            ELH.nik.in_(batch)
+        ).order_by(ELH.nik, ELH.recorded_at, ELH.id).all()
+        baru = [r for r in rows if r.id > sudah.get(r.nik, -1)]
+
+        if baru:
+            path = arsip(baru, tanggal, f"{bagian_prefix}_{b // NIK_BATCH:03d}")
+            if path:
+                hasil["arsip"].append(path)
+            windows = _shift_windows(db, sorted({r.nik for r in baru}), tanggal)
+            per_nik = {}
+            for r in baru:
+                per_nik.setdefault(r.nik, []).append(r)
+            tracks = []
+            for nik, ping in per_nik.items():
+                tracks.extend(kompaksi(nik, tanggal, ping, windows.get(nik, [])))
+            db.execute(LocationTrack.__table__.insert(), tracks)
+            db.commit()
+            hasil["track"] += len(tracks)
+
+        hasil["ping"] += len(baru)
+        hasil["dihapus"] += _hapus(db, ELH, [r.id for r in rows])
+
+    _bump(hari=1, ping_diarsip=hasil["ping"], ping_dihapus=hasil["dihapus"], track=hasil["track"])
+    logger.info(f"[LocationRetention] {tanggal}: {hasil['ping']} ping → {hasil['track']} track, {hasil['dihapus']} baris dihapus")
+    return hasil
+
+
+def hapus_track_lama(db: Session) -> int:
+    """Hapus location_tracks yang lebih tua dari LOCATION_TRACK_RETENTION_DAYS (0 = simpan)."""
+    if TRACK_RETENTION_DAYS <= 0:
+        return 0
+    batas = date.today() - timedelta(days=TRACK_RETENTION_DAYS)
+    total = 0
+    while True:
+        ids = [i for (i,) in db.query(LocationTrack.id).filter(LocationTrack.tanggal < batas).limit(DELETE_CHUNK).all()]
+        if not ids:
+            break
+        total += _hapus(db, LocationTrack, ids)
+    _bump(track_dihapus=total)
+    return total
+
+
+@contextmanager
+def _named_lock():
+    """MySQL GET_LOCK agar hanya satu worker/proses yang menjalankan retensi."""
+    with engine.connect() as conn:
+        ok = conn.execute(text("SELECT GET_LOCK(:name, 0)"), {"name": LOCK_NAME}).scalar() == 1
+        try:
+            yield ok
+        finally:
+            if ok:
+                conn.execute(text("SELECT RELEASE_LOCK(:name)"), {"name": LOCK_NAME})
+
+
+def run() -> list:
+    """Job scheduler: proses hari tertua yang melewati retensi (maks. DAYS_PER_RUN hari)."""
+    started = time.monotonic()
+    diproses = []
+    try:
+        with _named_lock() as ok:
+            if not ok:
+                return diproses
+            db = SessionLocal()
+            try:
+                batas = datetime.combine(date.today() - timedelta(days=RAW_RETENTION_DAYS), datetime.min.time())
+                for _ in range(DAYS_PER_RUN):
+                    tertua = db.query(func.min(EmployeeLocationHistories.recorded_at)).filter(
+                        EmployeeLocationHistories.recorded_at < batas
+                    ).scalar()
+                    if tertua is None:
+                        break
+                    tanggal = tertua.date() if isinstance(tertua, datetime) else tertua
+                    proses_hari(db, tanggal)
+                    diproses.append(tanggal)
+                hapus_track_lama(db)
+            finally:
+                db.close()
+    except Exception as e:
+        _bump(errors=1)
+        logger.error(f"[LocationRetention] Gagal: {e}")
+    with _lock:
+        _stats["runs"] += 1
+        _stats["last_run_ms"] = round((time.monotonic() - started) * 1000, 1)
+    return diproses
+
+
+def stats() -> dict:
+    with _lock:
+        return {**_stats, "raw_retention_days": RAW_RETENTION_DAYS, "archive_format": _format_arsip()}
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    if len(sys.argv) < 2 or sys.argv[1] not in ("run", "hari") or (sys.argv[1] == "hari" and len(sys.argv) < 3):
+        print("Usage: python -m app.services.location_retention run | hari <tanggal>")
+        sys.exit(2)
+
+    if sys.argv[1] == "run":
+        print(run())
+    else:
+        db = SessionLocal()
+        try:
+            print(proses_hari(db, date.fromisoformat(sys.argv[2])))
+        finally:
+            db.close()
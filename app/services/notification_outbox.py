@@ -0,0 +1,401 @@
+"""
+Notification Outbox
+===================
+Semua push eskalasi (Fake GPS, keluar radius, bypass radius, SOS, force close,
+liveness lock) dan notifikasi chat ditulis dulu ke tabel `notification_outbox`.
+Handler request / worker cukup memanggil enqueue(); pengiriman FCM dilakukan oleh
+dispatcher di background (thread "notification-outbox").
+
+Deduplikasi:
+    dedup_key = "{type}:{nik}:{window}" dengan window = epoch // window_seconds.
+    INSERT IGNORE pada unique index → alert yang sama dalam satu window hanya tercatat
+    sekali. enqueue() mengembalikan False jika tertahan dedup, sehingga pemanggil bisa
+    melewati pekerjaan lanjutan (mis. menulis security_reports).
+
+Penerima (recipient_scope):
+- 'cabang'        → seluruh karyawan cabang subjek, kecuali subjek sendiri
+- 'cabang_active' → karyawan cabang yang sedang bertugas (absen masuk, belum pulang)
+- 'niks'          → daftar NIK eksplisit (recipient_niks)
+Peta cabang → {nik: [token]} di-cache per cabang (OUTBOX_RECIPIENT_TTL detik).
+
+Dispatcher mengklaim baris dengan `UPDATE … ORDER BY id LIMIT n` (aman untuk banyak
+worker), mengelompokkan per himpunan penerima sehingga token cukup di-resolve sekali
+per kelompok, lalu mengirim semua pesan secara paralel lewat app.core.fcm.
+
+Placeholder {nama} dan {cabang} pada title/body/data diisi dispatcher dari data subjek.
+
+Retensi: purge() (job leader, setiap OUTBOX_PURGE_MINUTES) menghapus baris 'sent' /
+'failed' yang lebih tua dari OUTBOX_RETENTION_DAYS hari per OUTBOX_PURGE_CHUNK baris,
+supaya tabel yang diklaim setiap tick tidak tumbuh tanpa batas.
+"""
+
+import os
+import json
+import time
+import uuid
+import logging
+import threading
+import concurrent.futures
+from datetime import datetime, date, timedelta
+
+from sqlalchemy import text, update
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.orm import Session
+
+from app.database import SessionLocal
+from app.core import master_cache, fcm
+from app.models.models import Karyawan, KaryawanDevices, Presensi
+from app.models.notification_outbox import NotificationOutbox
+
+logger = logging.getLogger("notification_outbox")
+
+POLL_INTERVAL = float(os.getenv("OUTBOX_POLL_INTERVAL", 5))
+BATCH_SIZE = int(os.getenv("OUTBOX_BATCH_SIZE", 100))
+MAX_ATTEMPTS = int(os.getenv("OUTBOX_MAX_ATTEMPTS", 5))
+RECIPIENT_TTL = int(os.getenv("OUTBOX_RECIPIENT_TTL", 60))
+STALE_LOCK_MINUTES = 5
+RETENTION_DAYS = int(os.getenv("OUTBOX_RETENTION_DAYS", 7))
+PURGE_CHUNK = int(os.getenv("OUTBOX_PURGE_CHUNK", 5000))
+PURGE_MINUTES = int(os.getenv("OUTBOX_PURGE_MINUTES", 60))
+
+_wake = threading.Event()
+_stop = threading.Event()
+_worker = None
+
+_stats_lock = threading.Lock()
+_stats = {"enqueued": 0, "deduplicated": 0, "claimed": 0, "sent": 0, "retried": 0, "failed": 0, "purged": 0}
+
+_recipient_lock = threading.Lock()
+_recipient_cache = {}  # (scope, kode_cabang, tanggal) -> (loaded_at, {nik: [token]})
+
+
+# ─── Enqueue ───────────────────────────────────────────────────────────────
+def dedup_key(type: str, nik: str, window_seconds: int) -> str:
+    return f"{type}:{nik}:{int(time.time() // window_seconds)}"
+
+
+def enqueue(
+    db: Session,
+    type: str,
+    nik: str = None,
+    title: str = None,
+    body: str = None,
+    data: dict = None,
+    kode_cabang: str = None,
+    recipient_scope: str = 'cabang',
+    recipient_niks: list = None,
+    dedup_window: int = None,
+    dedup: str = None,
+    ttl_seconds: int = None,
+    commit: bool = True
+) -> bool:
+    """
+    Simpan notifikasi ke outbox. Return False jika sudah ada notifikasi dengan dedup key
+    yang sama (tidak ada baris baru).
+
+    dedup_window (detik) → dedup_key otomatis per (type, nik, window).
+    dedup              → dedup_key eksplisit (mis. "EMERGENCY:{alert_id}").
+    """
+    key = dedup or (dedup_key(type, nik, dedup_window) if dedup_window else None)
+    stmt = mysql_insert(NotificationOutbox).prefix_with("IGNORE").values(
+        dedup_key=key,
+        type=type,
+        nik=nik,
+        kode_cabang=kode_cabang,
+        recipient_scope=recipient_scope,
+        recipient_niks=json.dumps(recipient_niks) if recipient_niks else None,
+        title=title,
+        body=body,
+        data=json.dumps(data) if data else None,
+        ttl_seconds=ttl_seconds,
+        status='pending',
+        attempts=0,
+        available_at=datetime.now(),
+        created_at=datetime.now(),
+    )
+    inserted = db.execute(stmt).rowcount == 1
+    if commit:
+        db.commit()
+    with _stats_lock:
+        _stats["enqueued" if inserted else "deduplicated"] += 1
+    if inserted:
+        _wake.set()
+    return inserted
+
+
+# ─── Recipient resolution ──────────────────────────────────────────────────
+def _load_recipients(db: Session, scope: str, kode_cabang: str, tanggal: date) -> dict:
+    q = db.query(KaryawanDevices.nik, KaryawanDevices.fcm_token).join(
+        Karyawan, Karyawan.nik == KaryawanDevices.nik
+    ).filter(
+        Karyawan.kode_cabang == kode_cabang,
+        KaryawanDevices.fcm_token != None,
+        KaryawanDevices.fcm_token != ''
+    )
+    if scope == 'cabang_active':
+        active = db.query(Presensi.nik).filter(
+            Presensi.tanggal == tanggal,
+            Presensi.kode_jam_kerja != None,
+            Presensi.jam_in != None,
+            Presensi.jam_out == None
+        )
+        q = q.filter(KaryawanDevices.nik.in_(active))
+
+    tokens = {}
+    for nik, token in q.all():
+        tokens.setdefault(nik, []).append(token)
+    return tokens
+
+
+def _cabang_recipients(db: Session, scope: str, kode_cabang: str) -> dict:
+    """{nik: [fcm_token]} untuk cabang (dan scope) tertentu, di-cache RECIPIENT_TTL detik."""
+    tanggal = date.today()
+    key = (scope, kode_cabang, tanggal if scope == 'cabang_active' else None)
+    now = time.monotonic()
+    with _recipient_lock:
+        cached = _recipient_cache.get(key)
+        if cached and now - cached[0] < RECIPIENT_TTL:
+            return cached[1]
+
+    tokens = _load_recipients(db, scope, kode_cabang, tanggal)
+    with _recipient_lock:
+        _recipient_cache[key] = (now, tokens)
+    return tokens
+
+
+def invalidate_recipients(kode_cabang: str = None):
+    """Buang cache penerima (semua cabang jika kode_cabang None)."""
+    with _recipient_lock:
+        for key in list(_recipient_cache):
+            if kode_cabang is None or key[1] == kode_cabang:
+                _recipient_cache.pop(key, None)
+
+
+def _explicit_recipients(db: Session, niks: list) -> dict:
+    tokens = {}
+    if not niks:
+        return tokens
+    rows = db.query(KaryawanDevices.nik, KaryawanDevices.fcm_token).filter(
+        KaryawanDevices.nik.in_(niks),
+        KaryawanDevices.fcm_token != None,
+        KaryawanDevices.fcm_token != ''
+    ).all()
+    for nik, token in rows:
+        tokens.setdefault(nik, []).append(token)
+    return tokens
+
+
+# ─── Dispatcher ────────────────────────────────────────────────────────────
+def _claim(db: Session) -> list:
+    # Lepas klaim yang tertinggal (worker mati saat mengirim)
+    db.execute(
+        update(NotificationOutbox)
+        .where(
+            NotificationOutbox.status == 'sending',
+            NotificationOutbox.locked_at < datetime.now() - timedelta(minutes=STALE_LOCK_MINUTES)
+        )
+        .values(status='pending', claim_token=None)
+    )
+    claim = str(uuid.uuid4())
+    db.execute(text("""
+        UPDATE notification_outbox
+        SET status = 'sending', claim_token = :claim, locked_at = NOW(), attempts = attempts + 1
+        WHERE status = 'pending' AND available_at <= NOW()
+        ORDER BY id
+        LIMIT :limit
+    """), {"claim": claim, "limit": BATCH_SIZE})
+    db.commit()
+    return db.query(NotificationOutbox).filter(NotificationOutbox.claim_token == claim).order_by(NotificationOutbox.id).all()
+
+
+def _fill(value, nama: str, cabang: str):
+    if isinstance(value, str):
+        return value.replace("{nama}", nama).replace("{cabang}", cabang)
+    return value
+
+
+def _dispatch(db: Session, rows: list) -> int:
+    # Info subjek (nama & cabang) untuk seluruh batch dalam satu query
+    subject_niks = list({r.nik for r in rows if r.nik})
+    subjects = {}
+    if subject_niks:
+        for k in db.query(Karyawan.nik, Karyawan.nama_karyawan, Karyawan.kode_cabang).filter(Karyawan.nik.in_(subject_niks)).all():
+            subjects[k.nik] = k
+
+    # Kelompokkan per himpunan penerima → token di-resolve sekali per kelompok
+    groups = {}
+    for row in rows:
+        subject = subjects.get(row.nik)
+        kode_cabang = row.kode_cabang or (subject.kode_cabang if subject else None)
+        if row.recipient_scope == 'niks':
+            group_key = ('niks', row.recipient_niks)
+        else:
+            group_key = (row.recipient_scope, kode_cabang)
+        groups.setdefault(group_key, []).append((row, subject, kode_cabang))
+
+    pending = []
+    for (scope, ref), items in groups.items():
+        if scope == 'niks':
+            recipients = _explicit_recipients(db, json.loads(ref) if ref else [])
+        elif ref:
+            recipients = _cabang_recipients(db, scope, ref)
+        else:
+            recipients = {}
+
+        for row, subject, kode_cabang in items:
+            tokens = [t for nik, toks in recipients.items() if nik != row.nik for t in toks]
+            if not tokens:
+                pending.append((row, None))
+                continue
+
+            nama = (subject.nama_karyawan if subject and subject.nama_karyawan else None) or row.nik or "-"
+            cabang_info = master_cache.get_cabang(db, kode_cabang)
+            cabang = cabang_info.nama_cabang if cabang_info else "Cabang"
+
+            data = json.loads(row.data) if row.data else {}
+            data = {k: _fill(v, nama, cabang) for k, v in data.items()}
+            notification = None
+            if row.title or row.body:
+                notification = {"title": _fill(row.title or "", nama, cabang), "body": _fill(row.body or "", nama, cabang)}
+
+            try:
+                future = fcm.submit_multicast(tokens, data=data or None, notification=notification, ttl_seconds=row.ttl_seconds)
+            except Exception as e:
+                future = concurrent.futures.Future()
+                future.set_exception(e)
+            pending.append((row, future))
+
+    sent = retried = failed = 0
+    for row, future in pending:
+        if future is None:
+            row.status, row.sent_count, row.failure_count = 'sent', 0, 0
+            row.sent_at = datetime.now()
+            continue
+        try:
+            result = future.result()
+            row.status = 'sent'
+            row.sent_count = result.success_count
+            row.failure_count = result.failure_count
+            row.sent_at = datetime.now()
+            sent += 1
+        except Exception as e:
+            row.last_error = str(e)[:1000]
+            if row.attempts >= MAX_ATTEMPTS:
+                row.status = 'failed'
+                failed += 1
+            else:
+                row.status = 'pending'
+                row.available_at = datetime.now() + timedelta(seconds=min(30 * (2 ** row.attempts), 900))
+                retried += 1
+        row.claim_token = None
+    db.commit()
+    with _stats_lock:
+        _stats["claimed"] += len(rows)
+        _stats["sent"] += sent
+        _stats["retried"] += retried
+        _stats["failed"] += failed
+    return sent
+
+
+def run_outbox_once() -> int:
+    """Klaim & kirim satu batch. Return jumlah baris yang diklaim."""
+    db: Session = SessionLocal()
+    try:
+        rows = _claim(db)
+        if rows:
+            sent = _dispatch(db, rows)
+            logger.info(f"[Outbox] {len(rows)} notifikasi diproses, {sent} terkirim ke FCM")
+        return len(rows)
+    except Exception as e:
+        db.rollback()
+        logger.error(f"[Outbox] Dispatcher error: {e}")
+        return 0
+    finally:
+        db.close()
+
+
+def purge(days: int = RETENTION_DAYS) -> int:
+    """
+    Job scheduler (leader): hapus baris selesai ('sent' / 'failed') yang lebih tua dari
+    `days` hari, PURGE_CHUNK baris per DELETE + commit agar lock tidak ditahan lama.
+    Filter lewat idx_outbox_status (status, available_at); window dedup sudah lama lewat.
+    """
+    batas = datetime.now() - timedelta(days=days)
+    total = 0
+    db: Session = SessionLocal()
+    try:
+        while not _stop.is_set():
+            deleted = db.execute(text("""
+                DELETE FROM notification_outbox
+                WHERE status IN ('sent', 'failed') AND available_at < :batas
+                LIMIT :limit
+            """), {"batas": batas, "limit": PURGE_CHUNK}).rowcount
+            db.commit()
+            total += deleted
+            if deleted < PURGE_CHUNK:
+                break
+    except Exception as e:
+        db.rollback()
+        logger.error(f"[Outbox] Purge gagal: {e}")
+    finally:
+        db.close()
+    if total:
+        logger.info(f"[Outbox] {total} baris lebih tua dari {days} hari dihapus")
+        with _stats_lock:
+            _stats["purged"] += total
+    return total
+
+
+def _run():
+    logger.info(f"✅ Notification outbox dispatcher started (poll {POLL_INTERVAL}s, batch {BATCH_SIZE})")
+    while not _stop.is_set():
+        _wake.wait(POLL_INTERVAL)
+        _wake.clear()
+        # Kuras sampai kosong sebelum tidur lagi
+        while not _stop.is_set() and run_outbox_once() >= BATCH_SIZE:
+            pass
+
+
+def start():
+    global _worker
+    if _worker is not None and _worker.is_alive():
+        return
+    _stop.clear()
+    _worker = threading.Thread(target=_run, name="notification-outbox", daemon=True)
+    _worker.start()
+
+
+def stop(timeout: float = 10):
+    global _worker
+    if _worker is None:
+        return
+    _stop.set()
+    _wake.set()
+    _worker.join(timeout)
+    _worker = None
+    logger.info("🛑 Notification outbox dispatcher stopped")
+
+
+def stats() -> dict:
+    db: Session = SessionLocal()
+    try:
+        backlog = dict(db.execute(text(
+            "SELECT status, COUNT(*) FROM notification_outbox WHERE status IN ('pending', 'sending', 'failed') GROUP BY status"
+        )).all())
+    except Exception:
+        backlog = {}
+    finally:
+        db.close()
+    with _stats_lock:
+        counters = dict(_stats)
+    with _recipient_lock:
+        cached_groups = len(_recipient_cache)
+    return {
+        **counters,
+        "backlog": backlog,
+        "recipient_cache_groups": cached_groups,
+        "worker_alive": bool(_worker and _worker.is_alive()),
+        "poll_interval": POLL_INTERVAL,
+        "batch_size": BATCH_SIZE,
+        "retention_days": RETENTION_DAYS,
+    }
@@ -0,0 +1,223 @@
+"""
+Payroll Calculator
+==================
+Hitung gaji satu periode untuk banyak karyawan sekaligus — dipakai oleh
+/api/laporan/gaji dan /api/payroll/slip-gaji/{kode}/recap.
+
+Setiap komponen diambil SEKALI untuk seluruh NIK terpilih (bukan query per karyawan):
+- gaji pokok, tunjangan (header + detail), BPJS kesehatan, BPJS tenaga kerja →
+  baris terbaru per NIK dengan tanggal_berlaku <= akhir periode, memakai
+  ROW_NUMBER() OVER (PARTITION BY nik ORDER BY tanggal_berlaku DESC) (MySQL 8)
+- penyesuaian gaji → detail kode PYG<MM><YYYY>
+Daftar NIK tidak dikirim sebagai IN (...) besar; filter karyawan dipasang sebagai
+subquery sehingga jumlah query konstan (7) berapa pun headcount-nya.
+
+Hasil bisa disimpan sebagai snapshot periode di slip_gaji_detail (simpan_snapshot)
+agar slip periode yang sudah ditutup tidak berubah ketika master gaji diedit.
+"""
+
+import json
+import calendar
+import logging
+from datetime import date
+
+from sqlalchemy import select, func, or_, delete
+from sqlalchemy.orm import Session
+
+from app.models.models import (
+    Karyawan, Cabang, Departemen, Jabatan, JenisTunjangan,
+    KaryawanGajiPokok, KaryawanTunjangan, KaryawanTunjanganDetail,
+    KaryawanBpjsKesehatan, KaryawanBpjstenagakerja, KaryawanPenyesuaianGajiDetail
+)
+from app.models.slip_gaji_detail import SlipGajiDetail
+
+logger = logging.getLogger("payroll_calculator")
+
+SNAPSHOT_BATCH = 500
+
+
+def periode_sampai(bulan: int, tahun: int) -> date:
+    return date(tahun, bulan, calendar.monthrange(tahun, bulan)[1])
+
+
+def kode_penyesuaian(bulan: int, tahun: int) -> str:
+    return f"PYG{str(bulan).zfill(2)}{tahun}"
+
+
+def _filter_karyawan(stmt, kode_cabang=None, kode_dept=None, search=None, nik=None, aktif_only=True):
+    if aktif_only:
+        stmt = stmt.where(Karyawan.status_aktif_karyawan == '1')
+    if nik:
+        stmt = stmt.where(Karyawan.nik == nik)
+    if kode_cabang:
+        stmt = stmt.where(Karyawan.kode_cabang == kode_cabang)
+    if kode_dept:
+        stmt = stmt.where(Karyawan.kode_dept == kode_dept)
+    if search:
+        stmt = stmt.where(or_(
+            Karyawan.nama_karyawan.like(f"%{search}%"),
+            Karyawan.nik.like(f"%{search}%")
+        ))
+    return stmt
+
+
+def _latest(model, pk, sampai: date, nik_select):
+    """Subquery baris terbaru per NIK (tanggal_berlaku <= sampai); kolom rn == 1 yang berlaku."""
+    rn = func.row_number().over(
+        partition_by=model.nik,
+        order_by=(model.tanggal_berlaku.desc(), pk.desc())
+    ).label("rn")
+    return select(model, rn)\
+        .where(model.tanggal_berlaku <= sampai, model.nik.in_(nik_select))\
+        .subquery()
+
+
+def _latest_jumlah(db: Session, model, pk, sampai: date, nik_select) -> dict:
+    sub = _latest(model, pk, sampai, nik_select)
+    return dict(db.execute(select(sub.c.nik, sub.c.jumlah).where(sub.c.rn == 1)).all())
+
+
+def hitung_gaji(db: Session, bulan: int, tahun: int, kode_cabang: str = None, kode_dept: str = None,
+                search: str = None, nik: str = None) -> dict:
+    """
+    Matriks gaji satu periode untuk karyawan aktif yang lolos filter, urut nama.
+
+    Return {"jenis_tunjangan": [{"kode", "nama"}], "data": [dict per karyawan]} dengan field
+    nik, nama_karyawan, nama_dept, nama_cabang, nama_jabatan, gaji_pokok, tunjangan_detail,
+    total_tunjangan, bpjs_kesehatan, bpjs_tenagakerja, penambah, pengurang, gaji_bersih.
+    """
+    sampai = periode_sampai(bulan, tahun)
+    filters = dict(kode_cabang=kode_cabang, kode_dept=kode_dept, search=search, nik=nik)
+    nik_select = _filter_karyawan(select(Karyawan.nik), **filters)
+
+    # 1. Kolom jenis tunjangan
+    jenis_tunjangan = db.query(JenisTunjangan).order_by(JenisTunjangan.kode_jenis_tunjangan).all()
+    tunjangan_columns = [{"kode": jt.kode_jenis_tunjangan, "nama": jt.jenis_tunjangan} for jt in jenis_tunjangan]
+
+    # 2. Karyawan
+    karyawan_stmt = _filter_karyawan(
+        select(Karyawan.nik, Karyawan.nama_karyawan, Departemen.nama_dept, Cabang.nama_cabang, Jabatan.nama_jabatan)
+        .outerjoin(Cabang, Karyawan.kode_cabang == Cabang.kode_cabang)
+        .outerjoin(Departemen, Karyawan.kode_dept == Departemen.kode_dept)
+        .outerjoin(Jabatan, Karyawan.kode_jabatan == Jabatan.kode_jabatan),
+        **filters
+    ).order_by(Karyawan.nama_karyawan)
+    karyawans = db.execute(karyawan_stmt).all()
+    if not karyawans:
+        return {"jenis_tunjangan": tunjangan_columns, "data": []}
+
+    # 3. Komponen per NIK (satu query per komponen)
+    gaji_pokok = _latest_jumlah(db, KaryawanGajiPokok, KaryawanGajiPokok.kode_gaji, sampai, nik_select)
+    bpjs_kes = _latest_jumlah(db, KaryawanBpjsKesehatan, KaryawanBpjsKesehatan.kode_bpjs_kesehatan, sampai, nik_select)
+    bpjs_tk = _latest_jumlah(db, KaryawanBpjstenagakerja, KaryawanBpjstenagakerja.kode_bpjs_tk, sampai, nik_select)
+
+    # Hanya kode yang terdaftar di jenis_tunjangan yang dijumlahkan (sama seperti laporan lama)
+    known = {col["kode"] for col in tunjangan_columns}
+    header = _latest(KaryawanTunjangan, KaryawanTunjangan.kode_tunjangan, sampai, nik_select)
+    tunjangan = {}
+    for t_nik, kode_jenis, jumlah in db.execute(
+        select(header.c.nik, KaryawanTunjanganDetail.kode_jenis_tunjangan, KaryawanTunjanganDetail.jumlah)
+        .select_from(header)
+        .join(KaryawanTunjanganDetail, KaryawanTunjanganDetail.kode_tunjangan == header.c.kode_tunjangan)
+        .where(header.c.rn == 1)
+    ).all():
+        if kode_jenis in known:
+            tunjangan.setdefault(t_nik, {})[kode_jenis] = jumlah
+
+    penyesuaian = {
+        p_nik: (penambah or 0, pengurang or 0)
+        for p_nik, penambah, pengurang in db.execute(
+            select(KaryawanPenyesuaianGajiDetail.nik, KaryawanPenyesuaianGajiDetail.penambah,
+                   KaryawanPenyesuaianGajiDetail.pengurang)
+            .where(KaryawanPenyesuaianGajiDetail.kode_penyesuaian_gaji == kode_penyesuaian(bulan, tahun),
+                   KaryawanPenyesuaianGajiDetail.nik.in_(nik_select))
+        ).all()
+    }
+
+    # 4. Rakit matriks gaji dalam satu lintasan
+    data = []
+    for k_nik, nama_karyawan, nama_dept, nama_cabang, nama_jabatan in karyawans:
+        detail = {col["kode"]: 0 for col in tunjangan_columns}
+        detail.update(tunjangan.get(k_nik, {}))
+        total_tunjangan = sum(detail.values())
+        penambah, pengurang = penyesuaian.get(k_nik, (0, 0))
+        pokok = gaji_pokok.get(k_nik, 0)
+        kes = bpjs_kes.get(k_nik, 0)
+        tk = bpjs_tk.get(k_nik, 0)
+        data.append({
+            "nik": k_nik,
+            "nama_karyawan": nama_karyawan,
+            "nama_dept": nama_dept or "-",
+            "nama_cabang": nama_cabang or "-",
+            "nama_jabatan": nama_jabatan or "-",
+            "gaji_pokok": pokok,
+            "tunjangan_detail": detail,
+            "total_tunjangan": total_tunjangan,
+            "bpjs_kesehatan": kes,
+            "bpjs_tenagakerja": tk,
+            "penambah": penambah,
+            "pengurang": pengurang,
+            "gaji_bersih": (pokok + total_tunjangan + penambah) - (kes + tk + pengurang),
+        })
+
+    return {"jenis_tunjangan": tunjangan_columns, "data": data}
+
+
+# ─── Snapshot periode ──────────────────────────────────────────────────────
+def simpan_snapshot(db: Session, kode_slip_gaji: str, bulan: int, tahun: int) -> int:
+    """Hitung ulang seluruh karyawan aktif dan ganti snapshot slip_gaji_detail periode ini."""
+    hasil = hitung_gaji(db, bulan, tahun)
+    db.execute(delete(SlipGajiDetail).where(SlipGajiDetail.kode_slip_gaji == kode_slip_gaji))
+    rows = [
+        {
+            "kode_slip_gaji": kode_slip_gaji,
+            "nik": r["nik"],
+            "nama_karyawan": r["nama_karyawan"],
+            "nama_jabatan": r["nama_jabatan"],
+            "nama_dept": r["nama_dept"],
+            "nama_cabang": r["nama_cabang"],
+            "gaji_pokok": r["gaji_pokok"],
+            "total_tunjangan": r["total_tunjangan"],
+            "tunjangan_detail": json.dumps(r["tunjangan_detail"]),
+            "bpjs_kesehatan": r["bpjs_kesehatan"],
+            "bpjs_tenagakerja": r["bpjs_tenagakerja"],
+            "penambah": r["penambah"],
+            "pengurang": r["pengurang"],
+            "gaji_bersih": r["gaji_bersih"],
+        }
+        for r in hasil["data"]
+    ]
+    for i in range(0, len(rows), SNAPSHOT_BATCH):
+        db.execute(SlipGajiDetail.__table__.insert(), rows[i:i + SNAPSHOT_BATCH])
+    db.commit()
+    logger.info(f"[Payroll] Snapshot {kode_slip_gaji}: {len(rows)} karyawan")
+    return len(rows)
+
+
+def baca_snapshot(db: Session, kode_slip_gaji: str, nik: str = None) -> list:
+    """Baris snapshot periode (urut nama) dalam bentuk yang sama dengan hitung_gaji()['data']."""
+    q = db.query(SlipGajiDetail).filter(SlipGajiDetail.kode_slip_gaji == kode_slip_gaji)
+    if nik:
+        q = q.filter(SlipGajiDetail.nik == nik)
+    return [
+        {
+            "nik": s.nik,
+            "nama_karyawan": s.nama_karyawan,
+            "nama_dept": s.nama_dept,
+            "nama_cabang": s.nama_cabang,
+            "nama_jabatan": s.nama_jabatan,
+            "gaji_pokok": s.gaji_pokok,
+            "tunjangan_detail": json.loads(s.tunjangan_detail) if s.tunjangan_detail else {},
+            "total_tunjangan": s.total_tunjangan,
+            "bpjs_kesehatan": s.bpjs_kesehatan,
+            "bpjs_tenagakerja": s.bpjs_tenagakerja,
+            "penambah": s.penambah,
+            "pengurang": s.pengurang,
+            "gaji_bersih": s.gaji_bersih,
+        }
+        for s in q.order_by(SlipGajiDetail.nama_karyawan).all()
+    ]
+
+
+def hapus_snapshot(db: Session, kode_slip_gaji: str):
+    db.execute(delete(SlipGajiDetail).where(SlipGajiDetail.kode_slip_gaji == kode_slip_gaji))
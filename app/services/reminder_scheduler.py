@@ -4,25 +4,34 @@ Reminder Scheduler
 Dijalankan setiap menit oleh APScheduler di startup FastAPI.
 
 Alur:
-1. Ambil semua reminder_settings yang is_active=1
-2. Untuk setiap reminder, tentukan jam target berdasarkan type
-3. Hitung window: jam_target - minutes_before  (±1 menit toleransi)
-4. Ambil semua karyawan yang memenuhi kriteria target_role / target_dept / target_cabang
-5. Kirim FCM push notification ke device masing-masing
+1. Timeline harian (app.services.reminder_timeline) disusun sekali per hari dan saat ada
+   invalidasi: untuk setiap reminder_settings aktif × karyawan target, hitung waktu tembak
+   jam_target - minutes_before (patroli: H-minus + ping audio setiap 5 menit di jendela).
+2. Setiap tick hanya mengambil entry yang sudah jatuh tempo dari heap.
+3. Untuk NIK yang jatuh tempo saja: resolve ulang jadwal & presensi (batch), cek kondisi
+   (belum absen masuk / belum absen pulang / belum ada sesi patroli).
+4. Kirim FCM push notification ke device masing-masing
 """
 
+import time
 import logging
+from bisect import bisect_left
+from types import SimpleNamespace
 from datetime import datetime, date, timedelta, time as dtime, timezone
 from sqlalchemy.orm import Session
-from sqlalchemy import or_, func
+from sqlalchemy import or_, func, tuple_
 
 from app.database import SessionLocal
 from app.models.models import (
     ReminderSettings, Karyawan, KaryawanDevices, Userkaryawan,
     Presensi, PresensiJamkerja, SetJamKerjaByDate, SetJamKerjaByDay,
-    PatrolSchedules
+    PatrolSchedules, PatrolSessions
 )
+from app.core import master_cache
 from app.core.fcm import _send_to_tokens as fcm_send
+from app.services.schedule_resolver import ScheduleResolver
+from app.services import reminder_timeline
+from app.services.reminder_timeline import timeline, TimelineEntry
 
 logger = logging.getLogger("reminder_scheduler")
 
@@ -32,6 +41,12 @@ HARI_MAP = {0: 'Senin', 1: 'Selasa', 2: 'Rabu', 3: 'Kamis',
 # Timezone WIB (UTC+7) — server berjalan di UTC, jadwal patroli & absen dalam WIB
 TZ_WIB = timezone(timedelta(hours=7))
 
+# Interval ping audio di dalam jendela patroli (menit ke-0, 5, 10, ... 55)
+PATROL_PING_MINUTES = 5
+
+# Entry yang terlambat lebih dari ini (tick terlewat / scheduler macet) tidak dikirim lagi
+MAX_LATE = timedelta(minutes=2)
+
 
 def _get_patroli_niks(db: Session, kode_dept: str = None, kode_cabang: str = None) -> list:
     """
@@ -71,7 +86,7 @@ def _send_fcm_to_niks(db: Session, niks: list, title: str, body: str, reminder_t
         logger.info(f"[Reminder:{reminder_type}] Tidak ada FCM token — skip")
         return
 
-    # Kirim menggunakan fcm.py (force IPv4, tidak hang)
+    # Kirim menggunakan dispatcher fcm.py (paralel, retry, token invalid di-prune)
     payload = {
         "type":          "reminder",
         "reminder_type": reminder_type,
@@ -90,29 +105,46 @@ def _send_fcm_to_niks(db: Session, niks: list, title: str, body: str, reminder_t
 # ─────────────────────────────────────────────────────────────────────────────
 # Resolve Jam Kerja aktif untuk satu karyawan hari ini
 # ─────────────────────────────────────────────────────────────────────────────
-def _get_jam_masuk_pulang(nik: str, db: Session, today: date = None):
-    """
-    Return (jam_masuk, jam_pulang, is_libur, presensi_obj)
-    Hanya menggunakan determine_jam_kerja_hari_ini agar 100% akurat dengan hierarki Absensi.
-    """
-    from app.routers.absensi_legacy import determine_jam_kerja_hari_ini
-    if today is None:
-        today = datetime.now(TZ_WIB).date()
-        
-    now_wib = datetime.now(TZ_WIB)
-    
-    jam_kerja_obj, presensi = determine_jam_kerja_hari_ini(db, nik, today, now_wib)
-    
+def _jadwal_tuple(jam_kerja_obj, presensi):
+    """Ubah hasil resolver → (jam_masuk, jam_pulang, is_libur, presensi_obj, kode_jam_kerja)."""
     if not jam_kerja_obj:
         return None, None, False, presensi, None
-        
+
     is_libur = False
     if jam_kerja_obj.kode_jam_kerja == 'LIBR' or (jam_kerja_obj.nama_jam_kerja and 'Libur' in jam_kerja_obj.nama_jam_kerja):
         is_libur = True
-        
+
     return jam_kerja_obj.jam_masuk, jam_kerja_obj.jam_pulang, is_libur, presensi, jam_kerja_obj.kode_jam_kerja
 
 
+def _get_jam_masuk_pulang(nik: str, db: Session, today: date = None):
+    """
+    Return (jam_masuk, jam_pulang, is_libur, presensi_obj, kode_jam_kerja)
+    Menggunakan ScheduleResolver agar 100% akurat dengan hierarki Absensi.
+    """
+    if today is None:
+        today = datetime.now(TZ_WIB).date()
+
+    now_wib = datetime.now(TZ_WIB)
+
+    jam_kerja_obj, presensi = ScheduleResolver(db).resolve_one(nik, today, now_wib)
+    return _jadwal_tuple(jam_kerja_obj, presensi)
+
+
+def _resolve_jadwal_batch(db: Session, niks: list, today: date, cache: dict) -> dict:
+    """
+    Resolve jadwal untuk NIK yang belum ada di cache dalam satu batch.
+    Cache berlaku per pemanggilan (build timeline / tick) sehingga setiap NIK hanya di-resolve sekali walau dipakai banyak setting.
+    """
+    missing = [n for n in niks if n not in cache]
+    if missing:
+        now_wib = datetime.now(TZ_WIB)
+        resolved = ScheduleResolver(db).resolve(missing, today, now_wib)
+        for nik in missing:
+            cache[nik] = _jadwal_tuple(*resolved.get(nik, (None, None)))
+    return cache
+
+
 # ─────────────────────────────────────────────────────────────────────────────
 # Ambil karyawan yang memenuhi filter reminder
 # ─────────────────────────────────────────────────────────────────────────────
@@ -148,54 +180,292 @@ def _get_target_karyawan(db: Session, setting: ReminderSettings) -> list:
 
 
 # ─────────────────────────────────────────────────────────────────────────────
-# Cek apakah waktu sekarang dalam window target
+# Timeline: hitung waktu tembak per (setting, NIK[, jadwal patroli])
 # ─────────────────────────────────────────────────────────────────────────────
-def _in_window(now: datetime, target_time: dtime, minutes_before: int) -> bool:
+SETTING_FIELDS = ('id', 'type', 'label', 'message', 'minutes_before',
+                  'target_role', 'target_dept', 'target_cabang', 'target_shift')
+SCHEDULE_FIELDS = ('id', 'kode_jam_kerja', 'start_time', 'end_time', 'kode_dept', 'kode_cabang')
+
+
+def _snapshot(obj, fields: tuple) -> SimpleNamespace:
+    return SimpleNamespace(**{f: getattr(obj, f) for f in fields})
+
+
+def _ceil_ping(dt: datetime) -> datetime:
+    """Bulatkan ke atas ke kelipatan PATROL_PING_MINUTES menit (detik = 0)."""
+    base = dt.replace(second=0, microsecond=0)
+    if base < dt:
+        base += timedelta(minutes=1)
+    return base + timedelta(minutes=(-base.minute) % PATROL_PING_MINUTES)
+
+
+def _patrol_segments(day: date, sch) -> list:
     """
-    Apakah now berada dalam [target - minutes_before - 1, target - minutes_before + 1]?
-    Toleransi ±1 menit untuk menghindari miss saat scheduler terlambat.
+    Jendela patroli yang beririsan dengan `day`:
+    [(window_start, window_end, seg_start, seg_end)], seg = potongan jendela di hari tsb.
     """
-    target_dt  = datetime.combine(now.date(), target_time) - timedelta(minutes=minutes_before)
-    window_start = target_dt - timedelta(minutes=1)
-    window_end   = target_dt + timedelta(minutes=1)
-    return window_start <= now <= window_end
+    day_start = datetime.combine(day, dtime.min)
+    day_end = day_start + timedelta(days=1)
+    start = datetime.combine(day, sch.start_time)
+    end = datetime.combine(day, sch.end_time)
+    if end > start:
+        windows = [(start, end)]
+    else:
+        # Lintas tengah malam (mis. 23:00 - 05:00): sisa jendela kemarin + jendela malam ini
+        windows = [(start - timedelta(days=1), end), (start, end + timedelta(days=1))]
+    return [(ws, we, max(ws, day_start), min(we, day_end)) for ws, we in windows]
+
+
+def _build_entries(setting, nik: str, jadwal: tuple, kary, schedules: list,
+                   day: date, after: datetime, version: int) -> list:
+    """Waktu tembak di `day` (setelah `after`) untuk satu NIK pada satu setting."""
+    jam_masuk, jam_pulang, is_libur, _, kode_jk = jadwal
+    if is_libur:
+        return []
+
+    def h_minus(t: dtime) -> datetime:
+        return datetime.combine(day, t) - timedelta(minutes=setting.minutes_before)
+
+    def berlaku(fire_at: datetime) -> bool:
+        return fire_at > after and fire_at.date() == day
+
+    entries = []
+    if setting.type in ('absen_masuk', 'cleaning_task', 'driver_task'):
+        if jam_masuk and berlaku(h_minus(jam_masuk)):
+            entries.append(TimelineEntry(h_minus(jam_masuk), setting.id, nik, kode_jk, version=version))
+
+    elif setting.type == 'absen_pulang':
+        if jam_pulang and berlaku(h_minus(jam_pulang)):
+            entries.append(TimelineEntry(h_minus(jam_pulang), setting.id, nik, kode_jk, version=version))
+
+    elif setting.type == 'absen_patroli':
+        if not kode_jk or not kary:
+            return []
+        for sch in schedules:
+            if setting.target_shift and sch.kode_jam_kerja != setting.target_shift:
+                continue
+            # Jadwal harus relevan untuk Cabang, Dept & shift karyawan
+            if sch.kode_cabang and sch.kode_cabang != kary.kode_cabang:
+                continue
+            if sch.kode_dept and sch.kode_dept != kary.kode_dept:
+                continue
+            if sch.kode_jam_kerja and sch.kode_jam_kerja != kode_jk:
+                continue
+
+            segments = _patrol_segments(day, sch)
+
+            # 1. Ping H-minutes_before → notifikasi penuh
+            fire_at = h_minus(sch.start_time)
+            if berlaku(fire_at):
+                entries.append(TimelineEntry(
+                    fire_at, setting.id, nik, kode_jk,
+                    schedule_id=sch.id, window=segments[-1][:2], version=version
+                ))
+
+            # 2. Di dalam jendela patroli: ping audio setiap PATROL_PING_MINUTES menit.
+            #    Hanya ping pertama yang masuk timeline; berikutnya dijadwalkan saat di-pop.
+            for ws, we, seg_start, seg_end in segments:
+                first = _ceil_ping(max(seg_start, after + timedelta(microseconds=1)))
+                if first < seg_end:
+                    entries.append(TimelineEntry(
+                        first, setting.id, nik, kode_jk, audio_only=True,
+                        schedule_id=sch.id, window=(ws, we), until=seg_end, version=version
+                    ))
+    return entries
+
+
+def _push_entries(db: Session, context: dict, niks: set, day: date, after: datetime) -> int:
+    """Resolve jadwal `niks` sekali (batch) lalu masukkan semua waktu tembaknya ke timeline."""
+    if not niks:
+        return 0
+    jadwal = _resolve_jadwal_batch(db, list(niks), day, {})
+    pushed = 0
+    for setting_id, setting in context["settings"].items():
+        for nik in context["targets"][setting_id] & niks:
+            entries = _build_entries(
+                setting, nik, jadwal[nik], context["karyawan"].get(nik),
+                context["schedules"], day, after, timeline.version_of(nik)
+            )
+            for entry in entries:
+                timeline.push(entry)
+            pushed += len(entries)
+    return pushed
+
+
+def _refresh_timeline(db: Session, now: datetime):
+    """Rebuild penuh jika perlu (ganti hari / invalidasi / master berubah), lalu NIK yang kotor."""
+    day = now.date()
+    master_versions = master_cache.versions(master_cache.JAM_KERJA, master_cache.JAM_KERJA_DEPT)
+    after = timeline.watermark or (now - timedelta(minutes=1))
+
+    if timeline.needs_full_rebuild(day, master_versions):
+        started = time.monotonic()
+        settings = {
+            s.id: _snapshot(s, SETTING_FIELDS)
+            for s in db.query(ReminderSettings).filter(ReminderSettings.is_active == 1).all()
+        }
+        targets = {sid: set(_get_target_karyawan(db, s)) for sid, s in settings.items()}
+
+        karyawan, schedules = {}, []
+        if any(s.type == 'absen_patroli' for s in settings.values()):
+            karyawan = {
+                k.nik: k for k in db.query(Karyawan.nik, Karyawan.kode_cabang, Karyawan.kode_dept).all()
+            }
+            schedules = [
+                _snapshot(sch, SCHEDULE_FIELDS)
+                for sch in db.query(PatrolSchedules).filter(PatrolSchedules.is_active == True).all()
+            ]
+
+        context = {"settings": settings, "targets": targets, "karyawan": karyawan, "schedules": schedules}
+        timeline.reset(day, after, master_versions, context)
+        all_niks = set().union(*targets.values()) if targets else set()
+        pushed = _push_entries(db, context, all_niks, day, after)
+        logger.info(
+            f"[Reminder] Timeline {day} disusun: {pushed} entry, {len(settings)} setting, "
+            f"{len(all_niks)} NIK ({(time.monotonic() - started) * 1000:.0f} ms)"
+        )
+        return
 
+    dirty = timeline.take_dirty()
+    if dirty:
+        context = timeline.context
+        targeted = set().union(*context["targets"].values()) if context["targets"] else set()
+        dirty &= targeted
+        if dirty:
+            timeline.bump(dirty)
+            pushed = _push_entries(db, context, dirty, day, after)
+            logger.info(f"[Reminder] Timeline dihitung ulang untuk {len(dirty)} NIK ({pushed} entry)")
 
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Evaluasi entry yang jatuh tempo (kondisi murah, hanya untuk NIK yang due)
 # ─────────────────────────────────────────────────────────────────────────────
-def _is_active_patrol_window_and_due(now: datetime, sch_start: dtime, sch_end: dtime, minutes_before: int):
+def _load_patrol_sessions(db: Session, candidates: list) -> dict:
     """
-    Untuk patroli: 
-    1. Ping H-minutes_before (seperti biasa) -> Full Notif (return True, False)
-    2. Jika sudah masuk jam window (start <= now <= end), ping setiap kelipatan 5 menit -> Audio Only (return True, True)
-    Kembalian: (should_ping, audio_only)
+    Muat sesi patroli untuk semua grup (cabang, dept) & jendela kandidat dalam SATU query.
+    Return {(kode_cabang, kode_dept): [created_at terurut]} untuk pengecekan di memori.
     """
-    now_time = now.time()
-    today_date = now.date()
-    
-    # 1. Cek H-minus (sama dengan _in_window standard)
-    target_dt  = datetime.combine(today_date, sch_start) - timedelta(minutes=minutes_before)
-    window_start = target_dt - timedelta(minutes=1)
-    window_end   = target_dt + timedelta(minutes=1)
-    if window_start <= now <= window_end:
-        return True, False
-        
-    # 2. Cek apakah sedang berada di DALAM window patroli
-    # Helper untuk logic melampaui tengah malam
-    start_dt = datetime.combine(today_date, sch_start)
-    end_dt = datetime.combine(today_date, sch_end)
-    if end_dt <= start_dt:
-        # Jika jadwal seperti 23:00 - 05:00
-        if now_time >= sch_start:
-            end_dt += timedelta(days=1)
-        else: # now_time < sch_end
-            start_dt -= timedelta(days=1)
-            
-    if start_dt <= now < end_dt:
-        # Ping berulang setiap 5 menit pas (0, 5, 10, ... 55) (AUDIO ONLY)
-        if now.minute % 5 == 0:
-            return True, True
-            
-    return False, False
+    groups = {(kary.kode_cabang, kary.kode_dept) for _, kary in candidates}
+    # Cabang/dept NULL tidak pernah cocok di SQL (= NULL), jadi grup tsb tidak punya sesi
+    groups = [g for g in groups if g[0] is not None and g[1] is not None]
+    if not groups:
+        return {}
+
+    window_start = min(entry.window[0] for entry, _ in candidates)
+    window_end = max(entry.window[1] for entry, _ in candidates)
+    rows = db.query(Karyawan.kode_cabang, Karyawan.kode_dept, PatrolSessions.created_at).join(
+        Karyawan, Karyawan.nik == PatrolSessions.nik
+    ).filter(
+        tuple_(Karyawan.kode_cabang, Karyawan.kode_dept).in_(groups),
+        PatrolSessions.created_at >= window_start,
+        PatrolSessions.created_at <= window_end
+    ).all()
+
+    index = {}
+    for kode_cabang, kode_dept, created_at in rows:
+        if created_at is not None:
+            index.setdefault((kode_cabang, kode_dept), []).append(created_at)
+    for times in index.values():
+        times.sort()
+    return index
+
+
+def _sudah_patroli(sessions: dict, kary, window: tuple) -> bool:
+    """Apakah rekan satu cabang & dept sudah memulai sesi patroli dalam jendela ini."""
+    times = sessions.get((kary.kode_cabang, kary.kode_dept))
+    if not times:
+        return False
+    i = bisect_left(times, window[0])
+    return i < len(times) and times[i] <= window[1]
+
+
+def _hadir_bertugas(jadwal: tuple, now: datetime) -> bool:
+    """Syarat patroli: sudah absen masuk dan belum lewat jam pulang shift."""
+    jam_masuk, jam_pulang, _, presensi, _ = jadwal
+
+    # SYARAT MUTLAK 1: Karyawan harus sudah hadir (Absen Masuk).
+    if not presensi or presensi.jam_in is None:
+        return False
+
+    # SYARAT MUTLAK 2: Lupa absen pulang dan sudah lewat jam pulang shift → skip
+    if presensi.jam_out is None and jam_pulang:
+        pulang_dt = datetime.combine(presensi.tanggal, jam_pulang)
+        if jam_masuk and jam_pulang < jam_masuk:  # shift malam
+            pulang_dt += timedelta(days=1)
+        if now > pulang_dt:
+            return False
+    return True
+
+
+def _should_fire(setting, jadwal: tuple) -> bool:
+    """Kondisi reminder absen/task (patroli dievaluasi terpisah secara berkelompok)."""
+    presensi = jadwal[3]
+
+    if setting.type == 'absen_masuk':
+        # Jika belum ada tap In
+        return not presensi or presensi.jam_in is None
+
+    if setting.type == 'absen_pulang':
+        # Sudah absen masuk tapi belum absen pulang
+        return bool(presensi and presensi.jam_in is not None and presensi.jam_out is None)
+
+    if setting.type in ('cleaning_task', 'driver_task'):
+        return True
+
+    return False
+
+
+def _fire_due(db: Session, due: list, now: datetime):
+    context = timeline.context
+    settings = context["settings"]
+    karyawan = context["karyawan"]
+
+    # Jadwal & presensi terbaru hanya untuk NIK yang jatuh tempo
+    jadwal = _resolve_jadwal_batch(db, list({e.nik for e in due}), timeline.day, {})
+
+    fire, audio = {}, {}  # setting_id -> set(nik)
+    patrol_candidates = []  # [(entry, karyawan)] yang hadir & menunggu cek sesi patroli
+    for entry in due:
+        if entry.audio_only:
+            next_entry = entry.repeat(PATROL_PING_MINUTES, now)
+            if next_entry:
+                timeline.push(next_entry)
+
+        setting = settings.get(entry.setting_id)
+        if not setting or now - entry.fire_at > MAX_LATE:
+            continue
+        try:
+            _, _, is_libur, _, kode_jk = jadwal[entry.nik]
+            # Shift berubah sejak timeline disusun → entry ini tidak berlaku lagi
+            if is_libur or kode_jk != entry.kode_jam_kerja:
+                continue
+            if setting.type == 'absen_patroli':
+                kary = karyawan.get(entry.nik)
+                if kary and _hadir_bertugas(jadwal[entry.nik], now):
+                    patrol_candidates.append((entry, kary))
+            elif _should_fire(setting, jadwal[entry.nik]):
+                fire.setdefault(entry.setting_id, set()).add(entry.nik)
+        except Exception as ex:
+            logger.error(f"[Reminder] Error evaluasi setting id={entry.setting_id} nik={entry.nik}: {ex}")
+
+    # Patroli: satu query sesi untuk semua grup & jendela, lalu dijawab di memori
+    if patrol_candidates:
+        sessions = _load_patrol_sessions(db, patrol_candidates)
+        for entry, kary in patrol_candidates:
+            if not _sudah_patroli(sessions, kary, entry.window):
+                (audio if entry.audio_only else fire).setdefault(entry.setting_id, set()).add(entry.nik)
+
+    for setting_id, niks in audio.items():
+        # Buang nik di audio yang sudah ada di fire (kembar)
+        niks = niks - fire.get(setting_id, set())
+        if niks:
+            setting = settings[setting_id]
+            _send_fcm_to_niks(db, list(niks), setting.label, setting.message, setting.type, audio_only=True)
+
+    for setting_id, niks in fire.items():
+        setting = settings[setting_id]
+        _send_fcm_to_niks(db, list(niks), setting.label, setting.message, setting.type)
+
 
 # ─────────────────────────────────────────────────────────────────────────────
 # Main scheduler job
@@ -205,161 +475,14 @@ def run_reminder_check():
     try:
         now_wib = datetime.now(TZ_WIB)          # waktu sekarang dalam WIB
         now     = now_wib.replace(tzinfo=None)   # naive untuk perbandingan
-        today   = now.date()
-        logger.info(f"[Reminder] Scheduler tick (WIB): {now.strftime('%H:%M:%S')} | UTC: {datetime.utcnow().strftime('%H:%M:%S')}")
-
-        settings = db.query(ReminderSettings).filter(ReminderSettings.is_active == 1).all()
-
-        for setting in settings:
-            try:
-                niks = _get_target_karyawan(db, setting)
-                if not niks:
-                    continue
-
-                fire_niks = []  # NIK yang akan dikirimi reminder
-
-                # ─── absen_masuk ───────────────────────────────────────────
-                if setting.type == 'absen_masuk':
-                    for nik in niks:
-                        jam_masuk, _, is_libur, presensi, _ = _get_jam_masuk_pulang(nik, db, today)
-                        if jam_masuk and not is_libur and _in_window(now, jam_masuk, setting.minutes_before):
-                            # Jika belum ada tap In 
-                            if not presensi or presensi.jam_in is None:
-                                fire_niks.append(nik)
-
-                # ─── absen_pulang ──────────────────────────────────────────
-                elif setting.type == 'absen_pulang':
-                    for nik in niks:
-                        _, jam_pulang, is_libur, presensi, _ = _get_jam_masuk_pulang(nik, db, today)
-                        if jam_pulang and not is_libur and _in_window(now, jam_pulang, setting.minutes_before):
-                            # Sudah absen masuk tapi belum absen pulang
-                            if presensi and presensi.jam_in is not None and presensi.jam_out is None:
-                                fire_niks.append(nik)
-
-                # ─── absen_patroli ─────────────────────────────────────────
-                elif setting.type == 'absen_patroli':
-                    from app.models.models import PatrolSessions
-                    patrol_schedules = db.query(PatrolSchedules).filter(
-                        PatrolSchedules.is_active == True
-                    ).all()
-
-                    # Optimize Karyawan lookups
-                    karyawan_dict = {k.nik: k for k in db.query(Karyawan).filter(Karyawan.nik.in_(niks)).all()}
-                    group_niks_cache = {}
-                    
-                    audio_niks = []
-
-                    for sch in patrol_schedules:
-                        if setting.target_shift and sch.kode_jam_kerja != setting.target_shift:
-                            continue
-
-                        should_ping, is_audio_only = _is_active_patrol_window_and_due(now, sch.start_time, sch.end_time, setting.minutes_before)
-                        if not should_ping:
-                            continue
-
-                        # Check each targeted NIK
-                        for nik in niks:
-                            kary = karyawan_dict.get(nik)
-                            if not kary: continue
-
-                            # 1. Pastikan jadwal ini relevan untuk Cabang & Dept karyawan
-                            if sch.kode_cabang and sch.kode_cabang != kary.kode_cabang:
-                                continue
-                            if sch.kode_dept and sch.kode_dept != kary.kode_dept:
-                                continue
-                                
-                            # 2. Pastikan jadwal kerja Karyawan sesuai dengan jadwal Patroli
-                            _, _, is_libur, presensi, kode_jk = _get_jam_masuk_pulang(nik, db, today)
-                            if is_libur or not kode_jk:
-                                continue
-                                
-                            if sch.kode_jam_kerja and sch.kode_jam_kerja != kode_jk:
-                                continue
-                                
-                            # SYARAT MUTLAK 1: Karyawan harus sudah hadir (Absen Masuk) hari ini.
-                            if not presensi or presensi.jam_in is None:
-                                continue
-                                    
-                            # SYARAT MUTLAK 2: Jika jam sekarang sudah di luar shift/jam pulang kerja aslinya, skip (misal ybs lupa absen pulang)
-                            jam_pulang = presensi.jam_out
-                            if not jam_pulang: # Lupa absen pulang
-                                _, jam_pulang_asli, _, _, _ = _get_jam_masuk_pulang(nik, db, today)
-                                if jam_pulang_asli:
-                                    # Hitung rentang sebenarnya
-                                    pulang_dt = datetime.combine(today, jam_pulang_asli).replace(tzinfo=TZ_WIB).replace(tzinfo=None)
-                                    jam_masuk_asli = jam_kerja_obj.jam_masuk if 'jam_kerja_obj' in locals() else None # fallback aman
-                                    # Jika jam malam
-                                    if hasattr(presensi, 'jam_masuk') and presensi.jam_masuk and jam_pulang_asli < presensi.jam_masuk:
-                                        pulang_dt += timedelta(days=1)
-                                    # Bandingkan jika sudah lewat dari batas kepulangan
-                                    if now > pulang_dt:
-                                        continue
-
-                            # 3. Cek apakah di rentang jadwal Patroli ini sesi karyawan (atau rekan cabangnya) sudah done
-                            # Window Schedule:
-                            start_dt = datetime.combine(today, sch.start_time)
-                            end_dt = datetime.combine(today, sch.end_time)
-                            if end_dt <= start_dt:
-                                end_dt += timedelta(days=1)
-                                
-                            cache_key = f"{kary.kode_cabang}_{kary.kode_dept}"
-                            if cache_key not in group_niks_cache:
-                                group_niks_cache[cache_key] = [
-                                    r[0] for r in db.query(Karyawan.nik).filter(
-                                        Karyawan.kode_cabang == kary.kode_cabang,
-                                        Karyawan.kode_dept   == kary.kode_dept
-                                    ).all()
-                                ]
-                                
-                            group_niks = group_niks_cache[cache_key]
-                                
-                            # Cari PatrolSession yang beririsan
-                            sudah_patroli = db.query(PatrolSessions).filter(
-                                PatrolSessions.nik.in_(group_niks),
-                                PatrolSessions.created_at >= start_dt,
-                                PatrolSessions.created_at <= end_dt
-                            ).first()
-
-                            if not sudah_patroli:
-                                if is_audio_only:
-                                    audio_niks.append(nik)
-                                else:
-                                    fire_niks.append(nik)
-
-                    fire_niks = list(set(fire_niks))
-                    
-                    # Buang nik di audio yang sudah ada di fire_niks (kembar)
-                    audio_niks = list(set(audio_niks) - set(fire_niks))
-                    
-                    if audio_niks:
-                        _send_fcm_to_niks(
-                            db=db,
-                            niks=audio_niks,
-                            title=setting.label,
-                            body=setting.message,
-                            reminder_type=setting.type,
-                            audio_only=True
-                        )
-
-                # ─── cleaning_task / driver_task ───────────────────────────
-                elif setting.type in ('cleaning_task', 'driver_task'):
-                    # Reminder di jam masuk kerja masing-masing
-                    for nik in niks:
-                        jam_masuk, _, is_libur, _, _ = _get_jam_masuk_pulang(nik, db, today)
-                        if jam_masuk and not is_libur and _in_window(now, jam_masuk, setting.minutes_before):
-                            fire_niks.append(nik)
-
-                if fire_niks:
-                    _send_fcm_to_niks(
-                        db=db,
-                        niks=fire_niks,
-                        title=setting.label,
-                        body=setting.message,
-                        reminder_type=setting.type
-                    )
-
-            except Exception as ex:
-                logger.error(f"[Reminder] Error processing setting id={setting.id}: {ex}")
+
+        reminder_timeline.poll(db)     # invalidasi dari worker lain
+        _refresh_timeline(db, now)
+        due = timeline.pop_due(now)
+        if not due:
+            return
+        logger.info(f"[Reminder] Tick (WIB) {now.strftime('%H:%M:%S')}: {len(due)} entry jatuh tempo")
+        _fire_due(db, due, now)
 
     except Exception as e:
         logger.error(f"[Reminder] Scheduler error: {e}")
@@ -0,0 +1,263 @@
+"""
+Reminder Timeline
+=================
+Daftar waktu tembak reminder yang sudah dihitung di muka untuk satu hari (WIB),
+disimpan sebagai min-heap berdasarkan fire_at.
+
+Tick scheduler (setiap menit) cukup mengambil entry yang sudah jatuh tempo lewat
+pop_due(); tidak ada lagi perhitungan ulang target × setting × jadwal setiap menit.
+Isi timeline disusun oleh app.services.reminder_scheduler (rebuild penuh / per NIK).
+
+Invalidasi:
+- invalidate()    → rebuild penuh pada tick berikutnya (reminder_settings, patrol_schedules,
+                    master jam kerja / jadwal departemen, edit karyawan)
+- invalidate(nik) → hanya entry NIK tsb yang dihitung ulang (absen, roster/jadwal NIK)
+Entry lama tidak dihapus dari heap; setiap NIK punya nomor versi dan entry dengan
+versi lama dilewati saat di-pop (lazy deletion).
+
+Timeline hanya hidup di worker leader (job reminder dibungkus leader.only_leader), jadi
+invalidate() juga menulis satu baris ke tabel reminder_timeline_invalidations. poll()
+dijalankan leader di awal setiap tick dan menerapkan baris baru ke timeline-nya sebelum
+pop_due(), sehingga edit di worker mana pun berlaku paling lambat satu tick kemudian.
+Invalidasi penuh dari log juga membuang master_cache jam kerja / jadwal departemen di
+leader (versinya per worker). Baris lebih tua dari sehari dihapus leader setiap jam.
+
+Rebuild penuh juga terjadi saat ganti hari, saat versi master jam kerja / jadwal
+departemen berubah (app.core.master_cache), dan setiap REMINDER_TIMELINE_MAX_AGE detik
+(default 1800) sebagai jaring pengaman.
+"""
+
+import os
+import time
+import heapq
+import itertools
+import logging
+import threading
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete
+from sqlalchemy.orm import Session
+
+from app.database import SessionLocal
+from app.core import master_cache
+from app.models.reminder_timeline_invalidation import ReminderTimelineInvalidation
+
+logger = logging.getLogger("reminder_scheduler")
+
+MAX_AGE_SECONDS = int(os.getenv("REMINDER_TIMELINE_MAX_AGE", 1800))
+LOG_LOOKBACK_IDS = 200        # id auto-increment bisa commit tidak berurutan → baca ulang sedikit ke belakang
+LOG_KEEP = timedelta(days=1)
+LOG_PURGE_SECONDS = 3600
+
+
+class TimelineEntry:
+    """Satu waktu tembak untuk (setting, NIK[, jadwal patroli])."""
+
+    __slots__ = (
+        "fire_at", "setting_id", "nik", "kode_jam_kerja",
+        "audio_only", "schedule_id", "window", "until", "version"
+    )
+
+    def __init__(self, fire_at: datetime, setting_id: int, nik: str, kode_jam_kerja: str = None,
+                 audio_only: bool = False, schedule_id: int = None, window: tuple = None,
+                 until: datetime = None, version: int = 0):
+        self.fire_at = fire_at
+        self.setting_id = setting_id
+        self.nik = nik
+        self.kode_jam_kerja = kode_jam_kerja
+        self.audio_only = audio_only
+        self.schedule_id = schedule_id
+        self.window = window      # (start, end) jendela patroli
+        self.until = until        # batas ping audio berulang (patroli)
+        self.version = version
+
+    def repeat(self, minutes: int, after: datetime):
+        """Entry ping berulang berikutnya setelah `after`, atau None jika sudah melewati `until`."""
+        next_at = self.fire_at + timedelta(minutes=minutes)
+        while next_at <= after:
+            next_at += timedelta(minutes=minutes)
+        if not self.until or next_at >= self.until:
+            return None
+        return TimelineEntry(
+            next_at, self.setting_id, self.nik, self.kode_jam_kerja,
+            self.audio_only, self.schedule_id, self.window, self.until, self.version
+        )
+
+
+class ReminderTimeline:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._heap = []
+        self._seq = itertools.count()
+        self._versions = {}      # nik -> versi entry yang berlaku
+        self._dirty = set()
+        self._dirty_all = True
+        self.day = None
+        self.built_at = 0.0
+        self.master_versions = None
+        self.watermark = None    # entry dengan fire_at <= watermark sudah diproses
+        self.context = {}        # data build (settings, target, karyawan, jadwal patroli)
+        self._stats = {"rebuilds": 0, "partial_rebuilds": 0, "popped": 0, "stale_skipped": 0}
+
+    # ─── Invalidasi ────────────────────────────────────────────────────────
+    def invalidate(self, nik: str = None):
+        with self._lock:
+            if nik is None:
+                self._dirty_all = True
+            else:
+                self._dirty.add(nik)
+
+    def needs_full_rebuild(self, day, master_versions: dict) -> bool:
+        with self._lock:
+            return (
+                self._dirty_all
+                or self.day != day
+                or self.master_versions != master_versions
+                or time.monotonic() - self.built_at > MAX_AGE_SECONDS
+            )
+
+    def take_dirty(self) -> set:
+        with self._lock:
+            dirty, self._dirty = self._dirty, set()
+            return dirty
+
+    # ─── Build ─────────────────────────────────────────────────────────────
+    def reset(self, day, watermark: datetime, master_versions: dict, context: dict):
+        with self._lock:
+            self._heap = []
+            self._versions = {}
+            self._dirty = set()
+            self._dirty_all = False
+            self.day = day
+            self.built_at = time.monotonic()
+            self.master_versions = master_versions
+            self.watermark = watermark
+            self.context = context
+            self._stats["rebuilds"] += 1
+
+    def bump(self, niks) -> int:
+        """Naikkan versi NIK (entry lama otomatis basi). Return versi baru terakhir."""
+        version = 0
+        with self._lock:
+            for nik in niks:
+                version = self._versions.get(nik, 0) + 1
+                self._versions[nik] = version
+            self._stats["partial_rebuilds"] += 1
+        return version
+
+    def version_of(self, nik: str) -> int:
+        return self._versions.get(nik, 0)
+
+    def push(self, entry: TimelineEntry):
+        with self._lock:
+            if entry.version != self._versions.get(entry.nik, 0):
+                return
+            heapq.heappush(self._heap, (entry.fire_at, next(self._seq), entry))
+
+    # ─── Tick ──────────────────────────────────────────────────────────────
+    def pop_due(self, now: datetime) -> list:
+        """Ambil semua entry dengan fire_at <= now yang masih berlaku."""
+        due = []
+        with self._lock:
+            while self._heap and self._heap[0][0] <= now:
+                _, _, entry = heapq.heappop(self._heap)
+                if entry.version != self._versions.get(entry.nik, 0):
+                    self._stats["stale_skipped"] += 1
+                    continue
+                due.append(entry)
+            self._stats["popped"] += len(due)
+            if self.watermark is None or now > self.watermark:
+                self.watermark = now
+        return due
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                **self._stats,
+                "day": self.day.isoformat() if self.day else None,
+                "entries": len(self._heap),
+                "next_fire_at": self._heap[0][0].isoformat() if self._heap else None,
+                "dirty_niks": len(self._dirty),
+                "age_seconds": round(time.monotonic() - self.built_at, 1) if self.built_at else None,
+            }
+
+
+timeline = ReminderTimeline()
+
+_log_lock = threading.Lock()
+_last_id = None       # id log terbesar yang sudah diterapkan (None = belum pernah poll)
+_seen_ids = set()     # id di jendela lookback yang sudah diterapkan
+_purged_at = 0.0
+_log_stats = {"published": 0, "publish_errors": 0, "applied": 0}
+
+
+def invalidate(nik: str = None):
+    """Dipanggil endpoint tulis: tanpa NIK = rebuild penuh, dengan NIK = hitung ulang NIK tsb."""
+    timeline.invalidate(nik)
+    db = SessionLocal()
+    try:
+        db.add(ReminderTimelineInvalidation(nik=nik))
+        db.commit()
+        with _log_lock:
+            _log_stats["published"] += 1
+    except Exception as e:
+        db.rollback()
+        with _log_lock:
+            _log_stats["publish_errors"] += 1
+        logger.warning(f"[ReminderTimeline] Gagal menulis log invalidasi ({nik or 'semua'}): {e}")
+    finally:
+        db.close()
+
+
+def poll(db: Session) -> int:
+    """
+    Leader, awal setiap tick: terapkan invalidasi dari worker lain ke timeline ini.
+    Return jumlah baris log yang diterapkan.
+    """
+    try:
+        return _poll(db)
+    except Exception as e:
+        db.rollback()
+        logger.warning(f"[ReminderTimeline] Gagal membaca log invalidasi: {e}")
+        return 0
+
+
+def _poll(db: Session) -> int:
+    global _last_id, _purged_at
+    model = ReminderTimelineInvalidation
+    with _log_lock:
+        if _last_id is None:
+            # Baru jadi leader: timeline toh disusun ulang penuh, mulai dari ujung log
+            _last_id = db.query(model.id).order_by(model.id.desc()).limit(1).scalar() or 0
+            _seen_ids.update(i for (i,) in db.query(model.id).filter(model.id > _last_id - LOG_LOOKBACK_IDS))
+            timeline.invalidate()
+            return 0
+
+        floor = max(_last_id - LOG_LOOKBACK_IDS, 0)
+        rows = db.query(model.id, model.nik).filter(model.id > floor).order_by(model.id).all()
+        full = applied = 0
+        for row_id, nik in rows:
+            if row_id in _seen_ids:
+                continue
+            _seen_ids.add(row_id)
+            timeline.invalidate(nik)
+            full += nik is None
+            applied += 1
+            _last_id = max(_last_id, row_id)
+        floor = max(_last_id - LOG_LOOKBACK_IDS, 0)
+        _seen_ids.difference_update([i for i in _seen_ids if i <= floor])
+        _log_stats["applied"] += applied
+
+        if time.monotonic() - _purged_at > LOG_PURGE_SECONDS:
+            _purged_at = time.monotonic()
+            db.execute(delete(model).where(model.created_at < datetime.now() - LOG_KEEP))
+            db.commit()
+
+    if full:
+        master_cache.invalidate(master_cache.JAM_KERJA, master_cache.JAM_KERJA_DEPT)
+    return applied
+
+
+def log_stats() -> dict:
+    with _log_lock:
+        return {**_log_stats, "last_id": _last_id}
@@ -0,0 +1,194 @@
+"""
+Schedule Resolver
+=================
+Penentuan jadwal (jam kerja) aktif untuk banyak karyawan sekaligus.
+
+Hierarki identik dengan logika absensi Android:
+0. Presensi yang masih berjalan (hari ini, atau kemarin jika lintas hari) → kunci ke shift tsb
+1. Extra Date   (presensi_jamkerja_bydate_extra) → selalu ditambahkan sebagai kandidat
+2. Roster       (presensi_jamkerja_bydate)       → jika karyawan punya roster bulan ini
+3. Regular Day  (presensi_jamkerja_byday)        → jika punya jadwal per hari
+4. Dept Day     (presensi_jamkerja_bydept)       → jika dept/cabang punya jadwal per hari
+5. Default      (karyawan.kode_jadwal)
+
+Kandidat diurutkan berdasarkan jam_masuk; shift pertama yang belum selesai (belum
+absen pulang) dipilih. Jika semua sudah selesai, kembalikan shift terakhir + presensinya.
+
+Semua data dimuat dengan jumlah query yang tetap (per chunk NIK), bukan per karyawan.
+Master jam kerja & jadwal departemen diambil dari app.core.master_cache.
+"""
+
+from datetime import datetime, date, timedelta
+
+import pytz
+from sqlalchemy.orm import Session
+
+from app.core import master_cache
+from app.models.models import (
+    Karyawan, Presensi, SetJamKerjaByDate, SetJamKerjaByDay, PresensiJamkerjaBydateExtra
+)
+
+WIB = pytz.timezone('Asia/Jakarta')
+
+HARI_MAP = ["Senin", "Selasa", "Rabu", "Kamis", "Jumat", "Sabtu", "Minggu"]
+
+# Batas jumlah NIK per klausa IN agar query tetap ringan
+CHUNK_SIZE = 1000
+
+
+def _chunks(items: list, size: int = CHUNK_SIZE):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def _same_hari(a: str, b: str) -> bool:
+    # MySQL membandingkan string case-insensitive & mengabaikan spasi di akhir
+    return (a or '').strip().lower() == (b or '').strip().lower()
+
+
+class ScheduleResolver:
+    """
+    Resolve jadwal kerja untuk sekumpulan NIK pada satu tanggal.
+
+    Pemakaian:
+        resolver = ScheduleResolver(db)
+        hasil = resolver.resolve(niks, today, now_wib)   # {nik: (jam_kerja_obj, presensi)}
+        jk, presensi = resolver.resolve_one(nik, today, now_wib)
+    """
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def resolve_one(self, nik: str, today: date, now_wib: datetime = None):
+        return self.resolve([nik], today, now_wib).get(nik, (None, None))
+
+    def resolve(self, niks: list, today: date, now_wib: datetime = None) -> dict:
+        """Return {nik: (PresensiJamkerja | None, Presensi | None)} untuk setiap NIK."""
+        niks = list(dict.fromkeys(n for n in niks if n))
+        if not niks:
+            return {}
+        if now_wib is None:
+            now_wib = datetime.now(WIB)
+
+        # Catatan: nama hari mengikuti now_wib (sama seperti logika lama), bukan `today`
+        day_name = HARI_MAP[now_wib.weekday()]
+        yesterday = today - timedelta(days=1)
+        month_start = today.replace(day=1)
+        next_month_start = (month_start + timedelta(days=32)).replace(day=1)
+
+        # 1. Presensi hari ini & kemarin (aktif + yang sudah selesai)
+        #    Urutan mengikuti index presensi_unique (nik, tanggal, kode_jam_kerja) seperti .first() lama
+        open_today, open_yesterday, finished = {}, {}, {}
+        for p in self._by_nik(Presensi, niks, Presensi.tanggal.in_([today, yesterday]), order_by=Presensi.kode_jam_kerja):
+            if p.jam_out is None:
+                if p.tanggal == today:
+                    open_today.setdefault(p.nik, p)
+                elif p.lintashari == 1:
+                    open_yesterday.setdefault(p.nik, p)
+            elif p.tanggal == today:
+                finished.setdefault((p.nik, p.kode_jam_kerja), p)
+
+        # 2. Roster bulan ini (sekaligus roster hari ini)
+        roster_niks, roster_today = set(), {}
+        for r in self._by_nik(
+            SetJamKerjaByDate, niks,
+            SetJamKerjaByDate.tanggal >= month_start,
+            SetJamKerjaByDate.tanggal < next_month_start
+        ):
+            roster_niks.add(r.nik)
+            if r.tanggal == today:
+                roster_today.setdefault(r.nik, r.kode_jam_kerja)
+
+        # 3. Jadwal reguler per hari
+        byday_niks, byday_today = set(), {}
+        for r in self._by_nik(SetJamKerjaByDay, niks):
+            byday_niks.add(r.nik)
+            if _same_hari(r.hari, day_name):
+                byday_today.setdefault(r.nik, r.kode_jam_kerja)
+
+        # 4. Data karyawan (dept, cabang, jadwal default)
+        karyawan_map = {}
+        for chunk in _chunks(niks):
+            rows = self.db.query(
+                Karyawan.nik, Karyawan.kode_dept, Karyawan.kode_cabang, Karyawan.kode_jadwal
+            ).filter(Karyawan.nik.in_(chunk)).all()
+            for k in rows:
+                karyawan_map[k.nik] = k
+
+        # 5. Jadwal per departemen (header + detail) — dari master cache
+        dept_jadwal = master_cache.get_jam_kerja_dept(self.db)
+        dept_header_map = dept_jadwal["headers"]
+        dept_has_detail, dept_today = set(), {}
+        for kode_jk_dept, details in dept_jadwal["details"].items():
+            dept_has_detail.add(kode_jk_dept)
+            for d_hari, d_kode in details:
+                if _same_hari(d_hari, day_name):
+                    dept_today.setdefault(kode_jk_dept, d_kode)
+                    break
+
+        # 6. Extra date hari ini (terbaru dulu)
+        extras = {}
+        for ex in self._by_nik(
+            PresensiJamkerjaBydateExtra, niks,
+            PresensiJamkerjaBydateExtra.tanggal == today,
+            order_by=PresensiJamkerjaBydateExtra.id.desc()
+        ):
+            extras.setdefault(ex.nik, []).append(ex.kode_jam_kerja)
+
+        # Susun kandidat shift per NIK
+        candidates = {}
+        for nik in niks:
+            if nik in open_today or nik in open_yesterday:
+                continue
+
+            possible = list(extras.get(nik, []))
+            if nik in roster_niks:
+                if nik in roster_today:
+                    possible.append(roster_today[nik])
+            elif nik in byday_niks:
+                if nik in byday_today:
+                    possible.append(byday_today[nik])
+            else:
+                kary = karyawan_map.get(nik)
+                kode_jk_dept = None
+                if kary and kary.kode_dept:
+                    kode_jk_dept = dept_header_map.get((kary.kode_dept, kary.kode_cabang))
+                if kode_jk_dept and kode_jk_dept in dept_has_detail:
+                    if dept_today.get(kode_jk_dept):
+                        possible.append(dept_today[kode_jk_dept])
+                elif kary and kary.kode_jadwal:
+                    possible.append(kary.kode_jadwal)
+            candidates[nik] = possible
+
+        # 7. Master jam kerja — dari master cache
+        jam_kerja_map = master_cache.get_all_jam_kerja(self.db)
+
+        result = {}
+        for nik in niks:
+            presensi_aktif = open_today.get(nik) or open_yesterday.get(nik)
+            if presensi_aktif:
+                result[nik] = (jam_kerja_map.get(presensi_aktif.kode_jam_kerja), presensi_aktif)
+                continue
+
+            shifts = [(kode, jam_kerja_map[kode]) for kode in candidates[nik] if kode in jam_kerja_map]
+            shifts.sort(key=lambda x: x[1].jam_masuk)
+
+            resolved = (None, None)
+            for kode, jk in shifts:
+                finished_p = finished.get((nik, kode))
+                if not finished_p:
+                    resolved = (jk, None)
+                    break
+                resolved = (jk, finished_p)
+            result[nik] = resolved
+
+        return result
+
+    def _by_nik(self, model, niks: list, *criteria, order_by=None) -> list:
+        rows = []
+        for chunk in _chunks(niks):
+            q = self.db.query(model).filter(model.nik.in_(chunk), *criteria)
+            if order_by is not None:
+                q = q.order_by(order_by)
+            rows.extend(q.all())
+        return rows
@@ -0,0 +1,435 @@
+"""
+Tracking Ingest — Write-Behind /tracking/location
+==================================================
+Ping lokasi Android (setiap ±30 detik per karyawan) tidak lagi ditulis langsung di
+request. Endpoint cukup memasukkan ping ke antrean lalu langsung merespon; worker
+thread di background yang menulis ke DB per batch:
+
+1. employee_location_histories → satu INSERT multi-row untuk seluruh batch
+2. employee_locations          → INSERT … ON DUPLICATE KEY UPDATE, 1 baris per NIK
+                                 (ping terakhir dalam window flush)
+3. employee_status             → INSERT … ON DUPLICATE KEY UPDATE, 1 baris per NIK
+4. Evaluasi keamanan (di luar request path), per NIK per batch:
+   - Fake GPS        → jika ada ping is_mocked=1 di batch
+   - Keluar radius   → ping terakhir saat shift aktif; jarak seluruh batch dihitung
+                       sekaligus lewat app.services.geofence
+   Alert masuk notification_outbox (dedup 1 jam per NIK per jenis); security_reports
+   hanya ditulis bila alert lolos dedup.
+
+Konfigurasi (env):
+- TRACKING_WRITE_BEHIND   : 1 = aktif (default), 0 = tulis sinkron seperti dulu
+- TRACKING_FLUSH_SIZE     : maksimal ping per batch (default 500)
+- TRACKING_FLUSH_INTERVAL : detik maksimal menunggu sebelum flush (default 2)
+- TRACKING_QUEUE_MAX      : kapasitas antrean (default 20000)
+
+Batch yang gagal ditulis dibelah dua berulang kali (_write_isolated) sehingga hanya
+ping yang benar-benar ditolak DB yang hilang (stats()["failed_rows"]).
+
+Back-pressure: jika antrean penuh (DB lambat) atau worker belum jalan, ping ditulis
+secara sinkron di request tersebut (tidak ada data yang dibuang) dan dihitung di
+stats()["sync_fallback"].
+"""
+
+import os
+import time
+import queue
+import logging
+import threading
+from datetime import datetime
+
+import numpy as np
+from sqlalchemy import insert
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.orm import Session
+
+from app.database import SessionLocal
+from app.services import notification_outbox, geofence
+from app.models.models import (
+    EmployeeLocations, EmployeeLocationHistories, EmployeeStatus, Karyawan,
+    Presensi, SecurityReports, LoginLogs
+)
+
+logger = logging.getLogger("tracking_ingest")
+
+WRITE_BEHIND = os.getenv("TRACKING_WRITE_BEHIND", "1") == "1"
+FLUSH_SIZE = int(os.getenv("TRACKING_FLUSH_SIZE", 500))
+FLUSH_INTERVAL = float(os.getenv("TRACKING_FLUSH_INTERVAL", 2))
+QUEUE_MAX = int(os.getenv("TRACKING_QUEUE_MAX", 20000))
+
+_queue = queue.Queue(maxsize=QUEUE_MAX)
+_stop = threading.Event()
+_worker = None
+_stats_lock = threading.Lock()
+_stats = {
+    "enqueued": 0,
+    "flushed": 0,
+    "batches": 0,
+    "sync_fallback": 0,
+    "failed_rows": 0,
+    "max_depth": 0,
+    "last_batch_size": 0,
+    "last_flush_ms": 0.0,
+    "last_lag_ms": 0.0,
+}
+
+
+def _bump(**kwargs):
+    with _stats_lock:
+        for key, val in kwargs.items():
+            _stats[key] += val
+
+
+def make_ping(user_id: int, nik: str, latitude: float, longitude: float, accuracy=None, speed=None,
+              bearing=None, provider: str = "gps", is_mocked: int = 0, battery_level: int = 0,
+              is_charging: int = 0, ip_address: str = None) -> dict:
+    return {
+        "user_id": user_id,
+        "nik": nik,
+        "latitude": latitude,
+        "longitude": longitude,
+        "accuracy": accuracy,
+        "speed": speed,
+        "bearing": bearing,
+        "provider": provider,
+        "is_mocked": is_mocked,
+        "battery_level": battery_level,
+        "is_charging": is_charging,
+        "ip_address": ip_address,
+        "recorded_at": datetime.now(),
+        "_enqueued": time.monotonic(),
+    }
+
+
+def submit(ping: dict):
+    """
+    Masukkan ping ke antrean. Jika write-behind nonaktif, worker belum jalan, atau
+    antrean penuh → flush sinkron di thread pemanggil (back-pressure ke client).
+    """
+    if WRITE_BEHIND and _worker is not None and _worker.is_alive():
+        try:
+            _queue.put_nowait(ping)
+            depth = _queue.qsize()
+            with _stats_lock:
+                _stats["enqueued"] += 1
+                if depth > _stats["max_depth"]:
+                    _stats["max_depth"] = depth
+            return
+        except queue.Full:
+            logger.warning(f"[TrackingIngest] Antrean penuh ({QUEUE_MAX}), tulis sinkron untuk NIK {ping['nik']}")
+
+    _bump(sync_fallback=1)
+    flush_batch([ping])
+
+
+# ─── Flush ─────────────────────────────────────────────────────────────────
+def _write_batch(db: Session, batch: list):
+    db.execute(insert(EmployeeLocationHistories), [
+        {
+            "nik": p["nik"],
+            "user_id": p["user_id"],
+            "latitude": p["latitude"],
+            "longitude": p["longitude"],
+            "accuracy": p["accuracy"],
+            "speed": p["speed"],
+            "bearing": p["bearing"],
+            "provider": p["provider"],
+            "is_mocked": p["is_mocked"],
+            "recorded_at": p["recorded_at"],
+        }
+        for p in batch
+    ])
+
+    # Koalesi: hanya ping terakhir per NIK yang menentukan lokasi & status terkini
+    latest = {}
+    for p in batch:
+        latest[p["nik"]] = p
+
+    loc_stmt = mysql_insert(EmployeeLocations).values([
+        {
+            "nik": p["nik"],
+            "id": p["user_id"],
+            "latitude": p["latitude"],
+            "longitude": p["longitude"],
+            "accuracy": p["accuracy"],
+            "speed": p["speed"],
+            "bearing": p["bearing"],
+            "provider": p["provider"],
+            "is_mocked": p["is_mocked"],
+            "updated_at": p["recorded_at"],
+        }
+        for p in latest.values()
+    ])
+    db.execute(loc_stmt.on_duplicate_key_update(
+        latitude=loc_stmt.inserted.latitude,
+        longitude=loc_stmt.inserted.longitude,
+        accuracy=loc_stmt.inserted.accuracy,
+        speed=loc_stmt.inserted.speed,
+        bearing=loc_stmt.inserted.bearing,
+        provider=loc_stmt.inserted.provider,
+        is_mocked=loc_stmt.inserted.is_mocked,
+        updated_at=loc_stmt.inserted.updated_at,
+    ))
+
+    status_stmt = mysql_insert(EmployeeStatus).values([
+        {
+            "nik": p["nik"],
+            "user_id": p["user_id"],
+            "battery_level": p["battery_level"],
+            "is_charging": p["is_charging"],
+            "last_seen": p["recorded_at"],
+            "is_online": 1,  # Anggap online jika mengirim lokasi
+        }
+        for p in latest.values()
+    ])
+    db.execute(status_stmt.on_duplicate_key_update(
+        battery_level=status_stmt.inserted.battery_level,
+        is_charging=status_stmt.inserted.is_charging,
+        last_seen=status_stmt.inserted.last_seen,
+        is_online=status_stmt.inserted.is_online,
+    ))
+    db.commit()
+    return latest
+
+
+def _write_isolated(db: Session, batch: list) -> dict:
+    """
+    _write_batch dengan isolasi kegagalan: bila batch gagal (mis. satu ping berisi nilai
+    di luar batas kolom), batch dibelah dua dan ditulis ulang sampai tersisa ping yang
+    memang bermasalah — hanya ping itu yang dibuang dan dihitung di failed_rows.
+    Kegagalan koneksi (DB mati) tidak bisa diisolasi per baris: seluruh sisa batch gagal.
+    """
+    try:
+        return _write_batch(db, batch)
+    except Exception as e:
+        db.rollback()
+        if len(batch) == 1 or getattr(e, "connection_invalidated", False):
+            _bump(failed_rows=len(batch))
+            logger.error(f"[TrackingIngest] Gagal tulis {len(batch)} ping (nik={batch[0]['nik']}): {e}")
+            return {}
+    mid = len(batch) // 2
+    latest = _write_isolated(db, batch[:mid])
+    latest.update(_write_isolated(db, batch[mid:]))
+    return latest
+
+
+def flush_batch(batch: list):
+    """Tulis satu batch ping lalu jalankan evaluasi keamanan. Dipakai worker & fallback sinkron."""
+    if not batch:
+        return
+    started = time.monotonic()
+    db: Session = SessionLocal()
+    try:
+        latest = _write_isolated(db, batch)
+        if not latest:
+            return
+
+        mocked = {}
+        for p in batch:
+            if p["is_mocked"] == 1:
+                mocked.setdefault(p["nik"], p)
+
+        for nik, p in latest.items():
+            if nik in mocked:
+                try:
+                    _check_mock_location(db, mocked[nik])
+                except Exception as alert_err:
+                    db.rollback()
+                    print(f"Failed to push escalate Mock Location concern: {alert_err}")
+        try:
+            _check_out_of_location(db, list(latest.values()))
+        except Exception as err:
+            db.rollback()
+            print(f"Failed handling OUT_OF_LOCATION live stream concern: {err}")
+    finally:
+        db.close()
+
+    now = time.monotonic()
+    with _stats_lock:
+        _stats["flushed"] += len(batch)
+        _stats["batches"] += 1
+        _stats["last_batch_size"] = len(batch)
+        _stats["last_flush_ms"] = round((now - started) * 1000, 1)
+        _stats["last_lag_ms"] = round((now - batch[0]["_enqueued"]) * 1000, 1)
+
+
+# ─── Evaluasi keamanan (dipindah dari tracking_legacy.update_location) ─────
+def _enqueue_security_alert(db: Session, subtype: str, nik: str, title: str, body: str, recipient_scope: str) -> bool:
+    """
+    Masukkan alert ke notification_outbox (dedup 1 jam per NIK per jenis). Return False
+    jika alert yang sama sudah tercatat dalam window ini.
+    """
+    return notification_outbox.enqueue(
+        db,
+        type=subtype,
+        nik=nik,
+        title=title,
+        body=body,
+        data={
+            "type": "SECURITY_ALERT",
+            "subtype": subtype,
+            "nik_pelanggar": nik,
+            "nama_pelanggar": "{nama}"
+        },
+        recipient_scope=recipient_scope,
+        dedup_window=3600,
+        commit=False
+    )
+
+
+def _device_model(db: Session, user_id: int) -> str:
+    ll = db.query(LoginLogs).filter(
+        LoginLogs.user_id == user_id,
+        LoginLogs.device != None,
+        LoginLogs.device != 'Unknown',
+        LoginLogs.android_version != None
+    ).order_by(LoginLogs.id.desc()).first()
+    return ll.device if ll and ll.device else "Unknown"
+
+
+def _check_mock_location(db: Session, p: dict):
+    # Cegah spam alert: maksimal 1 alarm Fake GPS per NIK per jam (dedup outbox)
+    if not _enqueue_security_alert(
+        db, 'FAKE_GPS', p["nik"],
+        "⚠️ INDIKASI FAKE GPS",
+        "Personel {nama} terdeteksi menggunakan aplikasi Titik Lokasi Palsu (Fake GPS) di area {cabang}.",
+        'cabang'
+    ):
+        return
+
+    # Catat ke security_reports agar dicentang sudah diingatkan
+    db.add(SecurityReports(
+        type='FAKE_GPS',
+        detail=f"Terdeteksi otomatis melalui modul Tracking Android. Coordinate: {p['latitude']},{p['longitude']}",
+        user_id=p["user_id"],
+        nik=p["nik"],
+        latitude=p["latitude"],
+        longitude=p["longitude"],
+        status_flag='pending',
+        device_model=_device_model(db, p["user_id"]),
+        ip_address=p["ip_address"],
+        created_at=datetime.now(),
+        updated_at=datetime.now()
+    ))
+    db.commit()
+
+
+def _check_out_of_location(db: Session, pings: list):
+    """Keluar radius: jarak ping terakhir tiap NIK di batch dihitung sekaligus (app.services.geofence)."""
+    karyawan = dict(db.query(Karyawan.nik, Karyawan.kode_cabang).filter(
+        Karyawan.nik.in_([p["nik"] for p in pings]),
+        Karyawan.lock_location == '1'
+    ).all())
+    pings = [p for p in pings if p["nik"] in karyawan]
+    if not pings:
+        return
+
+    outside, dist, radius = geofence.branches(db).outside(
+        [karyawan[p["nik"]] for p in pings],
+        [p["latitude"] for p in pings],
+        [p["longitude"] for p in pings]
+    )
+    for i in np.flatnonzero(outside):
+        try:
+            _report_out_of_location(db, pings[i], float(dist[i]), float(radius[i]))
+        except Exception as err:
+            db.rollback()
+            print(f"Failed handling OUT_OF_LOCATION live stream concern: {err}")
+
+
+def _report_out_of_location(db: Session, p: dict, dist: float, radius: float):
+    # Hanya saat shift aktif (jam_in ada, jam_out masih NULL)
+    active_session = db.query(Presensi.id).filter(
+        Presensi.nik == p["nik"],
+        Presensi.tanggal == p["recorded_at"].date(),
+        Presensi.jam_in != None,
+        Presensi.jam_out == None
+    ).first()
+    if not active_session:
+        return
+
+    # User is OUT OF LOCATION while ACTIVE! → eskalasi ke rekan yang sedang bertugas
+    if not _enqueue_security_alert(
+        db, 'OUT_OF_LOCATION', p["nik"],
+        "⚠️ ANGGOTA KELUAR RADIUS",
+        "Personel {nama} terdeteksi berada di luar jangkauan area {cabang} saat jam bertugas.",
+        'cabang_active'
+    ):
+        return
+
+    db.add(SecurityReports(
+        type='OUT_OF_LOCATION',
+        detail=f"Terdeteksi otomatis melalui modul Live Tracking. Jarak: {int(dist)}m dari maksimal {int(radius)}m",
+        user_id=p["user_id"],
+        nik=p["nik"],
+        latitude=p["latitude"],
+        longitude=p["longitude"],
+        status_flag='pending',
+        device_model=_device_model(db, p["user_id"]),
+        ip_address=p["ip_address"],
+        created_at=datetime.now(),
+        updated_at=datetime.now()
+    ))
+    db.commit()
+
+
+# ─── Worker ────────────────────────────────────────────────────────────────
+def _drain(first: dict) -> list:
+    batch = [first]
+    while len(batch) < FLUSH_SIZE:
+        try:
+            batch.append(_queue.get_nowait())
+        except queue.Empty:
+            break
+    return batch
+
+
+def _run():
+    logger.info(
+        f"✅ Tracking ingest worker started (flush {FLUSH_SIZE} ping / {FLUSH_INTERVAL}s, "
+        f"antrean maks {QUEUE_MAX})"
+    )
+    while not _stop.is_set() or not _queue.empty():
+        try:
+            first = _queue.get(timeout=FLUSH_INTERVAL)
+        except queue.Empty:
+            continue
+        # Beri waktu ping lain terkumpul agar INSERT multi-row lebih efektif
+        deadline = first["_enqueued"] + FLUSH_INTERVAL
+        while not _stop.is_set() and _queue.qsize() < FLUSH_SIZE - 1 and time.monotonic() < deadline:
+            time.sleep(0.05)
+        try:
+            flush_batch(_drain(first))
+        except Exception as e:
+            logger.error(f"[TrackingIngest] Worker error: {e}")
+
+
+def start():
+    global _worker
+    if not WRITE_BEHIND or (_worker is not None and _worker.is_alive()):
+        return
+    _stop.clear()
+    _worker = threading.Thread(target=_run, name="tracking-ingest", daemon=True)
+    _worker.start()
+
+
+def stop(timeout: float = 10):
+    """Hentikan worker setelah sisa antrean di-flush."""
+    global _worker
+    if _worker is None:
+        return
+    _stop.set()
+    _worker.join(timeout)
+    _worker = None
+    logger.info("🛑 Tracking ingest worker stopped")
+
+
+def stats() -> dict:
+    with _stats_lock:
+        return {
+            **_stats,
+            "queue_depth": _queue.qsize(),
+            "queue_max": QUEUE_MAX,
+            "flush_size": FLUSH_SIZE,
+            "flush_interval": FLUSH_INTERVAL,
+            "write_behind": WRITE_BEHIND and _worker is not None and _worker.is_alive(),
+        }
@@ -0,0 +1,152 @@
+"""
+Trajectory
+==========
+Jejak lokasi satu karyawan untuk replay peta dalam satu response.
+
+Titik diambil dari dua sumber lalu digabung urut waktu:
+- employee_location_histories (ping mentah yang masih dalam masa retensi)
+- location_tracks (jejak terkompresi hasil app.services.location_retention)
+
+Lalu:
+1. deteksi titik berhenti (berada dalam radius_m selama ≥ min_detik) pada titik penuh;
+   untuk rentang yang sudah dikompaksi hanya titik yang lolos Douglas-Peucker retensi
+   yang tersedia, sehingga berhenti di tengah segmen lurus bisa tidak terdeteksi
+2. penyederhanaan Douglas-Peucker dengan toleransi_m (0 = tanpa penyederhanaan)
+3. encode: koordinat → Google Encoded Polyline (1e-5), waktu → detik sejak t0
+   dengan delta encoding yang sama (app.core.polyline.decode_ints)
+
+Shift 12 jam (±1.440 ping) menjadi beberapa KB — jauh di bawah 100 KB.
+"""
+
+from datetime import datetime
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from app.core import polyline
+from app.services.geofence import haversine
+from app.models.models import EmployeeLocationHistories
+from app.models.location_track import LocationTrack
+
+DEFAULT_TOLERANSI_M = 5.0
+DEFAULT_RADIUS_BERHENTI_M = 30.0
+DEFAULT_MIN_BERHENTI_DETIK = 300
+_WINDOW = 256       # titik yang dicek sekaligus saat memperluas titik berhenti
+
+
+def ambil_titik(db: Session, nik: str, mulai: datetime, sampai: datetime) -> dict:
+    """Gabungan ping mentah + location_tracks dalam [mulai, sampai), urut waktu, tanpa duplikat detik."""
+    lat, lon, ts = [], [], []
+    mocked = 0
+
+    rows = db.query(
+        EmployeeLocationHistories.latitude, EmployeeLocationHistories.longitude,
+        EmployeeLocationHistories.recorded_at, EmployeeLocationHistories.is_mocked
+    ).filter(
+        EmployeeLocationHistories.nik == nik,
+        EmployeeLocationHistories.recorded_at >= mulai,
+        EmployeeLocationHistories.recorded_at < sampai
+    ).order_by(EmployeeLocationHistories.recorded_at).all()
+    for r in rows:
+        lat.append(float(r.latitude))
+        lon.append(float(r.longitude))
+        ts.append(r.recorded_at)
+        mocked += 1 if r.is_mocked == 1 else 0
+
+    tracks = db.query(LocationTrack).filter(
+        LocationTrack.nik == nik,
+        LocationTrack.mulai < sampai,
+        LocationTrack.selesai >= mulai
+    ).order_by(LocationTrack.mulai).all()
+    for tr in tracks:
+        t_lat, t_lon = polyline.decode(tr.polyline)
+        t0 = np.datetime64(tr.mulai, 's')
+        waktu = t0 + np.asarray(polyline.decode_ints(tr.waktu), dtype='timedelta64[s]')
+        lat.extend(t_lat.tolist())
+        lon.extend(t_lon.tolist())
+        ts.extend(waktu.tolist())
+        mocked += tr.mocked or 0
+
+    t = np.asarray(ts, dtype='datetime64[s]')
+    lat = np.asarray(lat, dtype=float)
+    lon = np.asarray(lon, dtype=float)
+    if len(t):
+        dalam = (t >= np.datetime64(mulai, 's')) & (t < np.datetime64(sampai, 's'))
+        lat, lon, t = lat[dalam], lon[dalam], t[dalam]
+        order = np.argsort(t, kind='stable')
+        lat, lon, t = lat[order], lon[order], t[order]
+        unik = np.concatenate(([True], t[1:] != t[:-1])) if len(t) else np.zeros(0, dtype=bool)
+        lat, lon, t = lat[unik], lon[unik], t[unik]
+    return {"lat": lat, "lon": lon, "t": t, "mocked": mocked, "raw": len(rows), "track": len(tracks)}
+
+
+def deteksi_berhenti(lat, lon, t, radius_m: float = DEFAULT_RADIUS_BERHENTI_M,
+                     min_detik: int = DEFAULT_MIN_BERHENTI_DETIK) -> list:
+    """
+    Titik berhenti: run titik berurutan yang seluruhnya dalam radius_m dari titik awal run
+    dan berlangsung ≥ min_detik. Return list dict (lat/lon = rata-rata run).
+    """
+    n = len(t)
+    stops = []
+    i = 0
+    while i < n - 1:
+        j = i + 1
+        while j < n:
+            end = min(j + _WINDOW, n)
+            jauh = np.flatnonzero(haversine(lat[i], lon[i], lat[j:end], lon[j:end]) > radius_m)
+            if len(jauh):
+                j += int(jauh[0])
+                break
+            j = end
+        # run = titik i .. j-1
+        durasi = int((t[j - 1] - t[i]) / np.timedelta64(1, 's'))
+        if j - 1 > i and durasi >= min_detik:
+            stops.append({
+                "lat": round(float(np.mean(lat[i:j])), 6),
+                "lon": round(float(np.mean(lon[i:j])), 6),
+                "mulai": str(t[i].astype(datetime)),
+                "selesai": str(t[j - 1].astype(datetime)),
+                "durasi_detik": durasi,
+                "jumlah_titik": j - i,
+            })
+            i = j
+        else:
+            i += 1
+    return stops
+
+
+def bangun(db: Session, nik: str, mulai: datetime, sampai: datetime,
+           toleransi_m: float = DEFAULT_TOLERANSI_M,
+           radius_berhenti_m: float = DEFAULT_RADIUS_BERHENTI_M,
+           min_berhenti_detik: int = DEFAULT_MIN_BERHENTI_DETIK) -> dict:
+    """Payload trajectory (lihat docstring modul)."""
+    titik = ambil_titik(db, nik, mulai, sampai)
+    lat, lon, t = titik["lat"], titik["lon"], titik["t"]
+
+    hasil = {
+        "nik": nik,
+        "mulai": mulai.isoformat(),
+        "sampai": sampai.isoformat(),
+        "toleransi_m": toleransi_m,
+        "jumlah_titik": int(len(t)),
+        "jumlah_simpan": 0,
+        "mocked": titik["mocked"],
+        "sumber": {"raw": titik["raw"], "track": titik["track"]},
+        "t0": None,
+        "polyline": "",
+        "waktu": "",
+        "stops": [],
+    }
+    if not len(t):
+        return hasil
+
+    hasil["stops"] = deteksi_berhenti(lat, lon, t, radius_berhenti_m, min_berhenti_detik)
+    keep = polyline.simplify(lat, lon, toleransi_m)
+    offset = ((t[keep] - t[0]) / np.timedelta64(1, 's')).astype(np.int64)
+    hasil.update({
+        "jumlah_simpan": int(len(keep)),
+        "t0": str(t[0].astype(datetime)),
+        "polyline": polyline.encode(lat[keep], lon[keep]),
+        "waktu": polyline.encode_ints(offset.tolist()),
+    })
+    return hasil
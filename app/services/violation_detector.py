@@ -0,0 +1,416 @@
+"""
+Violation Detector
+==================
+Deteksi pelanggaran otomatis secara inkremental, dijalankan APScheduler setiap
+VIOLATION_SCAN_SECONDS (default 60). Menggantikan background_sync_violations yang dulu
+dipicu setiap GET /api/security/violations dan men-scan ulang seluruh data hari ini +
+kemarin (presensi, karyawan, hari libur, AppFraud, SecurityReports, semua riwayat lokasi)
+lalu mengecek keberadaan setiap deteksi satu per satu.
+
+Sumber stream — hanya baris dengan id > high-water mark di violation_scan_state:
+- presensi                    → LATE (jam_in > jam masuk jadwal), ABSENT (status 'A')
+- app_frauds                  → fraud_type (FAKE_GPS / FORCE_CLOSE / ROOT_DEVICE / ...)
+- security_reports (pending)  → FAKE_GPS / FORCE_CLOSE / FACE_VERIFY_FAIL / OUT_OF_LOCATION
+- employee_location_histories → FAKE_GPS (is_mocked) & OUT_OF_LOCATION (app.services.geofence;
+                                ping di pagar titik patroli cabangnya sendiri dikecualikan)
+Sumber yang belum punya state dimulai dari baris sejak kemarin.
+
+Tutup hari — sekali per tanggal yang sudah lewat: scan penuh scan_violations() untuk
+pelanggaran yang baru pasti setelah hari berakhir (NO_CHECKOUT, ABSENT tanpa presensi,
+MISSED_PATROL, BLOCKED) sekaligus rekonsiliasi baris yang diubah setelah diproses stream.
+
+Penulisan: bulk INSERT IGNORE pada unique key violations (nik, tanggal_pelanggaran,
+system_type); system_type = violation_type untuk source SYSTEM (kolom generated), jadi
+pelanggaran MANUAL tidak ikut dibatasi. Mark (nik, tanggal) ke daily_stats.
+
+CLI: python -m app.services.violation_detector run | tutup <tanggal>
+"""
+
+import os
+import sys
+import logging
+import threading
+from datetime import date, datetime, timedelta
+
+import numpy as np
+from sqlalchemy import text
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.orm import Session
+
+from app.database import SessionLocal
+from app.models.models import (
+    Violation, Karyawan, Presensi, PresensiJamkerja, AppFraud, SecurityReports,
+    EmployeeLocationHistories
+)
+from app.models.violation_scan_state import ViolationScanState
+from app.services import daily_stats, geofence
+
+logger = logging.getLogger("violation_detector")
+
+SCAN_SECONDS = int(os.getenv("VIOLATION_SCAN_SECONDS", 60))
+BATCH_SIZE = int(os.getenv("VIOLATION_SCAN_BATCH", 5000))
+INSERT_BATCH = 500
+TUTUP_HARI = "tutup_hari"
+TUTUP_MAX_DAYS = 7          # hari yang terlewat (server mati) paling banyak ditutup mundur
+
+EXCLUDED_ROLES = (
+    "Super Admin",
+    "Admin Departemen",
+    "Unit Pelaksana Pelayanan Pelanggan",
+    "Unit Layanan Pelanggan"
+)
+
+FRAUD_LABELS = {
+    'FAKE_GPS': 'Terdeteksi Fake GPS',
+    'FORCE_CLOSE': 'Aplikasi Force Close',
+    'ROOT_DEVICE': 'Perangkat Rooted'
+}
+REPORT_LABELS = {
+    'FAKE_GPS': 'Terdeteksi Fake GPS (FCM)',
+    'APP_FORCE_CLOSE': 'Aplikasi Force Close',
+    'FACE_VERIFICATION_FAILED': 'Gagal Verifikasi Wajah',
+    'RADIUS_BYPASS': 'Melanggar Batas Radius Absensi',
+    'OUT_OF_LOCATION': 'Melanggar Batas Radius Patroli'
+}
+REPORT_CODES = {
+    'FAKE_GPS': 'FAKE_GPS',
+    'APP_FORCE_CLOSE': 'FORCE_CLOSE',
+    'FACE_VERIFICATION_FAILED': 'FACE_VERIFY_FAIL',
+    'RADIUS_BYPASS': 'OUT_OF_LOCATION',
+    'OUT_OF_LOCATION': 'OUT_OF_LOCATION'
+}
+
+_lock = threading.Lock()
+_stats = {"runs": 0, "rows": 0, "detected": 0, "inserted": 0, "hari_ditutup": 0, "errors": 0, "last_run_ms": None}
+
+
+# ─── Aturan bersama (dipakai juga oleh scan_violations) ───────────────────
+def get_excluded_niks(db: Session) -> list:
+    """NIK akun admin/pelanggan yang tidak dideteksi pelanggarannya."""
+    try:
+        query = text("""
+            SELECT uk.nik
+            FROM users_karyawan uk
+            JOIN model_has_roles mhr ON uk.id_user = mhr.model_id
+            JOIN roles r ON mhr.role_id = r.id
+            WHERE mhr.model_type = 'App\\\\Models\\\\User'
+            AND r.name IN :roles
+        """)
+        result = db.execute(query, {"roles": EXCLUDED_ROLES}).fetchall()
+        return [row[0] for row in result]
+    except Exception as e:
+        print(f"Error fetching excluded NIKs: {e}")
+        return []
+
+
+def cek_terlambat(jam_in, jam_masuk):
+    """(jam_in 'HH:MM:SS', jam_masuk 'HH:MM:SS') bila check-in melewati jadwal, selain itu None."""
+    if not jam_in or jam_masuk is None:
+        return None
+    jam_in_str = jam_in.strftime("%H:%M:%S") if hasattr(jam_in, 'strftime') else str(jam_in)[-8:]
+    if len(jam_in_str) > 8:
+        jam_in_str = jam_in_str.split(' ')[-1]
+    jam_masuk_str = jam_masuk.strftime("%H:%M:%S") if hasattr(jam_masuk, 'strftime') else str(jam_masuk)[:8]
+    return (jam_in_str, jam_masuk_str) if jam_in_str > jam_masuk_str else None
+
+
+def severity_fraud(code: str) -> str:
+    return 'BERAT' if code in ('FAKE_GPS', 'ROOT_DEVICE') else 'SEDANG'
+
+
+def severity_report(report_type: str) -> str:
+    return 'BERAT' if report_type in ('FAKE_GPS', 'FACE_VERIFICATION_FAILED') else 'SEDANG'
+
+
+# ─── High-water mark ───────────────────────────────────────────────────────
+def _state(db: Session) -> dict:
+    return {s.source: s for s in db.query(ViolationScanState).all()}
+
+
+def _simpan_state(db: Session, source: str, last_id: int = None, last_date: date = None):
+    stmt = mysql_insert(ViolationScanState.__table__).values(
+        source=source, last_id=last_id, last_date=last_date, updated_at=datetime.now()
+    )
+    db.execute(stmt.on_duplicate_key_update(
+        last_id=stmt.inserted.last_id,
+        last_date=stmt.inserted.last_date,
+        updated_at=stmt.inserted.updated_at
+    ))
+
+
+def _baru(query, id_col, ts_col, mark):
+    """Baris setelah high-water mark; tanpa mark → baris sejak kemarin."""
+    if mark is not None:
+        query = query.filter(id_col > mark)
+    else:
+        query = query.filter(ts_col >= date.today() - timedelta(days=1))
+    return query.order_by(id_col).limit(BATCH_SIZE)
+
+
+# ─── Detektor stream: (db, mark, excluded) → (last_id, deteksi, jumlah baris) ──
+def _deteksi_presensi(db: Session, mark, excluded: set):
+    rows = _baru(
+        db.query(
+            Presensi.id, Presensi.nik, Presensi.tanggal, Presensi.jam_in, Presensi.status,
+            Karyawan.nama_karyawan, PresensiJamkerja.jam_masuk
+        ).join(Karyawan, Presensi.nik == Karyawan.nik)
+         .outerjoin(PresensiJamkerja, Presensi.kode_jam_kerja == PresensiJamkerja.kode_jam_kerja),
+        Presensi.id, Presensi.tanggal, mark
+    ).all()
+    hasil = []
+    for r in rows:
+        if r.nik in excluded:
+            continue
+        telat = cek_terlambat(r.jam_in, r.jam_masuk)
+        if telat:
+            hasil.append({
+                "nik": r.nik,
+                "nama_karyawan": r.nama_karyawan,
+                "type": "Terlambat",
+                "description": f"Check-in pada {telat[0]} (Jadwal: {telat[1]})",
+                "timestamp": f"{r.tanggal} {telat[0]}",
+                "severity": "RINGAN",
+                "violation_code": "LATE"
+            })
+        if r.status == 'A':
+            hasil.append({
+                "nik": r.nik,
+                "nama_karyawan": r.nama_karyawan,
+                "type": "Tidak Hadir",
+                "description": "Tidak hadir tanpa keterangan (Alpha)",
+                "timestamp": f"{r.tanggal} 08:00:00",
+                "severity": "SEDANG",
+                "violation_code": "ABSENT"
+            })
+    return (rows[-1].id if rows else mark), hasil, len(rows)
+
+
+def _deteksi_app_fraud(db: Session, mark, excluded: set):
+    rows = _baru(
+        db.query(
+            AppFraud.id, AppFraud.nik, AppFraud.fraud_type, AppFraud.description, AppFraud.timestamp,
+            Karyawan.nama_karyawan
+        ).outerjoin(Karyawan, AppFraud.nik == Karyawan.nik),
+        AppFraud.id, AppFraud.timestamp, mark
+    ).all()
+    hasil = [
+        {
+            "nik": r.nik,
+            "nama_karyawan": r.nama_karyawan or r.nik,
+            "type": FRAUD_LABELS.get(r.fraud_type, r.fraud_type),
+            "description": r.description or "Terdeteksi aktivitas mencurigakan pada aplikasi",
+            "timestamp": str(r.timestamp),
+            "severity": severity_fraud(r.fraud_type),
+            "violation_code": r.fraud_type
+        }
+        for r in rows if r.nik not in excluded and r.timestamp
+    ]
+    return (rows[-1].id if rows else mark), hasil, len(rows)
+
+
+def _deteksi_security_reports(db: Session, mark, excluded: set):
+    rows = _baru(
+        db.query(
+            SecurityReports.id, SecurityReports.nik, SecurityReports.type, SecurityReports.detail,
+            SecurityReports.created_at, SecurityReports.status_flag, Karyawan.nama_karyawan
+        ).join(Karyawan, SecurityReports.nik == Karyawan.nik),
+        SecurityReports.id, SecurityReports.created_at, mark
+    ).all()
+    hasil = [
+        {
+            "nik": r.nik,
+            "nama_karyawan": r.nama_karyawan,
+            "type": REPORT_LABELS.get(r.type, r.type),
+            "description": r.detail or "Laporan aktivitas tidak wajar dari aplikasi",
+            "timestamp": str(r.created_at),
+            "severity": severity_report(r.type),
+            "violation_code": REPORT_CODES.get(r.type, r.type)
+        }
+        for r in rows if r.status_flag == 'pending' and r.nik not in excluded and r.created_at
+    ]
+    return (rows[-1].id if rows else mark), hasil, len(rows)
+
+
+def _di_titik_patroli(points, kode_cabang, lat, lon) -> bool:
+    """True bila titik berada di dalam pagar salah satu titik patroli milik cabang tsb."""
+    if not len(points) or lat is None or lon is None:
+        return False
+    return any(
+        points.group[points.pos[key]] == kode_cabang
+        for key, _ in points.containing(float(lat), float(lon))
+    )
+
+
+def _deteksi_lokasi(db: Session, mark, excluded: set):
+    rows = _baru(
+        db.query(
+            EmployeeLocationHistories.id, EmployeeLocationHistories.nik,
+            EmployeeLocationHistories.latitude, EmployeeLocationHistories.longitude,
+            EmployeeLocationHistories.recorded_at, EmployeeLocationHistories.is_mocked,
+            Karyawan.nama_karyawan, Karyawan.kode_cabang, Karyawan.lock_location
+        ).outerjoin(Karyawan, EmployeeLocationHistories.nik == Karyawan.nik),
+        EmployeeLocationHistories.id, EmployeeLocationHistories.recorded_at, mark
+    ).all()
+    last_id = rows[-1].id if rows else mark
+    fetched = len(rows)     # jumlah sebelum disaring — penentu batch berikutnya di scan()
+    rows = [r for r in rows if r.nik not in excluded and r.recorded_at]
+    hasil = [
+        {
+            "nik": r.nik,
+            "nama_karyawan": r.nama_karyawan or r.nik,
+            "type": "Terdeteksi Fake GPS (System)",
+            "description": "Lokasi palsu terdeteksi oleh sistem pelacakan",
+            "timestamp": str(r.recorded_at),
+            "severity": "BERAT",
+            "violation_code": "FAKE_GPS"
+        }
+        for r in rows if r.is_mocked == 1
+    ]
+
+    locked = [r for r in rows if r.lock_location == '1']
+    if locked:
+        outside, distance, radius = geofence.branches(db).outside(
+            [r.kode_cabang for r in locked],
+            [r.latitude for r in locked],
+            [r.longitude for r in locked]
+        )
+        points = geofence.patrol_points(db)
+        for i in np.flatnonzero(outside):
+            r = locked[i]
+            if _di_titik_patroli(points, r.kode_cabang, r.latitude, r.longitude):
+                continue
+            hasil.append({
+                "nik": r.nik,
+                "nama_karyawan": r.nama_karyawan,
+                "type": "Di Luar Radius Kantor",
+                "description": f"Terdeteksi lokasi di luar jangkauan saat bertugas ({int(distance[i])}m > {int(radius[i])}m)",
+                "timestamp": str(r.recorded_at),
+                "severity": "SEDANG",
+                "violation_code": "OUT_OF_LOCATION"
+            })
+    return last_id, hasil, fetched
+
+
+STREAMS = (
+    ("presensi", _deteksi_presensi),
+    ("app_frauds", _deteksi_app_fraud),
+    ("security_reports", _deteksi_security_reports),
+    ("location_histories", _deteksi_lokasi),
+)
+
+
+# ─── Penulisan ─────────────────────────────────────────────────────────────
+def simpan(db: Session, detected: list) -> tuple:
+    """
+    Bulk INSERT IGNORE hasil deteksi (format scan_violations) ke violations; tanpa commit.
+    Deteksi pertama per (nik, tanggal, jenis) yang dipakai. Return (jumlah baris baru,
+    set (nik, tanggal)) — pemanggil menandai daily_stats SETELAH commit.
+    """
+    rows = {}
+    for d in detected:
+        tanggal = date.fromisoformat(str(d['timestamp']).split(' ')[0])
+        key = (d['nik'], tanggal, d['violation_code'])
+        if key in rows:
+            continue
+        rows[key] = {
+            "nik": d['nik'],
+            "tanggal_pelanggaran": tanggal,
+            "jenis_pelanggaran": d['severity'],
+            "keterangan": d['description'],
+            "sanksi": '',
+            "status": 'OPEN',
+            "source": 'SYSTEM',
+            "violation_type": d['violation_code'],
+            "is_read": 0,
+        }
+    rows = list(rows.values())
+    inserted = 0
+    for i in range(0, len(rows), INSERT_BATCH):
+        stmt = mysql_insert(Violation.__table__).prefix_with("IGNORE").values(rows[i:i + INSERT_BATCH])
+        inserted += db.execute(stmt).rowcount
+    return inserted, {(r["nik"], r["tanggal_pelanggaran"]) for r in rows}
+
+
+def _mark(pairs):
+    daily_stats.mark_many(pairs)
+
+
+def tutup_hari(db: Session, tanggal: date) -> int:
+    """Scan penuh satu tanggal yang sudah lewat lalu simpan; commit. Return jumlah baris baru."""
+    from app.routers.violations import scan_violations
+    inserted, pairs = simpan(db, scan_violations(date_scan=tanggal, db=db))
+    db.commit()
+    _mark(pairs)
+    return inserted
+
+
+def run() -> dict:
+    """Job scheduler: proses sumber stream sejak high-water mark, lalu tutup hari yang lewat."""
+    started = datetime.now()
+    hasil = {"rows": 0, "detected": 0, "inserted": 0, "hari_ditutup": 0}
+    db = SessionLocal()
+    try:
+        state = _state(db)
+        excluded = set(get_excluded_niks(db))
+
+        for source, detektor in STREAMS:
+            mark = state[source].last_id if source in state else None
+            while True:
+                last_id, detected, n = detektor(db, mark, excluded)
+                hasil["rows"] += n
+                hasil["detected"] += len(detected)
+                inserted, pairs = simpan(db, detected)
+                hasil["inserted"] += inserted
+                if last_id is not None and last_id != mark:
+                    _simpan_state(db, source, last_id=last_id)
+                db.commit()
+                _mark(pairs)
+                mark = last_id
+                if n < BATCH_SIZE:
+                    break
+
+        kemarin = date.today() - timedelta(days=1)
+        ditutup = state[TUTUP_HARI].last_date if TUTUP_HARI in state and state[TUTUP_HARI].last_date else kemarin - timedelta(days=1)
+        tanggal = max(ditutup + timedelta(days=1), kemarin - timedelta(days=TUTUP_MAX_DAYS - 1))
+        while tanggal <= kemarin:
+            hasil["inserted"] += tutup_hari(db, tanggal)
+            _simpan_state(db, TUTUP_HARI, last_date=tanggal)
+            db.commit()
+            hasil["hari_ditutup"] += 1
+            logger.info(f"[ViolationDetector] Tutup hari {tanggal}")
+            tanggal += timedelta(days=1)
+    except Exception as e:
+        db.rollback()
+        with _lock:
+            _stats["errors"] += 1
+        logger.error(f"[ViolationDetector] Gagal: {e}")
+    finally:
+        db.close()
+
+    with _lock:
+        _stats["runs"] += 1
+        for k, v in hasil.items():
+            _stats[k] += v
+        _stats["last_run_ms"] = round((datetime.now() - started).total_seconds() * 1000, 1)
+    return hasil
+
+
+def stats() -> dict:
+    with _lock:
+        return dict(_stats)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    if len(sys.argv) < 2 or sys.argv[1] not in ("run", "tutup") or (sys.argv[1] == "tutup" and len(sys.argv) < 3):
+        print("Usage: python -m app.services.violation_detector run | tutup <tanggal>")
+        sys.exit(2)
+
+    if sys.argv[1] == "run":
+        print(run())
+    else:
+        db = SessionLocal()
+        try:
+            print(f"{tutup_hari(db, date.fromisoformat(sys.argv[2]))} pelanggaran baru")
+        finally:
+            db.close()
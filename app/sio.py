@@ -1,32 +1,61 @@
+import os
+import time
+import asyncio
 import socketio
-from jose import jwt, JWTError
-from app.routers.auth_legacy import SECRET_KEY, ALGORITHM, validate_sanctum_token
-from app.database import SessionLocal
+from socketio.exceptions import ConnectionRefusedError
+from app.core import sio_state, sio_auth
+from app.core.ptt_relay import PttRelay
 from urllib.parse import parse_qs
 
 # Create Socket.IO Server (Async implementation for ASGI)
+# SIO_MESSAGE_QUEUE diset → emit dipublish ke semua worker/node (lihat app.core.sio_state)
 sio = socketio.AsyncServer(
     async_mode='asgi',
     cors_allowed_origins='*',
     logger=True,
-    engineio_logger=True
+    engineio_logger=True,
+    client_manager=sio_state.client_manager()
 )
 
-# State Management (In-Memory)
+# State Management
 # clients[sid] = { 
 #    'userId': str, 
 #    'role': str, 
 #    'webrtc_room': str,      # Current WebRTC Signalling Room
 #    'walkie_channel': str    # Current Walkie Talkie Channel
 # }
+# clients hanya memuat socket yang tersambung ke worker ini. Presence lintas worker
+# (anggota room / channel, SID per user) dibaca dari `state` (in-memory atau Redis).
 clients = {}
+state = sio_state.create_state()
+ptt = PttRelay(sio, state)
+
+# room_status dikirim sekali per jendela debounce walau ada banyak join/leave (reconnect storm)
+ROOM_STATUS_DEBOUNCE = float(os.getenv("SIO_ROOM_STATUS_DEBOUNCE_MS", 250)) / 1000
+_pending_status = set()
+
+
+async def sids_for_user(user_id) -> set:
+    """Semua SID milik satu user di semua worker (bisa lebih dari satu perangkat / tab)."""
+    return await state.user_sids(user_id)
+
+
+async def _register_client(sid, user_id):
+    clients[sid] = {
+        'userId': user_id,
+        'role': None,
+        'webrtc_room': None,
+        'walkie_channel': None
+    }
+    await state.register(sid, user_id)
 
 @sio.event
 async def connect(sid, environ, auth):
     """
     Handle connection event.
-    Validate jwt token.
+    Validate jwt / sanctum token (lihat app.core.sio_auth).
     """
+    started = time.perf_counter()
     token = None
     
     # 1. Check Auth payload
@@ -42,59 +71,56 @@ async def connect(sid, environ, auth):
 
     if not token:
         print(f"Socket Connect Rejected: No Token (SID: {sid})")
+        sio_auth.observe('no_token', started)
         return False
 
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        user_id = payload.get("sub")
-        print(f"Socket Connected: User {user_id} (SID: {sid})")
-        
-        await sio.save_session(sid, {'user_id': user_id})
-        
-        # Init Client State
-        clients[sid] = {
-            'userId': user_id,
-            'role': None,
-            'webrtc_room': None,
-            'walkie_channel': None
-        }
-        
-    except JWTError:
-        # Fallback: Try Sanctum Token (Legacy Android)
-        print(f"Socket: JWT Decode failed for SID {sid}. Trying Sanctum...")
-        db = SessionLocal()
-        try:
-            sanctum_user_id = validate_sanctum_token(db, token)
-            if sanctum_user_id:
-                user_id = str(sanctum_user_id)
-                print(f"Socket Connected (Sanctum): User {user_id} (SID: {sid})")
-                
-                await sio.save_session(sid, {'user_id': user_id})
-                
-                clients[sid] = {
-                    'userId': user_id,
-                    'role': None,
-                    'webrtc_room': None,
-                    'walkie_channel': None
-                }
-                return True
-        except Exception as e:
-            print(f"Socket Sanctum Error: {e}")
-        finally:
-            db.close()
+    # Reconnect storm: handshake ditunda merata, yang melebihi batas tunggu ditolak
+    wait = sio_auth.limiter.admit()
+    if wait is None:
+        print(f"Socket Connect Throttled (SID: {sid})")
+        sio_auth.observe('throttled', started)
+        raise ConnectionRefusedError({'reason': 'throttled', 'retry_after': sio_auth.CONNECT_MAX_WAIT})
+    if wait:
+        await asyncio.sleep(wait)
 
+    # JWT, lalu fallback Sanctum (Legacy Android) di thread pool; hasil valid di-cache
+    user_id, source = await sio_auth.verify_token(token)
+    if source is None:
         print(f"Socket Connect Rejected: Invalid Token (SID: {sid})")
+        sio_auth.observe('invalid', started)
         return False
 
+    print(f"Socket Connected ({source}): User {user_id} (SID: {sid})")
+    await sio.save_session(sid, {'user_id': user_id})
+
+    # Init Client State
+    await _register_client(sid, user_id)
+    sio_auth.observe(source, started)
+    return True
+
 # --- Helper: Push Online Users (WebRTC) ---
-async def push_online_users(room):
+async def _emit_room_status(room):
     online_users = []
-    for c_sid, c_data in clients.items():
-        if c_data.get('webrtc_room') == room:
-            online_users.append({'userId': c_data.get('userId'), 'role': c_data.get('role')})
+    for member in await state.members(room):
+        online_users.append({'userId': member['userId'], 'role': member['role']})
     
     await sio.emit('room_status', {'members': online_users}, room=room)
 
+async def _flush_room_status(room):
+    await sio.sleep(ROOM_STATUS_DEBOUNCE)
+    _pending_status.discard(room)
+    await _emit_room_status(room)
+
+async def push_online_users(room):
+    """Jadwalkan room_status; perubahan lain dalam jendela debounce ikut terkirim di emit yang sama."""
+    if ROOM_STATUS_DEBOUNCE <= 0:
+        await _emit_room_status(room)
+        return
+    if room in _pending_status:
+        return
+    _pending_status.add(room)
+    sio.start_background_task(_flush_room_status, room)
+
 # --- WebRTC Signaling Events ---
 
 @sio.event
@@ -107,10 +133,14 @@ async def join_room(sid, data):
     # 1. Join Room & Save State
     await sio.enter_room(sid, room)
     
+    prev_room = None
     if sid in clients:
-        clients[sid]['webrtc_room'] = room
-        clients[sid]['role'] = role
-        clients[sid]['userId'] = user_id # Sync with payload
+        c_data = clients[sid]
+        prev_room = c_data.get('webrtc_room')
+        c_data['webrtc_room'] = room
+        c_data['role'] = role
+        c_data['userId'] = user_id # Sync with payload
+        await state.join_room(sid, room, role, user_id)
     
     print(f"[WebRTC] {role} {user_id} joined room {room} (SID: {sid})")
     
@@ -121,17 +151,19 @@ async def join_room(sid, data):
                    skip_sid=sid)
                    
     # 3. Send Existing Peers List
-    for c_sid, c_data in clients.items():
-        if c_data.get('webrtc_room') == room and c_sid != sid:
+    for member in await state.members(room):
+        if member['sid'] != sid:
             peer_payload = {
-                'peerId': c_sid,
-                'role': c_data.get('role'),
-                'userId': c_data.get('userId')
+                'peerId': member['sid'],
+                'role': member['role'],
+                'userId': member['userId']
             }
             await sio.emit('new_peer', peer_payload, to=sid)
             
     # 4. Push Updated Online Users
     await push_online_users(room)
+    if prev_room and prev_room != room:
+        await push_online_users(prev_room)
 
 @sio.event
 async def signal(sid, data):
@@ -157,32 +189,40 @@ async def join_channel(sid, data):
     # Leave previous channel logic?
     prev_channel = clients[sid].get('walkie_channel')
     if prev_channel:
+        await ptt.leave(sid)
         await sio.leave_room(sid, prev_channel)
         
     await sio.enter_room(sid, channel)
     clients[sid]['walkie_channel'] = channel
+    await state.set_channel(sid, channel)
+    ptt.join(sid, channel)
     
     user_id = clients[sid].get('userId')
     print(f"[Walkie] User {user_id} joined channel {channel}")
 
 @sio.event
 async def voice_stream(sid, data):
-    # data: Binary bytes
-    c_data = clients.get(sid)
-    if not c_data: return
-    
-    channel = c_data.get('walkie_channel')
-    if channel:
-        # Broadcast audio to channel, skip sender
-        await sio.emit('voice_stream', data, room=channel, skip_sid=sid)
+    # data: Binary bytes — diteruskan lewat PttRelay (giliran bicara + antrian terbatas)
+    await ptt.frame(sid, data)
+
+@sio.event
+async def ptt_start(sid, data=None):
+    # Minta giliran bicara; ack: {granted, channel, userId pemegang}
+    return await ptt.request_floor(sid)
+
+@sio.event
+async def ptt_end(sid, data=None):
+    await ptt.release(sid)
         
 @sio.event
 async def leave_channel(sid):
     c_data = clients.get(sid)
     if c_data and c_data.get('walkie_channel'):
         channel = c_data['walkie_channel']
+        await ptt.leave(sid)
         await sio.leave_room(sid, channel)
         c_data['walkie_channel'] = None
+        await state.set_channel(sid, None)
         print(f"[Walkie] User {c_data.get('userId')} left channel {channel}")
 
 
@@ -207,6 +247,8 @@ async def disconnect(sid):
         # ... logic if needed
         
         del clients[sid]
+        await ptt.leave(sid)
+        await state.unregister(sid)
         
         if webrtc_room:
              await push_online_users(webrtc_room)
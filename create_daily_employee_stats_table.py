@@ -0,0 +1,12 @@
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app.database import Base, engine
+from app.models.daily_employee_stats import DailyEmployeeStats, DailyEmployeeStatsDirty
+
+print("Creating daily_employee_stats & daily_employee_stats_dirty tables...")
+Base.metadata.create_all(bind=engine, tables=[DailyEmployeeStats.__table__, DailyEmployeeStatsDirty.__table__])
+print("Done!")
+print("Isi data lama dengan: python -m app.services.daily_stats backfill <mulai> <sampai>")
@@ -0,0 +1,31 @@
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from sqlalchemy import text
+from app.database import Base, engine
+from app.models.location_track import LocationTrack
+
+print("Creating location_tracks table...")
+Base.metadata.create_all(bind=engine, tables=[LocationTrack.__table__])
+
+# Tabel lama (sebelum kolom id_akhir): tambahkan kolomnya
+print("Adding location_tracks.id_akhir...")
+try:
+    with engine.begin() as conn:
+        conn.execute(text("ALTER TABLE location_tracks ADD COLUMN id_akhir BIGINT NULL AFTER waktu"))
+except Exception as e:
+    print(f"Skip (maybe already exists?): {e}")
+
+# Index recorded_at: range scan retensi & scan pelanggaran per hari (online DDL, tanpa lock tabel)
+print("Adding idx_history_recorded_at on employee_location_histories...")
+try:
+    with engine.begin() as conn:
+        conn.execute(text(
+            "ALTER TABLE employee_location_histories "
+            "ADD INDEX idx_history_recorded_at (recorded_at), ALGORITHM=INPLACE, LOCK=NONE"
+        ))
+except Exception as e:
+    print(f"Skip (maybe already exists?): {e}")
+print("Done!")
@@ -0,0 +1,11 @@
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app.database import Base, engine
+from app.models.notification_outbox import NotificationOutbox
+
+print("Creating notification_outbox table...")
+Base.metadata.create_all(bind=engine, tables=[NotificationOutbox.__table__])
+print("Done!")
@@ -0,0 +1,11 @@
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app.database import Base, engine
+from app.models.reminder_timeline_invalidation import ReminderTimelineInvalidation
+
+print("Creating reminder_timeline_invalidations table...")
+Base.metadata.create_all(bind=engine, tables=[ReminderTimelineInvalidation.__table__])
+print("Done!")
@@ -0,0 +1,11 @@
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app.database import Base, engine
+from app.models.slip_gaji_detail import SlipGajiDetail
+
+print("Creating slip_gaji_detail table...")
+Base.metadata.create_all(bind=engine, tables=[SlipGajiDetail.__table__])
+print("Done!")
@@ -0,0 +1,12 @@
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app.database import Base, engine
+from app.models.violation_scan_state import ViolationScanState
+
+print("Creating violation_scan_state table...")
+Base.metadata.create_all(bind=engine, tables=[ViolationScanState.__table__])
+print("Done!")
+print("Pasang juga unique key violations dengan: python migrate_violations_unique_key.py")
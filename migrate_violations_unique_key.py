@@ -0,0 +1,33 @@
+from sqlalchemy import text
+from app.database import SessionLocal
+
+def migrate():
+    db = SessionLocal()
+    try:
+        # Duplikat pelanggaran otomatis dari auto-sync lama: simpan id terkecil
+        result = db.execute(text("""
+            DELETE v1 FROM violations v1
+            JOIN violations v2
+              ON v1.nik = v2.nik
+             AND v1.tanggal_pelanggaran = v2.tanggal_pelanggaran
+             AND v1.violation_type = v2.violation_type
+             AND v1.source = 'SYSTEM' AND v2.source = 'SYSTEM'
+             AND v1.id > v2.id
+        """))
+        print(f"Removed {result.rowcount} duplicated SYSTEM violations.")
+        db.execute(text("""
+            ALTER TABLE violations
+            ADD COLUMN system_type VARCHAR(50)
+                GENERATED ALWAYS AS (CASE WHEN `source` = 'SYSTEM' THEN `violation_type` END) STORED,
+            ADD UNIQUE KEY uk_violations_system (nik, tanggal_pelanggaran, system_type)
+        """))
+        db.commit()
+        print("Successfully added system_type column and uk_violations_system to violations table.")
+    except Exception as e:
+        db.rollback()
+        print(f"Error (maybe already exists?): {e}")
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    migrate()
@@ -0,0 +1,127 @@
+"""
+Benchmark: CPU per frame relay PTT (voice_stream) pada channel besar.
+
+Mensimulasikan satu channel walkie dengan N anggota (default 200) di satu proses:
+socket Engine.IO sungguhan (AsyncSocket) tanpa jaringan, tiap anggota punya "writer"
+yang mengosongkan antriannya seperti writer websocket Engine.IO. Sebagian anggota
+dibuat lambat (bandwidth hanya setengah laju audio) untuk melihat perilaku antrian.
+
+Satu pembicara mengirim frame audio tiap 20 ms selama DURASI detik melalui:
+  emit   sio.emit('voice_stream', data, room=channel, skip_sid=...)  (jalur lama)
+  relay  app.core.ptt_relay.PttRelay.frame()                          (jalur baru)
+dan dicatat:
+  send_ms   CPU di dalam pemanggilan emit/frame() per frame (biaya relay itu sendiri)
+  cpu_ms    CPU seluruh proses per frame (termasuk writer simulasi)
+  p95_age   umur audio (ms) saat ditulis writer anggota lambat — audio basi
+  dropped   frame yang dibuang relay untuk anggota lambat
+
+Pemakaian:
+    python scripts/bench_ptt_relay.py                 # 200 anggota, 5 detik
+    python scripts/bench_ptt_relay.py 500 10          # 500 anggota, 10 detik
+"""
+
+import sys
+import time
+import struct
+import asyncio
+
+sys.path.append('/var/www/appPatrol-python')
+
+import socketio
+from engineio.async_socket import AsyncSocket
+
+from app.core.sio_state import MemoryState
+from app.core.ptt_relay import PttRelay
+
+MEMBERS = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+DURATION = float(sys.argv[2]) if len(sys.argv) > 2 else 5.0
+FRAME_MS = 20
+FRAME_BYTES = 512                   # Opus 20 ms ≈ 40–160 byte; dilebihkan
+SLOW_EVERY = 10                     # 1 dari 10 anggota lambat
+SLOW_PACKET_SECONDS = 0.02          # writer lambat: 20 ms per paket → 40 ms per frame (½ laju)
+
+
+def make_frame() -> bytes:
+    # 8 byte pertama = waktu kirim, untuk mengukur umur audio di penerima
+    return struct.pack("d", time.perf_counter()) + bytes(FRAME_BYTES - 8)
+
+
+async def writer(sock: AsyncSocket, per_packet: float, ages: list):
+    while True:
+        try:
+            packets = await sock.poll()
+        except Exception:
+            return
+        now = time.perf_counter()
+        for pkt in packets:
+            data = pkt.encode()
+            if per_packet and isinstance(data, bytes):
+                ages.append(now - struct.unpack("d", data[:8])[0])
+        await asyncio.sleep(per_packet * len(packets))
+
+
+async def setup(server: socketio.AsyncServer, channel: str, ages: list):
+    sids, tasks = [], []
+    for i in range(MEMBERS + 1):
+        eio_sid = f"eio{i}"
+        sock = AsyncSocket(server.eio, eio_sid)
+        sock.connected = True
+        server.eio.sockets[eio_sid] = sock
+        sid = await server.manager.connect(eio_sid, '/')
+        await server.manager.enter_room(sid, '/', channel)
+        sids.append(sid)
+        if i:
+            per_packet = SLOW_PACKET_SECONDS if i % SLOW_EVERY == 0 else 0
+            tasks.append(asyncio.ensure_future(writer(sock, per_packet, ages)))
+    return sids, tasks
+
+
+async def run(mode: str) -> dict:
+    server = socketio.AsyncServer(async_mode='asgi')
+    state = MemoryState()
+    relay = PttRelay(server, state)
+    channel = "BENCH"
+    ages = []
+    sids, tasks = await setup(server, channel, ages)
+    talker = sids[0]
+    await state.register(talker, "talker")
+    for sid in sids:
+        relay.join(sid, channel)
+
+    frames = int(DURATION * 1000 / FRAME_MS)
+    send = 0.0
+    cpu0, wall0 = time.process_time(), time.perf_counter()
+    for n in range(frames):
+        frame = make_frame()
+        t0 = time.process_time()
+        if mode == "emit":
+            await server.emit('voice_stream', frame, room=channel, skip_sid=talker)
+        else:
+            await relay.frame(talker, frame)
+        send += time.process_time() - t0
+        # pacing 20 ms terhadap jam dinding (CPU writer ikut terukur)
+        await asyncio.sleep(max(0.0, wall0 + (n + 1) * FRAME_MS / 1000 - time.perf_counter()))
+    cpu = time.process_time() - cpu0
+
+    for t in tasks:
+        t.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    ages.sort()
+    return {
+        "frames": frames,
+        "send_ms": round(send * 1000 / frames, 3),
+        "cpu_ms": round(cpu * 1000 / frames, 3),
+        "p95_age_ms": round(ages[int(len(ages) * 0.95)] * 1000) if ages else None,
+        "dropped": relay.stats()["dropped"] if mode == "relay" else "-",
+    }
+
+
+async def main():
+    print(f"{MEMBERS} anggota, frame {FRAME_MS} ms, {FRAME_BYTES} byte, {DURATION:g} detik "
+          f"({MEMBERS // SLOW_EVERY} anggota lambat)")
+    for mode in ("emit", "relay"):
+        print(f"{mode:6s}", await run(mode))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
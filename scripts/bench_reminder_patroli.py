@@ -0,0 +1,135 @@
+"""
+Benchmark: jumlah query reminder absen_patroli vs jumlah karyawan.
+
+Menyusun timeline reminder patroli untuk N karyawan sintetis, lalu menjalankan satu
+tick di dalam jendela patroli dan menghitung query SQL yang dieksekusi. Jumlah query
+tick harus sama untuk setiap N (evaluasi berkelompok, bukan per NIK × jadwal).
+Catatan: ScheduleResolver memecah klausa IN per 1000 NIK, jadi di atas 1000 NIK
+jumlah query bertambah per chunk, bukan per karyawan.
+
+Semua data sintetis ditulis di dalam transaksi yang di-rollback di akhir, dan push
+FCM diganti stub (tidak ada notifikasi yang terkirim).
+
+Pemakaian:
+    python scripts/bench_reminder_patroli.py            # N = 50 200 800
+    python scripts/bench_reminder_patroli.py 100 1000
+"""
+
+import sys
+import time
+from types import SimpleNamespace
+from datetime import datetime, date, timedelta
+
+sys.path.append('/var/www/appPatrol-python')
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app.database import engine
+from app.core import master_cache
+from app.models.models import Karyawan, Presensi, PatrolSessions
+from app.services import reminder_scheduler as rs
+from app.services.reminder_timeline import timeline
+
+SIZES = [int(a) for a in sys.argv[1:]] or [50, 200, 800]
+
+queries = []
+
+
+def _count(conn, cursor, statement, parameters, context, executemany):
+    queries.append(statement)
+
+
+def seed(db: Session, prefix: str, n: int, template, kode_jam_kerja: str, today: date, jam_in: datetime) -> list:
+    niks = [f"{prefix}{i:07d}" for i in range(n)]
+    db.add_all([
+        Karyawan(
+            nik=nik, no_ktp=nik[:16], nama_karyawan=f"Bench {nik}", jenis_kelamin='L',
+            kode_cabang=template.kode_cabang, kode_dept=template.kode_dept,
+            kode_jabatan=template.kode_jabatan, tanggal_masuk=today, status_karyawan='K',
+            lock_location='0', status_aktif_karyawan='1', password='-', kode_jadwal=kode_jam_kerja
+        )
+        for nik in niks
+    ])
+    db.flush()
+    db.add_all([
+        Presensi(nik=nik, tanggal=today, kode_jam_kerja=kode_jam_kerja, status='H', jam_in=jam_in)
+        for nik in niks
+    ])
+    db.flush()
+    return niks
+
+
+def run_round(db: Session, n: int, round_no: int, template, jk, today: date) -> dict:
+    now = datetime.combine(today, jk.jam_masuk) + timedelta(minutes=30)
+    niks = seed(db, f"BENCH{round_no:02d}", n, template, jk.kode_jam_kerja, today, now - timedelta(minutes=25))
+    if round_no % 2:
+        # Separuh ronde: grup sudah patroli → dijawab dari index di memori
+        db.add(PatrolSessions(nik=niks[0], tanggal=today, kode_jam_kerja=jk.kode_jam_kerja,
+                              jam_patrol=now.time(), created_at=now - timedelta(minutes=1)))
+        db.flush()
+
+    setting = SimpleNamespace(id=-1, type='absen_patroli', label='Bench', message='Bench', minutes_before=15,
+                              target_role=None, target_dept=None, target_cabang=None, target_shift=None)
+    schedule = SimpleNamespace(id=-1, kode_jam_kerja=jk.kode_jam_kerja, start_time=now.time(),
+                               end_time=(now + timedelta(hours=1)).time(), kode_dept=None, kode_cabang=None)
+    context = {
+        "settings": {setting.id: setting},
+        "targets": {setting.id: set(niks)},
+        "karyawan": {nik: SimpleNamespace(kode_cabang=template.kode_cabang, kode_dept=template.kode_dept) for nik in niks},
+        "schedules": [schedule],
+    }
+
+    queries.clear()
+    started = time.perf_counter()
+    timeline.reset(today, now - timedelta(minutes=1), {}, context)
+    rs._push_entries(db, context, set(niks), today, now - timedelta(minutes=1))
+    build = (len(queries), (time.perf_counter() - started) * 1000)
+
+    queries.clear()
+    started = time.perf_counter()
+    due = timeline.pop_due(now)
+    rs._fire_due(db, due, now)
+    tick = (len(queries), (time.perf_counter() - started) * 1000)
+
+    return {"n": n, "due": len(due), "build": build, "tick": tick}
+
+
+def main():
+    sent = []
+    rs._send_fcm_to_niks = lambda db, niks, title, body, reminder_type, audio_only=False: sent.append(len(niks))
+
+    with engine.connect() as conn:
+        trans = conn.begin()
+        db = Session(bind=conn, join_transaction_mode="create_savepoint")
+        try:
+            template = db.query(Karyawan).first()
+            jk_map = master_cache.get_all_jam_kerja(db)
+            jk = next((j for j in jk_map.values() if j.jam_masuk and j.jam_pulang and j.jam_pulang > j.jam_masuk), None)
+            if not template or not jk:
+                print("Butuh minimal 1 karyawan & 1 jam kerja non-lintas hari di database.")
+                return 1
+            today = date.today()
+            master_cache.get_jam_kerja_dept(db)  # hangatkan cache master agar tidak ikut terhitung
+
+            event.listen(conn, "before_cursor_execute", _count)
+            results = [run_round(db, n, i, template, jk, today) for i, n in enumerate(SIZES)]
+            event.remove(conn, "before_cursor_execute", _count)
+        finally:
+            db.close()
+            trans.rollback()
+
+    print(f"{'karyawan':>9} {'due':>6} {'build q':>8} {'build ms':>9} {'tick q':>7} {'tick ms':>8}")
+    for r in results:
+        print(f"{r['n']:>9} {r['due']:>6} {r['build'][0]:>8} {r['build'][1]:>9.1f} {r['tick'][0]:>7} {r['tick'][1]:>8.1f}")
+
+    tick_counts = {r["tick"][0] for r in results if r["n"] <= 1000}
+    if len(tick_counts) > 1:
+        print("GAGAL: jumlah query tick bergantung pada jumlah karyawan")
+        return 1
+    print("OK: jumlah query tick konstan terhadap jumlah karyawan")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
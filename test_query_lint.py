@@ -0,0 +1,66 @@
+"""
+Test app.core.query_lint mode strict: predikat DATE(kolom) ditolak, bentuk
+app.core.date_range lolos. Memakai engine SQLite in-memory.
+
+    python -m pytest -q test_query_lint.py
+"""
+
+import sys
+from datetime import date, datetime
+
+import pytest
+from sqlalchemy import (
+    create_engine, MetaData, Table, Column, Integer, String, DateTime, Index, select, func, insert
+)
+
+sys.path.append('/var/www/appPatrol-python')
+
+from app.core import query_lint
+from app.core.date_range import on_date, date_between
+
+metadata = MetaData()
+presensi = Table(
+    "presensi_lint", metadata,
+    Column("id", Integer, primary_key=True),
+    Column("nik", String(18)),
+    Column("jam_in", DateTime),
+    Index("presensi_lint_nik_jam_in_index", "nik", "jam_in"),
+)
+
+
+@pytest.fixture
+def engine(monkeypatch):
+    # Index kolom tanggal diambil dari metadata test, bukan model aplikasi
+    monkeypatch.setattr(query_lint, "_indexed", query_lint.indexed_date_columns(metadata))
+    eng = create_engine("sqlite://")
+    metadata.create_all(eng)
+    with eng.begin() as conn:
+        conn.execute(insert(presensi).values(nik="123", jam_in=datetime(2026, 9, 1, 7, 55)))
+    query_lint.install(eng, strict=True)
+    yield eng
+    eng.dispose()
+
+
+def test_date_kolom_ditolak(engine):
+    stmt = select(presensi.c.id).where(func.date(presensi.c.jam_in) == date(2026, 9, 1))
+    with engine.connect() as conn:
+        with pytest.raises(query_lint.WrappedDateColumnError, match=r"DATE\(.*jam_in\)"):
+            conn.execute(stmt)
+
+
+def test_date_range_lolos(engine):
+    with engine.connect() as conn:
+        hari = conn.execute(
+            select(presensi.c.id).where(on_date(presensi.c.jam_in, date(2026, 9, 1)))
+        ).all()
+        rentang = conn.execute(
+            select(presensi.c.id).where(date_between(presensi.c.jam_in, date(2026, 8, 31), date(2026, 9, 1)))
+        ).all()
+    assert len(hari) == 1
+    assert len(rentang) == 1
+
+
+def test_fungsi_di_select_tidak_dipermasalahkan(engine):
+    stmt = select(func.date(presensi.c.jam_in)).where(presensi.c.nik == "123")
+    with engine.connect() as conn:
+        assert conn.execute(stmt).scalar() == "2026-09-01"
@@ -0,0 +1,147 @@
+"""
+Test state Socket.IO lintas worker (app.core.sio_state) dan leader scheduler
+(app.core.leader) memakai fakeredis sebagai pengganti Redis.
+
+    pip install -r requirements-dev.txt
+    python -m pytest -q test_sio_state.py
+"""
+
+import sys
+import asyncio
+import threading
+
+import pytest
+
+sys.path.append('/var/www/appPatrol-python')
+
+fakeredis = pytest.importorskip("fakeredis")
+socketio = pytest.importorskip("socketio")
+from engineio.async_socket import AsyncSocket
+
+from app.core import leader
+from app.core.sio_state import RedisState
+
+
+@pytest.fixture(scope="module")
+def redis_url():
+    server = fakeredis.TcpFakeServer(("127.0.0.1", 0), server_type="redis")
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    host, port = server.server_address
+    yield f"redis://{host}:{port}/0"
+    server.shutdown()
+    server.server_close()
+
+
+def _run(coro):
+    return asyncio.run(coro)
+
+
+def test_room_state_dibagi_antar_worker(redis_url):
+    async def skenario():
+        a = RedisState(redis_url, prefix="t1:", node_id="worker-a")
+        b = RedisState(redis_url, prefix="t1:", node_id="worker-b")
+        await a.register("sid-a", "10")
+        await b.register("sid-b", 20)
+        assert await a.join_room("sid-a", "room-1", "admin", "10") is None
+        await b.join_room("sid-b", "room-1", "guard", 20)
+        await b.set_channel("sid-b", "CH1")
+
+        # worker A melihat anggota yang tersambung ke worker B, dan sebaliknya
+        members = sorted(await a.members("room-1"), key=lambda m: m["sid"])
+        assert members == [
+            {"sid": "sid-a", "userId": "10", "role": "admin"},
+            {"sid": "sid-b", "userId": "20", "role": "guard"},
+        ]
+        assert await a.channel_members("CH1") == {"sid-b"}
+        assert await a.user_sids(20) == {"sid-b"}
+        assert await b.user_of("sid-a") == "10"
+
+        # pindah room → anggota room lama berkurang di kedua worker
+        assert await a.join_room("sid-a", "room-2", "admin", "10") == "room-1"
+        assert [m["sid"] for m in await b.members("room-1")] == ["sid-b"]
+
+        # worker B mati tanpa shutdown bersih → dibersihkan worker A
+        await a._drop_node("worker-b")
+        assert await a.members("room-1") == []
+        assert await a.channel_members("CH1") == set()
+        assert await a.user_sids(20) == set()
+
+        await a.stop()
+        await b.redis.aclose()
+        await b.raw.aclose()
+
+    _run(skenario())
+
+
+def test_floor_ptt_satu_pemegang(redis_url):
+    async def skenario():
+        a = RedisState(redis_url, prefix="t2:", node_id="worker-a")
+        b = RedisState(redis_url, prefix="t2:", node_id="worker-b")
+        assert await a.acquire_floor("CH1", "sid-a", 1000) == "sid-a"
+        assert await b.acquire_floor("CH1", "sid-b", 1000) == "sid-a"
+        assert not await b.release_floor("CH1", "sid-b")
+        assert await a.release_floor("CH1", "sid-a")
+        assert await b.acquire_floor("CH1", "sid-b", 1000) == "sid-b"
+        for s in (a, b):
+            await s.redis.aclose()
+            await s.raw.aclose()
+
+    _run(skenario())
+
+
+async def _server_dengan_socket(url: str, room: str):
+    """AsyncServer ber-client manager Redis dengan satu socket lokal (tanpa jaringan) di room."""
+    server = socketio.AsyncServer(
+        async_mode='asgi', client_manager=socketio.AsyncRedisManager(url, channel="t3:emit")
+    )
+    server.manager_initialized = True
+    server.manager.initialize()
+    sock = AsyncSocket(server.eio, "eio-1")
+    sock.connected = True
+    server.eio.sockets["eio-1"] = sock
+    sid = await server.manager.connect("eio-1", '/')
+    await server.manager.enter_room(sid, '/', room)
+    return server, sock
+
+
+def test_emit_sampai_ke_worker_lain(redis_url):
+    async def skenario():
+        server_a, _ = await _server_dengan_socket(redis_url, "lobby")
+        server_b, sock_b = await _server_dengan_socket(redis_url, "room-x")
+        await asyncio.sleep(0.2)    # tunggu subscriber pub/sub siap
+
+        # emit dari worker A ke room yang hanya punya anggota di worker B
+        await server_a.emit("emergency_broadcast", {"id": 7}, room="room-x")
+        packets = await asyncio.wait_for(sock_b.poll(), timeout=3)
+        assert any("emergency_broadcast" in str(p.data) for p in packets)
+
+        for server in (server_a, server_b):
+            server.manager.thread.cancel()
+            await asyncio.gather(server.manager.thread, return_exceptions=True)
+
+    _run(skenario())
+
+
+def test_leader_hanya_satu(redis_url):
+    pertama = leader.RedisLease(redis_url, key="t4:leader", node_id="worker-a", ttl=5)
+    kedua = leader.RedisLease(redis_url, key="t4:leader", node_id="worker-b", ttl=5)
+    assert pertama.acquire()
+    assert not kedua.acquire()
+    assert pertama.acquire()        # perpanjang lease sendiri
+    pertama.release()
+    assert kedua.acquire()          # diambil alih setelah leader lepas
+    kedua.release()
+
+
+def test_only_leader_melewati_job(monkeypatch):
+    calls = []
+    job = leader.only_leader(lambda: calls.append(1))
+    monkeypatch.setattr(leader, "BACKEND", "none")
+    leader.release()
+    job()
+    assert calls == []
+    assert leader.renew()
+    job()
+    assert calls == [1]
+    leader.release()